@@ -0,0 +1,36 @@
+from django.contrib.auth.backends import ModelBackend
+from graphql_jwt.backends import JSONWebTokenBackend
+from graphql_jwt.utils import get_credentials
+
+from .services.permissions import user_permissions
+from .services.tokens import get_user_by_token
+
+
+class CachedModelBackend(ModelBackend):
+    """``ModelBackend`` reading permission sets from the permission cache.
+
+    Replace ``django.contrib.auth.backends.ModelBackend`` with this in
+    ``AUTHENTICATION_BACKENDS``; ``PermissionRequiredMixin`` and
+    ``user.has_perm`` then stop querying permission and group tables.
+    """
+
+    def get_all_permissions(self, user_obj, obj=None):
+        if not user_obj.is_active or user_obj.is_anonymous or obj is not None:
+            return set()
+        return user_permissions(user_obj)
+
+
+class CachedJSONWebTokenBackend(JSONWebTokenBackend):
+    """graphql_jwt backend verifying tokens through the token cache.
+
+    Use in ``AUTHENTICATION_BACKENDS`` in place of
+    ``graphql_jwt.backends.JSONWebTokenBackend``.
+    """
+
+    def authenticate(self, request=None, **kwargs):
+        if request is None or getattr(request, "_jwt_token_auth", False):
+            return None
+        token = get_credentials(request, **kwargs)
+        if token is None:
+            return None
+        return get_user_by_token(token, request)
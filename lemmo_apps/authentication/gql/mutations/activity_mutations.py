@@ -2,6 +2,7 @@ import graphene
 from graphene_django import DjangoObjectType
 from django.contrib.auth import get_user_model
 from lemmo_apps.authentication.models import UserActivity
+from lemmo_apps.authentication.services.audit import record_activity
 
 User = get_user_model()
 
@@ -37,13 +38,13 @@ class LogActivity(graphene.Mutation):
     ):
         try:
             user = User.objects.get(id=user_id)
-            activity = UserActivity.objects.create(
-                user=user,
+            activity = record_activity(
+                user,
                 activity_type=activity_type,
                 description=description,
                 ip_address=ip_address,
                 user_agent=user_agent,
-                metadata=metadata or {},
+                metadata=metadata,
             )
             return LogActivity(
                 activity=activity, success=True, message="Activity logged successfully"
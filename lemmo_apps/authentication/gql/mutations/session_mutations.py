@@ -47,6 +47,14 @@ class EndSession(graphene.Mutation):
     def mutate(self, info, session_id):
         try:
             session = UserSession.objects.get(id=session_id)
+            user = info.context.user
+            # Ending a session revokes the owner's tokens.
+            if not user.is_authenticated or (
+                session.user_id != user.pk and not user.is_staff
+            ):
+                return EndSession(
+                    success=False, message="Not allowed to end this session"
+                )
             session.end_session()
             return EndSession(success=True, message="Session ended successfully")
         except UserSession.DoesNotExist:
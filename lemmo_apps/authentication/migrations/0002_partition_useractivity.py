@@ -0,0 +1,25 @@
+# Generated by Django 5.2.4 on 2026-10-17 15:10
+
+from django.db import migrations
+
+from lemmo_apps.partitioning import partition_by_month
+
+
+def partition_user_activities(apps, schema_editor):
+    partition_by_month(schema_editor, "tblUserActivities", "created_at")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("authentication", "0001_initial"),
+    ]
+
+    operations = [
+        # Not undone: the table stays partitioned when this is unapplied, and
+        # reapplying skips it. See lemmo_apps.partitioning for the manual
+        # procedure that turns it back into a plain table.
+        migrations.RunPython(
+            partition_user_activities, reverse_code=migrations.RunPython.noop
+        ),
+    ]
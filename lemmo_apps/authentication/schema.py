@@ -7,6 +7,7 @@ from .gql.mutations.auth_mutations import AuthMutations
 from graphene_django.filter import DjangoFilterConnectionField
 from django.db.models import Q
 from lemmo_apps.authentication.models import User, UserSession, UserActivity
+from lemmo_apps.gql.optimizer import optimize_queryset
 
 
 class Query(graphene.ObjectType):
@@ -49,7 +50,7 @@ class Query(graphene.ObjectType):
     def resolve_users(
         self, info, role=None, is_active=None, search=None, limit=None, offset=None
     ):
-        queryset = User.objects.all()
+        queryset = optimize_queryset(User.objects.all(), info)
 
         if role:
             queryset = queryset.filter(role=role)
@@ -80,7 +81,7 @@ class Query(graphene.ObjectType):
         return User.objects.get(email=email)
 
     def resolve_user_sessions(self, info, user_id=None, is_active=None):
-        queryset = UserSession.objects.all()
+        queryset = optimize_queryset(UserSession.objects.all(), info)
 
         if user_id:
             queryset = queryset.filter(user_id=user_id)
@@ -93,7 +94,7 @@ class Query(graphene.ObjectType):
     def resolve_user_activities(
         self, info, user_id=None, activity_type=None, limit=None, offset=None
     ):
-        queryset = UserActivity.objects.all()
+        queryset = optimize_queryset(UserActivity.objects.all(), info)
 
         if user_id:
             queryset = queryset.filter(user_id=user_id)
@@ -110,10 +111,12 @@ class Query(graphene.ObjectType):
         return queryset
 
     def resolve_healthcare_professionals(self, info):
-        return User.objects.filter(role__in=["PHARMACIST", "NURSE", "DOCTOR"])
+        return optimize_queryset(
+            User.objects.filter(role__in=["PHARMACIST", "NURSE", "DOCTOR"]), info
+        )
 
     def resolve_logistics_staff(self, info):
-        return User.objects.filter(
+        queryset = User.objects.filter(
             role__in=[
                 "LOGISTICS_MANAGER",
                 "WAREHOUSE_MANAGER",
@@ -123,9 +126,10 @@ class Query(graphene.ObjectType):
                 "DRIVER",
             ]
         )
+        return optimize_queryset(queryset, info)
 
     def resolve_active_users(self, info):
-        return User.objects.filter(is_active=True)
+        return optimize_queryset(User.objects.filter(is_active=True), info)
 
     def resolve_user_stats(self, info):
         from django.db.models import Count
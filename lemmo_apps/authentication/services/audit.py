@@ -0,0 +1,234 @@
+"""Buffered writer for ``UserActivity`` audit rows.
+
+``record_activity`` builds the row and puts it on a bounded in-process queue;
+a daemon thread per process drains the queue with ``bulk_create`` whenever
+``LEMMO_AUDIT_FLUSH_SIZE`` rows are waiting or ``LEMMO_AUDIT_FLUSH_INTERVAL_MS``
+has passed, so the request thread neither opens a transaction nor serialises
+``metadata``. A batch that fails on a lost connection is retried with backoff
+``LEMMO_AUDIT_RETRIES`` times; a batch still failing, or rejected for its data,
+is written row by row, logging the rows that fail. Rows are validated before
+they are queued, so bad input is reported to the caller. When the
+queue already holds ``LEMMO_AUDIT_BUFFER_SIZE`` rows, the caller writes its
+row synchronously instead of dropping it.
+
+The stored ``created_at`` is the time the batch is written, up to one flush
+interval after the event. Rows still queued when the process exits are
+flushed by an ``atexit`` hook; rows are lost if the process is killed. Set
+``LEMMO_AUDIT_BUFFERED = False`` (e.g. in tests) to write every row
+synchronously.
+"""
+
+import atexit
+import logging
+import os
+import queue
+import threading
+import time
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.validators import validate_ipv46_address
+from django.db import (
+    DatabaseError,
+    InterfaceError,
+    OperationalError,
+    close_old_connections,
+)
+from django.utils import timezone
+
+from lemmo_apps.authentication.models import UserActivity
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BUFFER_SIZE = 10000
+DEFAULT_FLUSH_SIZE = 500
+DEFAULT_FLUSH_INTERVAL_MS = 200
+DEFAULT_RETRIES = 3
+RETRY_BACKOFF_SECONDS = 0.5
+
+
+def _setting(name, default):
+    return getattr(settings, f"LEMMO_AUDIT_{name}", default)
+
+
+def _write(activities):
+    """Insert ``activities``; retry the batch, then fall back to single rows."""
+    retries = _setting("RETRIES", DEFAULT_RETRIES)
+    for attempt in range(retries + 1):
+        # Drops connections broken by a previous failure or past CONN_MAX_AGE.
+        close_old_connections()
+        try:
+            UserActivity.objects.bulk_create(activities)
+            return
+        except (OperationalError, InterfaceError):
+            if attempt == retries:
+                break
+            logger.warning(
+                "Writing %d activities failed, retrying", len(activities), exc_info=True
+            )
+            time.sleep(RETRY_BACKOFF_SECONDS * 2**attempt)
+        except DatabaseError:
+            # Integrity or data errors won't go away by retrying.
+            break
+
+    # One bad row (e.g. a deleted user) must not take the batch down with it.
+    for activity in activities:
+        try:
+            activity.save(force_insert=True)
+        except DatabaseError:
+            logger.exception(
+                "Dropping %s activity of user %s",
+                activity.activity_type,
+                activity.user_id,
+            )
+
+
+class AuditBuffer:
+    """Bounded queue of unsaved activities drained by a background thread."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._queue = None
+        self._thread = None
+        self._pid = None
+
+    def _ensure_started(self):
+        # Threads don't survive fork(), so each worker starts its own.
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._queue = queue.Queue(_setting("BUFFER_SIZE", DEFAULT_BUFFER_SIZE))
+            self._thread = threading.Thread(
+                target=self._run, name="lemmo-audit-writer", daemon=True
+            )
+            self._thread.start()
+            self._pid = os.getpid()
+
+    def put(self, activity):
+        """Queue ``activity``; return False if the buffer is full."""
+        self._ensure_started()
+        try:
+            self._queue.put_nowait(activity)
+        except queue.Full:
+            return False
+        return True
+
+    def _drain(self, timeout):
+        """Block until one activity arrives, then take up to a batch."""
+        batch = [self._queue.get(timeout=timeout)]
+        size = _setting("FLUSH_SIZE", DEFAULT_FLUSH_SIZE)
+        deadline = time.monotonic() + timeout
+        while len(batch) < size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            interval = _setting("FLUSH_INTERVAL_MS", DEFAULT_FLUSH_INTERVAL_MS) / 1000
+            try:
+                batch = self._drain(interval)
+            except queue.Empty:
+                continue
+            try:
+                _write(batch)
+            except Exception:
+                logger.exception("Dropping %d activities", len(batch))
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+    def flush(self):
+        """Write everything queued so far on the calling thread."""
+        if self._pid != os.getpid():
+            return
+        batch = []
+        while True:
+            try:
+                batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        if batch:
+            _write(batch)
+            for _ in batch:
+                self._queue.task_done()
+        # Wait for a batch the writer thread may already be holding.
+        self._queue.join()
+
+
+buffer = AuditBuffer()
+atexit.register(buffer.flush)
+
+
+def record_activity(
+    user,
+    activity_type,
+    description="",
+    ip_address=None,
+    user_agent=None,
+    metadata=None,
+):
+    """Record an activity of ``user`` (a ``User`` or its id).
+
+    Returns the ``UserActivity``, which is unsaved until the buffer flushes.
+    Raises ``ValueError`` for an unknown ``activity_type`` or an invalid
+    ``ip_address``.
+    """
+    activity = UserActivity(
+        activity_type=activity_type,
+        description=description or "",
+        ip_address=ip_address,
+        user_agent=user_agent,
+        metadata=metadata or {},
+        # Overwritten with the write time by auto_now_add.
+        created_at=timezone.now(),
+    )
+    if hasattr(user, "pk"):
+        activity.user = user
+    else:
+        activity.user_id = user
+    try:
+        # The user is checked by the foreign key when the row is written.
+        activity.clean_fields(exclude=["user", "description"])
+    except ValidationError as exc:
+        raise ValueError(
+            "; ".join(
+                f"{field}: {' '.join(messages)}"
+                for field, messages in exc.message_dict.items()
+            )
+        )
+
+    if not _setting("BUFFERED", True) or not buffer.put(activity):
+        activity.save(force_insert=True)
+    return activity
+
+
+def activity_from_request(request, activity_type, description="", metadata=None):
+    """``record_activity`` for ``request.user``, which must be authenticated."""
+    forwarded = request.META.get("HTTP_X_FORWARDED_FOR")
+    ip_address = (
+        forwarded.split(",")[0].strip()
+        if forwarded
+        else request.META.get("REMOTE_ADDR")
+    )
+    if ip_address:
+        try:
+            validate_ipv46_address(ip_address)
+        except ValidationError:
+            # A client-supplied header must not make the caller fail.
+            ip_address = None
+    return record_activity(
+        request.user,
+        activity_type,
+        description=description,
+        ip_address=ip_address or None,
+        user_agent=request.META.get("HTTP_USER_AGENT"),
+        metadata=metadata,
+    )
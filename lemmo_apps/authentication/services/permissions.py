@@ -0,0 +1,141 @@
+"""Cached permission sets for authorisation checks.
+
+A user's permission set (``"app_label.codename"`` strings, as returned by
+``ModelBackend.get_all_permissions``) is stored in the Django cache named by
+``LEMMO_PERMISSION_CACHE_ALIAS`` (``"default"``, Redis in production) under
+a key made of the user id, role, a per-user version and a global version,
+with a per-process LRU of ``LEMMO_PERMISSION_LOCAL_CACHE_SIZE`` entries in
+front.
+Changing a user's role, flags, groups or direct permissions bumps the user's
+version; changing a group's permissions, or deleting a group or permission,
+bumps the global one (see ``authentication.signals``). Stale entries are
+never read again and expire after ``LEMMO_PERMISSION_CACHE_TIMEOUT`` seconds.
+
+Resolving a user's set costs one cache round trip per request for the
+versions; ``has_perm`` then answers from memory::
+
+    if not has_perm(info.context.user, "stock.view_stocktransaction"):
+        raise GraphQLError("Permission denied")
+"""
+
+import threading
+import uuid
+from collections import OrderedDict
+
+from django.conf import settings
+from django.contrib.auth.backends import ModelBackend
+from django.core.cache import caches
+
+KEY_PREFIX = "lemmo:perms"
+GLOBAL_VERSION_KEY = f"{KEY_PREFIX}:version"
+DEFAULT_TIMEOUT = 3600
+DEFAULT_LOCAL_CACHE_SIZE = 1000
+
+
+def get_cache():
+    return caches[getattr(settings, "LEMMO_PERMISSION_CACHE_ALIAS", "default")]
+
+
+def _user_version_key(user_id):
+    return f"{KEY_PREFIX}:version:{user_id}"
+
+
+class _LocalCache:
+    """Thread-safe LRU of permission sets keyed by versioned cache key."""
+
+    def __init__(self):
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+            return entry
+
+    def set(self, key, entry):
+        maxsize = getattr(
+            settings, "LEMMO_PERMISSION_LOCAL_CACHE_SIZE", DEFAULT_LOCAL_CACHE_SIZE
+        )
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > maxsize:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+local_cache = _LocalCache()
+
+
+def _versions(cache, user_id):
+    # Random tokens rather than counters: an evicted counter restarting at 0
+    # could match an entry cached before a permission was revoked.
+    keys = [GLOBAL_VERSION_KEY, _user_version_key(user_id)]
+    found = cache.get_many(keys)
+    missing = [key for key in keys if key not in found]
+    if missing:
+        for key in missing:
+            cache.add(key, uuid.uuid4().hex, timeout=None)
+        found.update(cache.get_many(missing))
+    return [found.get(key, "") for key in keys]
+
+
+def invalidate_user(*user_ids):
+    """Discard the cached permissions of ``user_ids``."""
+    cache = get_cache()
+    cache.set_many(
+        {_user_version_key(user_id): uuid.uuid4().hex for user_id in user_ids},
+        timeout=None,
+    )
+
+
+def invalidate_all():
+    """Discard every cached permission set."""
+    get_cache().set(GLOBAL_VERSION_KEY, uuid.uuid4().hex, timeout=None)
+
+
+def get_permissions(user):
+    """Return ``user``'s permission set as a frozenset, from cache if possible."""
+    cache = get_cache()
+    # The role is part of the key so that a role changed by a bulk update,
+    # which sends no signal, still takes effect at once.
+    key = ":".join([KEY_PREFIX, str(user.pk), user.role, *_versions(cache, user.pk)])
+    permissions = local_cache.get(key)
+    if permissions is None:
+        permissions = cache.get(key)
+        if permissions is None:
+            permissions = frozenset(ModelBackend().get_all_permissions(user))
+            cache.set(
+                key,
+                permissions,
+                timeout=getattr(
+                    settings, "LEMMO_PERMISSION_CACHE_TIMEOUT", DEFAULT_TIMEOUT
+                ),
+            )
+        local_cache.set(key, permissions)
+    return permissions
+
+
+def user_permissions(user):
+    """``get_permissions`` memoised on the user object for the request."""
+    if not hasattr(user, "_perm_cache"):
+        user._perm_cache = get_permissions(user)
+    return user._perm_cache
+
+
+def has_perm(user, perm):
+    """Whether ``user`` has ``perm``, without a database query."""
+    if user is None or not user.is_active or user.is_anonymous:
+        return False
+    if user.is_superuser:
+        return True
+    return perm in user_permissions(user)
+
+
+def has_perms(user, perms):
+    return all(has_perm(user, perm) for perm in perms)
@@ -0,0 +1,87 @@
+from django.contrib.auth.models import Group, Permission
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_delete, post_init, post_save
+
+from .models import User, UserSession
+from .services.permissions import invalidate_all, invalidate_user
+from .services.tokens import forget_user, revoke_tokens
+
+# User fields the cached permission set depends on.
+PERMISSION_FIELDS = {"role", "is_active", "is_superuser"}
+
+
+def _on_user_saved(sender, instance, created, update_fields=None, **kwargs):
+    if created or (update_fields and not PERMISSION_FIELDS & set(update_fields)):
+        return
+    transaction.on_commit(lambda: invalidate_user(instance.pk))
+
+
+def _on_user_changed(sender, instance, **kwargs):
+    # Any saved field may be in the token snapshot.
+    transaction.on_commit(lambda: forget_user(instance.pk))
+
+
+def _on_session_loaded(sender, instance, **kwargs):
+    # Read from __dict__ so a deferred is_active isn't fetched.
+    instance._was_active = instance.__dict__.get("is_active")
+
+
+def _on_session_saved(sender, instance, created, **kwargs):
+    # Only ending an active session revokes; saving an ended one again doesn't.
+    if not created and instance._was_active and not instance.is_active:
+        transaction.on_commit(lambda: revoke_tokens(instance.user_id))
+    instance._was_active = instance.is_active
+
+
+def _on_user_membership_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    if action not in ("post_add", "post_remove", "post_clear"):
+        return
+    if not reverse:
+        user_ids = [instance.pk]
+    elif pk_set:
+        user_ids = list(pk_set)
+    else:
+        # group.user_set.clear() doesn't report which users were removed.
+        transaction.on_commit(invalidate_all)
+        return
+    transaction.on_commit(lambda: invalidate_user(*user_ids))
+
+
+def _on_group_permissions_changed(sender, action, **kwargs):
+    if action in ("post_add", "post_remove", "post_clear"):
+        transaction.on_commit(invalidate_all)
+
+
+def _on_deleted(sender, **kwargs):
+    transaction.on_commit(invalidate_all)
+
+
+def connect_cache_invalidation():
+    post_save.connect(_on_user_saved, sender=User, dispatch_uid="permission-cache-user")
+    post_save.connect(_on_user_changed, sender=User, dispatch_uid="token-cache-user")
+    post_delete.connect(
+        _on_user_changed, sender=User, dispatch_uid="token-cache-user-delete"
+    )
+    post_init.connect(
+        _on_session_loaded, sender=UserSession, dispatch_uid="token-cache-session-init"
+    )
+    post_save.connect(
+        _on_session_saved, sender=UserSession, dispatch_uid="token-cache-session"
+    )
+    for through in (User.groups.through, User.user_permissions.through):
+        m2m_changed.connect(
+            _on_user_membership_changed,
+            sender=through,
+            dispatch_uid=f"permission-cache-{through._meta.label}",
+        )
+    m2m_changed.connect(
+        _on_group_permissions_changed,
+        sender=Group.permissions.through,
+        dispatch_uid="permission-cache-group-permissions",
+    )
+    for model in (Group, Permission):
+        post_delete.connect(
+            _on_deleted,
+            sender=model,
+            dispatch_uid=f"permission-cache-{model._meta.label}-delete",
+        )
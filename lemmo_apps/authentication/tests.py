@@ -1,3 +1,261 @@
-from django.test import TestCase
+import time
+from datetime import timedelta
+from types import SimpleNamespace
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth.models import AnonymousUser, Group, Permission
+from django.test import RequestFactory, TestCase, override_settings
+from django.utils import timezone
+from graphql_jwt.exceptions import JSONWebTokenError
+from graphql_jwt.shortcuts import get_token
+
+from .backends import CachedModelBackend
+from .gql.mutations import EndSession
+from .models import User, UserSession
+from .services import permissions, tokens
+
+LOCMEM_CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        "LOCATION": "authentication-tests",
+    }
+}
+
+VIEW_PRODUCT = "inventory.view_product"
+
+
+def make_user(email, **fields):
+    values = {"first_name": "Test", "last_name": "User"}
+    values.update(fields)
+    return User.objects.create_user(email=email, password="secret", **values)
+
+
+def get_permission(perm):
+    app_label, codename = perm.split(".")
+    return Permission.objects.get(content_type__app_label=app_label, codename=codename)
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class PermissionCacheTests(TestCase):
+    def setUp(self):
+        permissions.get_cache().clear()
+        permissions.local_cache.clear()
+        self.group = Group.objects.create(name="Clerks")
+        self.user = make_user("clerk@example.com")
+        self.user.groups.add(self.group)
+
+    def fresh_user(self):
+        # A new instance so the per-request memo on the user doesn't answer.
+        return User.objects.get(pk=self.user.pk)
+
+    def test_cached_set_answers_without_queries(self):
+        self.group.permissions.add(get_permission(VIEW_PRODUCT))
+        self.assertTrue(permissions.has_perm(self.fresh_user(), VIEW_PRODUCT))
+
+        user = self.fresh_user()
+        with self.assertNumQueries(0):
+            self.assertTrue(permissions.has_perm(user, VIEW_PRODUCT))
+            self.assertFalse(permissions.has_perm(user, "inventory.delete_product"))
+
+    def test_shared_cache_is_used_when_local_cache_is_empty(self):
+        self.group.permissions.add(get_permission(VIEW_PRODUCT))
+        permissions.get_permissions(self.fresh_user())
+        permissions.local_cache.clear()
+
+        user = self.fresh_user()
+        with self.assertNumQueries(0):
+            self.assertIn(VIEW_PRODUCT, permissions.get_permissions(user))
+
+    def test_group_permission_change_invalidates_members(self):
+        self.assertFalse(permissions.has_perm(self.fresh_user(), VIEW_PRODUCT))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.group.permissions.add(get_permission(VIEW_PRODUCT))
+        self.assertTrue(permissions.has_perm(self.fresh_user(), VIEW_PRODUCT))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.group.permissions.clear()
+        self.assertFalse(permissions.has_perm(self.fresh_user(), VIEW_PRODUCT))
+
+    def test_membership_change_invalidates_user(self):
+        other = Group.objects.create(name="Viewers")
+        other.permissions.add(get_permission(VIEW_PRODUCT))
+        self.assertFalse(permissions.has_perm(self.fresh_user(), VIEW_PRODUCT))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.groups.add(other)
+        self.assertTrue(permissions.has_perm(self.fresh_user(), VIEW_PRODUCT))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            other.user_set.clear()
+        self.assertFalse(permissions.has_perm(self.fresh_user(), VIEW_PRODUCT))
+
+    def test_direct_permission_change_invalidates_user(self):
+        self.assertFalse(permissions.has_perm(self.fresh_user(), VIEW_PRODUCT))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.user_permissions.add(get_permission(VIEW_PRODUCT))
+        self.assertTrue(permissions.has_perm(self.fresh_user(), VIEW_PRODUCT))
+
+    def test_group_delete_invalidates_members(self):
+        self.group.permissions.add(get_permission(VIEW_PRODUCT))
+        self.assertTrue(permissions.has_perm(self.fresh_user(), VIEW_PRODUCT))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.group.delete()
+        self.assertFalse(permissions.has_perm(self.fresh_user(), VIEW_PRODUCT))
+
+    def test_unrelated_user_save_keeps_cached_set(self):
+        permissions.get_permissions(self.fresh_user())
+        version_key = permissions._user_version_key(self.user.pk)
+        version = permissions.get_cache().get(version_key)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.first_name = "Renamed"
+            self.user.save(update_fields=["first_name"])
+        self.assertEqual(permissions.get_cache().get(version_key), version)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.role = "PHARMACIST"
+            self.user.save(update_fields=["role"])
+        self.assertNotEqual(permissions.get_cache().get(version_key), version)
+
+    def test_role_change_uses_a_new_key(self):
+        permissions.get_permissions(self.fresh_user())
+
+        # A bulk update sends no signal; the role in the key still misses.
+        User.objects.filter(pk=self.user.pk).update(role="PHARMACIST")
+        permissions.get_permissions(self.fresh_user())
+
+        self.assertEqual(len(permissions.local_cache._entries), 2)
+
+    def test_superuser_inactive_and_anonymous(self):
+        admin = make_user("admin@example.com", is_superuser=True)
+        self.assertTrue(permissions.has_perm(admin, VIEW_PRODUCT))
+
+        self.group.permissions.add(get_permission(VIEW_PRODUCT))
+        User.objects.filter(pk=self.user.pk).update(is_active=False)
+        self.assertFalse(permissions.has_perm(self.fresh_user(), VIEW_PRODUCT))
+        self.assertFalse(permissions.has_perm(AnonymousUser(), VIEW_PRODUCT))
+        self.assertFalse(permissions.has_perm(None, VIEW_PRODUCT))
+
+    def test_local_cache_is_bounded(self):
+        with self.settings(LEMMO_PERMISSION_LOCAL_CACHE_SIZE=1):
+            permissions.get_permissions(self.fresh_user())
+            permissions.get_permissions(make_user("other@example.com"))
+
+        self.assertEqual(len(permissions.local_cache._entries), 1)
+
+    def test_backend_reads_cached_set(self):
+        self.group.permissions.add(get_permission(VIEW_PRODUCT))
+        backend = CachedModelBackend()
+        permissions.get_permissions(self.fresh_user())
+
+        user = self.fresh_user()
+        with self.assertNumQueries(0):
+            self.assertIn(VIEW_PRODUCT, backend.get_all_permissions(user))
+            self.assertEqual(backend.get_all_permissions(user, obj=object()), set())
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class TokenCacheTests(TestCase):
+    def setUp(self):
+        tokens.get_cache().clear()
+        self.user = make_user("driver@example.com", role="DRIVER")
+        self.token = get_token(self.user)
+
+    def make_session(self, user=None):
+        return UserSession.objects.create(
+            user=user or self.user,
+            session_key=f"session-{UserSession.objects.count()}",
+            ip_address="127.0.0.1",
+            user_agent="tests",
+            expires_at=timezone.now() + timedelta(hours=1),
+        )
+
+    def end_session(self, session, user):
+        request = RequestFactory().post("/graphql/")
+        request.user = user
+        info = SimpleNamespace(context=request)
+        return EndSession.mutate(None, info, session_id=session.id)
+
+    def test_cached_token_costs_no_queries(self):
+        tokens.get_user_by_token(self.token)
+
+        with self.assertNumQueries(0):
+            user = tokens.get_user_by_token(self.token)
+            self.assertEqual(user.pk, self.user.pk)
+            self.assertEqual(user.email, "driver@example.com")
+            self.assertEqual(user.role, "DRIVER")
+            self.assertTrue(user.is_active)
+
+        # Fields outside the snapshot load on first access.
+        with self.assertNumQueries(1):
+            self.assertIsNone(user.department)
+
+    def test_user_save_drops_snapshot(self):
+        tokens.get_user_by_token(self.token)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.first_name = "Renamed"
+            self.user.save()
+
+        self.assertEqual(tokens.get_user_by_token(self.token).first_name, "Renamed")
+
+    def test_disabled_user_is_rejected(self):
+        tokens.get_user_by_token(self.token)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.is_active = False
+            self.user.save()
+
+        with self.assertRaises(JSONWebTokenError):
+            tokens.get_user_by_token(self.token)
+
+    def test_revocation_rejects_older_tokens(self):
+        tokens.get_user_by_token(self.token)
+
+        with mock.patch.object(tokens.time, "time", return_value=time.time() + 10):
+            tokens.revoke_tokens(self.user.pk)
+
+        with self.assertRaisesMessage(JSONWebTokenError, "revoked"):
+            tokens.get_user_by_token(self.token)
+
+    def test_token_obtained_after_revocation_is_accepted(self):
+        tokens.revoke_tokens(self.user.pk)
+
+        token = get_token(self.user)
+
+        self.assertEqual(tokens.get_user_by_token(token).pk, self.user.pk)
+
+    def test_ending_active_session_revokes(self):
+        session = self.make_session()
+        revoked_key = tokens._revoked_key(self.user.pk)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            session.end_session()
+        self.assertIsNotNone(tokens.get_cache().get(revoked_key))
+
+        tokens.get_cache().delete(revoked_key)
+        with self.captureOnCommitCallbacks(execute=True):
+            UserSession.objects.get(pk=session.pk).save()
+        self.assertIsNone(tokens.get_cache().get(revoked_key))
+
+    def test_only_owner_or_staff_can_end_session(self):
+        session = self.make_session()
+        other = make_user("other@example.com")
+
+        result = self.end_session(session, other)
+        self.assertFalse(result.success)
+        self.assertTrue(UserSession.objects.get(pk=session.pk).is_active)
+
+        result = self.end_session(session, AnonymousUser())
+        self.assertFalse(result.success)
+
+        result = self.end_session(session, self.user)
+        self.assertTrue(result.success)
+        self.assertFalse(UserSession.objects.get(pk=session.pk).is_active)
+
+        staff = make_user("staff@example.com", is_staff=True)
+        result = self.end_session(self.make_session(other), staff)
+        self.assertTrue(result.success)
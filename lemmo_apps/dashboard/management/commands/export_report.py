@@ -0,0 +1,61 @@
+import sys
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+
+from lemmo_apps.dashboard.services.exports import (
+    EXPORTS,
+    FORMATS,
+    ExportError,
+    stream_export,
+)
+
+
+class Command(BaseCommand):
+    help = "Export the rows behind a report as CSV, XLSX or NDJSON"
+
+    def add_arguments(self, parser):
+        parser.add_argument("dataset", choices=sorted(EXPORTS))
+        parser.add_argument(
+            "--format", dest="fmt", choices=sorted(FORMATS), default="csv"
+        )
+        parser.add_argument("--facility", help="Only rows for this facility id")
+        parser.add_argument(
+            "--from", dest="date_from", type=date.fromisoformat, help="YYYY-MM-DD"
+        )
+        parser.add_argument(
+            "--to", dest="date_to", type=date.fromisoformat, help="YYYY-MM-DD"
+        )
+        parser.add_argument(
+            "--output", "-o", help="File to write (default: standard output)"
+        )
+
+    def handle(self, *args, **options):
+        try:
+            chunks, _ = stream_export(
+                options["dataset"],
+                options["fmt"],
+                facility_id=options["facility"],
+                date_from=options["date_from"],
+                date_to=options["date_to"],
+            )
+        except ExportError as exc:
+            raise CommandError(str(exc))
+
+        if options["output"]:
+            output = open(options["output"], "wb")
+        else:
+            output = sys.stdout.buffer
+        try:
+            for chunk in chunks:
+                output.write(chunk.encode() if isinstance(chunk, str) else chunk)
+        finally:
+            if options["output"]:
+                output.close()
+
+        if options["output"]:
+            self.stdout.write(
+                self.style.SUCCESS(
+                    f"Exported {options['dataset']} to {options['output']}"
+                )
+            )
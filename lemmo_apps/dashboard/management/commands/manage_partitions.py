@@ -0,0 +1,43 @@
+from django.core.management.base import BaseCommand
+
+from lemmo_apps.partitioning import manage_partitions
+
+
+class Command(BaseCommand):
+    help = (
+        "Create upcoming monthly partitions and detach expired ones "
+        "for activity and stock transaction tables (run daily)"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--drop",
+            action="store_true",
+            help="Drop expired partitions instead of only detaching them",
+        )
+
+    def handle(self, *args, **options):
+        results = manage_partitions(drop=options["drop"])
+        if not results:
+            self.stdout.write("No partitioned tables found")
+            return
+
+        for table, result in results.items():
+            for name in result["created"]:
+                self.stdout.write(f"Created {name}")
+            verb = "Dropped" if options["drop"] else "Detached"
+            for name in result["removed"]:
+                self.stdout.write(f"{verb} {name}")
+            if result["default_rows"]:
+                self.stdout.write(
+                    self.style.WARNING(
+                        f"{table} has rows in its default partition; "
+                        f"create partitions covering them"
+                    )
+                )
+            self.stdout.write(
+                self.style.SUCCESS(
+                    f"{table}: {len(result['created'])} created, "
+                    f"{len(result['removed'])} removed"
+                )
+            )
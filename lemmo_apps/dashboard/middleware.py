@@ -0,0 +1,61 @@
+import time
+from contextlib import ExitStack
+
+from django.db import connections
+
+from .services.instrumentation import QueryCounter, log_request, record
+
+# Resolvers below this and without queries are left out of the statistics.
+RESOLVER_MIN_MS = 1.0
+
+
+def operation_name(request):
+    """GraphQL operation, else URL name, else ``path:unmatched``.
+
+    Unresolved paths are not used as names: any client can make up new ones.
+    """
+    operation = getattr(request, "graphql_operation", None)
+    if operation:
+        return f"graphql:{operation}"
+    match = getattr(request, "resolver_match", None)
+    if match is not None and match.view_name:
+        return f"view:{match.view_name}"
+    return "path:unmatched"
+
+
+class QueryInstrumentationMiddleware:
+    """Record wall time, query count and DB time of every request.
+
+    Add after ``SessionMiddleware``/``AuthenticationMiddleware`` in
+    ``MIDDLEWARE``. Queries run while a streaming response is being sent are
+    not counted.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        counter = QueryCounter()
+        # Read by gql.instrumentation.ResolverTimingMiddleware.
+        request.query_counter = counter
+        start = time.perf_counter()
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(counter))
+            response = self.get_response(request)
+        wall_ms = (time.perf_counter() - start) * 1000
+
+        name = operation_name(request)
+        db_ms = counter.seconds * 1000
+        record(name, wall_ms, db_ms, counter.count)
+        log_request(name, wall_ms, db_ms, counter.count)
+
+        for resolver, (seconds, queries, query_seconds) in getattr(
+            request, "resolver_timings", {}
+        ).items():
+            resolver_ms = seconds * 1000
+            if queries or resolver_ms >= RESOLVER_MIN_MS:
+                record(
+                    f"resolver:{resolver}", resolver_ms, query_seconds * 1000, queries
+                )
+        return response
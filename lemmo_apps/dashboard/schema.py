@@ -1,8 +1,10 @@
 import graphene
 from graphene_django import DjangoObjectType
-from django.db.models import F
 from datetime import timedelta
 
+from .services import stats
+from .services.cache import cached_stats
+
 
 class Query(graphene.ObjectType):
     # Dashboard overview queries
@@ -26,52 +28,33 @@ class Query(graphene.ObjectType):
     facility_report = graphene.JSONString()
     compliance_report = graphene.JSONString()
 
+    @cached_stats(
+        "dashboard_overview",
+        tags=("product", "shipment", "requisition", "supplier", "facility"),
+    )
     def resolve_dashboard_overview(self, info):
-        from django.db.models import Count, Sum
         from django.utils import timezone
-        from datetime import timedelta
-
-        # Import models
-        from lemmo_apps.inventory.models.product import Product
-        from lemmo_apps.logistics.models.shipment import Shipment
-        from lemmo_apps.supplier.models.supplier import Supplier
-        from lemmo_apps.location.models.facility import Facility
-        from lemmo_apps.requisition.models.requisition import Requisition
 
-        # Basic stats
-        total_products = Product.objects.count()
-        active_shipments = Shipment.objects.filter(
-            status__in=["PENDING", "ASSIGNED", "PICKED_UP", "IN_TRANSIT"]
-        ).count()
-        total_suppliers = Supplier.objects.count()
-        total_facilities = Facility.objects.count()
-        pending_requisitions = Requisition.objects.filter(status="PENDING").count()
-
-        # Recent activity
-        last_7_days = timezone.now() - timedelta(days=7)
-        recent_products = Product.objects.filter(created_at__gte=last_7_days).count()
-        recent_shipments = Shipment.objects.filter(created_at__gte=last_7_days).count()
+        now = timezone.now()
+        products = stats.product_stats(now)
+        shipments = stats.shipment_stats(now)
 
         return {
-            "total_products": total_products,
-            "active_shipments": active_shipments,
-            "total_suppliers": total_suppliers,
-            "total_facilities": total_facilities,
-            "pending_requisitions": pending_requisitions,
-            "recent_products": recent_products,
-            "recent_shipments": recent_shipments,
+            "total_products": products["total"],
+            "active_shipments": shipments["active"],
+            "total_suppliers": stats.supplier_stats()["total"],
+            "total_facilities": stats.facility_stats(now)["total"],
+            "pending_requisitions": stats.requisition_stats()["pending"],
+            "recent_products": products["recent_7_days"],
+            "recent_shipments": shipments["recent_7_days"],
         }
 
+    @cached_stats("inventory_overview", tags=("product",))
     def resolve_inventory_overview(self, info):
-        from django.db.models import Count, Sum
+        from django.db.models import Count
         from lemmo_apps.inventory.models.product import Product
 
-        total_products = Product.objects.count()
-        active_products = Product.objects.filter(is_active=True).count()
-        low_stock_products = Product.objects.filter(
-            stock_quantity__lte=F("reorder_point")
-        ).count()
-        out_of_stock_products = Product.objects.filter(stock_quantity=0).count()
+        products = stats.product_stats()
 
         # Product type distribution
         product_type_distribution = (
@@ -81,71 +64,46 @@ class Query(graphene.ObjectType):
         )
 
         return {
-            "total_products": total_products,
-            "active_products": active_products,
-            "low_stock_products": low_stock_products,
-            "out_of_stock_products": out_of_stock_products,
+            "total_products": products["total"],
+            "active_products": products["active"],
+            "low_stock_products": products["low_stock"],
+            "out_of_stock_products": products["out_of_stock"],
             "product_type_distribution": list(product_type_distribution),
         }
 
+    @cached_stats("logistics_overview", tags=("shipment", "vehicle"))
     def resolve_logistics_overview(self, info):
-        from django.db.models import Count
-        from lemmo_apps.logistics.models.vehicle import Vehicle
-        from lemmo_apps.logistics.models.shipment import Shipment
-
-        total_vehicles = Vehicle.objects.count()
-        active_vehicles = Vehicle.objects.filter(status="ACTIVE").count()
-        total_shipments = Shipment.objects.count()
-        active_shipments = Shipment.objects.filter(
-            status__in=["PENDING", "ASSIGNED", "PICKED_UP", "IN_TRANSIT"]
-        ).count()
-        delivered_shipments = Shipment.objects.filter(status="DELIVERED").count()
+        vehicles = stats.vehicle_stats()
+        shipments = stats.shipment_stats()
 
         return {
-            "total_vehicles": total_vehicles,
-            "active_vehicles": active_vehicles,
-            "total_shipments": total_shipments,
-            "active_shipments": active_shipments,
-            "delivered_shipments": delivered_shipments,
+            "total_vehicles": vehicles["total"],
+            "active_vehicles": vehicles["active"],
+            "total_shipments": shipments["total"],
+            "active_shipments": shipments["active"],
+            "delivered_shipments": shipments["delivered"],
         }
 
+    @cached_stats("supplier_overview", tags=("supplier", "purchase_order"))
     def resolve_supplier_overview(self, info):
-        from django.db.models import Count, Avg
-        from lemmo_apps.supplier.models.supplier import Supplier
-        from lemmo_apps.supplier.models.purchase_order import PurchaseOrder
-
-        total_suppliers = Supplier.objects.count()
-        active_suppliers = Supplier.objects.filter(status="ACTIVE").count()
-        preferred_suppliers = Supplier.objects.filter(is_preferred=True).count()
-        total_orders = PurchaseOrder.objects.count()
-        pending_orders = PurchaseOrder.objects.filter(
-            status__in=["DRAFT", "SUBMITTED"]
-        ).count()
-
-        # Average ratings
-        avg_quality_rating = (
-            Supplier.objects.aggregate(avg_quality=Avg("quality_rating"))["avg_quality"]
-            or 0
-        )
+        suppliers = stats.supplier_stats()
+        orders = stats.purchase_order_stats()
 
         return {
-            "total_suppliers": total_suppliers,
-            "active_suppliers": active_suppliers,
-            "preferred_suppliers": preferred_suppliers,
-            "total_orders": total_orders,
-            "pending_orders": pending_orders,
-            "avg_quality_rating": float(avg_quality_rating),
+            "total_suppliers": suppliers["total"],
+            "active_suppliers": suppliers["active"],
+            "preferred_suppliers": suppliers["preferred"],
+            "total_orders": orders["total"],
+            "pending_orders": orders["pending"],
+            "avg_quality_rating": float(suppliers["avg_quality_rating"]),
         }
 
+    @cached_stats("facility_overview", tags=("facility",))
     def resolve_facility_overview(self, info):
         from django.db.models import Count
         from lemmo_apps.location.models.facility import Facility
 
-        total_facilities = Facility.objects.count()
-        active_facilities = Facility.objects.filter(is_active=True).count()
-        operational_facilities = Facility.objects.filter(
-            operational_status="ACTIVE"
-        ).count()
+        facilities = stats.facility_stats()
 
         # Facility type distribution
         facility_type_distribution = (
@@ -155,12 +113,13 @@ class Query(graphene.ObjectType):
         )
 
         return {
-            "total_facilities": total_facilities,
-            "active_facilities": active_facilities,
-            "operational_facilities": operational_facilities,
+            "total_facilities": facilities["total"],
+            "active_facilities": facilities["active"],
+            "operational_facilities": facilities["operational"],
             "facility_type_distribution": list(facility_type_distribution),
         }
 
+    @cached_stats("alerts", tags=("product", "vehicle", "contract"))
     def resolve_alerts(self, info):
         from django.db.models import F
         from lemmo_apps.inventory.models.product import Product
@@ -199,6 +158,7 @@ class Query(graphene.ObjectType):
             + expiring_contracts_count,
         }
 
+    @cached_stats("low_stock_alerts", tags=("product",))
     def resolve_low_stock_alerts(self, info):
         from django.db.models import F
         from lemmo_apps.inventory.models.product import Product
@@ -212,6 +172,7 @@ class Query(graphene.ObjectType):
             "products": list(low_stock_products),
         }
 
+    @cached_stats("expiring_products_alerts", tags=("product",))
     def resolve_expiring_products_alerts(self, info):
         from lemmo_apps.inventory.models.product import Product
         from django.utils import timezone
@@ -223,6 +184,7 @@ class Query(graphene.ObjectType):
 
         return {"count": expiring_products.count(), "products": list(expiring_products)}
 
+    @cached_stats("emergency_shipments_alerts", tags=("shipment",))
     def resolve_emergency_shipments_alerts(self, info):
         from lemmo_apps.logistics.models.shipment import Shipment
 
@@ -238,6 +200,7 @@ class Query(graphene.ObjectType):
             "shipments": list(emergency_shipments),
         }
 
+    @cached_stats("maintenance_due_alerts", tags=("vehicle",))
     def resolve_maintenance_due_alerts(self, info):
         from lemmo_apps.logistics.models.vehicle import Vehicle
         from django.utils import timezone
@@ -251,45 +214,24 @@ class Query(graphene.ObjectType):
             "vehicles": list(maintenance_due_vehicles),
         }
 
+    @cached_stats("inventory_report", tags=("product",))
     def resolve_inventory_report(self, info):
-        from django.db.models import Count, Sum, Avg
-        from django.db.models import F
-        from lemmo_apps.inventory.models.product import Product
-
-        total_products = Product.objects.count()
-        total_stock_value = (
-            Product.objects.aggregate(
-                total_value=Sum(F("stock_quantity") * F("price"))
-            )["total_value"]
-            or 0
-        )
-
-        # Stock level analysis
-        low_stock_count = Product.objects.filter(
-            stock_quantity__lte=F("reorder_point")
-        ).count()
-        out_of_stock_count = Product.objects.filter(stock_quantity=0).count()
-        overstocked_count = Product.objects.filter(
-            stock_quantity__gt=F("max_stock_level")
-        ).count()
+        products = stats.product_stats()
 
         return {
-            "total_products": total_products,
-            "total_stock_value": float(total_stock_value),
-            "low_stock_count": low_stock_count,
-            "out_of_stock_count": out_of_stock_count,
-            "overstocked_count": overstocked_count,
+            "total_products": products["total"],
+            "total_stock_value": float(products["total_stock_value"]),
+            "low_stock_count": products["low_stock"],
+            "out_of_stock_count": products["out_of_stock"],
+            "overstocked_count": products["overstocked"],
         }
 
+    @cached_stats("logistics_report", tags=("shipment", "vehicle"))
     def resolve_logistics_report(self, info):
-        from django.db.models import Count, Avg
-        from lemmo_apps.logistics.models.vehicle import Vehicle
-        from lemmo_apps.logistics.models.shipment import Shipment
-
-        total_vehicles = Vehicle.objects.count()
-        active_vehicles = Vehicle.objects.filter(status="ACTIVE").count()
-        total_shipments = Shipment.objects.count()
-        delivered_shipments = Shipment.objects.filter(status="DELIVERED").count()
+        vehicles = stats.vehicle_stats()
+        shipments = stats.shipment_stats()
+        total_shipments = shipments["total"]
+        delivered_shipments = shipments["delivered"]
 
         # Delivery success rate
         delivery_success_rate = (
@@ -297,60 +239,44 @@ class Query(graphene.ObjectType):
         )
 
         return {
-            "total_vehicles": total_vehicles,
-            "active_vehicles": active_vehicles,
+            "total_vehicles": vehicles["total"],
+            "active_vehicles": vehicles["active"],
             "total_shipments": total_shipments,
             "delivered_shipments": delivered_shipments,
             "delivery_success_rate": float(delivery_success_rate),
         }
 
+    @cached_stats("supplier_report", tags=("supplier", "purchase_order"))
     def resolve_supplier_report(self, info):
-        from django.db.models import Count, Avg
-        from lemmo_apps.supplier.models.supplier import Supplier
-        from lemmo_apps.supplier.models.purchase_order import PurchaseOrder
-
-        total_suppliers = Supplier.objects.count()
-        active_suppliers = Supplier.objects.filter(status="ACTIVE").count()
-        total_orders = PurchaseOrder.objects.count()
-
-        # Average supplier rating
-        avg_rating = (
-            Supplier.objects.aggregate(avg_rating=Avg("quality_rating"))["avg_rating"]
-            or 0
-        )
+        suppliers = stats.supplier_stats()
 
         return {
-            "total_suppliers": total_suppliers,
-            "active_suppliers": active_suppliers,
-            "total_orders": total_orders,
-            "avg_rating": float(avg_rating),
+            "total_suppliers": suppliers["total"],
+            "active_suppliers": suppliers["active"],
+            "total_orders": stats.purchase_order_stats()["total"],
+            "avg_rating": float(suppliers["avg_quality_rating"]),
         }
 
+    @cached_stats("facility_report", tags=("facility",))
     def resolve_facility_report(self, info):
-        from django.db.models import Count
-        from lemmo_apps.location.models.facility import Facility
-
-        total_facilities = Facility.objects.count()
-        active_facilities = Facility.objects.filter(is_active=True).count()
-        operational_facilities = Facility.objects.filter(
-            operational_status="ACTIVE"
-        ).count()
+        facilities = stats.facility_stats()
 
         return {
-            "total_facilities": total_facilities,
-            "active_facilities": active_facilities,
-            "operational_facilities": operational_facilities,
+            "total_facilities": facilities["total"],
+            "active_facilities": facilities["active"],
+            "operational_facilities": facilities["operational"],
         }
 
+    @cached_stats("compliance_report", tags=("product", "supplier", "facility"))
     def resolve_compliance_report(self, info):
-        from django.db.models import Count
-        from lemmo_apps.inventory.models.product import Product
         from lemmo_apps.supplier.models.supplier import Supplier
-        from lemmo_apps.location.models.facility import Facility
+
+        products = stats.product_stats()
+        facilities = stats.facility_stats()
 
         # FDA compliance
-        fda_approved_products = Product.objects.filter(fda_approved=True).count()
-        total_products = Product.objects.count()
+        fda_approved_products = products["fda_approved"]
+        total_products = products["total"]
         fda_compliance_rate = (
             (fda_approved_products / total_products * 100) if total_products > 0 else 0
         )
@@ -363,10 +289,8 @@ class Query(graphene.ObjectType):
         )
 
         # Facility compliance
-        licensed_facilities = Facility.objects.filter(
-            license_number__isnull=False
-        ).count()
-        total_facilities = Facility.objects.count()
+        licensed_facilities = facilities["licensed"]
+        total_facilities = facilities["total"]
         facility_compliance_rate = (
             (licensed_facilities / total_facilities * 100)
             if total_facilities > 0
@@ -0,0 +1,182 @@
+"""Snapshot cache for the dashboard and ``*_stats`` resolvers.
+
+Results are stored in the Django cache named by ``LEMMO_DASHBOARD_CACHE_ALIAS``
+(``"default"`` unless overridden), which in production is the django-redis
+backend. Every entry records the versions of the tags it depends on; saving or
+deleting a tagged model bumps the tag version (see ``dashboard.signals``), so
+the entry becomes stale without being deleted.
+
+Stale entries are served as-is while a single background thread recomputes
+them, and only a cold miss computes on the request thread.
+"""
+
+import functools
+import logging
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import connections
+
+logger = logging.getLogger(__name__)
+
+KEY_PREFIX = "lemmo:dashboard"
+
+DEFAULT_TTL = 60
+
+# Seconds an entry is considered fresh, keyed by resolver name. Override or
+# extend with the LEMMO_DASHBOARD_CACHE_TTLS setting.
+DEFAULT_TTLS = {
+    "dashboard_overview": 60,
+    "inventory_overview": 120,
+    "logistics_overview": 60,
+    "supplier_overview": 600,
+    "facility_overview": 600,
+    "alerts": 60,
+    "low_stock_alerts": 60,
+    "expiring_products_alerts": 300,
+    "emergency_shipments_alerts": 30,
+    "maintenance_due_alerts": 600,
+    "inventory_report": 300,
+    "logistics_report": 300,
+    "supplier_report": 900,
+    "facility_report": 900,
+    "compliance_report": 900,
+    "inventory_stats": 120,
+    "stock_alerts": 60,
+    "stock_stats": 120,
+    "transaction_stats": 120,
+    "batch_stats": 300,
+    "requisition_stats": 120,
+    "facility_stats": 600,
+}
+
+# How long past its TTL a stale entry may still be served while it refreshes.
+DEFAULT_STALE_TTL = 600
+
+# Models whose post_save/post_delete signals invalidate cached entries.
+MODEL_TAGS = {
+    "inventory.Product": "product",
+    "inventory.ProductBatch": "product_batch",
+    "stock.Stock": "stock",
+    "stock.StockTransaction": "stock_transaction",
+    "logistics.Shipment": "shipment",
+    "logistics.Vehicle": "vehicle",
+    "requisition.Requisition": "requisition",
+    "location.Facility": "facility",
+    "supplier.Supplier": "supplier",
+    "supplier.PurchaseOrder": "purchase_order",
+    "supplier.Contract": "contract",
+}
+
+REFRESH_LOCK_TIMEOUT = 30
+
+
+def get_cache():
+    return caches[getattr(settings, "LEMMO_DASHBOARD_CACHE_ALIAS", "default")]
+
+
+def get_ttl(name):
+    ttls = getattr(settings, "LEMMO_DASHBOARD_CACHE_TTLS", {})
+    return ttls.get(name, DEFAULT_TTLS.get(name, DEFAULT_TTL))
+
+
+def get_stale_ttl():
+    return getattr(settings, "LEMMO_DASHBOARD_CACHE_STALE_TTL", DEFAULT_STALE_TTL)
+
+
+def _tag_key(tag):
+    return f"{KEY_PREFIX}:tag:{tag}"
+
+
+def _entry_key(name, kwargs):
+    if not kwargs:
+        return f"{KEY_PREFIX}:{name}"
+    args = ",".join(f"{k}={kwargs[k]}" for k in sorted(kwargs))
+    return f"{KEY_PREFIX}:{name}:{args}"
+
+
+def invalidate(*tags):
+    """Mark every entry depending on ``tags`` as stale."""
+    cache = get_cache()
+    for tag in tags:
+        key = _tag_key(tag)
+        cache.add(key, 0, timeout=None)
+        try:
+            cache.incr(key)
+        except ValueError:
+            # The key was evicted between add() and incr().
+            cache.set(key, 1, timeout=None)
+
+
+def _store(cache, key, name, versions, compute):
+    value = compute()
+    ttl = get_ttl(name)
+    entry = {
+        "value": value,
+        "versions": versions,
+        "fresh_until": time.time() + ttl,
+    }
+    cache.set(key, entry, timeout=ttl + get_stale_ttl())
+    return value
+
+
+def _refresh(cache, key, name, versions, compute):
+    try:
+        _store(cache, key, name, versions, compute)
+    except Exception:
+        logger.exception("Background refresh of %s failed", key)
+    finally:
+        cache.delete(f"{key}:refreshing")
+        connections.close_all()
+
+
+def get_or_compute(name, compute, tags=(), kwargs=None):
+    cache = get_cache()
+    key = _entry_key(name, kwargs or {})
+    tag_keys = [_tag_key(tag) for tag in tags]
+
+    found = cache.get_many([key, *tag_keys])
+    versions = tuple(found.get(tag_key, 0) for tag_key in tag_keys)
+    entry = found.get(key)
+
+    if entry is None:
+        return _store(cache, key, name, versions, compute)
+
+    if entry["versions"] == versions and entry["fresh_until"] > time.time():
+        return entry["value"]
+
+    # Stale: answer from the old snapshot and let one worker recompute it.
+    if cache.add(f"{key}:refreshing", 1, timeout=REFRESH_LOCK_TIMEOUT):
+        threading.Thread(
+            target=_refresh,
+            args=(cache, key, name, versions, compute),
+            daemon=True,
+        ).start()
+    return entry["value"]
+
+
+def cached_stats(name, tags=()):
+    """Cache a JSON statistics resolver under ``name``.
+
+    ``tags`` lists the ``MODEL_TAGS`` values whose changes make the result
+    stale; resolvers without tags are refreshed on TTL alone. Stale entries
+    are recomputed on a background thread after the request has finished,
+    so the resolver is called with None for ``root`` and ``info`` and must
+    compute its result from its arguments alone.
+    """
+
+    def decorator(resolver):
+        @functools.wraps(resolver)
+        def wrapper(root, info, **kwargs):
+            return get_or_compute(
+                name,
+                lambda: resolver(None, None, **kwargs),
+                tags=tags,
+                kwargs=kwargs,
+            )
+
+        return wrapper
+
+    return decorator
@@ -0,0 +1,245 @@
+"""Row-level report exports streamed as CSV, XLSX or NDJSON.
+
+Rows are read with ``values_list(...).iterator(chunk_size=...)``, which uses a
+server-side cursor on PostgreSQL, and encoded one at a time, so an export
+never holds more than one chunk of rows in memory. CSV and NDJSON are sent as
+they are produced; XLSX has to be zipped as a whole, so it is written with
+openpyxl's write-only workbook to a temporary file and streamed from there.
+"""
+
+import csv
+import json
+import tempfile
+from datetime import datetime, time, timedelta
+
+from django.core.exceptions import ValidationError
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Q
+from django.utils import timezone
+
+from lemmo_apps.inventory.models.product import Product, ProductBatch
+from lemmo_apps.location.models.facility import Facility
+from lemmo_apps.logistics.models.shipment import Shipment
+from lemmo_apps.stock.models.stock import Stock
+from lemmo_apps.stock.models.stock_transaction import StockTransaction
+
+CHUNK_SIZE = 2000
+FILE_CHUNK_SIZE = 64 * 1024
+
+
+class ExportError(Exception):
+    """The export cannot be produced with the given arguments."""
+
+
+def _facility_q(*lookups):
+    def build(facility_id):
+        q = Q()
+        for lookup in lookups:
+            q |= Q(**{lookup: facility_id})
+        return q
+
+    return build
+
+
+# name -> model, (header, lookup) columns, facility filter, date-range field.
+EXPORTS = {
+    "products": {
+        "model": Product,
+        "columns": [
+            ("code", "code"),
+            ("name", "name"),
+            ("product_type", "product_type"),
+            ("category", "category__name"),
+            ("unit_of_measure", "unit_of_measure"),
+            ("price", "price"),
+            ("stock_quantity", "stock_quantity"),
+            ("min_stock_level", "min_stock_level"),
+            ("reorder_point", "reorder_point"),
+            ("is_active", "is_active"),
+            ("created_at", "created_at"),
+        ],
+        "facility": None,
+        "date_field": "created_at",
+    },
+    "batches": {
+        "model": ProductBatch,
+        "columns": [
+            ("batch_number", "batch_number"),
+            ("product_code", "product__code"),
+            ("product_name", "product__name"),
+            ("lot_number", "lot_number"),
+            ("quantity", "quantity"),
+            ("remaining_quantity", "remaining_quantity"),
+            ("manufacturing_date", "manufacturing_date"),
+            ("expiration_date", "expiration_date"),
+            ("cost_per_unit", "cost_per_unit"),
+            ("supplier", "supplier"),
+            ("quality_control_passed", "quality_control_passed"),
+            ("created_at", "created_at"),
+        ],
+        "facility": None,
+        "date_field": "created_at",
+    },
+    "stock": {
+        "model": Stock,
+        "columns": [
+            ("facility_id", "facility_id"),
+            ("facility", "facility__name"),
+            ("item_code", "item__code"),
+            ("product_code", "item__product__code"),
+            ("product_name", "item__product__name"),
+            ("expiry_date", "item__expiry_date"),
+            ("quantity", "quantity"),
+            ("minimum_stock_level", "minimum_stock_level"),
+            ("maximum_stock_level", "maximum_stock_level"),
+            ("last_updated", "last_updated"),
+        ],
+        "facility": _facility_q("facility_id"),
+        "date_field": "last_updated",
+    },
+    "stock_transactions": {
+        "model": StockTransaction,
+        "columns": [
+            ("created_at", "created_at"),
+            ("facility_id", "facility_id"),
+            ("facility", "facility__name"),
+            ("item_code", "item__code"),
+            ("product_code", "item__product__code"),
+            ("transaction_type", "transaction_type"),
+            ("quantity", "quantity"),
+            ("reference", "reference"),
+            ("comment", "comment"),
+        ],
+        "facility": _facility_q("facility_id"),
+        "date_field": "created_at",
+    },
+    "shipments": {
+        "model": Shipment,
+        "columns": [
+            ("shipment_number", "shipment_number"),
+            ("shipment_type", "shipment_type"),
+            ("status", "status"),
+            ("priority", "priority"),
+            ("origin_facility", "origin_facility__name"),
+            ("destination_facility", "destination_facility__name"),
+            ("pickup_date", "pickup_date"),
+            ("delivery_date", "delivery_date"),
+            ("actual_delivery_date", "actual_delivery_date"),
+            ("package_count", "package_count"),
+            ("total_cost", "total_cost"),
+            ("created_at", "created_at"),
+        ],
+        "facility": _facility_q("origin_facility_id", "destination_facility_id"),
+        "date_field": "created_at",
+    },
+}
+
+
+def _day_start(day):
+    return timezone.make_aware(datetime.combine(day, time.min))
+
+
+def export_rows(name, facility_id=None, date_from=None, date_to=None):
+    """Return ``(headers, rows)``; ``rows`` is a lazy iterator of tuples.
+
+    ``date_from`` and ``date_to`` are inclusive dates.
+    """
+    if name not in EXPORTS:
+        raise ExportError(f"Unknown export '{name}'")
+    export = EXPORTS[name]
+
+    queryset = export["model"].objects.all()
+    if facility_id is not None:
+        if export["facility"] is None:
+            raise ExportError(f"The {name} export cannot be filtered by facility")
+        # Rows are only fetched once streaming has started, so reject a
+        # malformed id now rather than mid-response.
+        try:
+            facility_id = Facility._meta.pk.to_python(facility_id)
+        except ValidationError:
+            raise ExportError(f"Invalid facility id '{facility_id}'")
+        queryset = queryset.filter(export["facility"](facility_id))
+    # Whole-day bounds keep the date-range filter sargable on timestamps.
+    if date_from is not None:
+        queryset = queryset.filter(
+            **{f"{export['date_field']}__gte": _day_start(date_from)}
+        )
+    if date_to is not None:
+        queryset = queryset.filter(
+            **{f"{export['date_field']}__lt": _day_start(date_to + timedelta(days=1))}
+        )
+
+    headers = [header for header, _ in export["columns"]]
+    rows = (
+        queryset.order_by(export["date_field"], "pk")
+        .values_list(*(lookup for _, lookup in export["columns"]))
+        .iterator(chunk_size=CHUNK_SIZE)
+    )
+    return headers, rows
+
+
+class _Echo:
+    def write(self, value):
+        return value
+
+
+def stream_csv(headers, rows):
+    writer = csv.writer(_Echo())
+    yield writer.writerow(headers)
+    for row in rows:
+        yield writer.writerow(row)
+
+
+def stream_ndjson(headers, rows):
+    for row in rows:
+        yield json.dumps(dict(zip(headers, row)), cls=DjangoJSONEncoder) + "\n"
+
+
+def _excel_value(value):
+    # Excel has no time zones; write local wall-clock time.
+    if isinstance(value, datetime) and timezone.is_aware(value):
+        return timezone.localtime(value).replace(tzinfo=None)
+    return value
+
+
+def stream_xlsx(headers, rows):
+    from openpyxl import Workbook
+
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet()
+    sheet.append(headers)
+    for row in rows:
+        sheet.append([_excel_value(value) for value in row])
+
+    with tempfile.TemporaryFile() as output:
+        workbook.save(output)
+        output.seek(0)
+        while chunk := output.read(FILE_CHUNK_SIZE):
+            yield chunk
+
+
+FORMATS = {
+    "csv": (stream_csv, "text/csv"),
+    "xlsx": (
+        stream_xlsx,
+        "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+    ),
+    "ndjson": (stream_ndjson, "application/x-ndjson"),
+}
+
+
+def stream_export(name, fmt, facility_id=None, date_from=None, date_to=None):
+    """Return ``(chunks, content_type)`` for an export in ``fmt``."""
+    if fmt not in FORMATS:
+        raise ExportError(f"Unknown export format '{fmt}'")
+    if fmt == "xlsx":
+        # Checked up front: once streaming starts the status can't change.
+        try:
+            import openpyxl  # noqa: F401
+        except ImportError:
+            raise ExportError(
+                "XLSX export requires openpyxl; install lemmo-apps[healthcare]"
+            )
+    writer, content_type = FORMATS[fmt]
+    headers, rows = export_rows(name, facility_id, date_from, date_to)
+    return writer(headers, rows), content_type
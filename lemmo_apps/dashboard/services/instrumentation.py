@@ -0,0 +1,113 @@
+"""Per-request query count and latency statistics.
+
+``dashboard.middleware.QueryInstrumentationMiddleware`` counts the SQL queries
+each request runs and their time with ``connection.execute_wrapper``, and
+``gql.instrumentation.ResolverTimingMiddleware`` does the same per GraphQL
+resolver. Samples are kept per operation (GraphQL operation, view or
+resolver name) in a bounded in-process window and summarised as
+p50/p95/p99 by ``snapshot``; each worker process keeps its own window, and
+every request is also logged to ``lemmo_apps.dashboard.services.instrumentation``
+for aggregation across workers.
+"""
+
+import logging
+import math
+import threading
+import time
+from collections import OrderedDict, deque
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+# Samples kept per operation; override with LEMMO_INSTRUMENTATION_WINDOW.
+DEFAULT_WINDOW = 1000
+# Requests slower than this are logged as warnings; LEMMO_SLOW_REQUEST_MS.
+DEFAULT_SLOW_MS = 1000
+# Operation names come from clients, so only this many are tracked; the
+# least recently seen one is dropped to make room for a new one.
+MAX_OPERATIONS = 500
+
+PERCENTILES = (50, 95, 99)
+METRICS = ("wall_ms", "db_ms", "queries")
+
+_lock = threading.Lock()
+_samples = OrderedDict()
+
+
+class QueryCounter:
+    """``execute_wrapper`` callable counting queries and the time they take."""
+
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.count += 1
+            self.seconds += time.perf_counter() - start
+
+
+def record(name, wall_ms, db_ms, queries):
+    window = getattr(settings, "LEMMO_INSTRUMENTATION_WINDOW", DEFAULT_WINDOW)
+    with _lock:
+        samples = _samples.get(name)
+        if samples is None:
+            while len(_samples) >= MAX_OPERATIONS:
+                _samples.popitem(last=False)
+            samples = _samples[name] = deque(maxlen=window)
+        else:
+            _samples.move_to_end(name)
+        samples.append((wall_ms, db_ms, queries))
+
+
+def log_request(name, wall_ms, db_ms, queries):
+    slow_ms = getattr(settings, "LEMMO_SLOW_REQUEST_MS", DEFAULT_SLOW_MS)
+    level = logging.WARNING if wall_ms >= slow_ms else logging.DEBUG
+    logger.log(
+        level,
+        "%s took %.1f ms, %d queries in %.1f ms",
+        name,
+        wall_ms,
+        queries,
+        db_ms,
+        extra={"operation": name, "wall_ms": wall_ms, "db_ms": db_ms},
+    )
+
+
+def _percentile(ordered, percent):
+    # Nearest-rank percentile of an already sorted list.
+    return ordered[max(0, math.ceil(percent / 100 * len(ordered)) - 1)]
+
+
+def summarize(samples):
+    summary = {"count": len(samples)}
+    for index, metric in enumerate(METRICS):
+        ordered = sorted(sample[index] for sample in samples)
+        summary[metric] = {
+            f"p{percent}": round(_percentile(ordered, percent), 2)
+            for percent in PERCENTILES
+        }
+    return summary
+
+
+def snapshot(prefix=None):
+    """Return ``{operation: {"count", "wall_ms", "db_ms", "queries"}}``.
+
+    Each metric maps ``p50``/``p95``/``p99`` to its value over the window.
+    """
+    with _lock:
+        samples = {
+            name: list(window)
+            for name, window in _samples.items()
+            if window and (prefix is None or name.startswith(prefix))
+        }
+    return {name: summarize(window) for name, window in sorted(samples.items())}
+
+
+def reset():
+    with _lock:
+        _samples.clear()
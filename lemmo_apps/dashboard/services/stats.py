@@ -0,0 +1,153 @@
+"""Single-pass counters shared by the dashboard resolvers and views.
+
+Every function below runs exactly one ``aggregate()`` against its table,
+using conditional ``Count(..., filter=Q(...))`` expressions so that all the
+counters a page needs for that table come back from the same scan.
+"""
+
+from datetime import timedelta
+
+from django.db.models import Avg, Count, DecimalField, F, Q, Sum
+from django.utils import timezone
+
+from lemmo_apps.inventory.services.expiry import expired_q, expiring_soon_q
+
+ACTIVE_SHIPMENT_STATUSES = ["PENDING", "ASSIGNED", "PICKED_UP", "IN_TRANSIT"]
+HEALTHCARE_ROLES = ["PHARMACIST", "NURSE", "DOCTOR"]
+LOGISTICS_ROLES = [
+    "LOGISTICS_MANAGER",
+    "WAREHOUSE_MANAGER",
+    "SUPPLY_CHAIN_SPECIALIST",
+    "INVENTORY_CLERK",
+    "DISPATCHER",
+    "DRIVER",
+]
+
+
+def product_stats(now=None):
+    from lemmo_apps.inventory.models.product import Product
+
+    now = now or timezone.now()
+    stock_value = Sum(
+        F("stock_quantity") * F("price"),
+        output_field=DecimalField(max_digits=20, decimal_places=2),
+    )
+    stats = Product.objects.aggregate(
+        total=Count("id"),
+        active=Count("id", filter=Q(is_active=True)),
+        low_stock=Count("id", filter=Q(stock_quantity__lte=F("reorder_point"))),
+        below_min_stock=Count("id", filter=Q(stock_quantity__lte=F("min_stock_level"))),
+        out_of_stock=Count("id", filter=Q(stock_quantity=0)),
+        overstocked=Count("id", filter=Q(stock_quantity__gt=F("max_stock_level"))),
+        fda_approved=Count("id", filter=Q(fda_approved=True)),
+        recent_7_days=Count("id", filter=Q(created_at__gte=now - timedelta(days=7))),
+        recent_30_days=Count("id", filter=Q(created_at__gte=now - timedelta(days=30))),
+        total_stock_value=stock_value,
+        below_min_stock_value=Sum(
+            F("stock_quantity") * F("price"),
+            filter=Q(stock_quantity__lte=F("min_stock_level")),
+            output_field=DecimalField(max_digits=20, decimal_places=2),
+        ),
+    )
+    stats["total_stock_value"] = stats["total_stock_value"] or 0
+    stats["below_min_stock_value"] = stats["below_min_stock_value"] or 0
+    return stats
+
+
+def product_batch_stats(today=None):
+    from lemmo_apps.inventory.models.product import ProductBatch
+
+    today = today or timezone.now().date()
+    return ProductBatch.objects.aggregate(
+        total=Count("id"),
+        expired=Count("id", filter=expired_q("expiration_date", today)),
+        expiring_soon=Count("id", filter=expiring_soon_q("expiration_date", today)),
+    )
+
+
+def shipment_stats(now=None):
+    from lemmo_apps.logistics.models.shipment import Shipment
+
+    now = now or timezone.now()
+    return Shipment.objects.aggregate(
+        total=Count("id"),
+        active=Count("id", filter=Q(status__in=ACTIVE_SHIPMENT_STATUSES)),
+        delivered=Count("id", filter=Q(status="DELIVERED")),
+        emergency=Count("id", filter=Q(priority="EMERGENCY")),
+        recent_7_days=Count("id", filter=Q(created_at__gte=now - timedelta(days=7))),
+    )
+
+
+def vehicle_stats(today=None):
+    from lemmo_apps.logistics.models.vehicle import Vehicle
+
+    today = today or timezone.now().date()
+    return Vehicle.objects.aggregate(
+        total=Count("id"),
+        active=Count("id", filter=Q(status="ACTIVE")),
+        maintenance_due=Count("id", filter=Q(next_maintenance_date__lte=today)),
+    )
+
+
+def facility_stats(now=None):
+    from lemmo_apps.location.models.facility import Facility
+
+    now = now or timezone.now()
+    return Facility.objects.aggregate(
+        total=Count("id"),
+        active=Count("id", filter=Q(is_active=True)),
+        operational=Count("id", filter=Q(operational_status="ACTIVE")),
+        licensed=Count("id", filter=Q(license_number__isnull=False)),
+        recent_30_days=Count("id", filter=Q(created_at__gte=now - timedelta(days=30))),
+    )
+
+
+def supplier_stats():
+    from lemmo_apps.supplier.models.supplier import Supplier
+
+    stats = Supplier.objects.aggregate(
+        total=Count("id"),
+        active=Count("id", filter=Q(status="ACTIVE")),
+        preferred=Count("id", filter=Q(is_preferred=True)),
+        avg_quality_rating=Avg("quality_rating"),
+    )
+    stats["avg_quality_rating"] = stats["avg_quality_rating"] or 0
+    return stats
+
+
+def purchase_order_stats():
+    from lemmo_apps.supplier.models.purchase_order import PurchaseOrder
+
+    return PurchaseOrder.objects.aggregate(
+        total=Count("id"),
+        pending=Count("id", filter=Q(status__in=["DRAFT", "SUBMITTED"])),
+    )
+
+
+def requisition_stats():
+    from lemmo_apps.requisition.models.requisition import Requisition
+
+    return Requisition.objects.aggregate(
+        total=Count("id"),
+        pending=Count("id", filter=Q(status="PENDING")),
+    )
+
+
+def user_stats():
+    from lemmo_apps.authentication.models import User
+
+    return User.objects.aggregate(
+        total=Count("id"),
+        active=Count("id", filter=Q(is_active=True)),
+        healthcare_professionals=Count("id", filter=Q(role__in=HEALTHCARE_ROLES)),
+        logistics_staff=Count("id", filter=Q(role__in=LOGISTICS_ROLES)),
+    )
+
+
+def user_activity_stats(now=None):
+    from lemmo_apps.authentication.models import UserActivity
+
+    now = now or timezone.now()
+    return UserActivity.objects.aggregate(
+        recent_7_days=Count("id", filter=Q(created_at__gte=now - timedelta(days=7))),
+    )
@@ -0,0 +1,29 @@
+from django.apps import apps
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+
+from .services.cache import MODEL_TAGS, invalidate
+
+
+def _invalidate_handler(tag):
+    def handler(sender, **kwargs):
+        # Readers must not pick up a recomputed snapshot before the write
+        # that triggered it is visible to them.
+        transaction.on_commit(lambda: invalidate(tag))
+
+    return handler
+
+
+def connect_cache_invalidation():
+    for label, tag in MODEL_TAGS.items():
+        model = apps.get_model(label)
+        handler = _invalidate_handler(tag)
+        post_save.connect(
+            handler, sender=model, weak=False, dispatch_uid=f"dashboard-cache-{tag}"
+        )
+        post_delete.connect(
+            handler,
+            sender=model,
+            weak=False,
+            dispatch_uid=f"dashboard-cache-{tag}-delete",
+        )
@@ -1,3 +1,148 @@
-from django.test import TestCase
+from decimal import Decimal
+from unittest import mock
 
-# Create your tests here.
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+
+from lemmo_apps.inventory.models.product import Product
+
+from .middleware import operation_name
+from .services import cache as snapshot_cache
+from .services import instrumentation, stats
+
+LOCMEM_CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        "LOCATION": "dashboard-tests",
+    }
+}
+
+
+def make_product(code, **fields):
+    values = {
+        "code": code,
+        "name": f"Product {code}",
+        "unit_of_measure": "units",
+        "price": Decimal("2.50"),
+    }
+    values.update(fields)
+    return Product.objects.create(**values)
+
+
+class ProductStatsTests(TestCase):
+    def test_counters_come_from_one_query(self):
+        make_product("P1", stock_quantity=0, reorder_point=10)
+        make_product("P2", stock_quantity=5, reorder_point=10, min_stock_level=5)
+        make_product("P3", stock_quantity=50, max_stock_level=40, is_active=False)
+        make_product("P4", stock_quantity=20, fda_approved=True)
+
+        with self.assertNumQueries(1):
+            result = stats.product_stats()
+
+        self.assertEqual(result["total"], 4)
+        self.assertEqual(result["active"], 3)
+        self.assertEqual(result["low_stock"], 2)
+        self.assertEqual(result["below_min_stock"], 2)
+        self.assertEqual(result["out_of_stock"], 1)
+        self.assertEqual(result["overstocked"], 1)
+        self.assertEqual(result["fda_approved"], 1)
+        self.assertEqual(result["recent_7_days"], 4)
+        self.assertEqual(result["total_stock_value"], Decimal("187.50"))
+        self.assertEqual(result["below_min_stock_value"], Decimal("12.50"))
+
+    def test_empty_table_reports_zero_values(self):
+        result = stats.product_stats()
+
+        self.assertEqual(result["total"], 0)
+        self.assertEqual(result["total_stock_value"], 0)
+        self.assertEqual(result["below_min_stock_value"], 0)
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class SnapshotCacheTests(TestCase):
+    def setUp(self):
+        snapshot_cache.get_cache().clear()
+
+    def get(self, compute):
+        return snapshot_cache.get_or_compute(
+            "inventory_stats", compute, tags=("product",)
+        )
+
+    def test_fresh_entry_is_served_from_cache(self):
+        compute = mock.Mock(return_value={"total": 1})
+
+        self.assertEqual(self.get(compute), {"total": 1})
+        self.assertEqual(self.get(compute), {"total": 1})
+        compute.assert_called_once()
+
+    def test_saving_a_tagged_model_serves_stale_snapshot_and_refreshes(self):
+        compute = mock.Mock(side_effect=[{"total": 0}, {"total": 1}])
+        self.get(compute)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            make_product("P1")
+        with mock.patch.object(snapshot_cache.threading, "Thread") as thread:
+            self.assertEqual(self.get(compute), {"total": 0})
+
+        thread.return_value.start.assert_called_once()
+        cache, key, name, versions, refresh = thread.call_args.kwargs["args"]
+        self.assertIs(refresh, compute)
+        snapshot_cache._store(cache, key, name, versions, refresh)
+        self.assertEqual(self.get(compute), {"total": 1})
+
+    def test_untagged_changes_keep_entry_fresh(self):
+        compute = mock.Mock(return_value={"total": 0})
+        self.get(compute)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            snapshot_cache.invalidate("shipment")
+
+        self.assertEqual(self.get(compute), {"total": 0})
+        compute.assert_called_once()
+
+    def test_resolver_is_computed_without_request_context(self):
+        calls = []
+
+        @snapshot_cache.cached_stats("facility_stats", tags=("facility",))
+        def resolve(root, info, **kwargs):
+            calls.append((root, info, kwargs))
+            return {}
+
+        resolve(object(), mock.Mock(), facility="f1")
+
+        self.assertEqual(calls, [(None, None, {"facility": "f1"})])
+
+
+class InstrumentationTests(SimpleTestCase):
+    def setUp(self):
+        instrumentation.reset()
+        self.addCleanup(instrumentation.reset)
+
+    @mock.patch.object(instrumentation, "MAX_OPERATIONS", 2)
+    def test_least_recently_seen_operation_is_evicted(self):
+        instrumentation.record("graphql:a", 10, 1, 1)
+        instrumentation.record("graphql:b", 20, 2, 2)
+        instrumentation.record("graphql:a", 30, 3, 3)
+        instrumentation.record("graphql:c", 40, 4, 4)
+
+        snapshot = instrumentation.snapshot()
+        self.assertEqual(sorted(snapshot), ["graphql:a", "graphql:c"])
+        self.assertEqual(snapshot["graphql:a"]["count"], 2)
+
+    @override_settings(LEMMO_INSTRUMENTATION_WINDOW=3)
+    def test_window_keeps_latest_samples(self):
+        for wall_ms in (100, 1, 2, 3):
+            instrumentation.record("view:home", wall_ms, 0, 0)
+
+        summary = instrumentation.snapshot("view:")["view:home"]
+        self.assertEqual(summary["count"], 3)
+        self.assertEqual(summary["wall_ms"]["p99"], 3)
+
+    def test_operation_names(self):
+        request = RequestFactory().get("/no/such/page/")
+        self.assertEqual(operation_name(request), "path:unmatched")
+
+        request.resolver_match = mock.Mock(view_name="dashboard:performance")
+        self.assertEqual(operation_name(request), "view:dashboard:performance")
+
+        request.graphql_operation = "Products"
+        self.assertEqual(operation_name(request), "graphql:Products")
@@ -79,5 +79,16 @@ urlpatterns = (
             views.ComplianceReportView.as_view(),
             name="compliance-report",
         ),
+        path(
+            "reports/export/<str:dataset>/",
+            views.ReportExportView.as_view(),
+            name="report-export",
+        ),
+        # Instrumentation
+        path(
+            "performance/",
+            views.PerformanceStatsView.as_view(),
+            name="performance",
+        ),
     ],
 )
@@ -1,14 +1,19 @@
+from django.http import JsonResponse, StreamingHttpResponse
 from django.shortcuts import render
-from django.views.generic import ListView, TemplateView
-from django.contrib.auth.mixins import LoginRequiredMixin
+from django.utils.dateparse import parse_date
+from django.views.generic import ListView, TemplateView, View
+from django.contrib.auth.mixins import LoginRequiredMixin, UserPassesTestMixin
 from django.db.models import Q, F, Count, Sum
 from django.utils import timezone
-from datetime import timedelta
 
 from lemmo_apps.inventory.models.product import Product, ProductBatch
+from lemmo_apps.inventory.services.expiry import expiring_soon_q
 from lemmo_apps.location.models.facility import Facility
 from lemmo_apps.stock.models.stock import Stock
-from lemmo_apps.authentication.models import User, UserActivity
+from lemmo_apps.authentication.models import User
+
+from .services import instrumentation, stats
+from .services.exports import ExportError, stream_export
 
 
 class DashboardView(LoginRequiredMixin, TemplateView):
@@ -17,36 +22,18 @@ class DashboardView(LoginRequiredMixin, TemplateView):
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
 
-        # Get basic statistics
-        total_products = Product.objects.count()
-        total_facilities = Facility.objects.count()
-        total_users = User.objects.count()
-
-        # Get low stock alerts
-        low_stock_products = Product.objects.filter(
-            stock_quantity__lte=F("min_stock_level")
-        ).count()
-        out_of_stock_products = Product.objects.filter(stock_quantity=0).count()
-
-        # Get expired batches
-        expired_batches = ProductBatch.objects.filter(
-            expiration_date__lt=timezone.now().date()
-        ).count()
-
-        # Get recent activity
-        recent_activities = UserActivity.objects.filter(
-            created_at__gte=timezone.now() - timedelta(days=7)
-        ).count()
+        now = timezone.now()
+        products = stats.product_stats(now)
 
         context.update(
             {
-                "total_products": total_products,
-                "total_facilities": total_facilities,
-                "total_users": total_users,
-                "low_stock_products": low_stock_products,
-                "out_of_stock_products": out_of_stock_products,
-                "expired_batches": expired_batches,
-                "recent_activities": recent_activities,
+                "total_products": products["total"],
+                "total_facilities": stats.facility_stats(now)["total"],
+                "total_users": stats.user_stats()["total"],
+                "low_stock_products": products["below_min_stock"],
+                "out_of_stock_products": products["out_of_stock"],
+                "expired_batches": stats.product_batch_stats(now.date())["expired"],
+                "recent_activities": stats.user_activity_stats(now)["recent_7_days"],
             }
         )
 
@@ -59,34 +46,15 @@ class DashboardOverviewView(LoginRequiredMixin, TemplateView):
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
 
-        # Get overview statistics
-        active_products = Product.objects.filter(is_active=True).count()
-        active_facilities = Facility.objects.filter(operational_status="ACTIVE").count()
-        active_users = User.objects.filter(is_active=True).count()
-
-        # Get healthcare specific stats
-        healthcare_professionals = User.objects.filter(
-            role__in=["PHARMACIST", "NURSE", "DOCTOR"]
-        ).count()
-
-        logistics_staff = User.objects.filter(
-            role__in=[
-                "LOGISTICS_MANAGER",
-                "WAREHOUSE_MANAGER",
-                "SUPPLY_CHAIN_SPECIALIST",
-                "INVENTORY_CLERK",
-                "DISPATCHER",
-                "DRIVER",
-            ]
-        ).count()
+        users = stats.user_stats()
 
         context.update(
             {
-                "active_products": active_products,
-                "active_facilities": active_facilities,
-                "active_users": active_users,
-                "healthcare_professionals": healthcare_professionals,
-                "logistics_staff": logistics_staff,
+                "active_products": stats.product_stats()["active"],
+                "active_facilities": stats.facility_stats()["operational"],
+                "active_users": users["active"],
+                "healthcare_professionals": users["healthcare_professionals"],
+                "logistics_staff": users["logistics_staff"],
             }
         )
 
@@ -109,13 +77,9 @@ class DashboardAnalyticsView(LoginRequiredMixin, TemplateView):
         user_role_stats = User.objects.values("role").annotate(count=Count("role"))
 
         # Get time-based analytics
-        recent_products = Product.objects.filter(
-            created_at__gte=timezone.now() - timedelta(days=30)
-        ).count()
-
-        recent_facilities = Facility.objects.filter(
-            created_at__gte=timezone.now() - timedelta(days=30)
-        ).count()
+        now = timezone.now()
+        recent_products = stats.product_stats(now)["recent_30_days"]
+        recent_facilities = stats.facility_stats(now)["recent_30_days"]
 
         context.update(
             {
@@ -136,25 +100,12 @@ class DashboardReportsView(LoginRequiredMixin, TemplateView):
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
 
-        # Get report data
-        total_stock_value = (
-            Product.objects.aggregate(
-                total_value=Sum(F("price") * F("stock_quantity"))
-            )["total_value"]
-            or 0
-        )
-
-        low_stock_value = (
-            Product.objects.filter(stock_quantity__lte=F("min_stock_level")).aggregate(
-                low_stock_value=Sum(F("price") * F("stock_quantity"))
-            )["low_stock_value"]
-            or 0
-        )
+        products = stats.product_stats()
 
         context.update(
             {
-                "total_stock_value": total_stock_value,
-                "low_stock_value": low_stock_value,
+                "total_stock_value": products["total_stock_value"],
+                "low_stock_value": products["below_min_stock_value"],
             }
         )
 
@@ -167,36 +118,18 @@ class InventoryOverviewView(LoginRequiredMixin, TemplateView):
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
 
-        # Get inventory statistics
-        total_products = Product.objects.count()
-        active_products = Product.objects.filter(is_active=True).count()
-        low_stock_products = Product.objects.filter(
-            stock_quantity__lte=F("min_stock_level")
-        ).count()
-        out_of_stock_products = Product.objects.filter(stock_quantity=0).count()
-
-        # Get batch statistics
-        total_batches = ProductBatch.objects.count()
-        expired_batches = ProductBatch.objects.filter(
-            expiration_date__lt=timezone.now().date()
-        ).count()
-
-        # Get expiring soon batches
-        expiry_threshold = timezone.now().date() + timedelta(days=30)
-        expiring_soon_batches = ProductBatch.objects.filter(
-            expiration_date__lte=expiry_threshold,
-            expiration_date__gte=timezone.now().date(),
-        ).count()
+        products = stats.product_stats()
+        batches = stats.product_batch_stats()
 
         context.update(
             {
-                "total_products": total_products,
-                "active_products": active_products,
-                "low_stock_products": low_stock_products,
-                "out_of_stock_products": out_of_stock_products,
-                "total_batches": total_batches,
-                "expired_batches": expired_batches,
-                "expiring_soon_batches": expiring_soon_batches,
+                "total_products": products["total"],
+                "active_products": products["active"],
+                "low_stock_products": products["below_min_stock"],
+                "out_of_stock_products": products["out_of_stock"],
+                "total_batches": batches["total"],
+                "expired_batches": batches["expired"],
+                "expiring_soon_batches": batches["expiring_soon"],
             }
         )
 
@@ -256,8 +189,9 @@ class FacilityOverviewView(LoginRequiredMixin, TemplateView):
         context = super().get_context_data(**kwargs)
 
         # Get facility statistics
-        total_facilities = Facility.objects.count()
-        active_facilities = Facility.objects.filter(operational_status="ACTIVE").count()
+        facilities = stats.facility_stats()
+        total_facilities = facilities["total"]
+        active_facilities = facilities["operational"]
 
         # Get facility type distribution
         facility_type_stats = Facility.objects.values("facility_type__name").annotate(
@@ -322,11 +256,7 @@ class ExpiringProductsAlertsView(LoginRequiredMixin, ListView):
     context_object_name = "expiring_batches"
 
     def get_queryset(self):
-        expiry_threshold = timezone.now().date() + timedelta(days=30)
-        return ProductBatch.objects.filter(
-            expiration_date__lte=expiry_threshold,
-            expiration_date__gte=timezone.now().date(),
-        )
+        return ProductBatch.objects.filter(expiring_soon_q("expiration_date"))
 
 
 class EmergencyShipmentsAlertsView(LoginRequiredMixin, TemplateView):
@@ -370,13 +300,9 @@ class InventoryReportView(LoginRequiredMixin, TemplateView):
         context = super().get_context_data(**kwargs)
 
         # Get inventory report data
-        total_products = Product.objects.count()
-        total_stock_value = (
-            Product.objects.aggregate(
-                total_value=Sum(F("price") * F("stock_quantity"))
-            )["total_value"]
-            or 0
-        )
+        products = stats.product_stats()
+        total_products = products["total"]
+        total_stock_value = products["total_stock_value"]
 
         # Get product type distribution
         product_type_stats = Product.objects.values("product_type").annotate(
@@ -393,3 +319,60 @@ class InventoryReportView(LoginRequiredMixin, TemplateView):
         )
 
         return context
+
+
+class ReportExportView(LoginRequiredMixin, View):
+    """Stream the rows behind a report.
+
+    ``?format=csv|xlsx|ndjson&facility=<id>&date_from=YYYY-MM-DD&date_to=YYYY-MM-DD``
+    """
+
+    def get(self, request, dataset):
+        fmt = request.GET.get("format", "csv")
+        dates = {}
+        for param in ("date_from", "date_to"):
+            value = request.GET.get(param)
+            if value:
+                try:
+                    dates[param] = parse_date(value)
+                except ValueError:
+                    # Well formed but impossible, e.g. 2024-02-30.
+                    dates[param] = None
+                if dates[param] is None:
+                    return JsonResponse(
+                        {"status": "error", "message": f"Invalid {param} '{value}'"},
+                        status=400,
+                    )
+
+        try:
+            chunks, content_type = stream_export(
+                dataset, fmt, facility_id=request.GET.get("facility") or None, **dates
+            )
+        except ExportError as exc:
+            return JsonResponse({"status": "error", "message": str(exc)}, status=400)
+
+        response = StreamingHttpResponse(chunks, content_type=content_type)
+        filename = f"{dataset}-{timezone.now():%Y%m%d}.{fmt}"
+        response["Content-Disposition"] = f'attachment; filename="{filename}"'
+        return response
+
+
+class PerformanceStatsView(LoginRequiredMixin, UserPassesTestMixin, View):
+    """p50/p95/p99 wall time, DB time and query count per operation.
+
+    ``?prefix=graphql:|view:|resolver:`` narrows the operations returned.
+    Statistics are those of the worker process serving the request.
+    """
+
+    def test_func(self):
+        return self.request.user.is_staff
+
+    def get(self, request):
+        return JsonResponse(
+            {
+                "status": "success",
+                "operations": instrumentation.snapshot(
+                    prefix=request.GET.get("prefix") or None
+                ),
+            }
+        )
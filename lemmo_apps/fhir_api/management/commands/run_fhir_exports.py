@@ -0,0 +1,35 @@
+from django.core.management.base import BaseCommand
+
+from lemmo_apps.fhir_api.services.bulk_export import (
+    claim_job,
+    export_job,
+    fail_stale_jobs,
+    purge_expired_jobs,
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Run queued FHIR $export jobs and delete expired ones "
+        "(when LEMMO_FHIR_EXPORT_IN_PROCESS is False, run every minute)"
+    )
+
+    def handle(self, *args, **options):
+        failed = fail_stale_jobs()
+        if failed:
+            self.stdout.write(
+                self.style.WARNING(f"Failed {failed} export(s) that stopped running")
+            )
+        purged = purge_expired_jobs()
+        if purged:
+            self.stdout.write(f"Deleted {purged} expired export(s)")
+
+        ran = 0
+        while True:
+            job = claim_job()
+            if job is None:
+                break
+            self.stdout.write(f"Running export {job.pk}...")
+            export_job(job)
+            ran += 1
+        self.stdout.write(self.style.SUCCESS(f"Ran {ran} export(s)"))
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.4 on 2026-10-17 17:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("fhir_api", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="bulkexportjob",
+            name="heartbeat_at",
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
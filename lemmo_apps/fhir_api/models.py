@@ -1,3 +1,51 @@
+import uuid
+
+from django.conf import settings
 from django.db import models
 
-# Create your models here.
+
+class BulkExportJob(models.Model):
+    """A FHIR Bulk Data ``$export`` request and the NDJSON files it produced."""
+
+    STATUS_CHOICES = [
+        ("ACCEPTED", "Accepted"),
+        ("IN_PROGRESS", "In Progress"),
+        ("COMPLETED", "Completed"),
+        ("FAILED", "Failed"),
+        ("CANCELLED", "Cancelled"),
+    ]
+
+    id = models.UUIDField(default=uuid.uuid4, primary_key=True, editable=False)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default="ACCEPTED")
+    resource_types = models.JSONField(default=list)
+    since = models.DateTimeField(blank=True, null=True)
+    request_url = models.TextField()
+    requested_by = models.ForeignKey(
+        settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, blank=True
+    )
+    transaction_time = models.DateTimeField()
+    progress = models.CharField(max_length=255, blank=True, default="")
+    # [{"type": "Medication", "path": "<storage name>", "count": 10}, ...]
+    output = models.JSONField(default=list, blank=True)
+    error = models.TextField(blank=True, default="")
+    created_at = models.DateTimeField(auto_now_add=True)
+    # Touched by the runner as it works; a stale one means the runner died.
+    heartbeat_at = models.DateTimeField(blank=True, null=True)
+    completed_at = models.DateTimeField(blank=True, null=True)
+    expires_at = models.DateTimeField(blank=True, null=True)
+
+    class Meta:
+        db_table = "tblFhirBulkExportJobs"
+        ordering = ["-created_at"]
+        indexes = [
+            models.Index(
+                fields=["status", "created_at"], name="fhir_export_status_idx"
+            ),
+        ]
+
+    def __str__(self):
+        return f"$export {self.id} ({self.status})"
+
+    @property
+    def is_running(self):
+        return self.status in ("ACCEPTED", "IN_PROGRESS")
@@ -0,0 +1,596 @@
+"""FHIR R4 Bulk Data ``$export`` to per-type NDJSON files.
+
+``create_job`` records the request and, unless
+``LEMMO_FHIR_EXPORT_IN_PROCESS`` is False, starts ``run_job`` on a
+background thread once the request commits; otherwise ``manage.py
+run_fhir_exports`` picks queued jobs up. Each resource type is read with
+``values(...).iterator(chunk_size=CHUNK_SIZE)``, which uses a server-side
+cursor on PostgreSQL, serialised one row at a time into a temporary file and
+saved to ``default_storage`` under ``LEMMO_FHIR_EXPORT_DIR``, so no more than
+one chunk of rows is held in memory. Files are kept for
+``LEMMO_FHIR_EXPORT_RETENTION_HOURS`` hours after the job completes.
+
+The runner records a heartbeat on the job after every chunk. A job in
+progress whose heartbeat is older than ``LEMMO_FHIR_EXPORT_STALE_MINUTES``
+lost its thread or worker; ``fail_stale_jobs`` marks it failed so that it is
+reported and purged instead of staying in progress forever.
+"""
+
+import json
+import logging
+import tempfile
+import threading
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.files import File
+from django.core.files.storage import default_storage
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connections, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from lemmo_apps.authentication.models import User
+from lemmo_apps.fhir_api.models import BulkExportJob
+from lemmo_apps.inventory.models.product import Product
+from lemmo_apps.location.models.facility import Facility
+from lemmo_apps.location.models.location import Location
+from lemmo_apps.logistics.models.shipment import ShipmentItem
+from lemmo_apps.requisition.models.requisition_item import RequisitionItem
+
+logger = logging.getLogger(__name__)
+
+CHUNK_SIZE = 2000
+DEFAULT_EXPORT_DIR = "fhir_exports"
+DEFAULT_RETENTION_HOURS = 72
+DEFAULT_STALE_MINUTES = 30
+IDENTIFIER_SYSTEM = "urn:lemmo"
+NDC_SYSTEM = "http://hl7.org/fhir/sid/ndc"
+PRACTITIONER_ROLES = ["PHARMACIST", "NURSE", "DOCTOR"]
+
+SUPPLY_DELIVERY_STATUS = {
+    "DELIVERED": "completed",
+    "FAILED": "abandoned",
+    "CANCELLED": "abandoned",
+    "RETURNED": "abandoned",
+}
+SUPPLY_REQUEST_STATUS = {
+    "DRAFT": "draft",
+    "SUBMITTED": "active",
+    "APPROVED": "active",
+    "REJECTED": "cancelled",
+    "FULFILLED": "completed",
+    "CANCELLED": "cancelled",
+}
+
+
+class BulkExportError(Exception):
+    """The ``$export`` request cannot be accepted."""
+
+
+def _instant(value):
+    return value.isoformat() if value else None
+
+
+def _meta(row, field="updated_at"):
+    return {"lastUpdated": _instant(row[field])} if row.get(field) else None
+
+
+def _identifier(kind, value):
+    return (
+        [{"system": f"{IDENTIFIER_SYSTEM}:{kind}", "value": value}] if value else None
+    )
+
+
+def _compact(resource):
+    """Drop empty elements, which FHIR JSON does not allow."""
+    return {
+        key: value for key, value in resource.items() if value not in (None, "", [])
+    }
+
+
+def _medication(row):
+    coding = [{"system": f"{IDENTIFIER_SYSTEM}:product", "code": row["code"]}]
+    if row["ndc_code"]:
+        coding.insert(0, {"system": NDC_SYSTEM, "code": row["ndc_code"]})
+    return _compact(
+        {
+            "resourceType": "Medication",
+            "id": str(row["id"]),
+            "meta": _meta(row),
+            "identifier": _identifier("product", row["code"]),
+            "code": {"coding": coding, "text": row["name"]},
+            "status": "active" if row["is_active"] else "inactive",
+            "manufacturer": (
+                {"display": row["manufacturer"]} if row["manufacturer"] else None
+            ),
+        }
+    )
+
+
+def _organization(row):
+    telecom = [
+        {"system": system, "value": row[field]}
+        for system, field in (
+            ("phone", "phone"),
+            ("email", "email"),
+            ("url", "website"),
+        )
+        if row[field]
+    ]
+    return _compact(
+        {
+            "resourceType": "Organization",
+            "id": str(row["id"]),
+            "meta": _meta(row),
+            "identifier": _identifier("facility-license", row["license_number"]),
+            "active": row["is_active"],
+            "type": [{"text": row["category"]}] if row["category"] else None,
+            "name": row["name"],
+            "telecom": telecom,
+            "address": [
+                _compact(
+                    {
+                        "line": [row["address"]] if row["address"] else None,
+                        "city": row["city"],
+                        "state": row["state"],
+                        "postalCode": row["postal_code"],
+                        "country": row["country"],
+                    }
+                )
+            ],
+        }
+    )
+
+
+def _location(row):
+    return _compact(
+        {
+            "resourceType": "Location",
+            "id": str(row["id"]),
+            "status": "active",
+            "mode": "instance",
+            "name": row["name"],
+            "type": [{"text": row["type__name"]}],
+            "partOf": (
+                {"reference": f"Location/{row['parent_id']}"}
+                if row["parent_id"]
+                else None
+            ),
+        }
+    )
+
+
+def _practitioner(row):
+    telecom = [
+        {"system": system, "value": row[field]}
+        for system, field in (("email", "email"), ("phone", "phone_number"))
+        if row[field]
+    ]
+    return _compact(
+        {
+            "resourceType": "Practitioner",
+            "id": str(row["id"]),
+            "meta": _meta(row),
+            "identifier": _identifier("employee", row["employee_id"]),
+            "active": row["is_active"],
+            "name": [
+                {
+                    "family": row["last_name"],
+                    "given": [row["first_name"]],
+                    "text": f"{row['first_name']} {row['last_name']}",
+                }
+            ],
+            "telecom": telecom,
+            "qualification": [
+                _compact(
+                    {
+                        "code": {"text": row["role"]},
+                        "identifier": _identifier("license", row["license_number"]),
+                    }
+                )
+            ],
+        }
+    )
+
+
+def _supply_delivery(row):
+    item = {"display": row["product__name"]}
+    if row["product__product_type"] == "MEDICATION":
+        # Only medications are exported as resources that can be referenced.
+        item["reference"] = f"Medication/{row['product_id']}"
+    return _compact(
+        {
+            "resourceType": "SupplyDelivery",
+            "id": str(row["id"]),
+            "meta": _meta(row),
+            "identifier": _identifier("shipment", row["shipment__shipment_number"]),
+            "status": SUPPLY_DELIVERY_STATUS.get(
+                row["shipment__status"], "in-progress"
+            ),
+            "suppliedItem": {
+                "quantity": {"value": row["quantity"]},
+                "itemReference": item,
+            },
+            "occurrenceDateTime": _instant(row["shipment__actual_delivery_date"]),
+            "supplier": {
+                "reference": f"Organization/{row['shipment__origin_facility_id']}"
+            },
+            "destination": {"display": row["shipment__destination_facility__name"]},
+        }
+    )
+
+
+def _supply_request(row):
+    requester = None
+    if row["requisition__requested_by__role"] in PRACTITIONER_ROLES:
+        requester = row["requisition__requested_by_id"]
+    return _compact(
+        {
+            "resourceType": "SupplyRequest",
+            "id": str(row["id"]),
+            "identifier": _identifier("requisition", str(row["requisition_id"])),
+            "status": SUPPLY_REQUEST_STATUS.get(row["requisition__status"], "unknown"),
+            "itemCodeableConcept": {
+                "coding": [
+                    {"system": f"{IDENTIFIER_SYSTEM}:item", "code": row["item__code"]}
+                ],
+                "text": row["item__label"],
+            },
+            "quantity": {"value": row["requested_quantity"]},
+            "authoredOn": _instant(row["requisition__request_date"]),
+            "requester": (
+                {"reference": f"Practitioner/{requester}"} if requester else None
+            ),
+            "deliverTo": {
+                "reference": f"Organization/{row['requisition__facility_id']}"
+            },
+        }
+    )
+
+
+# resourceType -> queryset, values() fields, _since filter and serializer.
+# The _since filter is a field name, a callable taking the instant and
+# returning a Q, or None for types that are always exported in full.
+RESOURCES = {
+    "Medication": {
+        "queryset": lambda: Product.objects.filter(product_type="MEDICATION"),
+        "fields": [
+            "id",
+            "code",
+            "name",
+            "ndc_code",
+            "manufacturer",
+            "is_active",
+            "updated_at",
+        ],
+        "since": "updated_at",
+        "serialize": _medication,
+    },
+    "Organization": {
+        "queryset": lambda: Facility.objects.all(),
+        "fields": [
+            "id",
+            "name",
+            "category",
+            "license_number",
+            "is_active",
+            "phone",
+            "email",
+            "website",
+            "address",
+            "city",
+            "state",
+            "postal_code",
+            "country",
+            "updated_at",
+        ],
+        "since": "updated_at",
+        "serialize": _organization,
+    },
+    "Location": {
+        "queryset": lambda: Location.objects.all(),
+        "fields": ["id", "name", "type__name", "parent_id"],
+        "since": None,
+        "serialize": _location,
+    },
+    "Practitioner": {
+        "queryset": lambda: User.objects.filter(role__in=PRACTITIONER_ROLES),
+        "fields": [
+            "id",
+            "first_name",
+            "last_name",
+            "email",
+            "phone_number",
+            "employee_id",
+            "license_number",
+            "role",
+            "is_active",
+            "updated_at",
+        ],
+        "since": "updated_at",
+        "serialize": _practitioner,
+    },
+    "SupplyDelivery": {
+        "queryset": lambda: ShipmentItem.objects.all(),
+        "fields": [
+            "id",
+            "quantity",
+            "product_id",
+            "product__name",
+            "product__product_type",
+            "shipment__shipment_number",
+            "shipment__status",
+            "shipment__actual_delivery_date",
+            "shipment__origin_facility_id",
+            "shipment__destination_facility__name",
+            "updated_at",
+        ],
+        # Status and delivery date live on the shipment.
+        "since": lambda since: (
+            Q(updated_at__gt=since) | Q(shipment__updated_at__gt=since)
+        ),
+        "serialize": _supply_delivery,
+    },
+    "SupplyRequest": {
+        "queryset": lambda: RequisitionItem.objects.all(),
+        "fields": [
+            "id",
+            "requested_quantity",
+            "item__code",
+            "item__label",
+            "requisition_id",
+            "requisition__status",
+            "requisition__request_date",
+            "requisition__requested_by_id",
+            "requisition__requested_by__role",
+            "requisition__facility_id",
+        ],
+        # Status changes are saved on the requisition, not its items.
+        "since": "requisition__updated_at",
+        "serialize": _supply_request,
+    },
+}
+
+
+def _retention():
+    return timedelta(
+        hours=getattr(
+            settings, "LEMMO_FHIR_EXPORT_RETENTION_HOURS", DEFAULT_RETENTION_HOURS
+        )
+    )
+
+
+def _export_dir():
+    return getattr(settings, "LEMMO_FHIR_EXPORT_DIR", DEFAULT_EXPORT_DIR)
+
+
+def _file_path(job, resource_type):
+    return f"{_export_dir()}/{job.pk}/{resource_type}.ndjson"
+
+
+def _stale_before(now):
+    return now - timedelta(
+        minutes=getattr(
+            settings, "LEMMO_FHIR_EXPORT_STALE_MINUTES", DEFAULT_STALE_MINUTES
+        )
+    )
+
+
+def parse_types(value):
+    """Resource types named by ``_type``; every supported type if empty."""
+    if not value:
+        return list(RESOURCES)
+    types = [name.strip() for name in value.split(",") if name.strip()]
+    unknown = [name for name in types if name not in RESOURCES]
+    if unknown:
+        raise BulkExportError(
+            f"Unsupported resource type(s): {', '.join(unknown)}; "
+            f"supported: {', '.join(RESOURCES)}"
+        )
+    return list(dict.fromkeys(types))
+
+
+def create_job(request_url, resource_types, since=None, user=None):
+    job = BulkExportJob.objects.create(
+        request_url=request_url,
+        resource_types=resource_types,
+        since=since,
+        requested_by=user,
+        transaction_time=timezone.now(),
+    )
+    if getattr(settings, "LEMMO_FHIR_EXPORT_IN_PROCESS", True):
+        transaction.on_commit(lambda: start_job(job.pk))
+    return job
+
+
+def start_job(job_id):
+    threading.Thread(
+        target=_run_in_thread, args=(job_id,), name=f"fhir-export-{job_id}", daemon=True
+    ).start()
+
+
+def _run_in_thread(job_id):
+    try:
+        run_job(job_id)
+    finally:
+        connections.close_all()
+
+
+def _claim(job_id):
+    # Only one thread or worker wins the ACCEPTED -> IN_PROGRESS transition.
+    return bool(
+        BulkExportJob.objects.filter(pk=job_id, status="ACCEPTED").update(
+            status="IN_PROGRESS", heartbeat_at=timezone.now()
+        )
+    )
+
+
+def claim_job():
+    """Mark the oldest accepted job as in progress and return it, or None."""
+    accepted = BulkExportJob.objects.filter(status="ACCEPTED").order_by("created_at")
+    while True:
+        job_id = accepted.values_list("pk", flat=True).first()
+        if job_id is None:
+            return None
+        if _claim(job_id):
+            return BulkExportJob.objects.get(pk=job_id)
+
+
+class _Cancelled(Exception):
+    pass
+
+
+def _write_resource(job, resource_type, path):
+    """Stream ``resource_type`` into ``path``; return the number of resources."""
+    spec = RESOURCES[resource_type]
+    queryset = spec["queryset"]()
+    since = spec["since"]
+    if job.since and callable(since):
+        queryset = queryset.filter(since(job.since))
+    elif job.since and since:
+        queryset = queryset.filter(**{f"{since}__gt": job.since})
+    rows = queryset.order_by("pk").values(*spec["fields"])
+
+    count = 0
+    with tempfile.TemporaryFile() as output:
+        for row in rows.iterator(chunk_size=CHUNK_SIZE):
+            resource = spec["serialize"](row)
+            output.write(
+                json.dumps(
+                    resource, cls=DjangoJSONEncoder, separators=(",", ":")
+                ).encode()
+            )
+            output.write(b"\n")
+            count += 1
+            if count % CHUNK_SIZE == 0 and not _heartbeat(job):
+                raise _Cancelled()
+        output.seek(0)
+        saved = default_storage.save(path, File(output))
+    return saved, count
+
+
+def _heartbeat(job, **fields):
+    """Record that the runner is alive; False once the job was cancelled,
+    failed as stale or purged."""
+    return bool(
+        BulkExportJob.objects.filter(pk=job.pk, status="IN_PROGRESS").update(
+            heartbeat_at=timezone.now(), **fields
+        )
+    )
+
+
+def run_job(job_id):
+    """Claim and run the job unless another thread or worker already has."""
+    if _claim(job_id):
+        export_job(BulkExportJob.objects.get(pk=job_id))
+
+
+def export_job(job):
+    """Export every resource type of a claimed job, recording progress."""
+    output = []
+    try:
+        for index, resource_type in enumerate(job.resource_types):
+            if not _heartbeat(
+                job,
+                progress=f"Exporting {resource_type} "
+                f"({index + 1} of {len(job.resource_types)})",
+            ):
+                raise _Cancelled()
+            path, count = _write_resource(
+                job, resource_type, _file_path(job, resource_type)
+            )
+            output.append({"type": resource_type, "path": path, "count": count})
+    except _Cancelled:
+        _delete_files(output)
+        return
+    except Exception as exc:
+        logger.exception("FHIR export %s failed", job.pk)
+        _delete_files(output)
+        now = timezone.now()
+        BulkExportJob.objects.filter(pk=job.pk).update(
+            status="FAILED",
+            error=str(exc),
+            completed_at=now,
+            expires_at=now + _retention(),
+        )
+        return
+
+    now = timezone.now()
+    completed = BulkExportJob.objects.filter(pk=job.pk, status="IN_PROGRESS").update(
+        heartbeat_at=now,
+        status="COMPLETED",
+        output=output,
+        progress="",
+        completed_at=now,
+        expires_at=now + _retention(),
+    )
+    if not completed:
+        # Cancelled while the last file was being saved.
+        _delete_files(output)
+
+
+def _delete_files(output):
+    for entry in output:
+        default_storage.delete(entry["path"])
+
+
+def cancel_job(job):
+    """Cancel a running job, or delete a finished job and its files."""
+    if job.is_running:
+        # The runner notices, deletes its files and stops.
+        now = timezone.now()
+        BulkExportJob.objects.filter(pk=job.pk).update(
+            status="CANCELLED", completed_at=now, expires_at=now + _retention()
+        )
+    else:
+        _delete_files(job.output)
+        job.delete()
+
+
+def is_stale(job, now=None):
+    """Whether ``job`` is in progress but its runner stopped reporting."""
+    return job.status == "IN_PROGRESS" and (
+        job.heartbeat_at is None
+        or job.heartbeat_at < _stale_before(now or timezone.now())
+    )
+
+
+def fail_stale_jobs(now=None):
+    """Mark stale in-progress jobs failed and delete their files; return how
+    many."""
+    now = now or timezone.now()
+    stale = BulkExportJob.objects.filter(status="IN_PROGRESS").filter(
+        Q(heartbeat_at__isnull=True) | Q(heartbeat_at__lt=_stale_before(now))
+    )
+    count = 0
+    for job in stale.iterator():
+        # Conditional on the heartbeat, so a runner that was only slow and
+        # reported meanwhile keeps its job.
+        failed = BulkExportJob.objects.filter(
+            pk=job.pk, status="IN_PROGRESS", heartbeat_at=job.heartbeat_at
+        ).update(
+            status="FAILED",
+            error="The export stopped before it finished",
+            progress="",
+            completed_at=now,
+            expires_at=now + _retention(),
+        )
+        if failed:
+            # The dead runner never recorded the files it had saved.
+            for resource_type in job.resource_types:
+                default_storage.delete(_file_path(job, resource_type))
+            count += 1
+    return count
+
+
+def purge_expired_jobs(now=None):
+    """Delete jobs past ``expires_at`` and their files; return how many."""
+    now = now or timezone.now()
+    expired = BulkExportJob.objects.filter(expires_at__lte=now)
+    count = 0
+    for job in expired.iterator():
+        _delete_files(job.output)
+        job.delete()
+        count += 1
+    return count
@@ -1,3 +1,249 @@
-from django.test import TestCase
+import json
+from datetime import timedelta
+from decimal import Decimal
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.core.files.storage import default_storage
+from django.test import RequestFactory, TestCase, override_settings
+from django.utils import timezone
+
+from lemmo_apps.inventory.models.item import Item
+from lemmo_apps.inventory.models.product import Product
+from lemmo_apps.inventory.models.product_management import Batch
+from lemmo_apps.location.models.facility import Facility
+from lemmo_apps.logistics.models.shipment import Shipment, ShipmentItem
+from lemmo_apps.requisition.models.requisition import Requisition
+from lemmo_apps.requisition.models.requisition_item import RequisitionItem
+
+from .models import BulkExportJob
+from .services import bulk_export
+from .views import BulkExportKickoffView
+
+EXPORT_SETTINGS = {
+    "LEMMO_FHIR_EXPORT_IN_PROCESS": False,
+    "STORAGES": {
+        "default": {"BACKEND": "django.core.files.storage.InMemoryStorage"},
+        "staticfiles": {
+            "BACKEND": "django.contrib.staticfiles.storage.StaticFilesStorage"
+        },
+    },
+}
+
+
+def make_product(code, **fields):
+    fields.setdefault("name", f"Product {code}")
+    fields.setdefault("unit_of_measure", "units")
+    fields.setdefault("price", Decimal("1.00"))
+    fields.setdefault("product_type", "MEDICATION")
+    return Product.objects.create(code=code, **fields)
+
+
+def make_facility(name):
+    return Facility.objects.create(
+        name=name,
+        address="1 Main St",
+        city="Springfield",
+        state="IL",
+        postal_code="62701",
+    )
+
+
+def make_item(code, product):
+    batch = Batch.objects.create(code=f"B-{code}", name=f"Batch {code}")
+    return Item.objects.create(
+        code=code,
+        label=f"Item {code}",
+        price=Decimal("1.00"),
+        product=product,
+        batch=batch,
+    )
+
+
+def exported_ids(job, resource_type):
+    entry = next(entry for entry in job.output if entry["type"] == resource_type)
+    with default_storage.open(entry["path"], "rb") as output:
+        return {json.loads(line)["id"] for line in output.read().splitlines()}
+
+
+@override_settings(**EXPORT_SETTINGS)
+class ExportJobLifecycleTests(TestCase):
+    def test_job_runs_from_accepted_to_completed(self):
+        product = make_product("P1")
+        facility = make_facility("Clinic")
+
+        job = bulk_export.create_job("/fhir/$export", ["Medication", "Organization"])
+        self.assertEqual(job.status, "ACCEPTED")
+        bulk_export.run_job(job.pk)
+
+        job.refresh_from_db()
+        self.assertEqual(job.status, "COMPLETED")
+        self.assertEqual(job.progress, "")
+        self.assertIsNotNone(job.expires_at)
+        self.assertEqual([entry["count"] for entry in job.output], [1, 1])
+        self.assertEqual(exported_ids(job, "Medication"), {str(product.pk)})
+        self.assertEqual(exported_ids(job, "Organization"), {str(facility.pk)})
+
+    def test_claimed_job_is_not_run_again(self):
+        job = bulk_export.create_job("/fhir/$export", ["Medication"])
+        self.assertEqual(bulk_export.claim_job(), job)
+        self.assertIsNone(bulk_export.claim_job())
+
+        with mock.patch.object(bulk_export, "export_job") as export_job:
+            bulk_export.run_job(job.pk)
+        export_job.assert_not_called()
+
+    def test_error_fails_job_and_deletes_files(self):
+        make_product("P1")
+        job = bulk_export.create_job("/fhir/$export", ["Organization", "Medication"])
+        make_facility("Clinic")
+
+        with mock.patch.dict(
+            bulk_export.RESOURCES["Medication"],
+            serialize=mock.Mock(side_effect=ValueError("bad row")),
+        ):
+            bulk_export.run_job(job.pk)
+
+        job.refresh_from_db()
+        self.assertEqual(job.status, "FAILED")
+        self.assertEqual(job.error, "bad row")
+        self.assertFalse(
+            default_storage.exists(bulk_export._file_path(job, "Organization"))
+        )
+
+    def test_cancelled_job_is_not_run(self):
+        job = bulk_export.create_job("/fhir/$export", ["Medication"])
+
+        bulk_export.cancel_job(job)
+        bulk_export.run_job(job.pk)
+
+        job.refresh_from_db()
+        self.assertEqual(job.status, "CANCELLED")
+        self.assertEqual(job.output, [])
+
+    def test_stale_jobs_are_failed(self):
+        now = timezone.now()
+        stale = bulk_export.create_job("/fhir/$export", ["Medication"])
+        alive = bulk_export.create_job("/fhir/$export", ["Medication"])
+        BulkExportJob.objects.filter(pk=stale.pk).update(
+            status="IN_PROGRESS", heartbeat_at=now - timedelta(hours=1)
+        )
+        BulkExportJob.objects.filter(pk=alive.pk).update(
+            status="IN_PROGRESS", heartbeat_at=now
+        )
+        stale.refresh_from_db()
+        self.assertTrue(bulk_export.is_stale(stale, now))
+
+        self.assertEqual(bulk_export.fail_stale_jobs(now), 1)
+
+        stale.refresh_from_db()
+        alive.refresh_from_db()
+        self.assertEqual(stale.status, "FAILED")
+        self.assertEqual(alive.status, "IN_PROGRESS")
+
+    def test_expired_jobs_are_purged(self):
+        job = bulk_export.create_job("/fhir/$export", ["Medication"])
+        bulk_export.run_job(job.pk)
+        job.refresh_from_db()
+        path = job.output[0]["path"]
+
+        self.assertEqual(bulk_export.purge_expired_jobs(job.expires_at), 1)
+
+        self.assertFalse(BulkExportJob.objects.filter(pk=job.pk).exists())
+        self.assertFalse(default_storage.exists(path))
+
+
+@override_settings(**EXPORT_SETTINGS)
+class ExportSinceTests(TestCase):
+    def export(self, resource_type, since):
+        job = bulk_export.create_job("/fhir/$export", [resource_type], since=since)
+        bulk_export.run_job(job.pk)
+        job.refresh_from_db()
+        return exported_ids(job, resource_type)
+
+    def test_field_filter(self):
+        make_product("P1")
+        since = timezone.now()
+        changed = make_product("P2")
+
+        self.assertEqual(self.export("Medication", since), {str(changed.pk)})
+
+    def test_supply_delivery_follows_its_shipment(self):
+        product = make_product("P1")
+        origin = make_facility("Depot")
+        items = []
+        for number in ("SHP-1", "SHP-2"):
+            shipment = Shipment.objects.create(
+                shipment_number=number,
+                origin_facility=origin,
+                destination_facility=make_facility(f"Clinic {number}"),
+            )
+            items.append(
+                ShipmentItem.objects.create(
+                    shipment=shipment, product=product, quantity=1, weight=1
+                )
+            )
+        since = timezone.now()
+
+        delivered = items[0].shipment
+        delivered.status = "DELIVERED"
+        delivered.save()
+
+        self.assertEqual(self.export("SupplyDelivery", since), {str(items[0].pk)})
+
+    def test_supply_request_follows_its_requisition(self):
+        facility = make_facility("Clinic")
+        product = make_product("P1")
+        lines = []
+        for code in ("I1", "I2"):
+            requisition = Requisition.objects.create(facility=facility)
+            lines.append(
+                RequisitionItem.objects.create(
+                    requisition=requisition,
+                    item=make_item(code, product),
+                    requested_quantity=5,
+                )
+            )
+        since = timezone.now()
+
+        approved = lines[1].requisition
+        approved.status = "APPROVED"
+        approved.save()
+
+        self.assertEqual(self.export("SupplyRequest", since), {str(lines[1].pk)})
+
+
+@override_settings(**EXPORT_SETTINGS)
+class ExportKickoffTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = get_user_model().objects.create_superuser(
+            email="admin@example.com",
+            password="secret",
+            first_name="Admin",
+            last_name="User",
+        )
+
+    def kickoff(self, **params):
+        request = RequestFactory().get("/fhir/$export", params)
+        request.user = self.user
+        return BulkExportKickoffView.as_view()(request)
+
+    def test_since_must_be_an_instant_with_time_zone(self):
+        for value in ("yesterday", "2024-01-01T00:00:00", "2024-02-30T00:00:00Z"):
+            with self.subTest(value=value):
+                self.assertEqual(self.kickoff(_since=value).status_code, 400)
+        self.assertFalse(BulkExportJob.objects.exists())
+
+    def test_valid_request_queues_job(self):
+        response = self.kickoff(_since="2024-01-01T00:00:00Z", _type="Medication")
+
+        self.assertEqual(response.status_code, 202)
+        job = BulkExportJob.objects.get()
+        self.assertEqual(job.status, "ACCEPTED")
+        self.assertEqual(job.resource_types, ["Medication"])
+        self.assertEqual(job.since.year, 2024)
+        self.assertIn(str(job.pk), response["Content-Location"])
+
+    def test_unknown_type_is_rejected(self):
+        self.assertEqual(self.kickoff(_type="Patient").status_code, 400)
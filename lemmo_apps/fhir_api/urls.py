@@ -80,5 +80,17 @@ urlpatterns = (
             views.SupplyRequestDetailView.as_view(),
             name="supply-request-detail",
         ),
+        # FHIR Bulk Data export
+        path("$export", views.BulkExportKickoffView.as_view(), name="bulk-export"),
+        path(
+            "$export-status/<uuid:job_id>/",
+            views.BulkExportStatusView.as_view(),
+            name="bulk-export-status",
+        ),
+        path(
+            "$export-files/<uuid:job_id>/<str:resource_type>.ndjson",
+            views.BulkExportFileView.as_view(),
+            name="bulk-export-file",
+        ),
     ],
 )
@@ -1,13 +1,33 @@
 from django.shortcuts import render
-from django.views.generic import ListView, DetailView, TemplateView
-from django.contrib.auth.mixins import LoginRequiredMixin
-from django.http import JsonResponse
+from django.views.generic import ListView, DetailView, TemplateView, View
+from django.contrib.auth.mixins import LoginRequiredMixin, UserPassesTestMixin
+from django.core.files.storage import default_storage
+from django.http import FileResponse, Http404, JsonResponse
 from django.db.models import Q, Count
+from django.urls import reverse
 from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from django.utils.http import http_date
 
 from lemmo_apps.inventory.models.product import Product
 from lemmo_apps.location.models.facility import Facility
 from lemmo_apps.authentication.models import User
+from lemmo_apps.authentication.services.permissions import has_perm
+from lemmo_apps.logistics.models.shipment import Shipment
+from lemmo_apps.requisition.models.requisition import Requisition
+
+from .models import BulkExportJob
+from .services.bulk_export import (
+    BulkExportError,
+    cancel_job,
+    create_job,
+    fail_stale_jobs,
+    is_stale,
+    parse_types,
+)
+
+FHIR_JSON = "application/fhir+json"
+NDJSON_FORMATS = ("application/fhir+ndjson", "application/ndjson", "ndjson")
 
 
 class FHIRAPIView(LoginRequiredMixin, TemplateView):
@@ -128,3 +148,176 @@ class HealthcareFacilityDetailView(LoginRequiredMixin, DetailView):
     model = Facility
     template_name = "fhir_api/healthcare_facility_detail.html"
     context_object_name = "healthcare_facility"
+
+
+class SupplyDeliveryListView(LoginRequiredMixin, ListView):
+    model = Shipment
+    template_name = "fhir_api/supply_delivery_list.html"
+    context_object_name = "supply_deliveries"
+
+    def get_queryset(self):
+        return Shipment.objects.select_related(
+            "origin_facility", "destination_facility"
+        )
+
+
+class SupplyDeliveryDetailView(LoginRequiredMixin, DetailView):
+    model = Shipment
+    template_name = "fhir_api/supply_delivery_detail.html"
+    context_object_name = "supply_delivery"
+
+
+class SupplyRequestListView(LoginRequiredMixin, ListView):
+    model = Requisition
+    template_name = "fhir_api/supply_request_list.html"
+    context_object_name = "supply_requests"
+
+    def get_queryset(self):
+        return Requisition.objects.select_related("facility", "requested_by")
+
+
+class SupplyRequestDetailView(LoginRequiredMixin, DetailView):
+    model = Requisition
+    template_name = "fhir_api/supply_request_detail.html"
+    context_object_name = "supply_request"
+
+
+def operation_outcome(message, status, code="processing"):
+    return JsonResponse(
+        {
+            "resourceType": "OperationOutcome",
+            "issue": [{"severity": "error", "code": code, "diagnostics": message}],
+        },
+        status=status,
+        content_type=FHIR_JSON,
+    )
+
+
+class BulkExportMixin(LoginRequiredMixin, UserPassesTestMixin):
+    raise_exception = True
+
+    def test_func(self):
+        return has_perm(self.request.user, "fhir_api.add_bulkexportjob")
+
+    def get_job(self, job_id):
+        job = BulkExportJob.objects.filter(pk=job_id).first()
+        user = self.request.user
+        if job is None or not (user.is_staff or job.requested_by_id == user.pk):
+            raise Http404("Export job not found")
+        return job
+
+
+class BulkExportKickoffView(BulkExportMixin, View):
+    """``GET [base]/$export`` (system level) per the FHIR Bulk Data spec.
+
+    Accepts ``_type``, ``_since`` and ``_outputFormat`` and answers 202 with
+    the status URL in ``Content-Location``.
+    """
+
+    def get(self, request):
+        output_format = request.GET.get("_outputFormat")
+        if output_format and output_format not in NDJSON_FORMATS:
+            return operation_outcome(
+                f"Unsupported _outputFormat '{output_format}'", 400, "not-supported"
+            )
+
+        since = None
+        if request.GET.get("_since"):
+            try:
+                since = parse_datetime(request.GET["_since"])
+            except ValueError:
+                # Well formed but impossible, e.g. 2024-02-30T00:00:00Z.
+                since = None
+            # FHIR instants carry a time zone; a naive one would be guessed.
+            if since is None or timezone.is_naive(since):
+                return operation_outcome(
+                    f"Invalid _since '{request.GET['_since']}', expected an "
+                    "instant with a time zone",
+                    400,
+                    "invalid",
+                )
+
+        try:
+            resource_types = parse_types(request.GET.get("_type"))
+        except BulkExportError as exc:
+            return operation_outcome(str(exc), 400, "not-supported")
+
+        job = create_job(
+            request.build_absolute_uri(),
+            resource_types,
+            since=since,
+            user=request.user,
+        )
+        response = JsonResponse({}, status=202, content_type=FHIR_JSON)
+        response["Content-Location"] = request.build_absolute_uri(
+            reverse("fhir_api:bulk-export-status", args=[job.pk])
+        )
+        return response
+
+
+class BulkExportStatusView(BulkExportMixin, View):
+    """Status polling (``GET``) and cancellation (``DELETE``) of an export."""
+
+    def get(self, request, job_id):
+        job = self.get_job(job_id)
+        if is_stale(job) and fail_stale_jobs():
+            job.refresh_from_db()
+        if job.is_running:
+            response = JsonResponse({}, status=202, content_type=FHIR_JSON)
+            response["X-Progress"] = job.progress or job.get_status_display()
+            response["Retry-After"] = "10"
+            return response
+        if job.status == "FAILED":
+            return operation_outcome(job.error or "Export failed", 500, "exception")
+        if job.status == "CANCELLED":
+            raise Http404("Export job not found")
+
+        response = JsonResponse(
+            {
+                "transactionTime": job.transaction_time.isoformat(),
+                "request": job.request_url,
+                "requiresAccessToken": True,
+                "output": [
+                    {
+                        "type": entry["type"],
+                        "url": request.build_absolute_uri(
+                            reverse(
+                                "fhir_api:bulk-export-file",
+                                args=[job.pk, entry["type"]],
+                            )
+                        ),
+                        "count": entry["count"],
+                    }
+                    for entry in job.output
+                ],
+                "error": [],
+            }
+        )
+        if job.expires_at:
+            response["Expires"] = http_date(job.expires_at.timestamp())
+        return response
+
+    def delete(self, request, job_id):
+        cancel_job(self.get_job(job_id))
+        return JsonResponse({}, status=202, content_type=FHIR_JSON)
+
+
+class BulkExportFileView(BulkExportMixin, View):
+    """Stream one NDJSON file of a completed export."""
+
+    def get(self, request, job_id, resource_type):
+        job = self.get_job(job_id)
+        entry = next(
+            (
+                entry
+                for entry in job.output
+                if job.status == "COMPLETED" and entry["type"] == resource_type
+            ),
+            None,
+        )
+        if entry is None:
+            raise Http404("Export file not found")
+        return FileResponse(
+            default_storage.open(entry["path"], "rb"),
+            content_type="application/fhir+ndjson",
+        )
@@ -0,0 +1,211 @@
+"""Static cost and depth limits for GraphQL operations.
+
+Types expose every relation, so one document can fan out into millions of
+rows. Before execution, ``QueryCostRule`` estimates the cost of the
+operation: an object field costs its weight (1 by default) plus the cost of
+its sub-selection, times the number of objects it may return. That
+multiplier is the ``first``/``last``/``limit`` argument when one is given,
+the page size for connections and ``LEMMO_GRAPHQL_DEFAULT_LIST_SIZE`` for
+other lists. Scalars are free except on the root types. Operations costing
+more than ``LEMMO_GRAPHQL_MAX_COST`` or nested deeper than
+``LEMMO_GRAPHQL_MAX_DEPTH`` fields are rejected with their cost in the
+error's ``extensions``.
+"""
+
+from django.conf import settings
+from graphql import (
+    GraphQLError,
+    GraphQLInt,
+    GraphQLInterfaceType,
+    GraphQLObjectType,
+    ValidationRule,
+    get_named_type,
+    get_nullable_type,
+    is_list_type,
+    value_from_ast,
+)
+from graphql.language import FieldNode, FragmentSpreadNode, InlineFragmentNode
+
+from .pagination import DEFAULT_MAX_PAGE_SIZE, DEFAULT_PAGE_SIZE
+
+DEFAULT_MAX_COST = 20000
+DEFAULT_MAX_DEPTH = 10
+DEFAULT_LIST_SIZE = 50
+
+SIZE_ARGUMENTS = ("first", "last", "limit")
+# Relay wrappers add nesting without adding work; they don't count as depth.
+CONNECTION_FIELDS = ("edges", "node")
+
+
+def _settings():
+    return {
+        "max_cost": getattr(settings, "LEMMO_GRAPHQL_MAX_COST", DEFAULT_MAX_COST),
+        "max_depth": getattr(settings, "LEMMO_GRAPHQL_MAX_DEPTH", DEFAULT_MAX_DEPTH),
+        "list_size": getattr(
+            settings, "LEMMO_GRAPHQL_DEFAULT_LIST_SIZE", DEFAULT_LIST_SIZE
+        ),
+        "max_page_size": getattr(
+            settings, "LEMMO_GRAPHQL_MAX_PAGE_SIZE", DEFAULT_MAX_PAGE_SIZE
+        ),
+        # "Type.field" -> weight, e.g. {"Query.logisticsStats": 50}
+        "field_costs": getattr(settings, "LEMMO_GRAPHQL_FIELD_COSTS", {}),
+    }
+
+
+class QueryCostRule(ValidationRule):
+    """Reject operations above the cost or depth budget.
+
+    Use ``cost_rule(variables, operation_name, results)`` to build a rule
+    bound to a request; ``results`` then receives the operation's
+    ``{"cost", "max_cost", "depth", "max_depth"}``.
+    """
+
+    variables = None
+    operation_name = None
+    results = None
+
+    def __init__(self, context):
+        super().__init__(context)
+        self.limits = _settings()
+
+    def enter_operation_definition(self, node, *_args):
+        name = node.name.value if node.name else None
+        if self.operation_name and name != self.operation_name:
+            return
+        schema = self.context.schema
+        root = {
+            "query": schema.query_type,
+            "mutation": schema.mutation_type,
+            "subscription": schema.subscription_type,
+        }[node.operation.value]
+        if root is None:
+            return
+
+        cost, depth = self._selection_cost(node.selection_set, root, 0, frozenset())
+        analysis = {
+            "cost": cost,
+            "max_cost": self.limits["max_cost"],
+            "depth": depth,
+            "max_depth": self.limits["max_depth"],
+        }
+        if self.results is not None:
+            self.results.update(analysis)
+
+        if depth > self.limits["max_depth"]:
+            self.report_error(
+                GraphQLError(
+                    f"Operation is nested {depth} levels deep; "
+                    f"the limit is {self.limits['max_depth']}",
+                    node,
+                    extensions={"code": "QUERY_TOO_DEEP", **analysis},
+                )
+            )
+        elif cost > self.limits["max_cost"]:
+            self.report_error(
+                GraphQLError(
+                    f"Operation cost {cost} exceeds the limit of "
+                    f"{self.limits['max_cost']}; request fewer rows or fields",
+                    node,
+                    extensions={"code": "QUERY_TOO_COSTLY", **analysis},
+                )
+            )
+
+    def _selection_cost(self, selection_set, parent_type, depth, fragments):
+        """Return ``(cost, depth)`` of a selection set on ``parent_type``."""
+        total, deepest = 0, depth
+        for selection in selection_set.selections:
+            if isinstance(selection, FieldNode):
+                cost, field_depth = self._field_cost(
+                    selection, parent_type, depth, fragments
+                )
+            elif isinstance(selection, InlineFragmentNode):
+                fragment_type = parent_type
+                if selection.type_condition is not None:
+                    fragment_type = self.context.schema.get_type(
+                        selection.type_condition.name.value
+                    )
+                cost, field_depth = self._selection_cost(
+                    selection.selection_set, fragment_type, depth, fragments
+                )
+            elif isinstance(selection, FragmentSpreadNode):
+                name = selection.name.value
+                fragment = self.context.get_fragment(name)
+                if fragment is None or name in fragments:
+                    continue
+                cost, field_depth = self._selection_cost(
+                    fragment.selection_set,
+                    self.context.schema.get_type(fragment.type_condition.name.value),
+                    depth,
+                    fragments | {name},
+                )
+            else:
+                continue
+            total += cost
+            deepest = max(deepest, field_depth)
+        return total, deepest
+
+    def _field_cost(self, node, parent_type, depth, fragments):
+        name = node.name.value
+        if name.startswith("__") or not isinstance(
+            parent_type, (GraphQLObjectType, GraphQLInterfaceType)
+        ):
+            return 0, depth
+        field = parent_type.fields.get(name)
+        if field is None:
+            # Unknown fields are reported by the standard rules.
+            return 0, depth
+
+        if name not in CONNECTION_FIELDS:
+            depth += 1
+        field_type = get_named_type(field.type)
+        weight = self.limits["field_costs"].get(f"{parent_type.name}.{name}")
+        if weight is None:
+            is_root = parent_type is self.context.schema.query_type or (
+                parent_type is self.context.schema.mutation_type
+            )
+            if name in CONNECTION_FIELDS:
+                weight = 0
+            else:
+                weight = 1 if node.selection_set is not None or is_root else 0
+        if node.selection_set is None:
+            return weight, depth
+
+        children, deepest = self._selection_cost(
+            node.selection_set, field_type, depth, fragments
+        )
+        return self._multiplier(node, field) * (weight + children), deepest
+
+    def _multiplier(self, node, field):
+        field_type = get_named_type(field.type)
+        is_connection = (
+            isinstance(field_type, GraphQLObjectType) and "edges" in field_type.fields
+        )
+        for argument in node.arguments:
+            if argument.name.value in SIZE_ARGUMENTS:
+                size = value_from_ast(argument.value, GraphQLInt, self.variables)
+                if isinstance(size, int):
+                    if is_connection:
+                        size = min(size, self.limits["max_page_size"])
+                    return max(size, 0)
+
+        if node.name.value in CONNECTION_FIELDS:
+            # Sized by the connection field above.
+            return 1
+        if is_connection:
+            return min(DEFAULT_PAGE_SIZE, self.limits["max_page_size"])
+        if is_list_type(get_nullable_type(field.type)):
+            return self.limits["list_size"]
+        return 1
+
+
+def cost_rule(variables=None, operation_name=None, results=None):
+    """A ``QueryCostRule`` for one request's variables and operation."""
+    return type(
+        "QueryCostRule",
+        (QueryCostRule,),
+        {
+            "variables": variables or {},
+            "operation_name": operation_name,
+            "results": results,
+        },
+    )
@@ -0,0 +1,43 @@
+"""Graphene middleware timing resolvers for the query instrumentation.
+
+Add ``"lemmo_apps.gql.instrumentation.ResolverTimingMiddleware"`` to
+``GRAPHENE["MIDDLEWARE"]``. It relies on
+``dashboard.middleware.QueryInstrumentationMiddleware`` being installed and
+does nothing otherwise. Per request it names the operation and accumulates,
+for each ``ParentType.field``, the time spent in its resolver and the queries
+that resolver ran; the Django middleware records them when the request ends.
+
+Resolvers returning a lazy queryset only build it: the query runs when
+graphene iterates the result, and is counted against the request rather than
+the resolver.
+"""
+
+import time
+
+
+class ResolverTimingMiddleware:
+    def resolve(self, next, root, info, **args):
+        request = info.context
+        counter = getattr(request, "query_counter", None)
+        if counter is None:
+            return next(root, info, **args)
+
+        timings = getattr(request, "resolver_timings", None)
+        if timings is None:
+            timings = request.resolver_timings = {}
+            operation = info.operation
+            name = operation.name.value if operation.name else "anonymous"
+            request.graphql_operation = f"{operation.operation.value} {name}"
+
+        queries, query_seconds = counter.count, counter.seconds
+        start = time.perf_counter()
+        try:
+            return next(root, info, **args)
+        finally:
+            elapsed = time.perf_counter() - start
+            entry = timings.setdefault(
+                f"{info.parent_type.name}.{info.field_name}", [0.0, 0, 0.0]
+            )
+            entry[0] += elapsed
+            entry[1] += counter.count - queries
+            entry[2] += counter.seconds - query_seconds
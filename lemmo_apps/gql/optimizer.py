@@ -0,0 +1,115 @@
+"""Selection-set driven ``select_related``/``prefetch_related`` for list queries.
+
+Types are plain ``DjangoObjectType`` with ``fields = "__all__"``, so every
+foreign key and reverse relation a client selects is otherwise loaded with one
+query per row. ``optimize_queryset`` reads the selection set of the field being
+resolved and joins single-valued relations into the root query, while
+many-valued relations are prefetched in one query per relation (optimised the
+same way, recursively).
+"""
+
+from django.db.models import Prefetch
+from graphene.utils.str_converters import to_snake_case
+from graphql.language import FieldNode, FragmentSpreadNode, InlineFragmentNode
+
+# Relay connection wrappers are skipped so the node selection is optimised.
+CONNECTION_PATH = ("edges", "node")
+
+
+def _selected_fields(selection_sets, fragments):
+    """Map of snake_case field name to the selection sets requested for it."""
+    fields = {}
+    pending = list(selection_sets)
+    while pending:
+        selection_set = pending.pop()
+        if selection_set is None:
+            continue
+        for selection in selection_set.selections:
+            if isinstance(selection, FieldNode):
+                fields.setdefault(to_snake_case(selection.name.value), []).append(
+                    selection.selection_set
+                )
+            elif isinstance(selection, InlineFragmentNode):
+                pending.append(selection.selection_set)
+            elif isinstance(selection, FragmentSpreadNode):
+                fragment = fragments.get(selection.name.value)
+                if fragment is not None:
+                    pending.append(fragment.selection_set)
+    return fields
+
+
+def _relations(model):
+    """Relations of ``model`` keyed by the attribute graphene exposes them as."""
+    relations = {}
+    for field in model._meta.get_fields():
+        if not field.is_relation or field.related_model is None:
+            continue
+        if field.auto_created and not field.concrete:
+            name = field.get_accessor_name()
+        else:
+            name = field.name
+        if name:
+            relations[name] = field
+    return relations
+
+
+def _is_single_valued(field):
+    return field.many_to_one or field.one_to_one
+
+
+def _unwrap_connection(selection_sets, fragments):
+    fields = _selected_fields(selection_sets, fragments)
+    if "edges" not in fields:
+        return selection_sets
+    for name in CONNECTION_PATH:
+        selection_sets = fields.get(name, [])
+        fields = _selected_fields(selection_sets, fragments)
+    return selection_sets
+
+
+def _collect(model, selection_sets, fragments, prefix, select, prefetch):
+    relations = _relations(model)
+    for name, nested in _selected_fields(selection_sets, fragments).items():
+        field = relations.get(name)
+        if field is None:
+            continue
+        path = prefix + name
+        if _is_single_valued(field):
+            select.append(path)
+            _collect(
+                field.related_model, nested, fragments, path + "__", select, prefetch
+            )
+        else:
+            queryset = _optimize(
+                field.related_model._default_manager.all(), nested, fragments
+            )
+            prefetch.append(Prefetch(path, queryset=queryset))
+
+
+def _optimize(queryset, selection_sets, fragments):
+    select, prefetch = [], []
+    _collect(queryset.model, selection_sets, fragments, "", select, prefetch)
+    # Drop paths that a longer select_related path already covers.
+    select = [
+        path
+        for path in select
+        if not any(other.startswith(path + "__") for other in select)
+    ]
+    if select:
+        queryset = queryset.select_related(*select)
+    if prefetch:
+        queryset = queryset.prefetch_related(*prefetch)
+    return queryset
+
+
+def optimize_queryset(queryset, info):
+    """Join or prefetch every relation selected under the current field.
+
+    Call it before slicing. Works for both plain list fields and
+    ``KeysetConnectionField`` connections, whose ``edges { node }`` wrapper is
+    looked through.
+    """
+    selection_sets = _unwrap_connection(
+        [node.selection_set for node in info.field_nodes], info.fragments
+    )
+    return _optimize(queryset, selection_sets, info.fragments)
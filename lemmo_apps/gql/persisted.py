@@ -0,0 +1,122 @@
+"""Persisted queries and a cache of parsed, validated documents.
+
+Clients may send ``extensions.persistedQuery = {"version": 1, "sha256Hash":
+...}`` instead of the query text, following Apollo's automatic persisted
+queries protocol: an unknown hash is answered with ``PersistedQueryNotFound``
+and the client retries with the text, which, once it parses and validates,
+is stored under its hash for ``LEMMO_PERSISTED_QUERY_TIMEOUT`` seconds in the
+Django cache named by ``LEMMO_PERSISTED_QUERY_CACHE_ALIAS``. Queries shipped
+with a client build can also be registered up front in the JSON file
+``LEMMO_PERSISTED_QUERIES_FILE`` (``{"<sha256>": "<query>"}``).
+
+Independently of persistence, every document that parses and validates is
+kept in an in-process LRU keyed by schema and hash, so hot operations skip
+both steps.
+"""
+
+import functools
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import caches
+from graphql import GraphQLError
+
+KEY_PREFIX = "lemmo:graphql:persisted"
+DEFAULT_DOCUMENT_CACHE_SIZE = 1000
+DEFAULT_TIMEOUT = 7 * 24 * 3600
+SUPPORTED_VERSION = 1
+
+
+def query_hash(query):
+    return hashlib.sha256(query.encode()).hexdigest()
+
+
+def _store():
+    return caches[getattr(settings, "LEMMO_PERSISTED_QUERY_CACHE_ALIAS", "default")]
+
+
+@functools.lru_cache(maxsize=None)
+def _manifest(path):
+    with open(path, encoding="utf-8") as manifest:
+        return json.load(manifest)
+
+
+def _registered(sha256):
+    path = getattr(settings, "LEMMO_PERSISTED_QUERIES_FILE", None)
+    return _manifest(path).get(sha256) if path else None
+
+
+def resolve_persisted_query(persisted, query):
+    """Return the query text for a ``persistedQuery`` extension.
+
+    When the client sends ``query`` too, checks it against the hash; the
+    caller stores it with ``persist_query`` once it validates. Raises
+    ``GraphQLError`` with an Apollo-compatible code otherwise.
+    """
+    if not isinstance(persisted, dict):
+        raise GraphQLError("Invalid persistedQuery extension")
+    if persisted.get("version") != SUPPORTED_VERSION:
+        raise GraphQLError(
+            "PersistedQueryNotSupported",
+            extensions={"code": "PERSISTED_QUERY_NOT_SUPPORTED"},
+        )
+    sha256 = persisted.get("sha256Hash")
+    if not isinstance(sha256, str):
+        raise GraphQLError("persistedQuery.sha256Hash is required")
+
+    if query:
+        if query_hash(query) != sha256:
+            raise GraphQLError("provided sha does not match query")
+        return query
+
+    query = _registered(sha256) or _store().get(f"{KEY_PREFIX}:{sha256}")
+    if query is None:
+        raise GraphQLError(
+            "PersistedQueryNotFound", extensions={"code": "PERSISTED_QUERY_NOT_FOUND"}
+        )
+    return query
+
+
+def persist_query(query):
+    """Store a validated ``query`` under its hash."""
+    _store().set(
+        f"{KEY_PREFIX}:{query_hash(query)}",
+        query,
+        timeout=getattr(settings, "LEMMO_PERSISTED_QUERY_TIMEOUT", DEFAULT_TIMEOUT),
+    )
+
+
+class DocumentCache:
+    """Thread-safe LRU of validated ``DocumentNode``s."""
+
+    def __init__(self, maxsize=None):
+        self.maxsize = maxsize
+        self._documents = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            document = self._documents.get(key)
+            if document is not None:
+                self._documents.move_to_end(key)
+            return document
+
+    def set(self, key, document):
+        maxsize = self.maxsize or getattr(
+            settings, "LEMMO_GRAPHQL_DOCUMENT_CACHE_SIZE", DEFAULT_DOCUMENT_CACHE_SIZE
+        )
+        with self._lock:
+            self._documents[key] = document
+            self._documents.move_to_end(key)
+            while len(self._documents) > maxsize:
+                self._documents.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._documents.clear()
+
+
+documents = DocumentCache()
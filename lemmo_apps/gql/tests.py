@@ -0,0 +1,303 @@
+import json
+from decimal import Decimal
+from unittest import mock
+
+import graphene
+from django.db.models import Case, FloatField, Value, When
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+from graphql import GraphQLError, parse, validate
+
+from lemmo_apps.inventory.gql.queries.product_queries import ProductConnection
+from lemmo_apps.inventory.models.product import Product
+
+from . import views
+from .cost import cost_rule
+from .pagination import encode_cursor, paginate
+from .persisted import DocumentCache, documents, query_hash
+
+
+def make_product(code, name, **fields):
+    return Product.objects.create(
+        code=code,
+        name=name,
+        unit_of_measure="units",
+        price=Decimal("1.00"),
+        **fields,
+    )
+
+
+class KeysetPaginationTests(TestCase):
+    ordering = ("name", "id")
+
+    @classmethod
+    def setUpTestData(cls):
+        for code, name in [
+            ("P1", "Amoxicillin"),
+            ("P2", "Bandage"),
+            ("P3", "Bandage"),
+            ("P4", "Cotton"),
+            ("P5", "Dextrose"),
+        ]:
+            make_product(code, name)
+        cls.expected = list(Product.objects.order_by("name", "id"))
+
+    def page(self, **kwargs):
+        return paginate(
+            Product.objects.all(), ProductConnection, self.ordering, **kwargs
+        )
+
+    def nodes(self, connection):
+        return [edge.node for edge in connection.edges]
+
+    def test_forward_pages_cover_every_row_once(self):
+        seen = []
+        after = None
+        while True:
+            with self.assertNumQueries(1):
+                connection = self.page(first=2, after=after)
+            seen.extend(self.nodes(connection))
+            if not connection.page_info.has_next_page:
+                break
+            after = connection.page_info.end_cursor
+
+        self.assertEqual(seen, self.expected)
+
+    def test_ties_on_name_are_broken_by_id(self):
+        first = self.page(first=2)
+        second = self.page(first=1, after=first.page_info.end_cursor)
+
+        self.assertEqual(self.nodes(first), self.expected[:2])
+        self.assertEqual(self.nodes(second), [self.expected[2]])
+        self.assertEqual(self.expected[1].name, self.expected[2].name)
+
+    def test_backward_page_before_cursor(self):
+        cursor = encode_cursor([self.expected[3].name, self.expected[3].id])
+
+        connection = self.page(last=2, before=cursor)
+
+        self.assertEqual(self.nodes(connection), self.expected[1:3])
+        self.assertTrue(connection.page_info.has_previous_page)
+        self.assertTrue(connection.page_info.has_next_page)
+
+    def test_page_size_is_capped(self):
+        with self.settings(LEMMO_GRAPHQL_MAX_PAGE_SIZE=3):
+            connection = self.page(first=50)
+
+        self.assertEqual(len(connection.edges), 3)
+
+    def test_total_count_uses_unpaginated_queryset(self):
+        connection = self.page(first=1)
+
+        self.assertEqual(connection.count_queryset.count(), 5)
+
+    def test_invalid_cursor_is_rejected(self):
+        with self.assertRaises(GraphQLError):
+            self.page(first=2, after="not-a-cursor")
+        with self.assertRaises(GraphQLError):
+            self.page(first=2, after=encode_cursor(["Bandage"]))
+
+    def test_first_and_last_together_are_rejected(self):
+        with self.assertRaises(GraphQLError):
+            self.page(first=1, last=1)
+
+
+class RankedPaginationTests(TestCase):
+    def test_pages_follow_descending_rank(self):
+        for code, name in [("R1", "Low"), ("R2", "High"), ("R3", "Middle")]:
+            make_product(code, name)
+        ranks = {"High": 0.9, "Middle": 0.5, "Low": 0.1}
+        queryset = Product.objects.annotate(
+            search_rank=Case(
+                *[When(name=name, then=Value(rank)) for name, rank in ranks.items()],
+                output_field=FloatField(),
+            )
+        )
+
+        first = paginate(queryset, ProductConnection, ("-search_rank", "id"), first=2)
+        rest = paginate(
+            queryset,
+            ProductConnection,
+            ("-search_rank", "id"),
+            first=2,
+            after=first.page_info.end_cursor,
+        )
+
+        self.assertEqual(
+            [edge.node.name for edge in first.edges + rest.edges],
+            ["High", "Middle", "Low"],
+        )
+
+
+class Child(graphene.ObjectType):
+    name = graphene.String()
+
+
+class Parent(graphene.ObjectType):
+    name = graphene.String()
+    parent = graphene.Field(lambda: Parent)
+    children = graphene.List(Child, limit=graphene.Int())
+
+    def resolve_name(root, info):
+        return "parent"
+
+
+class ParentConnection(graphene.relay.Connection):
+    class Meta:
+        node = Parent
+
+
+class Query(graphene.ObjectType):
+    parents = graphene.List(Parent, limit=graphene.Int())
+    parent = graphene.Field(Parent)
+    parents_connection = graphene.relay.ConnectionField(ParentConnection)
+    stats = graphene.String()
+
+    def resolve_parent(root, info):
+        return Parent()
+
+
+schema = graphene.Schema(query=Query)
+
+
+def analyse(query, variables=None, operation_name=None):
+    results = {}
+    errors = validate(
+        schema.graphql_schema,
+        parse(query),
+        [cost_rule(variables, operation_name, results)],
+    )
+    return results, errors
+
+
+class QueryCostRuleTests(SimpleTestCase):
+    def assertCost(self, query, cost, **kwargs):
+        results, errors = analyse(query, **kwargs)
+        self.assertEqual(errors, [])
+        self.assertEqual(results["cost"], cost)
+
+    def test_lists_multiply_their_selection(self):
+        self.assertCost("{ parents { name } }", 50)
+        self.assertCost("{ parents(limit: 2) { children(limit: 3) { name } } }", 8)
+        self.assertCost(
+            "query ($n: Int) { parents(limit: $n) { name } }", 5, variables={"n": 5}
+        )
+
+    def test_fragments_are_counted(self):
+        self.assertCost(
+            "{ parents(limit: 2) { ...Kids } }"
+            " fragment Kids on Parent { children(limit: 3) { name } }",
+            8,
+        )
+
+    def test_connections_are_sized_by_capped_page(self):
+        self.assertCost("{ parentsConnection { edges { node { name } } } }", 20)
+        self.assertCost(
+            "{ parentsConnection(first: 500) { edges { node { name } } } }", 100
+        )
+
+    def test_root_scalars_and_configured_weights(self):
+        self.assertCost("{ stats }", 1)
+        with self.settings(LEMMO_GRAPHQL_FIELD_COSTS={"Query.stats": 50}):
+            self.assertCost("{ stats }", 50)
+
+    def test_only_the_selected_operation_is_costed(self):
+        self.assertCost(
+            "query Small { stats } query Big { parents { name } }",
+            1,
+            operation_name="Small",
+        )
+
+    @override_settings(LEMMO_GRAPHQL_MAX_COST=10)
+    def test_costly_operation_is_rejected(self):
+        results, errors = analyse("{ parents { name } }")
+
+        self.assertEqual(len(errors), 1)
+        self.assertEqual(errors[0].extensions["code"], "QUERY_TOO_COSTLY")
+        self.assertEqual(errors[0].extensions["cost"], 50)
+
+    @override_settings(LEMMO_GRAPHQL_MAX_DEPTH=3)
+    def test_deep_operation_is_rejected(self):
+        results, errors = analyse("{ parent { parent { parent { name } } } }")
+
+        self.assertEqual(results["depth"], 4)
+        self.assertEqual(errors[0].extensions["code"], "QUERY_TOO_DEEP")
+
+
+@override_settings(
+    CACHES={
+        "default": {
+            "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+            "LOCATION": "gql-tests",
+        }
+    },
+    LEMMO_PERSISTED_QUERIES_FILE=None,
+)
+class PersistedQueryTests(SimpleTestCase):
+    query = "{ parent { name } }"
+
+    def setUp(self):
+        documents.clear()
+        self.addCleanup(documents.clear)
+        self.view = views.GraphQLView.as_view(schema=schema, middleware=[])
+
+    def post(self, query=None, sha256=None):
+        body = {}
+        if query is not None:
+            body["query"] = query
+        if sha256 is not None:
+            body["extensions"] = {
+                "persistedQuery": {"version": 1, "sha256Hash": sha256}
+            }
+        request = RequestFactory().post(
+            "/graphql/", json.dumps(body), content_type="application/json"
+        )
+        return json.loads(self.view(request).content)
+
+    def test_unknown_hash_is_registered_by_sending_the_query(self):
+        sha256 = query_hash(self.query)
+
+        missing = self.post(sha256=sha256)
+        registered = self.post(self.query, sha256)
+        served = self.post(sha256=sha256)
+
+        self.assertEqual(
+            missing["errors"][0]["extensions"]["code"], "PERSISTED_QUERY_NOT_FOUND"
+        )
+        self.assertEqual(registered["data"], {"parent": {"name": "parent"}})
+        self.assertEqual(served["data"], {"parent": {"name": "parent"}})
+        self.assertIn("cost", served["extensions"])
+
+    def test_invalid_queries_are_not_persisted(self):
+        query = "{ parent { missing } }"
+        sha256 = query_hash(query)
+
+        self.assertIn("errors", self.post(query, sha256))
+        self.assertEqual(
+            self.post(sha256=sha256)["errors"][0]["extensions"]["code"],
+            "PERSISTED_QUERY_NOT_FOUND",
+        )
+
+    def test_hash_must_match_query(self):
+        response = self.post(self.query, query_hash("{ stats }"))
+
+        self.assertEqual(
+            response["errors"][0]["message"], "provided sha does not match query"
+        )
+
+    def test_validated_documents_are_parsed_once(self):
+        with mock.patch.object(views, "parse", wraps=parse) as parse_query:
+            self.post(self.query)
+            self.post(self.query)
+
+        parse_query.assert_called_once()
+
+
+class DocumentCacheTests(SimpleTestCase):
+    def test_least_recently_used_document_is_evicted(self):
+        cache = DocumentCache(maxsize=2)
+        cache.set("a", "A")
+        cache.set("b", "B")
+        cache.get("a")
+        cache.set("c", "C")
+
+        self.assertEqual((cache.get("a"), cache.get("b")), ("A", None))
@@ -0,0 +1,159 @@
+"""``GraphQLView`` with cost limits, persisted queries and a document cache.
+
+Route the GraphQL endpoint to this view instead of graphene-django's::
+
+    path("graphql/", GraphQLView.as_view(graphiql=True, schema=schema))
+
+Documents are parsed and validated once per process and then served from
+``persisted.documents``; only the cost rule, which depends on the request's
+variables, runs on every request. Successful responses report the
+operation's cost under ``extensions``.
+"""
+
+import json
+
+from django.db import connection, transaction
+from django.http import HttpResponseBadRequest, HttpResponseNotAllowed
+from graphene_django.constants import MUTATION_ERRORS_FLAG
+from graphene_django.settings import graphene_settings
+from graphene_django.views import GraphQLView as BaseGraphQLView
+from graphene_django.views import HttpError
+from graphql import (
+    ExecutionResult,
+    GraphQLError,
+    OperationType,
+    execute,
+    get_operation_ast,
+    parse,
+    specified_rules,
+    validate,
+    validate_schema,
+)
+
+from .cost import cost_rule
+from .persisted import documents, persist_query, query_hash, resolve_persisted_query
+
+
+class GraphQLView(BaseGraphQLView):
+    @staticmethod
+    def get_persisted_query(request, data):
+        """The operation's ``extensions.persistedQuery``, if any."""
+        extensions = data.get("extensions") or request.GET.get("extensions")
+        if isinstance(extensions, str):
+            try:
+                extensions = json.loads(extensions)
+            except ValueError:
+                raise HttpError(HttpResponseBadRequest("Extensions are invalid JSON."))
+        if not isinstance(extensions, dict):
+            return None
+        return extensions.get("persistedQuery")
+
+    def get_document(self, schema, query):
+        """Return ``(document, errors)``, parsing and validating on a miss."""
+        key = (id(schema), query_hash(query))
+        document = documents.get(key)
+        if document is not None:
+            return document, None
+
+        try:
+            document = parse(query)
+        except GraphQLError as error:
+            return None, [error]
+        errors = validate(
+            schema,
+            document,
+            self.validation_rules or specified_rules,
+            graphene_settings.MAX_VALIDATION_ERRORS,
+        )
+        if errors:
+            return None, errors
+        documents.set(key, document)
+        return document, None
+
+    def execute_graphql_request(
+        self, request, data, query, variables, operation_name, show_graphiql=False
+    ):
+        # Resolved per operation, so one failure doesn't affect a whole batch.
+        persisted = self.get_persisted_query(request, data)
+        sent_query = bool(query)
+        if persisted is not None:
+            try:
+                query = resolve_persisted_query(persisted, query)
+            except GraphQLError as error:
+                return ExecutionResult(data=None, errors=[error])
+        if not query:
+            if show_graphiql:
+                return None
+            raise HttpError(HttpResponseBadRequest("Must provide query string."))
+
+        schema = self.schema.graphql_schema
+        schema_validation_errors = validate_schema(schema)
+        if schema_validation_errors:
+            return ExecutionResult(data=None, errors=schema_validation_errors)
+
+        document, errors = self.get_document(schema, query)
+        if errors:
+            return ExecutionResult(data=None, errors=errors)
+        if persisted is not None and sent_query:
+            # Only documents that validate are worth sharing between clients.
+            persist_query(query)
+
+        operation_ast = get_operation_ast(document, operation_name)
+        if request.method.lower() == "get" and (
+            operation_ast and operation_ast.operation != OperationType.QUERY
+        ):
+            if show_graphiql:
+                return None
+            raise HttpError(
+                HttpResponseNotAllowed(
+                    ["POST"],
+                    f"Can only perform a {operation_ast.operation.value} "
+                    "operation from a POST request.",
+                )
+            )
+
+        analysis = {}
+        errors = validate(
+            schema,
+            document,
+            [cost_rule(variables, operation_name, analysis)],
+            graphene_settings.MAX_VALIDATION_ERRORS,
+        )
+        request.graphql_cost = analysis
+        if errors:
+            return ExecutionResult(data=None, errors=errors)
+
+        try:
+            options = {
+                "root_value": self.get_root_value(request),
+                "context_value": self.get_context(request),
+                "variable_values": variables,
+                "operation_name": operation_name,
+                "middleware": self.get_middleware(request),
+            }
+            if self.execution_context_class:
+                options["execution_context_class"] = self.execution_context_class
+
+            if (
+                operation_ast is not None
+                and operation_ast.operation == OperationType.MUTATION
+                and (
+                    graphene_settings.ATOMIC_MUTATIONS is True
+                    or connection.settings_dict.get("ATOMIC_MUTATIONS", False) is True
+                )
+            ):
+                with transaction.atomic():
+                    result = execute(schema, document, **options)
+                    if getattr(request, MUTATION_ERRORS_FLAG, False) is True:
+                        transaction.set_rollback(True)
+                return result
+
+            return execute(schema, document, **options)
+        except Exception as e:
+            return ExecutionResult(errors=[e])
+
+    def json_encode(self, request, d, pretty=False):
+        cost = getattr(request, "graphql_cost", None)
+        if cost and "data" in d:
+            d = {**d, "extensions": {**d.get("extensions", {}), "cost": cost}}
+        return super().json_encode(request, d, pretty=pretty)
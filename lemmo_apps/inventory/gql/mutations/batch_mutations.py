@@ -1,7 +1,27 @@
+"""Product batch mutations.
+
+These move ``ProductBatch.remaining_quantity`` and ``Product.stock_quantity``
+through the ledger service's atomic counter updates. Batches are not tied to
+a facility, so they post no ``StockTransaction`` and leave facility balances
+alone; record the facility movement separately. ``reconcile_stock`` rebuilds
+product stock from batches.
+"""
+
+import logging
+
 import graphene
 from graphene_django import DjangoObjectType
-from django.db import transaction
+from django.db import IntegrityError, transaction
 from lemmo_apps.inventory.models.product import ProductBatch, Product
+from lemmo_apps.stock.services.ledger import (
+    InsufficientStock,
+    adjust_batch_quantity,
+    adjust_product_stock,
+)
+
+logger = logging.getLogger(__name__)
+
+DUPLICATE_BATCH_MESSAGE = "A batch with this batch number already exists"
 
 
 class ProductBatchType(DjangoObjectType):
@@ -42,16 +62,22 @@ class CreateBatch(graphene.Mutation):
                 batch = ProductBatch.objects.create(**kwargs)
 
                 # Update product stock quantity
-                product.stock_quantity += kwargs["quantity"]
-                product.save()
+                adjust_product_stock(product.id, kwargs["quantity"])
 
                 return CreateBatch(
                     batch=batch, success=True, message="Batch created successfully"
                 )
         except Product.DoesNotExist:
             return CreateBatch(batch=None, success=False, message="Product not found")
-        except Exception as e:
-            return CreateBatch(batch=None, success=False, message=str(e))
+        except IntegrityError:
+            return CreateBatch(
+                batch=None, success=False, message=DUPLICATE_BATCH_MESSAGE
+            )
+        except Exception:
+            logger.exception("CreateBatch failed")
+            return CreateBatch(
+                batch=None, success=False, message="Failed to create batch"
+            )
 
 
 class UpdateBatch(graphene.Mutation):
@@ -75,32 +101,45 @@ class UpdateBatch(graphene.Mutation):
 
     def mutate(self, info, id, **kwargs):
         try:
-            batch = ProductBatch.objects.get(id=id)
+            with transaction.atomic():
+                batch = ProductBatch.objects.select_for_update().get(id=id)
 
-            # Handle quantity changes
-            if "quantity" in kwargs:
-                old_quantity = batch.quantity
-                new_quantity = kwargs["quantity"]
-                quantity_diff = new_quantity - old_quantity
+                # Handle quantity changes
+                if kwargs.get("quantity") is not None:
+                    quantity_diff = kwargs["quantity"] - batch.quantity
 
-                # Update product stock
-                batch.product.stock_quantity += quantity_diff
-                batch.product.save()
+                    # Update product stock
+                    adjust_product_stock(batch.product_id, quantity_diff)
 
-            # Update fields
-            for field, value in kwargs.items():
-                if value is not None:
-                    setattr(batch, field, value)
+                # Update fields
+                changed = []
+                for field, value in kwargs.items():
+                    if value is not None:
+                        setattr(batch, field, value)
+                        changed.append(field)
 
-            batch.save()
+                batch.save(update_fields=changed + ["updated_at"])
 
             return UpdateBatch(
                 batch=batch, success=True, message="Batch updated successfully"
             )
         except ProductBatch.DoesNotExist:
             return UpdateBatch(batch=None, success=False, message="Batch not found")
-        except Exception as e:
-            return UpdateBatch(batch=None, success=False, message=str(e))
+        except InsufficientStock:
+            return UpdateBatch(
+                batch=None,
+                success=False,
+                message="Product stock is lower than the quantity reduction",
+            )
+        except IntegrityError:
+            return UpdateBatch(
+                batch=None, success=False, message=DUPLICATE_BATCH_MESSAGE
+            )
+        except Exception:
+            logger.exception("UpdateBatch %s failed", id)
+            return UpdateBatch(
+                batch=None, success=False, message="Failed to update batch"
+            )
 
 
 class DeleteBatch(graphene.Mutation):
@@ -112,17 +151,22 @@ class DeleteBatch(graphene.Mutation):
 
     def mutate(self, info, id):
         try:
-            batch = ProductBatch.objects.get(id=id)
+            with transaction.atomic():
+                batch = ProductBatch.objects.select_for_update().get(id=id)
 
-            # Update product stock quantity
-            batch.product.stock_quantity -= batch.remaining_quantity
-            batch.product.save()
+                # Update product stock quantity
+                adjust_product_stock(batch.product_id, -batch.remaining_quantity)
 
-            batch.delete()
+                batch.delete()
 
             return DeleteBatch(success=True, message="Batch deleted successfully")
         except ProductBatch.DoesNotExist:
             return DeleteBatch(success=False, message="Batch not found")
+        except InsufficientStock:
+            return DeleteBatch(
+                success=False,
+                message="Product stock is lower than the batch remaining quantity",
+            )
 
 
 class AdjustBatchQuantity(graphene.Mutation):
@@ -137,26 +181,10 @@ class AdjustBatchQuantity(graphene.Mutation):
 
     def mutate(self, info, id, adjustment_quantity, adjustment_reason=None):
         try:
+            # Moves the batch and its product's stock in one transaction
+            adjust_batch_quantity(id, adjustment_quantity)
             batch = ProductBatch.objects.get(id=id)
 
-            # Calculate new remaining quantity
-            new_remaining = batch.remaining_quantity + adjustment_quantity
-
-            if new_remaining < 0:
-                return AdjustBatchQuantity(
-                    batch=None,
-                    success=False,
-                    message="Adjustment would result in negative quantity",
-                )
-
-            # Update batch
-            batch.remaining_quantity = new_remaining
-            batch.save()
-
-            # Update product stock
-            batch.product.stock_quantity += adjustment_quantity
-            batch.product.save()
-
             return AdjustBatchQuantity(
                 batch=batch,
                 success=True,
@@ -166,6 +194,12 @@ class AdjustBatchQuantity(graphene.Mutation):
             return AdjustBatchQuantity(
                 batch=None, success=False, message="Batch not found"
             )
+        except InsufficientStock:
+            return AdjustBatchQuantity(
+                batch=None,
+                success=False,
+                message="Adjustment would result in negative quantity",
+            )
 
 
 class QualityControlCheck(graphene.Mutation):
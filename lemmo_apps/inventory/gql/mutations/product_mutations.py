@@ -7,7 +7,7 @@ from lemmo_apps.inventory.models.product import Product, ProductCategory, Produc
 class ProductType(DjangoObjectType):
     class Meta:
         model = Product
-        fields = "__all__"
+        exclude = ("search_vector",)
 
 
 class ProductCategoryType(DjangoObjectType):
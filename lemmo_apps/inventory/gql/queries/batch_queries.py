@@ -1,7 +1,16 @@
 import graphene
 from graphene_django import DjangoObjectType
-from django.db.models import Q
 from lemmo_apps.inventory.models.product import ProductBatch
+from lemmo_apps.dashboard.services.cache import cached_stats
+from lemmo_apps.gql.pagination import CountableConnection, KeysetConnectionField
+from lemmo_apps.gql.optimizer import optimize_queryset
+from lemmo_apps.inventory.services.expiry import (
+    DAYS_0_30,
+    EXPIRED,
+    expired_q,
+    expiring_soon_q,
+)
+from lemmo_apps.stock.services.expiry_buckets import bucket_totals
 
 
 class ProductBatchType(DjangoObjectType):
@@ -10,6 +19,11 @@ class ProductBatchType(DjangoObjectType):
         fields = "__all__"
 
 
+class ProductBatchConnection(CountableConnection):
+    class Meta:
+        node = ProductBatchType
+
+
 class BatchQuery(graphene.ObjectType):
     batches = graphene.List(
         ProductBatchType,
@@ -22,6 +36,16 @@ class BatchQuery(graphene.ObjectType):
         offset=graphene.Int(),
     )
 
+    batches_connection = KeysetConnectionField(
+        ProductBatchConnection,
+        ordering=("-created_at", "-id"),
+        product_id=graphene.UUID(),
+        is_expired=graphene.Boolean(),
+        is_expiring_soon=graphene.Boolean(),
+        supplier=graphene.String(),
+        quality_control_passed=graphene.Boolean(),
+    )
+
     batch = graphene.Field(ProductBatchType, id=graphene.UUID(required=True))
 
     batch_by_number = graphene.Field(
@@ -47,32 +71,22 @@ class BatchQuery(graphene.ObjectType):
         limit=None,
         offset=None,
     ):
-        from django.utils import timezone
-        from datetime import timedelta
-
-        queryset = ProductBatch.objects.all()
+        queryset = optimize_queryset(ProductBatch.objects.all(), info)
 
         if product_id:
             queryset = queryset.filter(product_id=product_id)
 
         if is_expired is not None:
             if is_expired:
-                queryset = queryset.filter(expiration_date__lt=timezone.now().date())
+                queryset = queryset.filter(expired_q("expiration_date"))
             else:
-                queryset = queryset.filter(expiration_date__gte=timezone.now().date())
+                queryset = queryset.exclude(expired_q("expiration_date"))
 
         if is_expiring_soon is not None:
-            expiry_threshold = timezone.now().date() + timedelta(days=30)
             if is_expiring_soon:
-                queryset = queryset.filter(
-                    expiration_date__lte=expiry_threshold,
-                    expiration_date__gte=timezone.now().date(),
-                )
+                queryset = queryset.filter(expiring_soon_q("expiration_date"))
             else:
-                queryset = queryset.filter(
-                    Q(expiration_date__gt=expiry_threshold)
-                    | Q(expiration_date__lt=timezone.now().date())
-                )
+                queryset = queryset.exclude(expiring_soon_q("expiration_date"))
 
         if supplier:
             queryset = queryset.filter(supplier__icontains=supplier)
@@ -88,6 +102,9 @@ class BatchQuery(graphene.ObjectType):
 
         return queryset
 
+    def resolve_batches_connection(self, info, **kwargs):
+        return BatchQuery.resolve_batches(self, info, **kwargs)
+
     def resolve_batch(self, info, id):
         return ProductBatch.objects.get(id=id)
 
@@ -95,39 +112,31 @@ class BatchQuery(graphene.ObjectType):
         return ProductBatch.objects.get(batch_number=batch_number)
 
     def resolve_expired_batches(self, info):
-        from django.utils import timezone
-
-        return ProductBatch.objects.filter(expiration_date__lt=timezone.now().date())
+        return optimize_queryset(
+            ProductBatch.objects.filter(expired_q("expiration_date")), info
+        )
 
     def resolve_expiring_soon_batches(self, info):
-        from django.utils import timezone
-        from datetime import timedelta
-
-        expiry_threshold = timezone.now().date() + timedelta(days=30)
-        return ProductBatch.objects.filter(
-            expiration_date__lte=expiry_threshold,
-            expiration_date__gte=timezone.now().date(),
+        return optimize_queryset(
+            ProductBatch.objects.filter(expiring_soon_q("expiration_date")), info
         )
 
     def resolve_quality_control_failed(self, info):
-        return ProductBatch.objects.filter(quality_control_passed=False)
+        return optimize_queryset(
+            ProductBatch.objects.filter(quality_control_passed=False), info
+        )
 
+    @cached_stats("batch_stats", tags=("product_batch",))
     def resolve_batch_stats(self, info):
-        from django.utils import timezone
-        from datetime import timedelta
-        from django.db.models import Count, Sum
+        from django.db.models import Count, DecimalField, F, Sum
 
         total_batches = ProductBatch.objects.count()
-        active_batches = ProductBatch.objects.filter(
-            expiration_date__gte=timezone.now().date()
+        active_batches = ProductBatch.objects.exclude(
+            expired_q("expiration_date")
         ).count()
 
-        # Expiring batches
-        expiry_threshold = timezone.now().date() + timedelta(days=30)
-        expiring_soon = ProductBatch.objects.filter(
-            expiration_date__lte=expiry_threshold,
-            expiration_date__gte=timezone.now().date(),
-        ).count()
+        # Expiring batches, from the nightly expiry buckets
+        buckets = bucket_totals(central=True)
 
         # Quality control
         quality_passed = ProductBatch.objects.filter(
@@ -140,7 +149,10 @@ class BatchQuery(graphene.ObjectType):
         # Total value
         total_value = (
             ProductBatch.objects.aggregate(
-                total_value=Sum("cost_per_unit" * "remaining_quantity")
+                total_value=Sum(
+                    F("cost_per_unit") * F("remaining_quantity"),
+                    output_field=DecimalField(max_digits=20, decimal_places=2),
+                )
             )["total_value"]
             or 0
         )
@@ -155,7 +167,8 @@ class BatchQuery(graphene.ObjectType):
         return {
             "total_batches": total_batches,
             "active_batches": active_batches,
-            "expiring_soon": expiring_soon,
+            "expired": buckets[EXPIRED]["lot_count"],
+            "expiring_soon": buckets[DAYS_0_30]["lot_count"],
             "quality_passed": quality_passed,
             "quality_failed": quality_failed,
             "total_value": float(total_value),
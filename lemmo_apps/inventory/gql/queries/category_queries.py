@@ -1,6 +1,7 @@
 import graphene
 from graphene_django import DjangoObjectType
 from lemmo_apps.inventory.models.product import ProductCategory
+from lemmo_apps.gql.optimizer import optimize_queryset
 
 
 class ProductCategoryType(DjangoObjectType):
@@ -23,7 +24,7 @@ class CategoryQuery(graphene.ObjectType):
     category_tree = graphene.JSONString()
 
     def resolve_categories(self, info, is_active=None, parent_id=None, search=None):
-        queryset = ProductCategory.objects.all()
+        queryset = optimize_queryset(ProductCategory.objects.all(), info)
 
         if is_active is not None:
             queryset = queryset.filter(is_active=is_active)
@@ -40,7 +41,9 @@ class CategoryQuery(graphene.ObjectType):
         return ProductCategory.objects.get(id=id)
 
     def resolve_root_categories(self, info):
-        return ProductCategory.objects.filter(parent__isnull=True, is_active=True)
+        return optimize_queryset(
+            ProductCategory.objects.filter(parent__isnull=True, is_active=True), info
+        )
 
     def resolve_category_tree(self, info):
         def build_tree(categories, parent=None):
@@ -1,6 +1,17 @@
 import graphene
 from graphene_django import DjangoObjectType
-from django.db.models import Q, Sum, Count, F
+from django.db.models import Sum, Count, F
+from lemmo_apps.dashboard.services.cache import cached_stats
+from lemmo_apps.gql.pagination import CountableConnection, KeysetConnectionField
+from lemmo_apps.gql.optimizer import optimize_queryset
+from lemmo_apps.inventory.services.expiry import (
+    DAYS_0_30,
+    EXPIRED,
+    expired_q,
+    expiring_soon_q,
+)
+from lemmo_apps.inventory.services.search import search_products
+from lemmo_apps.stock.services.expiry_buckets import bucket_totals
 from lemmo_apps.inventory.models.product import (
     Product,
     ProductCategory,
@@ -30,7 +41,19 @@ class ProductBatchType(DjangoObjectType):
 class ProductType(DjangoObjectType):
     class Meta:
         model = Product
-        fields = "__all__"
+        exclude = ("search_vector",)
+
+
+class ProductConnection(CountableConnection):
+    class Meta:
+        node = ProductType
+
+
+def _products_ordering(search=None, **kwargs):
+    # Searches page through results best match first; see search_products.
+    if search and search.strip():
+        return ("-search_rank", "id")
+    return ("name", "id")
 
 
 class ProductQuery(graphene.ObjectType):
@@ -49,6 +72,19 @@ class ProductQuery(graphene.ObjectType):
         offset=graphene.Int(),
     )
 
+    products_connection = KeysetConnectionField(
+        ProductConnection,
+        ordering=_products_ordering,
+        category_id=graphene.UUID(),
+        product_type=graphene.String(),
+        is_active=graphene.Boolean(),
+        search=graphene.String(),
+        low_stock=graphene.Boolean(),
+        out_of_stock=graphene.Boolean(),
+        requires_refrigeration=graphene.Boolean(),
+        controlled_substance=graphene.String(),
+    )
+
     product = graphene.Field(ProductType, id=graphene.UUID(required=True))
 
     product_by_code = graphene.Field(ProductType, code=graphene.String(required=True))
@@ -101,7 +137,7 @@ class ProductQuery(graphene.ObjectType):
         limit=None,
         offset=None,
     ):
-        queryset = Product.objects.all()
+        queryset = optimize_queryset(Product.objects.all(), info)
 
         if category_id:
             queryset = queryset.filter(category_id=category_id)
@@ -113,14 +149,7 @@ class ProductQuery(graphene.ObjectType):
             queryset = queryset.filter(is_active=is_active)
 
         if search:
-            queryset = queryset.filter(
-                Q(name__icontains=search)
-                | Q(description__icontains=search)
-                | Q(generic_name__icontains=search)
-                | Q(brand_name__icontains=search)
-                | Q(manufacturer__icontains=search)
-                | Q(ndc_code__icontains=search)
-            )
+            queryset = search_products(queryset, search)
 
         if low_stock is not None:
             if low_stock:
@@ -150,6 +179,9 @@ class ProductQuery(graphene.ObjectType):
 
         return queryset
 
+    def resolve_products_connection(self, info, **kwargs):
+        return ProductQuery.resolve_products(self, info, **kwargs)
+
     def resolve_product(self, info, id):
         return Product.objects.get(id=id)
 
@@ -157,7 +189,7 @@ class ProductQuery(graphene.ObjectType):
         return Product.objects.get(code=code)
 
     def resolve_product_categories(self, info, is_active=None, parent_id=None):
-        queryset = ProductCategory.objects.all()
+        queryset = optimize_queryset(ProductCategory.objects.all(), info)
 
         if is_active is not None:
             queryset = queryset.filter(is_active=is_active)
@@ -179,32 +211,22 @@ class ProductQuery(graphene.ObjectType):
         limit=None,
         offset=None,
     ):
-        from django.utils import timezone
-        from datetime import timedelta
-
-        queryset = ProductBatch.objects.all()
+        queryset = optimize_queryset(ProductBatch.objects.all(), info)
 
         if product_id:
             queryset = queryset.filter(product_id=product_id)
 
         if is_expired is not None:
             if is_expired:
-                queryset = queryset.filter(expiration_date__lt=timezone.now().date())
+                queryset = queryset.filter(expired_q("expiration_date"))
             else:
-                queryset = queryset.filter(expiration_date__gte=timezone.now().date())
+                queryset = queryset.exclude(expired_q("expiration_date"))
 
         if is_expiring_soon is not None:
-            expiry_threshold = timezone.now().date() + timedelta(days=30)
             if is_expiring_soon:
-                queryset = queryset.filter(
-                    expiration_date__lte=expiry_threshold,
-                    expiration_date__gte=timezone.now().date(),
-                )
+                queryset = queryset.filter(expiring_soon_q("expiration_date"))
             else:
-                queryset = queryset.filter(
-                    Q(expiration_date__gt=expiry_threshold)
-                    | Q(expiration_date__lt=timezone.now().date())
-                )
+                queryset = queryset.exclude(expiring_soon_q("expiration_date"))
 
         if offset:
             queryset = queryset[offset:]
@@ -218,16 +240,22 @@ class ProductQuery(graphene.ObjectType):
         return ProductBatch.objects.get(id=id)
 
     def resolve_medications(self, info):
-        return Product.objects.filter(product_type="MEDICATION", is_active=True)
+        return optimize_queryset(
+            Product.objects.filter(product_type="MEDICATION", is_active=True), info
+        )
 
     def resolve_medical_supplies(self, info):
-        return Product.objects.filter(product_type="MEDICAL_SUPPLY", is_active=True)
+        return optimize_queryset(
+            Product.objects.filter(product_type="MEDICAL_SUPPLY", is_active=True), info
+        )
 
     def resolve_vaccines(self, info):
-        return Product.objects.filter(product_type="VACCINE", is_active=True)
+        return optimize_queryset(
+            Product.objects.filter(product_type="VACCINE", is_active=True), info
+        )
 
     def resolve_controlled_substances(self, info):
-        return Product.objects.filter(
+        queryset = Product.objects.filter(
             controlled_substance__in=[
                 "SCHEDULE_I",
                 "SCHEDULE_II",
@@ -236,28 +264,28 @@ class ProductQuery(graphene.ObjectType):
                 "SCHEDULE_V",
             ]
         )
+        return optimize_queryset(queryset, info)
 
     def resolve_refrigerated_products(self, info):
-        return Product.objects.filter(
+        queryset = Product.objects.filter(
             storage_type__in=["REFRIGERATED", "FROZEN", "ULTRA_COLD"]
         )
+        return optimize_queryset(queryset, info)
 
     def resolve_expired_products(self, info):
-        from django.utils import timezone
-
-        return (
-            ProductBatch.objects.filter(expiration_date__lt=timezone.now().date())
-            .values_list("product", flat=True)
-            .distinct()
-        )
+        # Products with expired stock left, from the nightly expiry buckets
+        queryset = Product.objects.filter(
+            expiry_buckets__bucket=EXPIRED, expiry_buckets__facility__isnull=True
+        ).distinct()
+        return optimize_queryset(queryset, info)
 
     def resolve_low_stock_products(self, info):
-        return Product.objects.filter(stock_quantity__lte=F("reorder_point"))
+        return optimize_queryset(
+            Product.objects.filter(stock_quantity__lte=F("reorder_point")), info
+        )
 
+    @cached_stats("inventory_stats", tags=("product", "product_batch"))
     def resolve_inventory_stats(self, info):
-        from django.utils import timezone
-        from datetime import timedelta
-
         total_products = Product.objects.count()
         active_products = Product.objects.filter(is_active=True).count()
         total_stock_value = (
@@ -273,12 +301,8 @@ class ProductQuery(graphene.ObjectType):
             stock_quantity__lte=F("reorder_point")
         ).count()
 
-        # Expiring batches
-        expiry_threshold = timezone.now().date() + timedelta(days=30)
-        expiring_batches = ProductBatch.objects.filter(
-            expiration_date__lte=expiry_threshold,
-            expiration_date__gte=timezone.now().date(),
-        ).count()
+        # Expiring batches, from the nightly expiry buckets
+        expiring_batches = bucket_totals(central=True)[DAYS_0_30]["lot_count"]
 
         # Product types distribution
         product_types = (
@@ -297,10 +321,8 @@ class ProductQuery(graphene.ObjectType):
             "product_types": list(product_types),
         }
 
+    @cached_stats("stock_alerts", tags=("product", "product_batch"))
     def resolve_stock_alerts(self, info):
-        from django.utils import timezone
-        from datetime import timedelta
-
         # Low stock alerts
         low_stock_products = Product.objects.filter(
             stock_quantity__lte=F("reorder_point")
@@ -312,10 +334,8 @@ class ProductQuery(graphene.ObjectType):
         )
 
         # Expiring batches alerts
-        expiry_threshold = timezone.now().date() + timedelta(days=30)
         expiring_batches = ProductBatch.objects.filter(
-            expiration_date__lte=expiry_threshold,
-            expiration_date__gte=timezone.now().date(),
+            expiring_soon_q("expiration_date"), remaining_quantity__gt=0
         ).values(
             "id",
             "product__name",
@@ -0,0 +1,60 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from lemmo_apps.inventory.services.importer import (
+    DEFAULT_CHUNK_SIZE,
+    IMPORTERS,
+    ImportFileError,
+    import_file,
+)
+
+
+class Command(BaseCommand):
+    help = "Bulk import products or batches from a CSV or XLSX file"
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help="CSV or XLSX file to import")
+        parser.add_argument(
+            "--type",
+            dest="kind",
+            choices=sorted(IMPORTERS),
+            default="products",
+            help="What the file contains (default: products)",
+        )
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=DEFAULT_CHUNK_SIZE,
+            help=f"Rows validated and upserted per statement (default: {DEFAULT_CHUNK_SIZE})",
+        )
+
+    def handle(self, *args, **options):
+        path = options["path"]
+        self.stdout.write(f"Importing {options['kind']} from {path}...")
+        try:
+            with open(path, "rb") as stream:
+                result = import_file(
+                    stream,
+                    path,
+                    options["kind"],
+                    chunk_size=options["chunk_size"],
+                )
+        except (OSError, ImportFileError) as exc:
+            raise CommandError(str(exc))
+
+        for error in result["errors"]:
+            messages = "; ".join(
+                f"{column}: {' '.join(column_errors)}"
+                for column, column_errors in error["errors"].items()
+            )
+            self.stdout.write(self.style.WARNING(f"Row {error['row']}: {messages}"))
+        if result["failed"] > len(result["errors"]):
+            self.stdout.write(
+                f"... {result['failed'] - len(result['errors'])} more rows failed"
+            )
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Processed {result['processed']} rows: "
+                f"{result['imported']} imported, {result['failed']} failed"
+            )
+        )
@@ -0,0 +1,27 @@
+# Generated by Django 5.2.4 on 2026-10-17 11:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("inventory", "0003_product_search"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="productbatch",
+            index=models.Index(
+                fields=["expiration_date"], name="product_batch_expiry_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="item",
+            index=models.Index(fields=["expiry_date"], name="item_expiry_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="batch",
+            index=models.Index(fields=["expiry_date"], name="item_batch_expiry_idx"),
+        ),
+    ]
@@ -26,3 +26,11 @@ class Item(TimeDataStampedModel, CodeModel):
         ordering = ["-created_at"]
         unique_together = (("label", "product", "batch"),)
         db_table = "tblProductItems"
+        indexes = [
+            models.Index(fields=["expiry_date"], name="item_expiry_idx"),
+            models.Index(
+                fields=["bar_code"],
+                name="item_bar_code_prefix_idx",
+                opclasses=["text_pattern_ops"],
+            ),
+        ]
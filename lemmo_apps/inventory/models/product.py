@@ -1,3 +1,5 @@
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVectorField
 from django.db import models
 from simple_history.models import HistoricalRecords
 from core.models import CodeModel
@@ -103,10 +105,13 @@ class Product(CodeModel):
         max_length=50, blank=True, null=True, help_text="LxWxH in cm"
     )
 
+    # Maintained by the product_search_vector_update trigger (migration 0003).
+    search_vector = SearchVectorField(null=True, editable=False)
+
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
-    history = HistoricalRecords()
+    history = HistoricalRecords(excluded_fields=["search_vector"])
 
     def __str__(self):
         return self.name
@@ -128,6 +133,35 @@ class Product(CodeModel):
         verbose_name_plural = "Products"
         db_table = "tblProducts"
         ordering = ["name"]
+        indexes = [
+            models.Index(fields=["name", "id"], name="product_name_id_idx"),
+            GinIndex(fields=["search_vector"], name="product_search_vector_idx"),
+            GinIndex(
+                fields=["name"],
+                name="product_name_trgm_idx",
+                opclasses=["gin_trgm_ops"],
+            ),
+            GinIndex(
+                fields=["generic_name"],
+                name="product_generic_trgm_idx",
+                opclasses=["gin_trgm_ops"],
+            ),
+            GinIndex(
+                fields=["brand_name"],
+                name="product_brand_trgm_idx",
+                opclasses=["gin_trgm_ops"],
+            ),
+            models.Index(
+                fields=["ndc_code"],
+                name="product_ndc_prefix_idx",
+                opclasses=["varchar_pattern_ops"],
+            ),
+            models.Index(
+                fields=["code"],
+                name="product_code_prefix_idx",
+                opclasses=["varchar_pattern_ops"],
+            ),
+        ]
 
 
 class ProductBatch(models.Model):
@@ -155,6 +189,9 @@ class ProductBatch(models.Model):
         verbose_name_plural = "Product Batches"
         db_table = "tblProductBatches"
         ordering = ["-expiration_date"]
+        indexes = [
+            models.Index(fields=["expiration_date"], name="product_batch_expiry_idx"),
+        ]
 
     def __str__(self):
         return f"{self.product.name} - Batch {self.batch_number}"
@@ -167,10 +204,9 @@ class ProductBatch(models.Model):
 
     @property
     def is_expiring_soon(self):
-        from django.utils import timezone
-        from datetime import timedelta
+        from lemmo_apps.inventory.services.expiry import expiring_soon_threshold
 
-        return self.expiration_date <= (timezone.now().date() + timedelta(days=30))
+        return self.expiration_date <= expiring_soon_threshold()
 
 
 class ProductImage(models.Model):
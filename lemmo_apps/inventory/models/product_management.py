@@ -14,6 +14,9 @@ class Batch(CodeModel, TimeDataStampedModel):
         verbose_name_plural = "Batches"
         ordering = ["-created_at"]
         db_table = "tblItemBatches"
+        indexes = [
+            models.Index(fields=["expiry_date"], name="item_batch_expiry_idx"),
+        ]
 
     def __str__(self):
         return f"{self.name} (exp: {self.expiry_date})"
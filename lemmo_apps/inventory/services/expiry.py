@@ -0,0 +1,62 @@
+"""Expiry windows shared by batch, stock and dashboard queries."""
+
+from datetime import timedelta
+
+from django.db.models import Case, CharField, Q, Value, When
+from django.utils import timezone
+
+EXPIRING_SOON_DAYS = 30
+SHORT_DATED_DAYS = 90
+
+EXPIRED = "EXPIRED"
+DAYS_0_30 = "DAYS_0_30"
+DAYS_31_90 = "DAYS_31_90"
+OVER_90 = "OVER_90"
+
+BUCKET_CHOICES = [
+    (EXPIRED, "Expired"),
+    (DAYS_0_30, "0-30 days"),
+    (DAYS_31_90, "31-90 days"),
+    (OVER_90, "Over 90 days"),
+]
+
+
+def _today(today):
+    return today or timezone.now().date()
+
+
+def expiring_soon_threshold(today=None):
+    return _today(today) + timedelta(days=EXPIRING_SOON_DAYS)
+
+
+def expired_q(field, today=None):
+    return Q(**{f"{field}__lt": _today(today)})
+
+
+def expiring_soon_q(field, today=None):
+    """Not yet expired, but expiring within ``EXPIRING_SOON_DAYS``."""
+    today = _today(today)
+    return Q(
+        **{
+            f"{field}__gte": today,
+            f"{field}__lte": expiring_soon_threshold(today),
+        }
+    )
+
+
+def bucket_case(field, today=None):
+    """SQL expression naming the expiry bucket of ``field``."""
+    today = _today(today)
+    return Case(
+        When(**{f"{field}__lt": today}, then=Value(EXPIRED)),
+        When(
+            **{f"{field}__lte": today + timedelta(days=EXPIRING_SOON_DAYS)},
+            then=Value(DAYS_0_30),
+        ),
+        When(
+            **{f"{field}__lte": today + timedelta(days=SHORT_DATED_DAYS)},
+            then=Value(DAYS_31_90),
+        ),
+        default=Value(OVER_90),
+        output_field=CharField(),
+    )
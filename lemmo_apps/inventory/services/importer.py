@@ -0,0 +1,364 @@
+"""Streaming bulk import of products and batches from CSV or XLSX files.
+
+Rows are read one at a time (``csv`` or ``openpyxl`` in read-only mode),
+validated against the model fields in chunks and upserted with a single
+``INSERT ... ON CONFLICT DO UPDATE`` per chunk, keyed on ``Product.code`` or
+``ProductBatch.batch_number``. Only one chunk is held in memory at a time, so
+file size does not matter. Each chunk commits on its own; a row that fails
+validation is reported and skipped without affecting the rest of its chunk.
+
+Only the columns present in the file are written when a row updates an
+existing record. Bulk upserts bypass ``save()``, so they do not write
+django-simple-history rows or send model signals. Batch imports move each
+product's ``stock_quantity`` by the change in its batches' remaining quantity.
+"""
+
+import csv
+import io
+import os
+from collections import defaultdict
+
+from django.core.exceptions import ValidationError
+from django.db import DatabaseError, models, transaction
+
+from lemmo_apps.dashboard.services.cache import invalidate
+from lemmo_apps.inventory.models.product import Product, ProductBatch, ProductCategory
+from lemmo_apps.stock.services.ledger import InsufficientStock, adjust_product_stock
+
+DEFAULT_CHUNK_SIZE = 2000
+MAX_REPORTED_ERRORS = 1000
+
+TRUE_VALUES = {"1", "true", "t", "yes", "y"}
+FALSE_VALUES = {"0", "false", "f", "no", "n"}
+
+CSV_EXTENSIONS = {".csv"}
+XLSX_EXTENSIONS = {".xlsx", ".xlsm"}
+
+
+class ImportFileError(Exception):
+    """The file as a whole cannot be imported (type, header, encoding)."""
+
+
+def _normalise_header(value):
+    return str(value or "").strip().lower().replace(" ", "_").replace("-", "_")
+
+
+def _iter_csv(stream):
+    reader = csv.reader(io.TextIOWrapper(stream, encoding="utf-8-sig", newline=""))
+    try:
+        yield from reader
+    except UnicodeDecodeError as exc:
+        raise ImportFileError(f"CSV file is not UTF-8 encoded: {exc}")
+
+
+def _iter_xlsx(stream):
+    try:
+        import openpyxl
+    except ImportError:
+        raise ImportFileError(
+            "XLSX import requires openpyxl; install lemmo-apps[healthcare]"
+        )
+
+    workbook = openpyxl.load_workbook(stream, read_only=True, data_only=True)
+    try:
+        yield from workbook.active.iter_rows(values_only=True)
+    finally:
+        workbook.close()
+
+
+def read_rows(stream, filename):
+    """Return ``(columns, rows)`` for a CSV/XLSX stream.
+
+    ``columns`` are the normalised header names and ``rows`` yields
+    ``(row_number, {column: value})`` for every non-empty data row. Row
+    numbers match the spreadsheet, so the header is row 1.
+    """
+    extension = os.path.splitext(filename or "")[1].lower()
+    if extension in CSV_EXTENSIONS:
+        rows = _iter_csv(stream)
+    elif extension in XLSX_EXTENSIONS:
+        rows = _iter_xlsx(stream)
+    else:
+        raise ImportFileError(f"Unsupported file type '{extension or filename}'")
+
+    header = next(rows, None)
+    if not header:
+        raise ImportFileError("File is empty")
+    columns = [_normalise_header(value) for value in header]
+    return [column for column in columns if column], _data_rows(columns, rows)
+
+
+def _data_rows(columns, rows):
+    for row_number, values in enumerate(rows, start=2):
+        row = {
+            column: value.strip() if isinstance(value, str) else value
+            for column, value in zip(columns, values)
+            if column
+        }
+        if any(value not in (None, "") for value in row.values()):
+            yield row_number, row
+
+
+def iter_rows(stream, filename):
+    """Yield ``(row_number, {column: value})`` for every non-empty data row.
+
+    ``stream`` is a binary file object; ``filename`` picks the format. Cells
+    missing from the end of a short row are left out of its dict.
+    """
+    yield from read_rows(stream, filename)[1]
+
+
+class ModelImporter:
+    """Validates rows into unsaved instances of ``model`` and upserts them."""
+
+    model = None
+    key_field = None
+    excluded_fields = ("id", "created_at", "updated_at", "search_vector")
+
+    def __init__(self, columns):
+        self.fields = {
+            field.name: field
+            for field in self.model._meta.concrete_fields
+            if field.editable
+            and field.name not in self.excluded_fields
+            and not field.is_relation
+        }
+        self.columns = [column for column in columns if column in self.fields]
+        missing = [
+            name
+            for name, field in self.fields.items()
+            if self.is_required(field) and name not in self.columns
+        ]
+        missing.extend(
+            column for column in self.extra_required_columns() if column not in columns
+        )
+        if missing:
+            raise ImportFileError(f"Missing required columns: {', '.join(missing)}")
+
+    @staticmethod
+    def is_required(field):
+        return not field.null and not field.blank and not field.has_default()
+
+    def extra_required_columns(self):
+        return []
+
+    def update_fields(self):
+        fields = [column for column in self.columns if column != self.key_field]
+        return fields + self.extra_update_fields() + ["updated_at"]
+
+    def extra_update_fields(self):
+        return []
+
+    def clean_value(self, field, value):
+        if value in (None, ""):
+            if field.has_default():
+                return field.get_default()
+            if field.null:
+                return None
+            if field.blank and isinstance(field, (models.CharField, models.TextField)):
+                return ""
+        if isinstance(field, models.BooleanField) and isinstance(value, str):
+            lowered = value.lower()
+            if lowered in TRUE_VALUES:
+                value = True
+            elif lowered in FALSE_VALUES:
+                value = False
+        elif isinstance(value, (int, float)) and isinstance(
+            field, (models.CharField, models.TextField)
+        ):
+            # Spreadsheets turn codes like 00123 into numbers.
+            value = str(int(value)) if float(value).is_integer() else str(value)
+        return field.clean(value, None)
+
+    def build(self, row):
+        """Return ``(field values, errors)`` for one row."""
+        values = {}
+        errors = {}
+        for column in self.columns:
+            field = self.fields[column]
+            try:
+                values[column] = self.clean_value(field, row.get(column))
+            except ValidationError as exc:
+                errors[column] = exc.messages
+        return values, errors
+
+    def resolve(self, chunk):
+        """Resolve related-object columns for a whole chunk at once."""
+
+    def finish(self, values, row, errors):
+        return values
+
+    def upsert(self, instances):
+        self.model.objects.bulk_create(
+            instances,
+            update_conflicts=True,
+            unique_fields=[self.key_field],
+            update_fields=self.update_fields(),
+        )
+
+
+class ProductImporter(ModelImporter):
+    model = Product
+    key_field = "code"
+
+    def __init__(self, columns):
+        super().__init__(columns)
+        self.has_category = "category" in columns
+        self.categories = {}
+
+    def extra_update_fields(self):
+        return ["category"] if self.has_category else []
+
+    def resolve(self, chunk):
+        if not self.has_category:
+            return
+        names = {row["category"] for _, row in chunk if row.get("category")}
+        names -= self.categories.keys()
+        if names:
+            self.categories.update(
+                ProductCategory.objects.filter(name__in=names).values_list("name", "id")
+            )
+
+    def finish(self, values, row, errors):
+        if self.has_category:
+            name = row.get("category")
+            if not name:
+                values["category_id"] = None
+            elif name in self.categories:
+                values["category_id"] = self.categories[name]
+            else:
+                errors["category"] = [f"Unknown category '{name}'"]
+        return values
+
+
+class BatchImporter(ModelImporter):
+    model = ProductBatch
+    key_field = "batch_number"
+
+    def __init__(self, columns):
+        super().__init__(columns)
+        self.products = {}
+
+    def extra_required_columns(self):
+        return ["product_code"]
+
+    def extra_update_fields(self):
+        return ["product"]
+
+    def resolve(self, chunk):
+        # Only the current chunk's products are kept, however big the catalogue.
+        codes = {
+            str(row["product_code"]) for _, row in chunk if row.get("product_code")
+        }
+        self.products = dict(
+            Product.objects.filter(code__in=codes).values_list("code", "id")
+        )
+
+    def finish(self, values, row, errors):
+        code = str(row.get("product_code") or "")
+        if code in self.products:
+            values["product_id"] = self.products[code]
+        else:
+            errors["product_code"] = [f"Unknown product code '{code}'"]
+        if "remaining_quantity" not in self.columns:
+            values["remaining_quantity"] = values.get("quantity")
+        return values
+
+    def _remaining(self, batch_numbers, lock=False):
+        batches = ProductBatch.objects.filter(batch_number__in=batch_numbers)
+        if lock:
+            batches = batches.select_for_update()
+        return {
+            batch_number: (product_id, remaining)
+            for batch_number, product_id, remaining in batches.values_list(
+                "batch_number", "product_id", "remaining_quantity"
+            )
+        }
+
+    def upsert(self, instances):
+        # Move product counters by what the chunk changed rather than
+        # recomputing them, so concurrent stock updates are not overwritten.
+        batch_numbers = [instance.batch_number for instance in instances]
+        before = self._remaining(batch_numbers, lock=True)
+        super().upsert(instances)
+        deltas = defaultdict(int)
+        for product_id, remaining in before.values():
+            deltas[product_id] -= remaining
+        for product_id, remaining in self._remaining(batch_numbers).values():
+            deltas[product_id] += remaining
+        for product_id in sorted(deltas):
+            if deltas[product_id]:
+                adjust_product_stock(product_id, deltas[product_id])
+
+
+IMPORTERS = {
+    "products": ProductImporter,
+    "batches": BatchImporter,
+}
+
+
+def _chunks(rows, size):
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def import_file(stream, filename, kind, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Import products or batches from a CSV/XLSX stream.
+
+    Returns ``{"processed", "imported", "failed", "errors"}``; ``errors`` lists
+    ``{"row": n, "errors": {column: [messages]}}`` for the first
+    ``MAX_REPORTED_ERRORS`` failing rows. Raises ``ImportFileError`` when the
+    file itself cannot be read.
+    """
+    if kind not in IMPORTERS:
+        raise ImportFileError(f"Unknown import type '{kind}'")
+
+    columns, rows = read_rows(stream, filename)
+    # Columns come from the header, so short rows cannot hide any of them.
+    importer = IMPORTERS[kind](columns)
+    result = {"processed": 0, "imported": 0, "failed": 0, "errors": []}
+
+    def report(row_number, errors):
+        result["failed"] += 1
+        if len(result["errors"]) < MAX_REPORTED_ERRORS:
+            result["errors"].append({"row": row_number, "errors": errors})
+
+    for chunk in _chunks(rows, chunk_size):
+        result["processed"] += len(chunk)
+        importer.resolve(chunk)
+
+        # Later rows win when a key repeats within a chunk; ON CONFLICT cannot
+        # update the same row twice in one statement.
+        instances = {}
+        for row_number, row in chunk:
+            values, errors = importer.build(row)
+            values = importer.finish(values, row, errors)
+            if errors:
+                report(row_number, errors)
+                continue
+            instances[values[importer.key_field]] = (
+                row_number,
+                importer.model(**values),
+            )
+
+        if not instances:
+            continue
+        try:
+            with transaction.atomic():
+                batch = [instance for _, instance in instances.values()]
+                importer.upsert(batch)
+        except (DatabaseError, InsufficientStock) as exc:
+            for row_number, _ in instances.values():
+                report(row_number, {"__all__": [str(exc)]})
+            continue
+        result["imported"] += len(instances)
+
+    if result["imported"]:
+        invalidate("product", "product_batch")
+    return result
@@ -0,0 +1,102 @@
+"""Ranked product search.
+
+On PostgreSQL, words are matched as prefixes against ``Product.search_vector``
+(kept current by a database trigger) and fuzzily against the trigram-indexed
+names, then ranked. Numeric terms such as NDC codes and barcodes also take an
+indexed prefix lookup, and products matched that way rank first. Other
+databases fall back to ``icontains`` matching.
+
+Results are annotated with ``search_rank`` so keyset connections can page
+through them in rank order.
+"""
+
+import re
+
+from django.contrib.postgres.search import (
+    SearchQuery,
+    SearchRank,
+    TrigramWordSimilarity,
+)
+from django.db import connection
+from django.db.models import Case, Exists, F, FloatField, OuterRef, Q, Value, When
+
+from lemmo_apps.inventory.models.item import Item
+
+# Must match the configuration used by the product_search_vector_update trigger.
+SEARCH_CONFIG = "simple"
+
+CODE_TERM = re.compile(r"^\d[\d-]*$")
+WORD = re.compile(r"\w+")
+
+
+def _contains_filter(term):
+    return (
+        Q(name__icontains=term)
+        | Q(description__icontains=term)
+        | Q(generic_name__icontains=term)
+        | Q(brand_name__icontains=term)
+        | Q(manufacturer__icontains=term)
+        | Q(ndc_code__icontains=term)
+    )
+
+
+def _code_prefix_filter(term):
+    barcode_match = Item.objects.filter(
+        product=OuterRef("pk"), bar_code__startswith=term
+    )
+    return (
+        Q(ndc_code__startswith=term)
+        | Q(code__startswith=term)
+        | Q(Exists(barcode_match))
+    )
+
+
+def search_products(queryset, term):
+    """Filter ``queryset`` to products matching ``term``, best matches first."""
+    term = (term or "").strip()
+    if not term:
+        return queryset
+
+    if connection.vendor != "postgresql":
+        return (
+            queryset.filter(_contains_filter(term))
+            .annotate(search_rank=Value(0.0, output_field=FloatField()))
+            .order_by("-search_rank", "name", "id")
+        )
+
+    words = WORD.findall(term.lower())
+    if not words:
+        return (
+            queryset.filter(_contains_filter(term))
+            .annotate(search_rank=TrigramWordSimilarity(term, "name"))
+            .order_by("-search_rank", "name", "id")
+        )
+
+    query = SearchQuery(
+        " & ".join(f"{word}:*" for word in words),
+        search_type="raw",
+        config=SEARCH_CONFIG,
+    )
+    matches = (
+        Q(search_vector=query)
+        | Q(name__trigram_word_similar=term)
+        | Q(generic_name__trigram_word_similar=term)
+        | Q(brand_name__trigram_word_similar=term)
+    )
+    rank = SearchRank(F("search_vector"), query) + TrigramWordSimilarity(term, "name")
+
+    if CODE_TERM.match(term):
+        code_match = _code_prefix_filter(term)
+        matches |= code_match
+        # Boost code hits well above any text rank so they lead the results.
+        rank = rank + Case(
+            When(code_match, then=Value(10.0)),
+            default=Value(0.0),
+            output_field=FloatField(),
+        )
+
+    return (
+        queryset.filter(matches)
+        .annotate(search_rank=rank)
+        .order_by("-search_rank", "name", "id")
+    )
@@ -1,3 +1,143 @@
+import io
+from decimal import Decimal
+
 from django.test import TestCase
 
-# Create your tests here.
+from .gql.queries.product_queries import _products_ordering
+from .models.product import Product, ProductBatch
+from .services.importer import ImportFileError, import_file
+from .services.search import search_products
+
+
+def make_product(code, name, **fields):
+    return Product.objects.create(
+        code=code,
+        name=name,
+        unit_of_measure="units",
+        price=Decimal("1.00"),
+        **fields,
+    )
+
+
+class ProductSearchTests(TestCase):
+    def test_numeric_term_matches_codes_and_text(self):
+        by_code = make_product("500-1", "Saline")
+        by_name = make_product("P2", "Vitamin C 500")
+        make_product("P3", "Gauze")
+
+        results = list(search_products(Product.objects.all(), "500"))
+
+        self.assertEqual(results, [by_code, by_name])
+
+    def test_results_are_annotated_with_rank(self):
+        make_product("P1", "Paracetamol")
+
+        results = search_products(Product.objects.all(), "paracet")
+
+        self.assertTrue(all(hasattr(row, "search_rank") for row in results))
+
+    def test_blank_term_leaves_queryset_alone(self):
+        queryset = Product.objects.all()
+
+        self.assertIs(search_products(queryset, "  "), queryset)
+
+    def test_connection_orders_by_rank_only_when_searching(self):
+        self.assertEqual(_products_ordering(), ("name", "id"))
+        self.assertEqual(_products_ordering(search=" "), ("name", "id"))
+        self.assertEqual(_products_ordering(search="amox"), ("-search_rank", "id"))
+
+
+def csv_file(*lines):
+    return io.BytesIO("\n".join(lines).encode())
+
+
+BATCH_HEADER = (
+    "product_code,batch_number,quantity,remaining_quantity,"
+    "manufacturing_date,expiration_date,cost_per_unit"
+)
+
+
+class ImporterTests(TestCase):
+    def test_products_are_created_and_updated_by_code(self):
+        make_product("P1", "Old name")
+        stream = csv_file(
+            "Code,Name,Unit of Measure,Price",
+            "P1,Aspirin,box,1.50",
+            "P2,Ibuprofen,box,2.00",
+        )
+
+        result = import_file(stream, "products.csv", "products")
+
+        self.assertEqual(result["imported"], 2)
+        self.assertEqual(Product.objects.get(code="P1").name, "Aspirin")
+        self.assertEqual(Product.objects.get(code="P2").price, Decimal("2.00"))
+
+    def test_short_first_row_keeps_every_header_column(self):
+        stream = csv_file(
+            "code,name,unit_of_measure,price,description",
+            "P1,Aspirin,box,1.50",
+            "P2,Ibuprofen,box,2.00,Pain relief",
+        )
+
+        result = import_file(stream, "products.csv", "products")
+
+        self.assertEqual(result["failed"], 0)
+        self.assertEqual(Product.objects.get(code="P2").description, "Pain relief")
+
+    def test_invalid_rows_are_reported_and_skipped(self):
+        stream = csv_file(
+            "code,name,unit_of_measure,price",
+            "P1,Aspirin,box,not-a-price",
+            "P2,Ibuprofen,box,2.00",
+        )
+
+        result = import_file(stream, "products.csv", "products", chunk_size=1)
+
+        self.assertEqual(result["processed"], 2)
+        self.assertEqual(result["imported"], 1)
+        self.assertEqual(result["errors"][0]["row"], 2)
+        self.assertIn("price", result["errors"][0]["errors"])
+        self.assertFalse(Product.objects.filter(code="P1").exists())
+
+    def test_missing_required_columns_reject_the_file(self):
+        with self.assertRaises(ImportFileError):
+            import_file(csv_file("code,name", "P1,Aspirin"), "products.csv", "products")
+        with self.assertRaises(ImportFileError):
+            import_file(csv_file("code"), "products.txt", "products")
+
+    def test_batches_move_product_stock_by_their_change(self):
+        product = make_product("P1", "Aspirin", stock_quantity=3)
+        import_file(
+            csv_file(
+                BATCH_HEADER,
+                "P1,LOT-1,10,10,2025-01-01,2027-01-01,0.50",
+                "P1,LOT-2,5,5,2025-01-01,2027-06-01,0.50",
+            ),
+            "batches.csv",
+            "batches",
+        )
+        product.refresh_from_db()
+        self.assertEqual(product.stock_quantity, 18)
+
+        result = import_file(
+            csv_file(BATCH_HEADER, "P1,LOT-1,10,4,2025-01-01,2027-01-01,0.50"),
+            "batches.csv",
+            "batches",
+        )
+
+        product.refresh_from_db()
+        self.assertEqual(result["imported"], 1)
+        self.assertEqual(product.stock_quantity, 12)
+        self.assertEqual(
+            ProductBatch.objects.get(batch_number="LOT-1").remaining_quantity, 4
+        )
+
+    def test_unknown_product_code_fails_the_row(self):
+        result = import_file(
+            csv_file(BATCH_HEADER, "NOPE,LOT-1,10,10,2025-01-01,2027-01-01,0.50"),
+            "batches.csv",
+            "batches",
+        )
+
+        self.assertEqual(result["failed"], 1)
+        self.assertIn("product_code", result["errors"][0]["errors"])
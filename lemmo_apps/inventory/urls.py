@@ -10,6 +10,7 @@ urlpatterns = [
         "products/<uuid:pk>/", views.ProductDetailView.as_view(), name="product-detail"
     ),
     path("products/create/", views.ProductCreateView.as_view(), name="product-create"),
+    path("products/import/", views.ProductImportView.as_view(), name="product-import"),
     path(
         "products/<uuid:pk>/update/",
         views.ProductUpdateView.as_view(),
@@ -50,6 +51,7 @@ urlpatterns = [
     path("batches/", views.BatchListView.as_view(), name="batch-list"),
     path("batches/<uuid:pk>/", views.BatchDetailView.as_view(), name="batch-detail"),
     path("batches/create/", views.BatchCreateView.as_view(), name="batch-create"),
+    path("batches/import/", views.BatchImportView.as_view(), name="batch-import"),
     path(
         "batches/<uuid:pk>/update/",
         views.BatchUpdateView.as_view(),
@@ -5,6 +5,7 @@ from django.views.generic import (
     CreateView,
     UpdateView,
     DeleteView,
+    View,
 )
 from django.contrib.auth.mixins import LoginRequiredMixin, PermissionRequiredMixin
 from django.urls import reverse_lazy
@@ -14,6 +15,8 @@ from django.utils import timezone
 from datetime import timedelta
 
 from .models.product import Product, ProductCategory, ProductBatch
+from .services.importer import ImportFileError, import_file
+from .services.search import search_products
 
 
 class ProductListView(LoginRequiredMixin, ListView):
@@ -41,14 +44,7 @@ class ProductListView(LoginRequiredMixin, ListView):
             queryset = queryset.filter(is_active=is_active == "true")
 
         if search:
-            queryset = queryset.filter(
-                Q(name__icontains=search)
-                | Q(description__icontains=search)
-                | Q(generic_name__icontains=search)
-                | Q(brand_name__icontains=search)
-                | Q(manufacturer__icontains=search)
-                | Q(ndc_code__icontains=search)
-            )
+            queryset = search_products(queryset, search)
 
         if low_stock is not None:
             if low_stock == "true":
@@ -308,6 +304,34 @@ class BatchDeleteView(LoginRequiredMixin, PermissionRequiredMixin, DeleteView):
     permission_required = "inventory.delete_productbatch"
 
 
+class ImportView(LoginRequiredMixin, PermissionRequiredMixin, View):
+    """Upload a CSV/XLSX file as ``file`` and get the import report back."""
+
+    kind = None
+
+    def post(self, request, *args, **kwargs):
+        upload = request.FILES.get("file")
+        if upload is None:
+            return JsonResponse(
+                {"status": "error", "message": "No file uploaded"}, status=400
+            )
+        try:
+            result = import_file(upload.file, upload.name, self.kind)
+        except ImportFileError as exc:
+            return JsonResponse({"status": "error", "message": str(exc)}, status=400)
+        return JsonResponse({"status": "success", **result})
+
+
+class ProductImportView(ImportView):
+    kind = "products"
+    permission_required = "inventory.add_product"
+
+
+class BatchImportView(ImportView):
+    kind = "batches"
+    permission_required = "inventory.add_productbatch"
+
+
 class ExpiredBatchesView(LoginRequiredMixin, ListView):
     model = ProductBatch
     template_name = "inventory/expired_batches.html"
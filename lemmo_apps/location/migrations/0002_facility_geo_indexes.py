@@ -0,0 +1,26 @@
+# Generated by Django 5.2.4 on 2026-10-17 11:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("location", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="facility",
+            index=models.Index(
+                fields=["latitude", "longitude"], name="facility_geo_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="facility",
+            index=models.Index(
+                fields=["category", "latitude", "longitude"],
+                name="facility_category_geo_idx",
+            ),
+        ),
+    ]
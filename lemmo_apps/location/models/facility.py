@@ -132,6 +132,13 @@ class Facility(UUIDModel):
         verbose_name_plural = "Facilities"
         db_table = "tblFacilities"
         ordering = ["name"]
+        indexes = [
+            models.Index(fields=["latitude", "longitude"], name="facility_geo_idx"),
+            models.Index(
+                fields=["category", "latitude", "longitude"],
+                name="facility_category_geo_idx",
+            ),
+        ]
 
     def __str__(self):
         return self.name
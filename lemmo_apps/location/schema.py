@@ -2,6 +2,10 @@ import graphene
 from graphene_django import DjangoObjectType
 from .models.location import Location, LocationType
 from .models.facility import Facility, FacilityType, FacilityDepartment, FacilityContact
+from lemmo_apps.dashboard.services.cache import cached_stats
+from lemmo_apps.gql.pagination import CountableConnection, KeysetConnectionField
+from lemmo_apps.gql.optimizer import optimize_queryset
+from .services.geo import DEFAULT_LIMIT, MAX_LIMIT, nearest_facilities
 
 
 class LocationTypeType(DjangoObjectType):
@@ -23,10 +27,22 @@ class FacilityTypeType(DjangoObjectType):
 
 
 class FacilityType(DjangoObjectType):
+    distance_km = graphene.Float(
+        description="Distance from the searched point, for nearestFacilities"
+    )
+
     class Meta:
         model = Facility
         fields = "__all__"
 
+    def resolve_distance_km(self, info):
+        return getattr(self, "distance_km", None)
+
+
+class FacilityConnection(CountableConnection):
+    class Meta:
+        node = FacilityType
+
 
 class FacilityDepartmentType(DjangoObjectType):
     class Meta:
@@ -68,6 +84,19 @@ class Query(graphene.ObjectType):
         offset=graphene.Int(),
     )
 
+    facilities_connection = KeysetConnectionField(
+        FacilityConnection,
+        ordering=("name", "id"),
+        facility_type_id=graphene.UUID(),
+        category=graphene.String(),
+        operational_status=graphene.String(),
+        is_active=graphene.Boolean(),
+        search=graphene.String(),
+        has_pharmacy=graphene.Boolean(),
+        has_laboratory=graphene.Boolean(),
+        emergency_services=graphene.Boolean(),
+    )
+
     facility = graphene.Field(FacilityType, id=graphene.UUID(required=True))
 
     facility_types = graphene.List(FacilityTypeType)
@@ -80,13 +109,23 @@ class Query(graphene.ObjectType):
     warehouses = graphene.List(FacilityType)
     active_facilities = graphene.List(FacilityType)
 
+    # Geospatial queries
+    nearest_facilities = graphene.List(
+        FacilityType,
+        lat=graphene.Float(required=True),
+        lng=graphene.Float(required=True),
+        radius_km=graphene.Float(required=True),
+        category=graphene.String(),
+        limit=graphene.Int(),
+    )
+
     # Dashboard statistics
     facility_stats = graphene.JSONString()
 
     def resolve_locations(self, info, type_id=None, is_active=None, search=None):
         from .models.location import Location
 
-        queryset = Location.objects.all()
+        queryset = optimize_queryset(Location.objects.all(), info)
 
         if type_id:
             queryset = queryset.filter(type_id=type_id)
@@ -125,7 +164,7 @@ class Query(graphene.ObjectType):
     ):
         from .models.facility import Facility
 
-        queryset = Facility.objects.all()
+        queryset = optimize_queryset(Facility.objects.all(), info)
 
         if facility_type_id:
             queryset = queryset.filter(facility_type_id=facility_type_id)
@@ -159,6 +198,9 @@ class Query(graphene.ObjectType):
 
         return queryset
 
+    def resolve_facilities_connection(self, info, **kwargs):
+        return Query.resolve_facilities(self, info, **kwargs)
+
     def resolve_facility(self, info, id):
         from .models.facility import Facility
 
@@ -172,33 +214,56 @@ class Query(graphene.ObjectType):
     def resolve_hospitals(self, info):
         from .models.facility import Facility
 
-        return Facility.objects.filter(category="HOSPITAL", is_active=True)
+        return optimize_queryset(
+            Facility.objects.filter(category="HOSPITAL", is_active=True), info
+        )
 
     def resolve_clinics(self, info):
         from .models.facility import Facility
 
-        return Facility.objects.filter(category="CLINIC", is_active=True)
+        return optimize_queryset(
+            Facility.objects.filter(category="CLINIC", is_active=True), info
+        )
 
     def resolve_pharmacies(self, info):
         from .models.facility import Facility
 
-        return Facility.objects.filter(category="PHARMACY", is_active=True)
+        return optimize_queryset(
+            Facility.objects.filter(category="PHARMACY", is_active=True), info
+        )
 
     def resolve_laboratories(self, info):
         from .models.facility import Facility
 
-        return Facility.objects.filter(category="LABORATORY", is_active=True)
+        return optimize_queryset(
+            Facility.objects.filter(category="LABORATORY", is_active=True), info
+        )
 
     def resolve_warehouses(self, info):
         from .models.facility import Facility
 
-        return Facility.objects.filter(category="WAREHOUSE", is_active=True)
+        return optimize_queryset(
+            Facility.objects.filter(category="WAREHOUSE", is_active=True), info
+        )
 
     def resolve_active_facilities(self, info):
         from .models.facility import Facility
 
-        return Facility.objects.filter(is_active=True, operational_status="ACTIVE")
+        return optimize_queryset(
+            Facility.objects.filter(is_active=True, operational_status="ACTIVE"), info
+        )
+
+    def resolve_nearest_facilities(
+        self, info, lat, lng, radius_km, category=None, limit=None
+    ):
+        queryset = optimize_queryset(
+            nearest_facilities(lat, lng, radius_km, category=category), info
+        )
+        if limit is None:
+            limit = DEFAULT_LIMIT
+        return queryset[: min(max(limit, 1), MAX_LIMIT)]
 
+    @cached_stats("facility_stats", tags=("facility",))
     def resolve_facility_stats(self, info):
         from .models.facility import Facility
         from django.db.models import Count
@@ -0,0 +1,111 @@
+"""Distance queries over latitude/longitude decimal columns.
+
+A search first narrows candidates with a latitude/longitude bounding box,
+which the composite coordinate indexes can answer, and only then computes
+the haversine great-circle distance in SQL for the rows left. No spatial
+database extension is required.
+"""
+
+import math
+
+from django.db.models import F, FloatField, Q, Value
+from django.db.models.functions import (
+    ASin,
+    Cast,
+    Cos,
+    Least,
+    Power,
+    Radians,
+    Sin,
+    Sqrt,
+)
+
+from lemmo_apps.location.models.facility import Facility
+
+EARTH_RADIUS_KM = 6371.0088
+KM_PER_DEGREE_LAT = 111.045
+
+DEFAULT_LIMIT = 20
+MAX_LIMIT = 100
+
+
+def bounding_box(latitude, longitude, radius_km):
+    """Return ``(min_lat, max_lat, [(min_lng, max_lng), ...])`` around a point.
+
+    More than one longitude range is returned when the box crosses the
+    antimeridian; none when it reaches a pole and every longitude qualifies.
+    """
+    delta_lat = radius_km / KM_PER_DEGREE_LAT
+    min_lat = max(latitude - delta_lat, -90.0)
+    max_lat = min(latitude + delta_lat, 90.0)
+
+    cos_lat = math.cos(math.radians(latitude))
+    if min_lat <= -90.0 or max_lat >= 90.0 or cos_lat <= 1e-9:
+        return min_lat, max_lat, []
+
+    delta_lng = radius_km / (KM_PER_DEGREE_LAT * cos_lat)
+    if delta_lng >= 180.0:
+        return min_lat, max_lat, []
+
+    min_lng = longitude - delta_lng
+    max_lng = longitude + delta_lng
+    if min_lng < -180.0:
+        return min_lat, max_lat, [(min_lng + 360.0, 180.0), (-180.0, max_lng)]
+    if max_lng > 180.0:
+        return min_lat, max_lat, [(min_lng, 180.0), (-180.0, max_lng - 360.0)]
+    return min_lat, max_lat, [(min_lng, max_lng)]
+
+
+def bounding_box_q(latitude, longitude, radius_km, lat_field, lng_field):
+    min_lat, max_lat, lng_ranges = bounding_box(latitude, longitude, radius_km)
+    q = Q(**{f"{lat_field}__gte": min_lat, f"{lat_field}__lte": max_lat})
+    if lng_ranges:
+        lng_q = Q()
+        for min_lng, max_lng in lng_ranges:
+            lng_q |= Q(**{f"{lng_field}__gte": min_lng, f"{lng_field}__lte": max_lng})
+        q &= lng_q
+    return q
+
+
+def haversine_km(latitude, longitude, lat_field, lng_field):
+    """SQL expression for the distance in km from a point to the row's point."""
+    lat1 = Radians(Value(float(latitude)))
+    lng1 = Radians(Value(float(longitude)))
+    lat2 = Radians(Cast(F(lat_field), FloatField()))
+    lng2 = Radians(Cast(F(lng_field), FloatField()))
+    a = Power(Sin((lat2 - lat1) / 2), 2) + Cos(lat1) * Cos(lat2) * Power(
+        Sin((lng2 - lng1) / 2), 2
+    )
+    # Rounding can push sqrt(a) just past 1 for near-antipodal points.
+    return Value(2 * EARTH_RADIUS_KM) * ASin(Least(Sqrt(a), Value(1.0)))
+
+
+def within_radius(
+    queryset,
+    latitude,
+    longitude,
+    radius_km,
+    lat_field="latitude",
+    lng_field="longitude",
+):
+    """Rows within ``radius_km`` of a point, nearest first, with ``distance_km``."""
+    return (
+        queryset.filter(
+            bounding_box_q(latitude, longitude, radius_km, lat_field, lng_field)
+        )
+        .annotate(distance_km=haversine_km(latitude, longitude, lat_field, lng_field))
+        .filter(distance_km__lte=radius_km)
+        .order_by("distance_km")
+    )
+
+
+def nearest_facilities(latitude, longitude, radius_km, category=None):
+    """Operational facilities within ``radius_km``, nearest first.
+
+    Slice the result; a search radius rarely needs more than ``DEFAULT_LIMIT``
+    and callers should never take more than ``MAX_LIMIT``.
+    """
+    queryset = Facility.objects.filter(is_active=True, operational_status="ACTIVE")
+    if category:
+        queryset = queryset.filter(category=category)
+    return within_radius(queryset, latitude, longitude, radius_km)
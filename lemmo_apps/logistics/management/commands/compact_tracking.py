@@ -0,0 +1,41 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from lemmo_apps.logistics.services.tracking_history import (
+    MINUTE_RETENTION_DAYS,
+    RAW_RETENTION_DAYS,
+    compact_tracking,
+)
+
+
+class Command(BaseCommand):
+    help = "Compact old shipment location updates into minute and hour rollups"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--raw-days",
+            type=int,
+            default=RAW_RETENTION_DAYS,
+            help=f"Days to keep raw readings (default: {RAW_RETENTION_DAYS})",
+        )
+        parser.add_argument(
+            "--minute-days",
+            type=int,
+            default=MINUTE_RETENTION_DAYS,
+            help=f"Days to keep minute rollups (default: {MINUTE_RETENTION_DAYS})",
+        )
+
+    def handle(self, *args, **options):
+        self.stdout.write("Compacting shipment tracking...")
+        try:
+            result = compact_tracking(
+                raw_days=options["raw_days"], minute_days=options["minute_days"]
+            )
+        except ValueError as exc:
+            raise CommandError(str(exc))
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Compacted {result['readings']} readings and "
+                f"{result['minutes']} minute rollups"
+            )
+        )
@@ -12,6 +12,7 @@ from lemmo_apps.logistics.models.shipment import (
     ShipmentTracking,
 )
 from lemmo_apps.logistics.models.driver import Driver, DriverLicense, DriverSchedule
+from lemmo_apps.totals import defer_totals
 from lemmo_apps.location.models.facility import Facility
 from lemmo_apps.inventory.models.product import Product
 from django.contrib.auth import get_user_model
@@ -512,45 +513,47 @@ class Command(BaseCommand):
 
             # Generate shipment items
             num_items = random.randint(1, 5)
-            for j in range(num_items):
-                item_data = {
-                    "shipment": shipment,
-                    "product_name": fake.word().title(),
-                    "quantity": random.randint(1, 100),
-                    "unit_price": Decimal(str(random.uniform(5.0, 500.0))).quantize(
-                        Decimal("0.01")
-                    ),
-                    "total_price": Decimal(str(random.uniform(5.0, 5000.0))).quantize(
-                        Decimal("0.01")
-                    ),
-                    "weight_kg": Decimal(str(random.uniform(0.1, 50.0))).quantize(
-                        Decimal("0.01")
-                    )
-                    if random.choice([True, False])
-                    else None,
-                    "dimensions_cm": f"{random.randint(1, 50)}x{random.randint(1, 30)}x{random.randint(1, 20)}"
-                    if random.choice([True, False])
-                    else None,
-                    "requires_refrigeration": random.choice([True, False]),
-                    "is_hazardous": random.choice([True, False]),
-                    "is_fragile": random.choice([True, False]),
-                    "special_handling_instructions": fake.text(max_nb_chars=200)
-                    if random.choice([True, False])
-                    else None,
-                    "batch_number": f"B{fake.unique.random_number(digits=6)}"
-                    if random.choice([True, False])
-                    else None,
-                    "expiration_date": fake.date_between(
-                        start_date="today", end_date="+2y"
-                    )
-                    if random.choice([True, False])
-                    else None,
-                    "notes": fake.text(max_nb_chars=200)
-                    if random.choice([True, False])
-                    else None,
-                }
+            # Recalculate the totals once, not after every line
+            with defer_totals():
+                for j in range(num_items):
+                    item_data = {
+                        "shipment": shipment,
+                        "product_name": fake.word().title(),
+                        "quantity": random.randint(1, 100),
+                        "unit_price": Decimal(str(random.uniform(5.0, 500.0))).quantize(
+                            Decimal("0.01")
+                        ),
+                        "total_price": Decimal(str(random.uniform(5.0, 5000.0))).quantize(
+                            Decimal("0.01")
+                        ),
+                        "weight_kg": Decimal(str(random.uniform(0.1, 50.0))).quantize(
+                            Decimal("0.01")
+                        )
+                        if random.choice([True, False])
+                        else None,
+                        "dimensions_cm": f"{random.randint(1, 50)}x{random.randint(1, 30)}x{random.randint(1, 20)}"
+                        if random.choice([True, False])
+                        else None,
+                        "requires_refrigeration": random.choice([True, False]),
+                        "is_hazardous": random.choice([True, False]),
+                        "is_fragile": random.choice([True, False]),
+                        "special_handling_instructions": fake.text(max_nb_chars=200)
+                        if random.choice([True, False])
+                        else None,
+                        "batch_number": f"B{fake.unique.random_number(digits=6)}"
+                        if random.choice([True, False])
+                        else None,
+                        "expiration_date": fake.date_between(
+                            start_date="today", end_date="+2y"
+                        )
+                        if random.choice([True, False])
+                        else None,
+                        "notes": fake.text(max_nb_chars=200)
+                        if random.choice([True, False])
+                        else None,
+                    }
 
-                ShipmentItem.objects.create(**item_data)
+                    ShipmentItem.objects.create(**item_data)
 
             # Generate shipment tracking events
             num_events = random.randint(1, 5)
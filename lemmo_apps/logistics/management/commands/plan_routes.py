@@ -0,0 +1,65 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from lemmo_apps.location.models.facility import Facility
+from lemmo_apps.logistics.services.routing import DEFAULT_TIME_LIMIT, plan_routes
+
+
+class Command(BaseCommand):
+    help = "Plan delivery routes for a depot's pending shipments"
+
+    def add_arguments(self, parser):
+        parser.add_argument("depot", help="Id of the depot facility")
+        parser.add_argument(
+            "--date",
+            type=date.fromisoformat,
+            help="Day to plan, YYYY-MM-DD (default: today)",
+        )
+        parser.add_argument(
+            "--time-limit",
+            type=float,
+            default=DEFAULT_TIME_LIMIT,
+            help=f"Seconds to spend improving the routes (default: {DEFAULT_TIME_LIMIT})",
+        )
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Print the plan without saving routes or assigning shipments",
+        )
+
+    def handle(self, *args, **options):
+        try:
+            depot = Facility.objects.get(id=options["depot"])
+        except Facility.DoesNotExist:
+            raise CommandError(f"Facility {options['depot']} not found")
+
+        day = options["date"] or timezone.now().date()
+        self.stdout.write(f"Planning routes from {depot} for {day}...")
+        try:
+            plan = plan_routes(
+                depot,
+                day,
+                time_limit=options["time_limit"],
+                commit=not options["dry_run"],
+            )
+        except ValueError as exc:
+            raise CommandError(str(exc))
+
+        for route in plan["routes"]:
+            self.stdout.write(
+                f"{route.name}: {len(route.planned_stops)} stops, "
+                f"{route.estimated_distance} km, {route.estimated_duration} min"
+            )
+        for shipment in plan["unassigned"]:
+            self.stdout.write(
+                self.style.WARNING(f"Unassigned: {shipment.shipment_number}")
+            )
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Planned {len(plan['routes'])} routes covering "
+                f"{plan['distance_km']} km"
+            )
+        )
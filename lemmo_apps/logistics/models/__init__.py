@@ -1,6 +1,12 @@
 from .vehicle import Vehicle, VehicleMaintenance, VehicleDriver
 from .route import Route, RouteStop, DeliveryZone
-from .shipment import Shipment, ShipmentItem, ShipmentTracking
+from .shipment import (
+    Shipment,
+    ShipmentItem,
+    ShipmentTracking,
+    ShipmentTrackingRollup,
+    ShipmentColdChainState,
+)
 from .driver import Driver, DriverLicense, DriverSchedule
 
 __all__ = [
@@ -13,6 +19,8 @@ __all__ = [
     "Shipment",
     "ShipmentItem",
     "ShipmentTracking",
+    "ShipmentTrackingRollup",
+    "ShipmentColdChainState",
     "Driver",
     "DriverLicense",
     "DriverSchedule",
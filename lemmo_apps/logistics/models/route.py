@@ -135,6 +135,13 @@ class RouteStop(UUIDModel, TimeDataStampedModel):
     facility = models.ForeignKey(
         Facility, on_delete=models.CASCADE, related_name="route_stops"
     )
+    shipment = models.ForeignKey(
+        "Shipment",
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name="route_stops",
+    )
     address = models.TextField()
     latitude = models.DecimalField(
         max_digits=9, decimal_places=6, blank=True, null=True
@@ -250,6 +257,12 @@ class DeliveryZone(UUIDModel, TimeDataStampedModel):
     class Meta:
         db_table = "tblDeliveryZones"
         ordering = ["name"]
+        indexes = [
+            models.Index(
+                fields=["center_latitude", "center_longitude"],
+                name="delivery_zone_geo_idx",
+            ),
+        ]
 
     def __str__(self):
         return f"{self.name} ({self.get_zone_type_display()})"
@@ -1,8 +1,11 @@
 from django.db import models
+from django.db.models import Count, Sum
 from django.conf import settings
+from django.utils import timezone
 from core.models import UUIDModel, TimeDataStampedModel
 from simple_history.models import HistoricalRecords
 from lemmo_apps.location.models.facility import Facility
+from lemmo_apps.totals import recalculate
 
 
 class Shipment(UUIDModel, TimeDataStampedModel):
@@ -168,19 +171,28 @@ class Shipment(UUIDModel, TimeDataStampedModel):
 
     def calculate_totals(self):
         """Calculate shipment totals"""
-        total_weight = sum(item.weight for item in self.items.all() if item.weight)
-        total_volume = sum(item.volume for item in self.items.all() if item.volume)
-        package_count = self.items.count()
-
-        self.total_weight = total_weight
-        self.total_volume = total_volume
-        self.package_count = package_count
+        totals = self.items.aggregate(
+            total_weight=Sum("weight"),
+            total_volume=Sum("volume"),
+            package_count=Count("id"),
+        )
+        self.total_weight = totals["total_weight"] or 0
+        self.total_volume = totals["total_volume"] or 0
+        self.package_count = totals["package_count"]
 
         # Calculate total cost
         total_cost = (self.shipping_cost or 0) + (self.insurance_cost or 0)
         self.total_cost = total_cost
 
-        self.save()
+        self.save(
+            update_fields=[
+                "total_weight",
+                "total_volume",
+                "package_count",
+                "total_cost",
+                "updated_at",
+            ]
+        )
 
 
 class ShipmentItem(models.Model):
@@ -231,6 +243,16 @@ class ShipmentItem(models.Model):
     def __str__(self):
         return f"{self.shipment.shipment_number} - {self.product.name}"
 
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        # Update shipment totals, once per bulk operation under defer_totals
+        recalculate(self.shipment)
+
+    def delete(self, *args, **kwargs):
+        result = super().delete(*args, **kwargs)
+        recalculate(self.shipment)
+        return result
+
     @property
     def is_expired(self):
         from django.utils import timezone
@@ -269,7 +291,8 @@ class ShipmentTracking(models.Model):
         Shipment, on_delete=models.CASCADE, related_name="tracking_events"
     )
     event_type = models.CharField(max_length=20, choices=TRACKING_EVENTS)
-    event_time = models.DateTimeField(auto_now_add=True)
+    # Not auto_now_add: bulk-ingested readings carry the device's own time.
+    event_time = models.DateTimeField(default=timezone.now)
     location = models.CharField(max_length=255, blank=True, null=True)
     description = models.TextField()
     latitude = models.DecimalField(
@@ -306,8 +329,123 @@ class ShipmentTracking(models.Model):
     class Meta:
         db_table = "tblShipmentTracking"
         ordering = ["-event_time"]
+        indexes = [
+            models.Index(fields=["event_time", "id"], name="shipment_trk_time_id_idx"),
+            models.Index(
+                fields=["shipment", "event_time"],
+                name="shipment_trk_shipment_time_idx",
+            ),
+        ]
 
     def __str__(self):
         return (
             f"{self.shipment.shipment_number} - {self.event_type} at {self.event_time}"
         )
+
+
+class ShipmentTrackingRollup(models.Model):
+    """Location updates older than the raw retention, summarised per bucket.
+
+    Averages are kept with the number of readings behind them so buckets can
+    be merged into coarser ones.
+    """
+
+    RESOLUTIONS = [
+        ("MINUTE", "Per minute"),
+        ("HOUR", "Per hour"),
+    ]
+
+    shipment = models.ForeignKey(
+        Shipment, on_delete=models.CASCADE, related_name="tracking_rollups"
+    )
+    resolution = models.CharField(max_length=10, choices=RESOLUTIONS)
+    bucket_start = models.DateTimeField()
+    reading_count = models.PositiveIntegerField(default=0)
+
+    temperature_count = models.PositiveIntegerField(default=0)
+    min_temperature = models.DecimalField(
+        max_digits=5, decimal_places=2, blank=True, null=True
+    )
+    max_temperature = models.DecimalField(
+        max_digits=5, decimal_places=2, blank=True, null=True
+    )
+    avg_temperature = models.DecimalField(
+        max_digits=5, decimal_places=2, blank=True, null=True
+    )
+    humidity_count = models.PositiveIntegerField(default=0)
+    avg_humidity = models.DecimalField(
+        max_digits=5, decimal_places=2, blank=True, null=True
+    )
+
+    # Last known position in the bucket
+    last_event_time = models.DateTimeField()
+    location = models.CharField(max_length=255, blank=True, null=True)
+    latitude = models.DecimalField(
+        max_digits=9, decimal_places=6, blank=True, null=True
+    )
+    longitude = models.DecimalField(
+        max_digits=9, decimal_places=6, blank=True, null=True
+    )
+
+    class Meta:
+        db_table = "tblShipmentTrackingRollups"
+        ordering = ["bucket_start"]
+        constraints = [
+            models.UniqueConstraint(
+                fields=["shipment", "resolution", "bucket_start"],
+                name="shipment_trk_rollup_bucket_uniq",
+            )
+        ]
+
+    def __str__(self):
+        return f"{self.shipment_id} {self.resolution} {self.bucket_start}"
+
+
+class ShipmentColdChainState(models.Model):
+    """Running cold-chain summary of a shipment's temperature readings.
+
+    Updated as readings arrive so an excursion is detected from this row and
+    the new reading alone, without reading the tracking history back.
+    """
+
+    shipment = models.OneToOneField(
+        Shipment, on_delete=models.CASCADE, related_name="cold_chain_state"
+    )
+
+    # Allowed range for the shipment as a whole; null means unbounded.
+    min_allowed = models.DecimalField(
+        max_digits=5, decimal_places=2, blank=True, null=True
+    )
+    max_allowed = models.DecimalField(
+        max_digits=5, decimal_places=2, blank=True, null=True
+    )
+
+    # Rolling statistics
+    reading_count = models.PositiveIntegerField(default=0)
+    min_temperature = models.DecimalField(
+        max_digits=5, decimal_places=2, blank=True, null=True
+    )
+    max_temperature = models.DecimalField(
+        max_digits=5, decimal_places=2, blank=True, null=True
+    )
+    last_temperature = models.DecimalField(
+        max_digits=5, decimal_places=2, blank=True, null=True
+    )
+    last_reading_at = models.DateTimeField(blank=True, null=True)
+    minutes_out_of_range = models.FloatField(default=0)
+
+    # Excursions
+    excursion_count = models.PositiveIntegerField(default=0)
+    excursion_started_at = models.DateTimeField(blank=True, null=True)
+
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = "tblShipmentColdChainState"
+
+    def __str__(self):
+        return f"{self.shipment_id} cold chain"
+
+    @property
+    def in_excursion(self):
+        return self.excursion_started_at is not None
@@ -1,7 +1,17 @@
 import graphene
 from graphene_django import DjangoObjectType
 from .models.vehicle import Vehicle, VehicleMaintenance, VehicleDriver
-from .models.shipment import Shipment, ShipmentItem, ShipmentTracking
+from .models.shipment import (
+    Shipment,
+    ShipmentColdChainState,
+    ShipmentItem,
+    ShipmentTracking,
+)
+from .models.route import DeliveryZone, Route, RouteStop
+from .services.tracking_history import DEFAULT_MAX_POINTS, tracking_series
+from .services.zones import zone_for_point
+from lemmo_apps.gql.pagination import CountableConnection, KeysetConnectionField
+from lemmo_apps.gql.optimizer import optimize_queryset
 
 
 class VehicleType(DjangoObjectType):
@@ -10,6 +20,11 @@ class VehicleType(DjangoObjectType):
         fields = "__all__"
 
 
+class VehicleConnection(CountableConnection):
+    class Meta:
+        node = VehicleType
+
+
 class VehicleMaintenanceType(DjangoObjectType):
     class Meta:
         model = VehicleMaintenance
@@ -28,6 +43,11 @@ class ShipmentType(DjangoObjectType):
         fields = "__all__"
 
 
+class ShipmentConnection(CountableConnection):
+    class Meta:
+        node = ShipmentType
+
+
 class ShipmentItemType(DjangoObjectType):
     class Meta:
         model = ShipmentItem
@@ -40,6 +60,54 @@ class ShipmentTrackingType(DjangoObjectType):
         fields = "__all__"
 
 
+class ShipmentTrackingConnection(CountableConnection):
+    class Meta:
+        node = ShipmentTrackingType
+
+
+class TrackingPointType(graphene.ObjectType):
+    time = graphene.DateTime()
+    reading_count = graphene.Int()
+    min_temperature = graphene.Decimal()
+    max_temperature = graphene.Decimal()
+    avg_temperature = graphene.Decimal()
+    avg_humidity = graphene.Decimal()
+    location = graphene.String()
+    latitude = graphene.Decimal()
+    longitude = graphene.Decimal()
+
+
+class TrackingSeriesType(graphene.ObjectType):
+    bucket_seconds = graphene.Int(description="0 when points are raw readings")
+    points = graphene.List(TrackingPointType)
+
+
+class ShipmentColdChainStateType(DjangoObjectType):
+    class Meta:
+        model = ShipmentColdChainState
+        fields = "__all__"
+
+    in_excursion = graphene.Boolean()
+
+
+class RouteType(DjangoObjectType):
+    class Meta:
+        model = Route
+        fields = "__all__"
+
+
+class RouteStopType(DjangoObjectType):
+    class Meta:
+        model = RouteStop
+        fields = "__all__"
+
+
+class DeliveryZoneType(DjangoObjectType):
+    class Meta:
+        model = DeliveryZone
+        fields = "__all__"
+
+
 class Query(graphene.ObjectType):
     # Vehicle queries
     vehicles = graphene.List(
@@ -54,6 +122,17 @@ class Query(graphene.ObjectType):
         offset=graphene.Int(),
     )
 
+    vehicles_connection = KeysetConnectionField(
+        VehicleConnection,
+        ordering=("vehicle_id", "id"),
+        vehicle_type=graphene.String(),
+        status=graphene.String(),
+        is_active=graphene.Boolean(),
+        is_refrigerated=graphene.Boolean(),
+        has_gps_tracking=graphene.Boolean(),
+        assigned_driver=graphene.UUID(),
+    )
+
     vehicle = graphene.Field(VehicleType, id=graphene.UUID(required=True))
 
     vehicle_by_id = graphene.Field(
@@ -94,6 +173,20 @@ class Query(graphene.ObjectType):
         offset=graphene.Int(),
     )
 
+    shipments_connection = KeysetConnectionField(
+        ShipmentConnection,
+        ordering=("-created_at", "-id"),
+        shipment_type=graphene.String(),
+        status=graphene.String(),
+        priority=graphene.String(),
+        origin_facility=graphene.UUID(),
+        destination_facility=graphene.UUID(),
+        assigned_driver=graphene.UUID(),
+        assigned_vehicle=graphene.UUID(),
+        requires_refrigeration=graphene.Boolean(),
+        is_hazardous=graphene.Boolean(),
+    )
+
     shipment = graphene.Field(ShipmentType, id=graphene.UUID(required=True))
 
     shipment_by_number = graphene.Field(
@@ -118,6 +211,34 @@ class Query(graphene.ObjectType):
         offset=graphene.Int(),
     )
 
+    shipment_tracking_connection = KeysetConnectionField(
+        ShipmentTrackingConnection,
+        ordering=("-event_time", "-id"),
+        shipment_id=graphene.UUID(),
+        event_type=graphene.String(),
+    )
+
+    tracking_series = graphene.Field(
+        TrackingSeriesType,
+        shipment_id=graphene.UUID(required=True),
+        start=graphene.DateTime(),
+        end=graphene.DateTime(),
+        max_points=graphene.Int(default_value=DEFAULT_MAX_POINTS),
+    )
+
+    # Cold chain queries
+    cold_chain_state = graphene.Field(
+        ShipmentColdChainStateType, shipment_id=graphene.UUID(required=True)
+    )
+    open_excursions = graphene.List(ShipmentColdChainStateType)
+
+    # Delivery zone queries
+    zone_for_point = graphene.Field(
+        DeliveryZoneType,
+        lat=graphene.Float(required=True),
+        lng=graphene.Float(required=True),
+    )
+
     # Healthcare specific queries
     refrigerated_vehicles = graphene.List(VehicleType)
     available_vehicles = graphene.List(VehicleType)
@@ -142,7 +263,7 @@ class Query(graphene.ObjectType):
         limit=None,
         offset=None,
     ):
-        queryset = Vehicle.objects.all()
+        queryset = optimize_queryset(Vehicle.objects.all(), info)
 
         if vehicle_type:
             queryset = queryset.filter(vehicle_type=vehicle_type)
@@ -170,6 +291,9 @@ class Query(graphene.ObjectType):
 
         return queryset
 
+    def resolve_vehicles_connection(self, info, **kwargs):
+        return Query.resolve_vehicles(self, info, **kwargs)
+
     def resolve_vehicle(self, info, id):
         return Vehicle.objects.get(id=id)
 
@@ -185,7 +309,7 @@ class Query(graphene.ObjectType):
         limit=None,
         offset=None,
     ):
-        queryset = VehicleMaintenance.objects.all()
+        queryset = optimize_queryset(VehicleMaintenance.objects.all(), info)
 
         if vehicle_id:
             queryset = queryset.filter(vehicle_id=vehicle_id)
@@ -207,7 +331,7 @@ class Query(graphene.ObjectType):
     def resolve_vehicle_drivers(
         self, info, vehicle_id=None, driver_id=None, is_active=None
     ):
-        queryset = VehicleDriver.objects.all()
+        queryset = optimize_queryset(VehicleDriver.objects.all(), info)
 
         if vehicle_id:
             queryset = queryset.filter(vehicle_id=vehicle_id)
@@ -235,7 +359,7 @@ class Query(graphene.ObjectType):
         limit=None,
         offset=None,
     ):
-        queryset = Shipment.objects.all()
+        queryset = optimize_queryset(Shipment.objects.all(), info)
 
         if shipment_type:
             queryset = queryset.filter(shipment_type=shipment_type)
@@ -272,6 +396,9 @@ class Query(graphene.ObjectType):
 
         return queryset
 
+    def resolve_shipments_connection(self, info, **kwargs):
+        return Query.resolve_shipments(self, info, **kwargs)
+
     def resolve_shipment(self, info, id):
         return Shipment.objects.get(id=id)
 
@@ -286,7 +413,7 @@ class Query(graphene.ObjectType):
         is_delivered=None,
         quality_check_passed=None,
     ):
-        queryset = ShipmentItem.objects.all()
+        queryset = optimize_queryset(ShipmentItem.objects.all(), info)
 
         if shipment_id:
             queryset = queryset.filter(shipment_id=shipment_id)
@@ -305,7 +432,7 @@ class Query(graphene.ObjectType):
     def resolve_shipment_tracking(
         self, info, shipment_id=None, event_type=None, limit=None, offset=None
     ):
-        queryset = ShipmentTracking.objects.all()
+        queryset = optimize_queryset(ShipmentTracking.objects.all(), info)
 
         if shipment_id:
             queryset = queryset.filter(shipment_id=shipment_id)
@@ -321,25 +448,57 @@ class Query(graphene.ObjectType):
 
         return queryset
 
+    def resolve_shipment_tracking_connection(self, info, **kwargs):
+        return Query.resolve_shipment_tracking(self, info, **kwargs)
+
+    def resolve_tracking_series(
+        self, info, shipment_id, start=None, end=None, max_points=DEFAULT_MAX_POINTS
+    ):
+        bucket_seconds, points = tracking_series(
+            shipment_id, start, end, max(1, min(max_points, 5000))
+        )
+        return TrackingSeriesType(
+            bucket_seconds=bucket_seconds,
+            points=[TrackingPointType(**point) for point in points],
+        )
+
+    def resolve_cold_chain_state(self, info, shipment_id):
+        return ShipmentColdChainState.objects.filter(shipment_id=shipment_id).first()
+
+    def resolve_open_excursions(self, info):
+        return optimize_queryset(
+            ShipmentColdChainState.objects.filter(
+                excursion_started_at__isnull=False
+            ).order_by("excursion_started_at"),
+            info,
+        )
+
     def resolve_refrigerated_vehicles(self, info):
-        return Vehicle.objects.filter(is_refrigerated=True, is_active=True)
+        return optimize_queryset(
+            Vehicle.objects.filter(is_refrigerated=True, is_active=True), info
+        )
 
     def resolve_available_vehicles(self, info):
-        return Vehicle.objects.filter(status="ACTIVE", assigned_driver__isnull=True)
+        return optimize_queryset(
+            Vehicle.objects.filter(status="ACTIVE", assigned_driver__isnull=True), info
+        )
 
     def resolve_active_shipments(self, info):
-        return Shipment.objects.filter(
+        queryset = Shipment.objects.filter(
             status__in=["PENDING", "ASSIGNED", "PICKED_UP", "IN_TRANSIT"]
         )
+        return optimize_queryset(queryset, info)
 
     def resolve_emergency_shipments(self, info):
-        return Shipment.objects.filter(priority="EMERGENCY")
+        return optimize_queryset(Shipment.objects.filter(priority="EMERGENCY"), info)
 
     def resolve_pending_shipments(self, info):
-        return Shipment.objects.filter(status="PENDING")
+        return optimize_queryset(Shipment.objects.filter(status="PENDING"), info)
 
     def resolve_in_transit_shipments(self, info):
-        return Shipment.objects.filter(status__in=["PICKED_UP", "IN_TRANSIT"])
+        return optimize_queryset(
+            Shipment.objects.filter(status__in=["PICKED_UP", "IN_TRANSIT"]), info
+        )
 
     def resolve_logistics_stats(self, info):
         from django.db.models import Count, Sum
@@ -378,6 +537,9 @@ class Query(graphene.ObjectType):
             "recent_shipments": recent_shipments,
         }
 
+    def resolve_zone_for_point(self, info, lat, lng):
+        return zone_for_point(lat, lng)
+
     def resolve_fleet_stats(self, info):
         from django.db.models import Count, Avg
         from django.utils import timezone
@@ -415,8 +577,85 @@ class Query(graphene.ObjectType):
         }
 
 
+class PlanRoutes(graphene.Mutation):
+    class Arguments:
+        depot_id = graphene.UUID(required=True)
+        date = graphene.Date(required=True)
+        time_limit = graphene.Float()
+
+    routes = graphene.List(RouteType)
+    unassigned_shipments = graphene.List(ShipmentType)
+    distance_km = graphene.Float()
+    success = graphene.Boolean()
+    message = graphene.String()
+
+    def mutate(self, info, depot_id, date, time_limit=None):
+        from lemmo_apps.location.models.facility import Facility
+        from .services.routing import DEFAULT_TIME_LIMIT, plan_routes
+
+        try:
+            depot = Facility.objects.get(id=depot_id)
+            plan = plan_routes(depot, date, time_limit=time_limit or DEFAULT_TIME_LIMIT)
+            return PlanRoutes(
+                routes=plan["routes"],
+                unassigned_shipments=plan["unassigned"],
+                distance_km=plan["distance_km"],
+                success=True,
+                message=(
+                    f"Planned {len(plan['routes'])} routes, "
+                    f"{len(plan['unassigned'])} shipments unassigned"
+                ),
+            )
+        except Facility.DoesNotExist:
+            return PlanRoutes(success=False, message="Depot not found")
+        except ValueError as e:
+            return PlanRoutes(success=False, message=str(e))
+
+
+class ShipmentItemInput(graphene.InputObjectType):
+    product_id = graphene.UUID(required=True)
+    quantity = graphene.Int(required=True)
+    weight = graphene.Decimal()
+    volume = graphene.Decimal()
+    batch_number = graphene.String()
+    lot_number = graphene.String()
+    expiration_date = graphene.Date()
+    requires_refrigeration = graphene.Boolean()
+    temperature_requirements = graphene.String()
+    notes = graphene.String()
+
+
+class AddShipmentItems(graphene.Mutation):
+    class Arguments:
+        shipment_id = graphene.UUID(required=True)
+        items = graphene.List(graphene.NonNull(ShipmentItemInput), required=True)
+
+    shipment = graphene.Field(ShipmentType)
+    items = graphene.List(ShipmentItemType)
+    success = graphene.Boolean()
+    message = graphene.String()
+
+    def mutate(self, info, shipment_id, items):
+        from .services.shipments import add_shipment_items
+
+        try:
+            shipment = Shipment.objects.get(id=shipment_id)
+            created = add_shipment_items(shipment, [dict(item) for item in items])
+            return AddShipmentItems(
+                shipment=shipment,
+                items=created,
+                success=True,
+                message=f"Added {len(created)} items",
+            )
+        except Shipment.DoesNotExist:
+            return AddShipmentItems(success=False, message="Shipment not found")
+        except ValueError as e:
+            return AddShipmentItems(success=False, message=str(e))
+
+
 class Mutation(graphene.ObjectType):
-    pass
+    plan_routes = PlanRoutes.Field()
+    add_shipment_items = AddShipmentItems.Field()
 
 
 schema = graphene.Schema(query=Query, mutation=Mutation)
@@ -0,0 +1,286 @@
+"""Incremental cold-chain excursion detection for shipment telemetry.
+
+Each shipment keeps a ``ShipmentColdChainState`` row with its rolling
+temperature statistics and whether an excursion is open, so a batch of new
+readings is checked against that row alone rather than the tracking history.
+A reading that takes a shipment out of range opens an excursion and raises an
+``EXCEPTION`` tracking event; items whose own range it breaks fail quality
+check.
+
+Allowed ranges come, most specific first, from the item's
+``temperature_requirements``, the product's ``storage_type``, the shipment's
+``temperature_requirements``, the assigned vehicle's ``temperature_range`` and
+finally ``requires_refrigeration``. The shipment's range is the intersection
+of its own range and those of its items.
+"""
+
+import re
+from decimal import Decimal
+
+from django.db.models import Case, F, TextField, Value, When
+from django.db.models.functions import Concat
+from django.utils import timezone
+
+from lemmo_apps.logistics.models.shipment import (
+    Shipment,
+    ShipmentColdChainState,
+    ShipmentItem,
+    ShipmentTracking,
+)
+
+# storage_type -> (min, max) in Celsius
+STORAGE_LIMITS = {
+    "REFRIGERATED": (Decimal("2"), Decimal("8")),
+    "FROZEN": (Decimal("-25"), Decimal("-15")),
+    "ULTRA_COLD": (Decimal("-80"), Decimal("-60")),
+    "CONTROLLED": (Decimal("15"), Decimal("25")),
+}
+REFRIGERATED_LIMITS = STORAGE_LIMITS["REFRIGERATED"]
+
+QUALITY_NOTE = "Failed cold-chain check: temperature left the allowed range."
+
+# A sign only counts at the start or after whitespace or "(", so the dash in
+# "2-8°C" or "2°C-8°C" separates a range instead of negating its upper bound.
+_NUMBER = re.compile(r"(?:(?<![^\s(])[-+])?(?<![\d.])\d+(?:\.\d+)?")
+_UPPER_BOUND_WORDS = ("below", "under", "max", "up to", "<")
+_LOWER_BOUND_WORDS = ("above", "over", "min", "at least", ">")
+
+
+def parse_range(text):
+    """Read ``(min, max)`` from text such as ``"2-8°C"`` or ``"below -15"``.
+
+    Either bound may be ``None`` for an open range. Returns ``None`` when no
+    range can be read, e.g. for a bare setpoint like ``"-20°C"``.
+    """
+    if not text:
+        return None
+    text = text.lower().replace("−", "-").replace("–", " to ")
+    numbers = [Decimal(number) for number in _NUMBER.findall(text)]
+    if len(numbers) >= 2:
+        low, high = sorted(numbers[:2])
+        return low, high
+    if len(numbers) == 1:
+        if any(word in text for word in _UPPER_BOUND_WORDS):
+            return None, numbers[0]
+        if any(word in text for word in _LOWER_BOUND_WORDS):
+            return numbers[0], None
+    return None
+
+
+def _intersect(*ranges):
+    ranges = [limits for limits in ranges if limits is not None]
+    if not ranges:
+        return None
+    lows = [low for low, _ in ranges if low is not None]
+    highs = [high for _, high in ranges if high is not None]
+    return (max(lows) if lows else None, min(highs) if highs else None)
+
+
+def _out_of_range(temperature, limits):
+    low, high = limits
+    return (low is not None and temperature < low) or (
+        high is not None and temperature > high
+    )
+
+
+def format_range(limits):
+    low, high = limits
+    if low is None:
+        return f"at most {high}°C"
+    if high is None:
+        return f"at least {low}°C"
+    return f"{low} to {high}°C"
+
+
+def resolve_limits(shipment_ids):
+    """Return ``{shipment_id: {"limits", "items", "passed"}}``.
+
+    ``limits`` is the shipment's ``(min, max)`` or ``None`` when nothing about
+    it is temperature controlled, ``items`` maps item ids to their own
+    ranges, and ``passed`` holds the items that have not failed quality check.
+    """
+    config = {}
+    for pk, requirements, refrigerated, vehicle_range in Shipment.objects.filter(
+        pk__in=shipment_ids
+    ).values_list(
+        "pk",
+        "temperature_requirements",
+        "requires_refrigeration",
+        "assigned_vehicle__temperature_range",
+    ):
+        base = parse_range(requirements) or parse_range(vehicle_range)
+        if base is None and refrigerated:
+            base = REFRIGERATED_LIMITS
+        config[pk] = {"base": base, "items": {}, "passed": set()}
+
+    for (
+        pk,
+        shipment_id,
+        requirements,
+        refrigerated,
+        storage_type,
+        passed,
+    ) in ShipmentItem.objects.filter(shipment_id__in=shipment_ids).values_list(
+        "pk",
+        "shipment_id",
+        "temperature_requirements",
+        "requires_refrigeration",
+        "product__storage_type",
+        "quality_check_passed",
+    ):
+        shipment = config[shipment_id]
+        limits = (
+            parse_range(requirements)
+            or STORAGE_LIMITS.get(storage_type)
+            or shipment["base"]
+            or (REFRIGERATED_LIMITS if refrigerated else None)
+        )
+        if limits is None:
+            continue
+        shipment["items"][pk] = limits
+        if passed:
+            shipment["passed"].add(pk)
+
+    for shipment in config.values():
+        shipment["limits"] = _intersect(
+            shipment.pop("base"), *shipment["items"].values()
+        )
+    return config
+
+
+def _lock_states(shipment_ids):
+    ShipmentColdChainState.objects.bulk_create(
+        [ShipmentColdChainState(shipment_id=pk) for pk in shipment_ids],
+        ignore_conflicts=True,
+    )
+    return {
+        state.shipment_id: state
+        for state in ShipmentColdChainState.objects.select_for_update().filter(
+            shipment_id__in=shipment_ids
+        )
+    }
+
+
+def _exception_event(reading, limits):
+    low, high = limits
+    return ShipmentTracking(
+        shipment_id=reading.shipment_id,
+        event_type="EXCEPTION",
+        event_time=reading.event_time,
+        location=reading.location,
+        description=(
+            f"Temperature excursion: {reading.temperature}°C outside "
+            f"{format_range(limits)}"
+        ),
+        latitude=reading.latitude,
+        longitude=reading.longitude,
+        temperature=reading.temperature,
+        humidity=reading.humidity,
+        metadata={
+            "cold_chain": "excursion",
+            "min_allowed": None if low is None else str(low),
+            "max_allowed": None if high is None else str(high),
+        },
+    )
+
+
+def _apply(state, reading, config, failed):
+    """Fold one reading into ``state``; return an exception event or ``None``."""
+    temperature, at = reading.temperature, reading.event_time
+
+    state.reading_count += 1
+    if state.min_temperature is None or temperature < state.min_temperature:
+        state.min_temperature = temperature
+    if state.max_temperature is None or temperature > state.max_temperature:
+        state.max_temperature = temperature
+
+    for item_id, limits in config["items"].items():
+        if item_id in config["passed"] and _out_of_range(temperature, limits):
+            config["passed"].discard(item_id)
+            failed.add(item_id)
+
+    # A reading older than the last one seen still counts towards the
+    # extremes and item checks, but cannot reopen or close an excursion.
+    if state.last_reading_at is not None and at < state.last_reading_at:
+        return None
+
+    # Time between readings is out of range when the earlier one was.
+    if state.in_excursion:
+        state.minutes_out_of_range += (at - state.last_reading_at).total_seconds() / 60
+    state.last_reading_at = at
+    state.last_temperature = temperature
+
+    if not _out_of_range(temperature, config["limits"]):
+        state.excursion_started_at = None
+        return None
+    if state.in_excursion:
+        return None
+    state.excursion_started_at = at
+    state.excursion_count += 1
+    return _exception_event(reading, config["limits"])
+
+
+def evaluate_readings(readings):
+    """Check newly stored readings against their shipments' cold-chain state.
+
+    Must run inside a transaction: the state rows are locked so concurrent
+    batches for the same shipment are applied one after the other. Returns
+    the ``EXCEPTION`` events created.
+    """
+    readings = sorted(
+        (reading for reading in readings if reading.temperature is not None),
+        key=lambda reading: reading.event_time,
+    )
+    if not readings:
+        return []
+
+    config = resolve_limits({reading.shipment_id for reading in readings})
+    monitored = {pk for pk, shipment in config.items() if shipment["limits"]}
+    if not monitored:
+        return []
+    states = _lock_states(monitored)
+
+    exceptions, failed = [], set()
+    for reading in readings:
+        if reading.shipment_id not in monitored:
+            continue
+        event = _apply(
+            states[reading.shipment_id], reading, config[reading.shipment_id], failed
+        )
+        if event is not None:
+            exceptions.append(event)
+
+    now = timezone.now()
+    for pk, state in states.items():
+        state.min_allowed, state.max_allowed = config[pk]["limits"]
+        state.updated_at = now
+    ShipmentColdChainState.objects.bulk_update(
+        states.values(),
+        [
+            "min_allowed",
+            "max_allowed",
+            "reading_count",
+            "min_temperature",
+            "max_temperature",
+            "last_temperature",
+            "last_reading_at",
+            "minutes_out_of_range",
+            "excursion_count",
+            "excursion_started_at",
+            "updated_at",
+        ],
+    )
+    ShipmentTracking.objects.bulk_create(exceptions)
+    if failed:
+        ShipmentItem.objects.filter(pk__in=failed).update(
+            quality_check_passed=False,
+            quality_notes=Case(
+                When(quality_notes__isnull=True, then=Value(QUALITY_NOTE)),
+                default=Concat(
+                    F("quality_notes"),
+                    Value("\n" + QUALITY_NOTE),
+                    output_field=TextField(),
+                ),
+            ),
+        )
+    return exceptions
@@ -0,0 +1,496 @@
+"""Daily delivery route planning.
+
+``plan_routes`` assigns a depot's pending shipments to its available vehicles
+and writes one planned ``Route`` per vehicle used, with a ``RouteStop`` per
+shipment in driving order. It solves a capacitated vehicle routing problem
+with time windows:
+
+* distances are haversine distances between facility coordinates, scaled by
+  ``ROAD_FACTOR``, held in a NumPy matrix; travel times assume
+  ``AVERAGE_SPEED_KMH``;
+* every vehicle leaves the depot at ``SHIFT_START`` and must be back within
+  ``SHIFT_HOURS``; a shipment with a ``delivery_time`` on the planned day must
+  be reached by then;
+* a vehicle's total ``weight``/``volume`` may not exceed its capacity, and
+  shipments that need refrigeration only go on refrigerated vehicles.
+
+Routes are built by regret insertion (the shipment that would lose most by
+waiting is placed first, emergencies before everything else), then improved
+by relocating shipments between routes and 2-opt within each route until no
+move helps or the time limit is reached.
+"""
+
+import time as monotonic_time
+from datetime import datetime, time, timedelta
+from decimal import Decimal
+
+import numpy as np
+from django.db import transaction
+from django.db.models import Exists, OuterRef, Q
+from django.utils import timezone
+
+from lemmo_apps.location.services.geo import EARTH_RADIUS_KM
+from lemmo_apps.logistics.models.route import Route, RouteStop
+from lemmo_apps.logistics.models.shipment import Shipment
+from lemmo_apps.logistics.models.vehicle import Vehicle
+
+ROAD_FACTOR = 1.3
+AVERAGE_SPEED_KMH = 40.0
+SERVICE_MINUTES = 15
+SHIFT_START = time(8, 0)
+SHIFT_HOURS = 10
+DEFAULT_TIME_LIMIT = 5.0
+
+PRIORITY_RANK = {"EMERGENCY": 4, "URGENT": 3, "HIGH": 2, "NORMAL": 1, "LOW": 0}
+
+EPS = 1e-6
+
+
+def distance_matrix(coordinates):
+    """Estimated road distance in km between every pair of (lat, lng) points."""
+    points = np.radians(np.asarray(coordinates, dtype=float))
+    lat = points[:, :1]
+    lng = points[:, 1:]
+    a = (
+        np.sin((lat - lat.T) / 2) ** 2
+        + np.cos(lat) * np.cos(lat.T) * np.sin((lng - lng.T) / 2) ** 2
+    )
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(a, 0, 1))) * ROAD_FACTOR
+
+
+class _Solver:
+    """Regret insertion plus local search over node indices; 0 is the depot.
+
+    ``earliest``/``latest``/``service`` are minutes from the shift start.
+    Vehicle capacities of ``inf`` mean unlimited.
+    """
+
+    def __init__(
+        self,
+        distance,
+        earliest,
+        latest,
+        service,
+        weight,
+        volume,
+        cold,
+        priority,
+        capacity_weight,
+        capacity_volume,
+        refrigerated,
+    ):
+        self.distance = distance
+        self.travel = distance / AVERAGE_SPEED_KMH * 60.0
+        self.earliest = earliest
+        self.latest = latest
+        self.service = service
+        self.weight = weight
+        self.volume = volume
+        self.cold = cold
+        self.priority = priority
+        self.capacity_weight = capacity_weight
+        self.capacity_volume = capacity_volume
+        self.refrigerated = refrigerated
+
+        vehicle_count = len(capacity_weight)
+        self.routes = [[] for _ in range(vehicle_count)]
+        self.load_weight = np.zeros(vehicle_count)
+        self.load_volume = np.zeros(vehicle_count)
+        self.timings = [self._timing([]) for _ in range(vehicle_count)]
+
+    def _timing(self, route):
+        """Schedule a route, or ``None`` if it breaks a time window.
+
+        Returns ``(seq, depart, arrival, start, push)`` where ``seq`` is the
+        route wrapped in depot visits and ``push[q]`` is how much later the
+        vehicle could arrive at ``seq[q]`` without breaking any later window.
+        """
+        seq = np.array([0, *route, 0])
+        size = len(seq)
+        depart = np.zeros(size)
+        arrival = np.zeros(size)
+        start = np.zeros(size)
+        for q in range(1, size):
+            node = seq[q]
+            arrival[q] = depart[q - 1] + self.travel[seq[q - 1], node]
+            start[q] = max(arrival[q], self.earliest[node])
+            if start[q] > self.latest[node] + EPS:
+                return None
+            depart[q] = start[q] + self.service[node]
+
+        push = np.zeros(size)
+        push[-1] = self.latest[0] - arrival[-1]
+        for q in range(size - 2, 0, -1):
+            node = seq[q]
+            push[q] = (start[q] - arrival[q]) + min(
+                self.latest[node] - start[q], push[q + 1]
+            )
+        return seq, depart, arrival, start, push
+
+    def _insertion(self, vehicle, candidates):
+        """Cheapest feasible insertion cost and position of each candidate."""
+        seq, depart, arrival, _, push = self.timings[vehicle]
+        before, after = seq[:-1], seq[1:]
+
+        travel = self.travel[candidates]
+        distance = self.distance[candidates]
+        earliest = self.earliest[candidates][:, None]
+        start = np.maximum(depart[:-1][None, :] + travel[:, before], earliest)
+        delay = (
+            start + self.service[candidates][:, None] + travel[:, after]
+        ) - arrival[1:][None, :]
+        feasible = (start <= self.latest[candidates][:, None] + EPS) & (
+            delay <= push[1:][None, :] + EPS
+        )
+        fits = (
+            (self.load_weight[vehicle] + self.weight[candidates])
+            <= self.capacity_weight[vehicle] + EPS
+        ) & (
+            (self.load_volume[vehicle] + self.volume[candidates])
+            <= self.capacity_volume[vehicle] + EPS
+        )
+        if not self.refrigerated[vehicle]:
+            fits &= ~self.cold[candidates]
+
+        cost = (
+            distance[:, before]
+            + distance[:, after]
+            - self.distance[before, after][None, :]
+        )
+        cost = np.where(feasible & fits[:, None], cost, np.inf)
+        position = cost.argmin(axis=1)
+        return cost[np.arange(len(candidates)), position], position
+
+    def _insert(self, vehicle, node, position):
+        self.routes[vehicle].insert(position, node)
+        self.load_weight[vehicle] += self.weight[node]
+        self.load_volume[vehicle] += self.volume[node]
+        self.timings[vehicle] = self._timing(self.routes[vehicle])
+
+    def _remove(self, vehicle, position):
+        node = self.routes[vehicle].pop(position)
+        self.load_weight[vehicle] -= self.weight[node]
+        self.load_volume[vehicle] -= self.volume[node]
+        # Dropping a stop never makes later stops later.
+        self.timings[vehicle] = self._timing(self.routes[vehicle])
+        return node
+
+    def construct(self):
+        """Regret insertion; returns the nodes that fit nowhere."""
+        unrouted = np.arange(1, len(self.distance))
+        vehicle_count = len(self.routes)
+        if not len(unrouted) or not vehicle_count:
+            return list(unrouted)
+
+        cost = np.full((len(self.distance), vehicle_count), np.inf)
+        position = np.zeros((len(self.distance), vehicle_count), dtype=int)
+        for vehicle in range(vehicle_count):
+            cost[unrouted, vehicle], position[unrouted, vehicle] = self._insertion(
+                vehicle, unrouted
+            )
+
+        while len(unrouted):
+            options = np.sort(cost[unrouted], axis=1)
+            best = options[:, 0]
+            if not np.isfinite(best).any():
+                break
+            if vehicle_count > 1:
+                # Shipments with a single feasible vehicle go first.
+                regret = np.full(len(best), 1e6)
+                second = np.isfinite(options[:, 1])
+                regret[second] = options[second, 1] - best[second]
+            else:
+                regret = -best
+            score = np.where(
+                np.isfinite(best),
+                self.priority[unrouted] * 1e9 + np.minimum(regret, 1e6),
+                -np.inf,
+            )
+            index = int(score.argmax())
+            node = unrouted[index]
+            vehicle = int(cost[node].argmin())
+            self._insert(vehicle, node, int(position[node, vehicle]))
+
+            unrouted = np.delete(unrouted, index)
+            if len(unrouted):
+                cost[unrouted, vehicle], position[unrouted, vehicle] = self._insertion(
+                    vehicle, unrouted
+                )
+        return list(unrouted)
+
+    def _relocate(self, deadline):
+        improved = False
+        for vehicle in range(len(self.routes)):
+            for node in list(self.routes[vehicle]):
+                if monotonic_time.monotonic() > deadline:
+                    return improved
+                route = self.routes[vehicle]
+                index = route.index(node)
+                before = route[index - 1] if index > 0 else 0
+                after = route[index + 1] if index + 1 < len(route) else 0
+                saving = (
+                    self.distance[before, node]
+                    + self.distance[node, after]
+                    - self.distance[before, after]
+                )
+                if saving <= EPS:
+                    continue
+
+                self._remove(vehicle, index)
+                best_cost, best_vehicle, best_position = self._best_insertion(node)
+                if best_cost < saving - EPS:
+                    self._insert(best_vehicle, node, best_position)
+                    improved = True
+                else:
+                    self._insert(vehicle, node, index)
+        return improved
+
+    def _best_insertion(self, node):
+        candidate = np.array([node])
+        best_cost, best_vehicle, best_position = np.inf, None, None
+        for vehicle in range(len(self.routes)):
+            cost, position = self._insertion(vehicle, candidate)
+            if cost[0] < best_cost:
+                best_cost, best_vehicle = cost[0], vehicle
+                best_position = int(position[0])
+        return best_cost, best_vehicle, best_position
+
+    def reinsert(self, nodes):
+        """Place nodes that did not fit during construction; returns the rest."""
+        left = []
+        for node in nodes:
+            cost, vehicle, position = self._best_insertion(node)
+            if np.isfinite(cost):
+                self._insert(vehicle, node, position)
+            else:
+                left.append(node)
+        return left
+
+    def _two_opt(self, vehicle, deadline):
+        route = self.routes[vehicle]
+        improved = False
+        changed = True
+        while changed and monotonic_time.monotonic() < deadline:
+            changed = False
+            seq = [0, *route, 0]
+            for i in range(1, len(route)):
+                for j in range(i + 1, len(route) + 1):
+                    a, b, c, d = seq[i - 1], seq[i], seq[j], seq[j + 1]
+                    delta = (
+                        self.distance[a, c]
+                        + self.distance[b, d]
+                        - self.distance[a, b]
+                        - self.distance[c, d]
+                    )
+                    if delta >= -EPS:
+                        continue
+                    candidate = route[: i - 1] + route[i - 1 : j][::-1] + route[j:]
+                    timing = self._timing(candidate)
+                    if timing is not None:
+                        route[:] = candidate
+                        self.timings[vehicle] = timing
+                        changed = improved = True
+                        break
+                if changed:
+                    break
+        return improved
+
+    def improve(self, deadline):
+        improved = True
+        while improved and monotonic_time.monotonic() < deadline:
+            improved = False
+            for vehicle in range(len(self.routes)):
+                improved |= self._two_opt(vehicle, deadline)
+            improved |= self._relocate(deadline)
+
+    def route_length(self, vehicle):
+        seq = self.timings[vehicle][0]
+        return float(self.distance[seq[:-1], seq[1:]].sum())
+
+
+def _pending_shipments(depot, day):
+    return (
+        Shipment.objects.select_for_update(skip_locked=True, of=("self",))
+        .filter(
+            Q(delivery_date__isnull=True) | Q(delivery_date__lte=day),
+            origin_facility=depot,
+            status="PENDING",
+            assigned_vehicle__isnull=True,
+        )
+        .select_related("destination_facility")
+    )
+
+
+def _available_vehicles(day):
+    """Active vehicles without a planned route departing the same day."""
+    day_start = timezone.make_aware(datetime.combine(day, time.min))
+    booked = Route.objects.filter(
+        assigned_vehicle=OuterRef("pk"),
+        status="PLANNED",
+        scheduled_departure_time__gte=day_start,
+        scheduled_departure_time__lt=day_start + timedelta(days=1),
+    )
+    return Vehicle.objects.filter(status="ACTIVE", is_active=True).exclude(
+        Exists(booked)
+    )
+
+
+def _amount(value):
+    return float(value) if value is not None else 0.0
+
+
+def _capacity(value):
+    return float(value) if value is not None else np.inf
+
+
+def plan_routes(depot, day, time_limit=DEFAULT_TIME_LIMIT, commit=True):
+    """Plan ``day``'s deliveries out of ``depot``.
+
+    Returns ``{"routes": [Route], "unassigned": [Shipment], "distance_km": km}``.
+    Routes, stops and shipment assignments are only saved when ``commit`` is
+    true; otherwise the routes are unsaved instances with their stops in
+    ``planned_stops``.
+    """
+    if depot.latitude is None or depot.longitude is None:
+        raise ValueError(f"Depot {depot} has no coordinates")
+
+    shift_start = timezone.make_aware(datetime.combine(day, SHIFT_START))
+    horizon = SHIFT_HOURS * 60.0
+
+    with transaction.atomic():
+        shipments = list(_pending_shipments(depot, day))
+        vehicles = list(_available_vehicles(day))
+
+        routable, unassigned = [], []
+        for shipment in shipments:
+            destination = shipment.destination_facility
+            if destination.latitude is None or destination.longitude is None:
+                unassigned.append(shipment)
+            else:
+                routable.append(shipment)
+
+        latest = [horizon]
+        for shipment in routable:
+            if shipment.delivery_date == day and shipment.delivery_time:
+                due = datetime.combine(day, shipment.delivery_time)
+                minutes = (due - datetime.combine(day, SHIFT_START)).total_seconds()
+                latest.append(min(minutes / 60, horizon))
+            else:
+                latest.append(horizon)
+
+        node_count = len(routable) + 1
+        solver = _Solver(
+            distance=distance_matrix(
+                [(depot.latitude, depot.longitude)]
+                + [
+                    (
+                        shipment.destination_facility.latitude,
+                        shipment.destination_facility.longitude,
+                    )
+                    for shipment in routable
+                ]
+            ),
+            earliest=np.zeros(node_count),
+            latest=np.array(latest),
+            service=np.array([0.0] + [SERVICE_MINUTES] * len(routable)),
+            weight=np.array([0.0] + [_amount(s.total_weight) for s in routable]),
+            volume=np.array([0.0] + [_amount(s.total_volume) for s in routable]),
+            cold=np.array([False] + [s.requires_refrigeration for s in routable]),
+            priority=np.array(
+                [0] + [PRIORITY_RANK.get(s.priority, 1) for s in routable]
+            ),
+            capacity_weight=np.array([_capacity(v.capacity_weight) for v in vehicles]),
+            capacity_volume=np.array([_capacity(v.capacity_volume) for v in vehicles]),
+            refrigerated=np.array([v.is_refrigerated for v in vehicles], dtype=bool),
+        )
+        deadline = monotonic_time.monotonic() + time_limit
+        leftover = solver.construct()
+        solver.improve(deadline)
+        leftover = solver.reinsert(leftover)
+        unassigned.extend(routable[node - 1] for node in leftover)
+
+        now = timezone.now()
+        routes, stops, assigned = [], [], []
+        total_distance = 0.0
+        for index, vehicle in enumerate(vehicles):
+            if not solver.routes[index]:
+                continue
+            seq, _, arrival, start, _ = solver.timings[index]
+            length = solver.route_length(index)
+            total_distance += length
+            route_shipments = [routable[node - 1] for node in solver.routes[index]]
+            route = Route(
+                name=f"{depot.name} {day:%Y-%m-%d} {vehicle.vehicle_id}",
+                route_type="DELIVERY",
+                status="PLANNED",
+                start_location=depot.name,
+                end_location=depot.name,
+                estimated_distance=Decimal(f"{length:.2f}"),
+                estimated_duration=int(round(arrival[-1])),
+                requires_refrigeration=any(
+                    s.requires_refrigeration for s in route_shipments
+                ),
+                is_hazardous_route=any(s.is_hazardous for s in route_shipments),
+                requires_special_handling=any(
+                    s.requires_special_handling for s in route_shipments
+                ),
+                assigned_driver_id=vehicle.assigned_driver_id,
+                assigned_vehicle=vehicle,
+                scheduled_departure_time=shift_start,
+                scheduled_arrival_time=shift_start + timedelta(minutes=arrival[-1]),
+            )
+            route.planned_stops = []
+            for order, shipment in enumerate(route_shipments, start=1):
+                arrives = shift_start + timedelta(minutes=start[order])
+                facility = shipment.destination_facility
+                stop = RouteStop(
+                    route=route,
+                    shipment=shipment,
+                    stop_type="DELIVERY",
+                    facility=facility,
+                    address=facility.full_address,
+                    latitude=facility.latitude,
+                    longitude=facility.longitude,
+                    sequence_order=order,
+                    estimated_arrival_time=arrives,
+                    estimated_departure_time=arrives
+                    + timedelta(minutes=SERVICE_MINUTES),
+                    requires_refrigeration=shipment.requires_refrigeration,
+                    temperature_requirements=shipment.temperature_requirements,
+                    is_hazardous_stop=shipment.is_hazardous,
+                    requires_special_handling=shipment.requires_special_handling,
+                    special_instructions=shipment.special_instructions,
+                    stop_duration=SERVICE_MINUTES,
+                )
+                route.planned_stops.append(stop)
+                stops.append(stop)
+
+                shipment.assigned_vehicle = vehicle
+                shipment.assigned_driver_id = vehicle.assigned_driver_id
+                shipment.status = "ASSIGNED"
+                shipment.assigned_at = now
+                shipment.estimated_delivery_time = arrives
+                assigned.append(shipment)
+            routes.append(route)
+
+        if commit:
+            Route.objects.bulk_create(routes)
+            RouteStop.objects.bulk_create(stops)
+            Shipment.objects.bulk_update(
+                assigned,
+                [
+                    "assigned_vehicle",
+                    "assigned_driver",
+                    "status",
+                    "assigned_at",
+                    "estimated_delivery_time",
+                ],
+            )
+        else:
+            transaction.set_rollback(True)
+
+    return {
+        "routes": routes,
+        "unassigned": unassigned,
+        "distance_km": round(total_distance, 2),
+    }
@@ -0,0 +1,38 @@
+"""Bulk line entry for shipments."""
+
+from django.db import transaction
+
+from lemmo_apps.inventory.models.product import Product
+from lemmo_apps.logistics.models.shipment import ShipmentItem
+from lemmo_apps.totals import recalculate
+
+
+def add_shipment_items(shipment, lines):
+    """Add many items to ``shipment`` with one ``INSERT`` and one recalculation.
+
+    ``lines`` are dicts of ``ShipmentItem`` field values, with the product
+    given as ``product_id``. Raises ``ValueError`` naming the first bad line;
+    nothing is saved in that case.
+    """
+    items = []
+    for index, line in enumerate(lines):
+        item = ShipmentItem(shipment=shipment, **line)
+        if not item.quantity or item.quantity < 1:
+            raise ValueError(f"Line {index + 1}: quantity must be at least 1")
+        items.append(item)
+
+    product_ids = {item.product_id for item in items}
+    known = {
+        str(pk)
+        for pk in Product.objects.filter(pk__in=product_ids).values_list(
+            "pk", flat=True
+        )
+    }
+    for index, item in enumerate(items):
+        if str(item.product_id) not in known:
+            raise ValueError(f"Line {index + 1}: unknown product {item.product_id}")
+
+    with transaction.atomic():
+        items = ShipmentItem.objects.bulk_create(items)
+        recalculate(shipment)
+    return items
@@ -0,0 +1,224 @@
+"""Bulk ingest of shipment telemetry (GPS, temperature, humidity readings).
+
+A batch of readings is validated in Python, written with one multi-row
+``INSERT`` per ``INSERT_BATCH_SIZE`` readings, and each shipment's
+``current_location`` is moved to its latest reading with a single
+``UPDATE`` for the whole batch, rather than one save per reading.
+"""
+
+import json
+import uuid
+from decimal import Decimal, InvalidOperation
+
+from django.db import transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from lemmo_apps.logistics.models.shipment import Shipment, ShipmentTracking
+from lemmo_apps.logistics.services.cold_chain import evaluate_readings
+
+MAX_READINGS = 20000
+MAX_BODY_BYTES = 16 * 1024 * 1024
+LOCATION_MAX_LENGTH = 255
+INSERT_BATCH_SIZE = 5000
+DEFAULT_EVENT_TYPE = "LOCATION_UPDATE"
+DEFAULT_DESCRIPTION = "Telemetry reading"
+
+EVENT_TYPES = {event_type for event_type, _ in ShipmentTracking.TRACKING_EVENTS}
+
+# field -> (largest absolute value the column holds, decimal places)
+DECIMAL_LIMITS = {
+    "latitude": (Decimal("90"), 6),
+    "longitude": (Decimal("180"), 6),
+    "temperature": (Decimal("999.99"), 2),
+    "humidity": (Decimal("999.99"), 2),
+}
+
+
+class TelemetryError(Exception):
+    """The request body cannot be read as a batch of readings."""
+
+
+def _lines(stream):
+    """Yield the lines of ``stream``, failing once ``MAX_BODY_BYTES`` are read."""
+    remaining = MAX_BODY_BYTES
+    while True:
+        line = stream.readline(remaining + 1)
+        if not line:
+            return
+        remaining -= len(line)
+        if remaining < 0:
+            raise TelemetryError(f"Telemetry body exceeds {MAX_BODY_BYTES} bytes")
+        yield line
+
+
+def parse_readings(stream, content_type):
+    """Read a JSON array, or NDJSON when ``content_type`` says so.
+
+    ``stream`` is a binary file object such as the request itself. NDJSON
+    bodies are read line by line and stop at the first line past
+    ``MAX_READINGS``; either form is refused beyond ``MAX_BODY_BYTES``.
+    """
+    try:
+        if "ndjson" in (content_type or ""):
+            readings = []
+            for line in _lines(stream):
+                if not line.strip():
+                    continue
+                if len(readings) == MAX_READINGS:
+                    raise TelemetryError(f"At most {MAX_READINGS} readings per request")
+                readings.append(json.loads(line))
+        else:
+            body = stream.read(MAX_BODY_BYTES + 1)
+            if len(body) > MAX_BODY_BYTES:
+                raise TelemetryError(f"Telemetry body exceeds {MAX_BODY_BYTES} bytes")
+            readings = json.loads(body)
+    except (UnicodeDecodeError, ValueError) as exc:
+        raise TelemetryError(f"Malformed telemetry body: {exc}")
+
+    if not isinstance(readings, list):
+        raise TelemetryError("Expected a JSON array of readings")
+    if len(readings) > MAX_READINGS:
+        raise TelemetryError(
+            f"At most {MAX_READINGS} readings per request, got {len(readings)}"
+        )
+    return readings
+
+
+def _text(reading, field, max_length=None):
+    value = reading.get(field)
+    if value in (None, ""):
+        return None
+    if not isinstance(value, str):
+        raise ValueError(f"{field} must be a string")
+    if max_length is not None and len(value) > max_length:
+        raise ValueError(f"{field} must be at most {max_length} characters")
+    return value
+
+
+def _decimal(field, value):
+    if value is None or value == "":
+        return None
+    limit, places = DECIMAL_LIMITS[field]
+    try:
+        number = Decimal(str(value)).quantize(Decimal(1).scaleb(-places))
+    except InvalidOperation:
+        raise ValueError(f"{field} must be a number")
+    # quantize() lets NaN through, and NaN can't be compared below.
+    if not number.is_finite():
+        raise ValueError(f"{field} must be a number")
+    if abs(number) > limit:
+        raise ValueError(f"{field} must be between -{limit} and {limit}")
+    return number
+
+
+def _build(reading, user):
+    if not isinstance(reading, dict):
+        raise ValueError("Reading must be an object")
+
+    try:
+        shipment_id = uuid.UUID(str(reading.get("shipment_id")))
+    except ValueError:
+        raise ValueError("shipment_id must be a UUID")
+
+    event_time = reading.get("event_time")
+    if event_time:
+        event_time = parse_datetime(str(event_time))
+        if event_time is None:
+            raise ValueError("event_time must be an ISO 8601 timestamp")
+        if timezone.is_naive(event_time):
+            event_time = timezone.make_aware(event_time)
+    else:
+        event_time = timezone.now()
+
+    event_type = _text(reading, "event_type") or DEFAULT_EVENT_TYPE
+    if event_type not in EVENT_TYPES:
+        raise ValueError(f"Unknown event_type '{event_type}'")
+
+    metadata = reading.get("metadata") or {}
+    if not isinstance(metadata, dict):
+        raise ValueError("metadata must be an object")
+
+    return ShipmentTracking(
+        shipment_id=shipment_id,
+        event_type=event_type,
+        event_time=event_time,
+        location=_text(reading, "location", LOCATION_MAX_LENGTH),
+        description=_text(reading, "description") or DEFAULT_DESCRIPTION,
+        latitude=_decimal("latitude", reading.get("latitude")),
+        longitude=_decimal("longitude", reading.get("longitude")),
+        temperature=_decimal("temperature", reading.get("temperature")),
+        humidity=_decimal("humidity", reading.get("humidity")),
+        recorded_by=user,
+        metadata=metadata,
+    )
+
+
+def _position(reading):
+    if reading.location:
+        return reading.location
+    if reading.latitude is not None and reading.longitude is not None:
+        return f"{reading.latitude},{reading.longitude}"
+    return None
+
+
+def ingest_readings(readings, user=None):
+    """Validate and store a batch of readings.
+
+    Returns ``{"accepted": n, "rejected": [{"index": i, "error": msg}],
+    "events": [ShipmentTracking], "excursions": [ShipmentTracking]}``.
+    Invalid readings, including ones for unknown shipments, are rejected
+    individually; the rest are stored and checked for cold-chain excursions,
+    whose ``EXCEPTION`` events are returned in ``excursions``.
+    """
+    if user is not None and not user.is_authenticated:
+        user = None
+
+    events, rejected = [], []
+    for index, reading in enumerate(readings):
+        try:
+            events.append((index, _build(reading, user)))
+        except ValueError as exc:
+            rejected.append({"index": index, "error": str(exc)})
+
+    known = set(
+        Shipment.objects.filter(
+            pk__in={event.shipment_id for _, event in events}
+        ).values_list("pk", flat=True)
+    )
+    accepted = []
+    for index, event in events:
+        if event.shipment_id in known:
+            accepted.append(event)
+        else:
+            rejected.append(
+                {"index": index, "error": f"Unknown shipment {event.shipment_id}"}
+            )
+
+    latest = {}
+    for event in accepted:
+        position = _position(event)
+        if position is None:
+            continue
+        current = latest.get(event.shipment_id)
+        if current is None or event.event_time >= current[0]:
+            latest[event.shipment_id] = (event.event_time, position)
+
+    with transaction.atomic():
+        ShipmentTracking.objects.bulk_create(accepted, batch_size=INSERT_BATCH_SIZE)
+        Shipment.objects.bulk_update(
+            [
+                Shipment(pk=shipment_id, current_location=position)
+                for shipment_id, (_, position) in latest.items()
+            ],
+            ["current_location"],
+        )
+        excursions = evaluate_readings(accepted)
+
+    rejected.sort(key=lambda rejection: rejection["index"])
+    return {
+        "accepted": len(accepted),
+        "rejected": rejected,
+        "events": accepted,
+        "excursions": excursions,
+    }
@@ -0,0 +1,367 @@
+"""Retention, downsampling and range queries for shipment location updates.
+
+Raw ``LOCATION_UPDATE`` readings are kept for ``RAW_RETENTION_DAYS`` and then
+compacted into per-minute ``ShipmentTrackingRollup`` rows, which are in turn
+compacted into per-hour rows after ``MINUTE_RETENTION_DAYS``. Milestone events
+(pick-up, delivery, exceptions, ...) are never compacted.
+
+``tracking_series`` answers "the track of this shipment between two times"
+with at most ``max_points`` points, folding whatever raw readings and rollups
+cover the range into buckets just wide enough, so a map never has to load
+every reading of a long haul.
+"""
+
+import math
+from datetime import datetime, timedelta, timezone as dt_timezone
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Count, Max, Min
+from django.utils import timezone
+
+from lemmo_apps.logistics.models.shipment import (
+    ShipmentTracking,
+    ShipmentTrackingRollup,
+)
+
+RAW_RETENTION_DAYS = 7
+MINUTE_RETENTION_DAYS = 90
+COMPACTED_EVENT_TYPES = ("LOCATION_UPDATE",)
+COMPACT_BATCH_SIZE = 5000
+DEFAULT_MAX_POINTS = 500
+
+RESOLUTIONS = {
+    "MINUTE": timedelta(minutes=1),
+    "HOUR": timedelta(hours=1),
+}
+
+# Bucket widths tried, narrowest first, when downsampling a range.
+BUCKET_WIDTHS = [
+    timedelta(minutes=minutes) for minutes in (1, 2, 5, 10, 15, 30, 60, 120, 180)
+] + [timedelta(hours=hours) for hours in (6, 12, 24)]
+
+_EPOCH = datetime(1970, 1, 1, tzinfo=dt_timezone.utc)
+_CENT = Decimal("0.01")
+
+_RAW_COLUMNS = (
+    "pk",
+    "shipment_id",
+    "event_time",
+    "temperature",
+    "humidity",
+    "location",
+    "latitude",
+    "longitude",
+)
+
+
+def bucket_start(moment, width):
+    return _EPOCH + (moment - _EPOCH) // width * width
+
+
+class _Bucket:
+    """Running summary of the readings and rollups folded into one bucket."""
+
+    def __init__(self):
+        self.reading_count = 0
+        self.temperature_count = 0
+        self.temperature_total = Decimal(0)
+        self.min_temperature = None
+        self.max_temperature = None
+        self.humidity_count = 0
+        self.humidity_total = Decimal(0)
+        self.last_event_time = None
+        self.position_time = None
+        self.location = None
+        self.latitude = None
+        self.longitude = None
+
+    def add(
+        self,
+        reading_count,
+        last_event_time,
+        temperature_count=0,
+        min_temperature=None,
+        max_temperature=None,
+        avg_temperature=None,
+        humidity_count=0,
+        avg_humidity=None,
+        location=None,
+        latitude=None,
+        longitude=None,
+    ):
+        self.reading_count += reading_count
+        if temperature_count:
+            self.temperature_count += temperature_count
+            self.temperature_total += avg_temperature * temperature_count
+            if self.min_temperature is None or min_temperature < self.min_temperature:
+                self.min_temperature = min_temperature
+            if self.max_temperature is None or max_temperature > self.max_temperature:
+                self.max_temperature = max_temperature
+        if humidity_count:
+            self.humidity_count += humidity_count
+            self.humidity_total += avg_humidity * humidity_count
+
+        if self.last_event_time is None or last_event_time > self.last_event_time:
+            self.last_event_time = last_event_time
+        has_position = location or (latitude is not None and longitude is not None)
+        if has_position and (
+            self.position_time is None or last_event_time >= self.position_time
+        ):
+            self.position_time = last_event_time
+            self.location = location
+            self.latitude = latitude
+            self.longitude = longitude
+
+    def add_reading(self, event_time, temperature, humidity, location, lat, lng):
+        self.add(
+            1,
+            event_time,
+            temperature_count=int(temperature is not None),
+            min_temperature=temperature,
+            max_temperature=temperature,
+            avg_temperature=temperature,
+            humidity_count=int(humidity is not None),
+            avg_humidity=humidity,
+            location=location,
+            latitude=lat,
+            longitude=lng,
+        )
+
+    def add_rollup(self, rollup):
+        self.add(
+            rollup.reading_count,
+            rollup.last_event_time,
+            temperature_count=rollup.temperature_count,
+            min_temperature=rollup.min_temperature,
+            max_temperature=rollup.max_temperature,
+            avg_temperature=rollup.avg_temperature,
+            humidity_count=rollup.humidity_count,
+            avg_humidity=rollup.avg_humidity,
+            location=rollup.location,
+            latitude=rollup.latitude,
+            longitude=rollup.longitude,
+        )
+
+    @property
+    def avg_temperature(self):
+        if not self.temperature_count:
+            return None
+        return (self.temperature_total / self.temperature_count).quantize(_CENT)
+
+    @property
+    def avg_humidity(self):
+        if not self.humidity_count:
+            return None
+        return (self.humidity_total / self.humidity_count).quantize(_CENT)
+
+    def as_rollup(self, shipment_id, resolution, start):
+        return ShipmentTrackingRollup(
+            shipment_id=shipment_id,
+            resolution=resolution,
+            bucket_start=start,
+            reading_count=self.reading_count,
+            temperature_count=self.temperature_count,
+            min_temperature=self.min_temperature,
+            max_temperature=self.max_temperature,
+            avg_temperature=self.avg_temperature,
+            humidity_count=self.humidity_count,
+            avg_humidity=self.avg_humidity,
+            last_event_time=self.last_event_time,
+            location=self.location,
+            latitude=self.latitude,
+            longitude=self.longitude,
+        )
+
+    def as_point(self, start):
+        return {
+            "time": start,
+            "reading_count": self.reading_count,
+            "min_temperature": self.min_temperature,
+            "max_temperature": self.max_temperature,
+            "avg_temperature": self.avg_temperature,
+            "avg_humidity": self.avg_humidity,
+            "location": self.location,
+            "latitude": self.latitude,
+            "longitude": self.longitude,
+        }
+
+
+def _save_rollups(buckets, resolution):
+    """Merge ``{(shipment_id, start): _Bucket}`` into the stored rollups."""
+    existing = ShipmentTrackingRollup.objects.select_for_update().filter(
+        resolution=resolution,
+        shipment_id__in={shipment_id for shipment_id, _ in buckets},
+        bucket_start__in={start for _, start in buckets},
+    )
+    for rollup in existing:
+        bucket = buckets.get((rollup.shipment_id, rollup.bucket_start))
+        if bucket is not None:
+            bucket.add_rollup(rollup)
+
+    ShipmentTrackingRollup.objects.bulk_create(
+        [
+            bucket.as_rollup(shipment_id, resolution, start)
+            for (shipment_id, start), bucket in buckets.items()
+        ],
+        update_conflicts=True,
+        unique_fields=["shipment", "resolution", "bucket_start"],
+        update_fields=[
+            "reading_count",
+            "temperature_count",
+            "min_temperature",
+            "max_temperature",
+            "avg_temperature",
+            "humidity_count",
+            "avg_humidity",
+            "last_event_time",
+            "location",
+            "latitude",
+            "longitude",
+        ],
+    )
+
+
+def _compact_raw(cutoff, batch_size):
+    queryset = ShipmentTracking.objects.filter(
+        event_type__in=COMPACTED_EVENT_TYPES, event_time__lt=cutoff
+    ).order_by("event_time", "id")
+    width = RESOLUTIONS["MINUTE"]
+    compacted = 0
+    while True:
+        with transaction.atomic():
+            rows = list(
+                queryset.select_for_update(skip_locked=True).values_list(*_RAW_COLUMNS)[
+                    :batch_size
+                ]
+            )
+            if not rows:
+                return compacted
+            buckets = {}
+            for pk, shipment_id, event_time, *values in rows:
+                key = (shipment_id, bucket_start(event_time, width))
+                buckets.setdefault(key, _Bucket()).add_reading(event_time, *values)
+            _save_rollups(buckets, "MINUTE")
+            ShipmentTracking.objects.filter(pk__in=[row[0] for row in rows]).delete()
+        compacted += len(rows)
+
+
+def _compact_minutes(cutoff, batch_size):
+    queryset = ShipmentTrackingRollup.objects.filter(
+        resolution="MINUTE", bucket_start__lt=cutoff
+    ).order_by("bucket_start", "id")
+    width = RESOLUTIONS["HOUR"]
+    compacted = 0
+    while True:
+        with transaction.atomic():
+            rollups = list(queryset.select_for_update(skip_locked=True)[:batch_size])
+            if not rollups:
+                return compacted
+            buckets = {}
+            for rollup in rollups:
+                key = (rollup.shipment_id, bucket_start(rollup.bucket_start, width))
+                buckets.setdefault(key, _Bucket()).add_rollup(rollup)
+            _save_rollups(buckets, "HOUR")
+            ShipmentTrackingRollup.objects.filter(
+                pk__in=[rollup.pk for rollup in rollups]
+            ).delete()
+        compacted += len(rollups)
+
+
+def compact_tracking(
+    raw_days=RAW_RETENTION_DAYS,
+    minute_days=MINUTE_RETENTION_DAYS,
+    batch_size=COMPACT_BATCH_SIZE,
+    now=None,
+):
+    """Roll expired raw readings into minutes and expired minutes into hours.
+
+    Works in transactions of ``batch_size`` rows, so it can be interrupted
+    and rerun safely. Returns ``{"readings": n, "minutes": n}`` compacted.
+    """
+    if minute_days < raw_days:
+        raise ValueError("Minute rollups must be kept at least as long as readings")
+    now = now or timezone.now()
+    # Cut on hour boundaries so no bucket is split between two runs.
+    hour = RESOLUTIONS["HOUR"]
+    raw_cutoff = bucket_start(now - timedelta(days=raw_days), hour)
+    minute_cutoff = bucket_start(now - timedelta(days=minute_days), hour)
+    return {
+        "readings": _compact_raw(raw_cutoff, batch_size),
+        "minutes": _compact_minutes(minute_cutoff, batch_size),
+    }
+
+
+def _bucket_width(start, end, max_points):
+    if start is None or end is None:
+        return BUCKET_WIDTHS[0]
+    span = end - start
+    for width in BUCKET_WIDTHS:
+        if span / width < max_points:
+            return width
+    days = math.ceil(span / timedelta(days=1) / max_points)
+    return timedelta(days=days)
+
+
+def tracking_series(shipment_id, start=None, end=None, max_points=DEFAULT_MAX_POINTS):
+    """Return ``(bucket_seconds, points)`` for a shipment's track.
+
+    When the raw readings in ``[start, end)`` number at most ``max_points``
+    they are returned as they are and ``bucket_seconds`` is 0. Otherwise
+    readings and rollups are folded into buckets of ``bucket_seconds``,
+    chosen so the range has fewer than ``max_points`` of them; hourly rollups
+    still count as one point each when the buckets are narrower than an hour.
+    """
+    raw = ShipmentTracking.objects.filter(
+        shipment_id=shipment_id, event_type__in=COMPACTED_EVENT_TYPES
+    )
+    rollups = ShipmentTrackingRollup.objects.filter(shipment_id=shipment_id)
+    if start is not None:
+        raw = raw.filter(event_time__gte=start)
+        rollups = rollups.filter(bucket_start__gte=start)
+    if end is not None:
+        raw = raw.filter(event_time__lt=end)
+        rollups = rollups.filter(bucket_start__lt=end)
+
+    raw_stats = raw.aggregate(
+        count=Count("id"), first=Min("event_time"), last=Max("event_time")
+    )
+    rollup_stats = rollups.aggregate(
+        count=Count("id"), first=Min("bucket_start"), last=Max("last_event_time")
+    )
+    if not rollup_stats["count"] and raw_stats["count"] <= max_points:
+        points = []
+        for event_time, *values in raw.order_by("event_time").values_list(
+            *_RAW_COLUMNS[2:]
+        ):
+            bucket = _Bucket()
+            bucket.add_reading(event_time, *values)
+            points.append(bucket.as_point(event_time))
+        return 0, points
+
+    if start is None:
+        start = min(
+            moment
+            for moment in (raw_stats["first"], rollup_stats["first"])
+            if moment is not None
+        )
+    if end is None:
+        end = max(
+            moment
+            for moment in (raw_stats["last"], rollup_stats["last"])
+            if moment is not None
+        )
+    width = _bucket_width(start, end, max_points)
+
+    buckets = {}
+    for rollup in rollups:
+        key = bucket_start(rollup.bucket_start, width)
+        buckets.setdefault(key, _Bucket()).add_rollup(rollup)
+    for event_time, *values in raw.values_list(*_RAW_COLUMNS[2:]).iterator(
+        chunk_size=COMPACT_BATCH_SIZE
+    ):
+        key = bucket_start(event_time, width)
+        buckets.setdefault(key, _Bucket()).add_reading(event_time, *values)
+
+    points = [buckets[key].as_point(key) for key in sorted(buckets)]
+    return int(width.total_seconds()), points
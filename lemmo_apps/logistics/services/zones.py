@@ -0,0 +1,37 @@
+"""Point-in-zone lookups for delivery zones.
+
+A zone is a circle around its centre. Candidates are narrowed with the
+bounding box of the largest active zone radius, so the centre coordinate
+index does the work, before the exact haversine check against each zone's
+own radius.
+"""
+
+from django.db.models import F, Max
+
+from lemmo_apps.location.services.geo import within_radius
+from lemmo_apps.logistics.models.route import DeliveryZone
+
+
+def zones_for_point(latitude, longitude):
+    """Active zones containing the point, smallest first."""
+    zones = DeliveryZone.objects.filter(is_active=True)
+    max_radius = zones.aggregate(max_radius=Max("radius_km"))["max_radius"]
+    if max_radius is None:
+        return zones.none()
+    return (
+        within_radius(
+            zones,
+            latitude,
+            longitude,
+            float(max_radius),
+            lat_field="center_latitude",
+            lng_field="center_longitude",
+        )
+        .filter(distance_km__lte=F("radius_km"))
+        .order_by("radius_km", "distance_km")
+    )
+
+
+def zone_for_point(latitude, longitude):
+    """The most specific active zone containing the point, or ``None``."""
+    return zones_for_point(latitude, longitude).first()
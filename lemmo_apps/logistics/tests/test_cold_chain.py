@@ -0,0 +1,93 @@
+from datetime import datetime, timedelta, timezone
+from decimal import Decimal
+
+from django.test import SimpleTestCase
+
+from lemmo_apps.logistics.models.shipment import (
+    ShipmentColdChainState,
+    ShipmentTracking,
+)
+from lemmo_apps.logistics.services.cold_chain import _apply, parse_range
+
+START = datetime(2026, 1, 1, 8, 0, tzinfo=timezone.utc)
+
+
+class ParseRangeTests(SimpleTestCase):
+    def test_ranges(self):
+        cases = {
+            "2-8°C": (2, 8),
+            "2°C-8°C": (2, 8),
+            "Store at 2°-8°": (2, 8),
+            "2 – 8 °C": (2, 8),
+            "2.5-7.5": (Decimal("2.5"), Decimal("7.5")),
+            "-25°C to -15°C": (-25, -15),
+            "−80 to −60": (-80, -60),
+            "+2 to +8 °C": (2, 8),
+            "between -5 and 5": (-5, 5),
+        }
+        for text, expected in cases.items():
+            with self.subTest(text=text):
+                self.assertEqual(parse_range(text), expected)
+
+    def test_open_ranges(self):
+        self.assertEqual(parse_range("below -15°C"), (None, -15))
+        self.assertEqual(parse_range("Keep above 15°C"), (15, None))
+
+    def test_unreadable_text(self):
+        for text in (None, "", "-20°C", "keep cool"):
+            with self.subTest(text=text):
+                self.assertIsNone(parse_range(text))
+
+
+class ExcursionStateTests(SimpleTestCase):
+    def setUp(self):
+        self.state = ShipmentColdChainState()
+        self.config = {
+            "limits": (Decimal("2"), Decimal("8")),
+            "items": {"vaccine": (Decimal("2"), Decimal("8")), "saline": (None, 30)},
+            "passed": {"vaccine", "saline"},
+        }
+        self.failed = set()
+
+    def read(self, minutes, temperature):
+        reading = ShipmentTracking(
+            event_time=START + timedelta(minutes=minutes),
+            temperature=Decimal(temperature),
+        )
+        return _apply(self.state, reading, self.config, self.failed)
+
+    def test_in_range_readings_only_update_statistics(self):
+        self.assertIsNone(self.read(0, "4"))
+        self.assertIsNone(self.read(10, "6"))
+
+        self.assertEqual(self.state.reading_count, 2)
+        self.assertEqual(self.state.min_temperature, 4)
+        self.assertEqual(self.state.max_temperature, 6)
+        self.assertEqual(self.state.excursion_count, 0)
+        self.assertEqual(self.failed, set())
+
+    def test_excursion_opens_once_and_closes_when_back_in_range(self):
+        self.read(0, "5")
+        event = self.read(10, "9.5")
+        self.assertIsNone(self.read(25, "11"))
+        self.assertIsNone(self.read(40, "6"))
+
+        self.assertEqual(event.event_type, "EXCEPTION")
+        self.assertEqual(event.metadata["max_allowed"], "8")
+        self.assertEqual(self.state.excursion_count, 1)
+        self.assertIsNone(self.state.excursion_started_at)
+        self.assertEqual(self.state.minutes_out_of_range, 30)
+        self.assertEqual(self.failed, {"vaccine"})
+
+        self.assertIsNotNone(self.read(50, "1"))
+        self.assertEqual(self.state.excursion_count, 2)
+
+    def test_late_reading_counts_but_does_not_reopen(self):
+        self.read(30, "5")
+
+        self.assertIsNone(self.read(0, "12"))
+
+        self.assertEqual(self.state.excursion_count, 0)
+        self.assertEqual(self.state.last_temperature, 5)
+        self.assertEqual(self.state.max_temperature, 12)
+        self.assertEqual(self.failed, {"vaccine"})
@@ -0,0 +1,82 @@
+from decimal import Decimal
+from unittest import mock
+
+from django.test import TestCase
+
+from lemmo_apps.inventory.models.product import Product
+from lemmo_apps.location.models.facility import Facility
+from lemmo_apps.logistics.models.shipment import Shipment, ShipmentItem
+from lemmo_apps.logistics.services.shipments import add_shipment_items
+from lemmo_apps.totals import defer_totals
+
+
+def make_facility(name):
+    return Facility.objects.create(
+        name=name,
+        address="1 Main St",
+        city="Springfield",
+        state="IL",
+        postal_code="62701",
+    )
+
+
+class ShipmentTotalsTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.product = Product.objects.create(
+            code="P1", name="Saline", unit_of_measure="units", price=Decimal("1.00")
+        )
+        cls.shipment = Shipment.objects.create(
+            shipment_number="SHP-1",
+            origin_facility=make_facility("Depot"),
+            destination_facility=make_facility("Clinic"),
+        )
+
+    def line(self, weight):
+        return {"product_id": self.product.pk, "quantity": 1, "weight": weight}
+
+    def test_bulk_lines_recalculate_totals_and_touch_the_shipment(self):
+        before = Shipment.objects.get(pk=self.shipment.pk).updated_at
+
+        add_shipment_items(
+            self.shipment, [self.line(Decimal("1.5")), self.line(Decimal("2"))]
+        )
+
+        shipment = Shipment.objects.get(pk=self.shipment.pk)
+        self.assertEqual(shipment.package_count, 2)
+        self.assertEqual(shipment.total_weight, Decimal("3.5"))
+        self.assertGreater(shipment.updated_at, before)
+
+    def test_bad_line_saves_nothing(self):
+        with self.assertRaisesMessage(ValueError, "Line 2"):
+            add_shipment_items(self.shipment, [self.line(1), {"quantity": 0}])
+
+        self.assertFalse(ShipmentItem.objects.exists())
+
+    def test_deferred_saves_recalculate_once(self):
+        with mock.patch.object(
+            Shipment, "calculate_totals", autospec=True
+        ) as calculate_totals:
+            with defer_totals():
+                for weight in (1, 2, 3):
+                    ShipmentItem.objects.create(
+                        shipment=self.shipment,
+                        product=self.product,
+                        quantity=1,
+                        weight=weight,
+                    )
+                calculate_totals.assert_not_called()
+
+        calculate_totals.assert_called_once()
+
+    def test_deferred_block_that_raises_recalculates_nothing(self):
+        with mock.patch.object(
+            Shipment, "calculate_totals", autospec=True
+        ) as calculate_totals:
+            with self.assertRaises(RuntimeError), defer_totals():
+                ShipmentItem.objects.create(
+                    shipment=self.shipment, product=self.product, quantity=1
+                )
+                raise RuntimeError
+
+        calculate_totals.assert_not_called()
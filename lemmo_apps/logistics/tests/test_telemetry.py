@@ -0,0 +1,124 @@
+import io
+import uuid
+from unittest import mock
+
+from django.test import SimpleTestCase, TestCase
+
+from lemmo_apps.location.models.facility import Facility
+from lemmo_apps.logistics.models.shipment import Shipment, ShipmentTracking
+from lemmo_apps.logistics.services import telemetry
+from lemmo_apps.logistics.services.telemetry import (
+    TelemetryError,
+    ingest_readings,
+    parse_readings,
+)
+
+NDJSON = "application/x-ndjson"
+
+
+def make_facility(name):
+    return Facility.objects.create(
+        name=name,
+        address="1 Main St",
+        city="Springfield",
+        state="IL",
+        postal_code="62701",
+    )
+
+
+class ParseReadingsTests(SimpleTestCase):
+    def test_reads_ndjson_skipping_blank_lines(self):
+        body = io.BytesIO(b'{"a": 1}\n\n{"b": 2}\n')
+
+        self.assertEqual(parse_readings(body, NDJSON), [{"a": 1}, {"b": 2}])
+
+    def test_reads_json_array(self):
+        body = io.BytesIO(b'[{"a": 1}]')
+
+        self.assertEqual(parse_readings(body, "application/json"), [{"a": 1}])
+
+    @mock.patch.object(telemetry, "MAX_READINGS", 2)
+    def test_ndjson_stops_at_first_line_past_limit(self):
+        body = io.BytesIO(b'{"a": 1}\n{"a": 2}\n{"a": 3}\nnot json\n')
+
+        with self.assertRaisesMessage(TelemetryError, "At most 2 readings"):
+            parse_readings(body, NDJSON)
+        self.assertEqual(body.read(), b"not json\n")
+
+    @mock.patch.object(telemetry, "MAX_READINGS", 2)
+    def test_json_array_is_limited(self):
+        with self.assertRaisesMessage(TelemetryError, "got 3"):
+            parse_readings(io.BytesIO(b"[1, 2, 3]"), "application/json")
+
+    @mock.patch.object(telemetry, "MAX_BODY_BYTES", 16)
+    def test_oversized_bodies_are_refused(self):
+        for body, content_type in [
+            (b'[{"a": 1}, {"a": 2}]', "application/json"),
+            (b'{"a": 1}\n{"a": 22}\n', NDJSON),
+            (b'{"a": "a single long line"}', NDJSON),
+        ]:
+            with self.subTest(body=body):
+                with self.assertRaisesMessage(TelemetryError, "exceeds 16 bytes"):
+                    parse_readings(io.BytesIO(body), content_type)
+
+    def test_malformed_bodies_are_refused(self):
+        with self.assertRaises(TelemetryError):
+            parse_readings(io.BytesIO(b"{not json"), NDJSON)
+        with self.assertRaisesMessage(TelemetryError, "Expected a JSON array"):
+            parse_readings(io.BytesIO(b'{"a": 1}'), "application/json")
+
+
+class IngestReadingsTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.shipment = Shipment.objects.create(
+            shipment_number="SHP-1",
+            origin_facility=make_facility("Depot"),
+            destination_facility=make_facility("Clinic"),
+        )
+
+    def reading(self, **fields):
+        return {"shipment_id": str(self.shipment.pk), **fields}
+
+    def test_valid_readings_are_stored_and_move_current_location(self):
+        result = ingest_readings(
+            [
+                self.reading(event_time="2026-01-01T10:00:00Z", location="Depot gate"),
+                self.reading(
+                    event_time="2026-01-01T11:00:00Z", latitude=1.5, longitude=-2.25
+                ),
+            ]
+        )
+
+        self.shipment.refresh_from_db()
+        self.assertEqual(result["accepted"], 2)
+        self.assertEqual(result["rejected"], [])
+        self.assertEqual(ShipmentTracking.objects.count(), 2)
+        self.assertEqual(self.shipment.current_location, "1.500000,-2.250000")
+
+    def test_bad_readings_are_rejected_individually(self):
+        result = ingest_readings(
+            [
+                self.reading(location=["not", "text"]),
+                self.reading(location="x" * 256),
+                self.reading(event_type=["LOCATION_UPDATE"]),
+                self.reading(latitude=91),
+                {"shipment_id": str(uuid.uuid4())},
+                "not an object",
+                self.reading(location="x" * 255),
+            ]
+        )
+
+        self.assertEqual(result["accepted"], 1)
+        self.assertEqual(
+            result["rejected"],
+            [
+                {"index": 0, "error": "location must be a string"},
+                {"index": 1, "error": "location must be at most 255 characters"},
+                {"index": 2, "error": "event_type must be a string"},
+                {"index": 3, "error": "latitude must be between -90 and 90"},
+                {"index": 4, "error": mock.ANY},
+                {"index": 5, "error": "Reading must be an object"},
+            ],
+        )
+        self.assertEqual(ShipmentTracking.objects.get().location, "x" * 255)
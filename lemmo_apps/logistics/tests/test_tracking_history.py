@@ -0,0 +1,142 @@
+from datetime import datetime, timedelta, timezone
+from decimal import Decimal
+
+from django.test import TestCase
+
+from lemmo_apps.location.models.facility import Facility
+from lemmo_apps.logistics.models.shipment import (
+    Shipment,
+    ShipmentTracking,
+    ShipmentTrackingRollup,
+)
+from lemmo_apps.logistics.services.tracking_history import (
+    compact_tracking,
+    tracking_series,
+)
+
+NOW = datetime(2026, 3, 1, 12, 0, tzinfo=timezone.utc)
+OLD = datetime(2026, 2, 19, 8, 0, tzinfo=timezone.utc)
+
+
+def make_facility(name):
+    return Facility.objects.create(
+        name=name,
+        address="1 Main St",
+        city="Springfield",
+        state="IL",
+        postal_code="62701",
+    )
+
+
+class TrackingHistoryTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.shipment = Shipment.objects.create(
+            shipment_number="SHP-1",
+            origin_facility=make_facility("Depot"),
+            destination_facility=make_facility("Clinic"),
+        )
+
+    def track(self, at, event_type="LOCATION_UPDATE", **fields):
+        return ShipmentTracking.objects.create(
+            shipment=self.shipment,
+            event_type=event_type,
+            event_time=at,
+            description="Reading",
+            **fields,
+        )
+
+    def add_old_readings(self):
+        self.track(
+            OLD + timedelta(seconds=10),
+            temperature=Decimal("4"),
+            humidity=Decimal("50"),
+            latitude=Decimal("1"),
+            longitude=Decimal("1"),
+        )
+        self.track(
+            OLD + timedelta(seconds=40), temperature=Decimal("6"), location="Gate"
+        )
+        self.track(OLD + timedelta(minutes=5))
+
+    def rollup(self, resolution, start):
+        return ShipmentTrackingRollup.objects.get(
+            shipment=self.shipment, resolution=resolution, bucket_start=start
+        )
+
+    def test_old_readings_fold_into_minute_rollups(self):
+        self.add_old_readings()
+        recent = self.track(NOW - timedelta(days=1), temperature=Decimal("5"))
+        milestone = self.track(OLD, event_type="EXCEPTION")
+
+        result = compact_tracking(now=NOW)
+
+        self.assertEqual(result, {"readings": 3, "minutes": 0})
+        self.assertEqual(
+            set(ShipmentTracking.objects.values_list("pk", flat=True)),
+            {recent.pk, milestone.pk},
+        )
+        rollup = self.rollup("MINUTE", OLD)
+        self.assertEqual(rollup.reading_count, 2)
+        self.assertEqual(rollup.temperature_count, 2)
+        self.assertEqual(
+            (rollup.min_temperature, rollup.max_temperature, rollup.avg_temperature),
+            (4, 6, 5),
+        )
+        self.assertEqual((rollup.humidity_count, rollup.avg_humidity), (1, 50))
+        self.assertEqual(rollup.last_event_time, OLD + timedelta(seconds=40))
+        self.assertEqual(rollup.location, "Gate")
+        self.assertEqual(
+            self.rollup("MINUTE", OLD + timedelta(minutes=5)).reading_count, 1
+        )
+
+    def test_rerun_merges_into_existing_rollups(self):
+        self.add_old_readings()
+        compact_tracking(now=NOW)
+        self.track(OLD + timedelta(seconds=50), temperature=Decimal("8"))
+
+        self.assertEqual(compact_tracking(now=NOW), {"readings": 1, "minutes": 0})
+
+        rollup = self.rollup("MINUTE", OLD)
+        self.assertEqual(rollup.reading_count, 3)
+        self.assertEqual((rollup.max_temperature, rollup.avg_temperature), (8, 6))
+
+    def test_old_minutes_fold_into_hours(self):
+        self.add_old_readings()
+
+        result = compact_tracking(raw_days=7, minute_days=7, now=NOW)
+
+        self.assertEqual(result, {"readings": 3, "minutes": 2})
+        self.assertFalse(
+            ShipmentTrackingRollup.objects.filter(resolution="MINUTE").exists()
+        )
+        rollup = self.rollup("HOUR", OLD)
+        self.assertEqual(rollup.reading_count, 3)
+        self.assertEqual(rollup.avg_temperature, 5)
+
+    def test_minute_retention_cannot_be_shorter_than_raw(self):
+        with self.assertRaises(ValueError):
+            compact_tracking(raw_days=7, minute_days=1, now=NOW)
+
+    def test_series_returns_raw_readings_when_few(self):
+        self.add_old_readings()
+
+        width, points = tracking_series(self.shipment.pk, max_points=10)
+
+        self.assertEqual(width, 0)
+        self.assertEqual([point["reading_count"] for point in points], [1, 1, 1])
+        self.assertEqual(points[0]["time"], OLD + timedelta(seconds=10))
+
+    def test_series_downsamples_readings_and_rollups(self):
+        self.add_old_readings()
+        compact_tracking(now=NOW)
+        self.track(OLD + timedelta(minutes=6), temperature=Decimal("7"))
+
+        width, points = tracking_series(self.shipment.pk, max_points=2)
+
+        self.assertEqual(width, 300)
+        self.assertEqual(
+            [(point["time"], point["reading_count"]) for point in points],
+            [(OLD, 2), (OLD + timedelta(minutes=5), 2)],
+        )
+        self.assertEqual(points[1]["max_temperature"], 7)
@@ -179,6 +179,11 @@ urlpatterns = [
         views.ShipmentTrackingDeleteView.as_view(),
         name="tracking-delete",
     ),
+    path(
+        "shipment-tracking/ingest/",
+        views.TelemetryIngestView.as_view(),
+        name="tracking-ingest",
+    ),
     # Healthcare specific URLs
     path(
         "refrigerated-vehicles/",
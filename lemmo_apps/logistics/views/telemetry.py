@@ -0,0 +1,31 @@
+from django.contrib.auth.mixins import LoginRequiredMixin, PermissionRequiredMixin
+from django.http import JsonResponse
+from django.views.generic import View
+
+from lemmo_apps.logistics.services.telemetry import (
+    TelemetryError,
+    ingest_readings,
+    parse_readings,
+)
+
+
+class TelemetryIngestView(LoginRequiredMixin, PermissionRequiredMixin, View):
+    """Accept a batch of readings as a JSON array or ``application/x-ndjson``."""
+
+    permission_required = "logistics.add_shipmenttracking"
+
+    def post(self, request, *args, **kwargs):
+        try:
+            readings = parse_readings(request, request.content_type)
+        except TelemetryError as exc:
+            return JsonResponse({"status": "error", "message": str(exc)}, status=400)
+
+        result = ingest_readings(readings, user=request.user)
+        return JsonResponse(
+            {
+                "status": "success",
+                "accepted": result["accepted"],
+                "rejected": result["rejected"],
+                "excursions": len(result["excursions"]),
+            }
+        )
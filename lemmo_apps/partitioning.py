@@ -0,0 +1,314 @@
+"""Monthly range partitioning of append-only tables (PostgreSQL only).
+
+``tblUserActivities`` and ``tblStockTransactions`` are partitioned by month
+on ``created_at`` so that "last 7/30 days" queries only touch the newest
+partitions and old months can be detached instead of deleted row by row.
+
+``partition_by_month`` converts an existing table in place, from a
+migration: the table becomes the first partition (``<table>_legacy``,
+``MINVALUE`` up to the month after its newest row), the original indexes and
+foreign keys are recreated on the partitioned parent, and the primary key
+gains the partition column, which PostgreSQL requires. Attaching the old
+table scans it once and builds the new primary key index, under an exclusive
+lock. A ``<table>_default`` partition catches rows outside every month and
+should stay empty.
+
+``manage_partitions`` keeps ``LEMMO_PARTITION_MONTHS_AHEAD`` (3) months of
+partitions ahead of the current one and detaches, or with ``drop`` drops,
+partitions that ended more than ``LEMMO_PARTITION_RETENTION_MONTHS[table]``
+months ago. Tables without a retention setting keep every partition.
+Detached partitions are plain tables that can be archived with ``pg_dump``.
+
+Unapplying a partitioning migration leaves the table partitioned, which the
+models work with unchanged, and reapplying it is then a no-op. To get a plain
+table back, in a maintenance window: rename the partitioned table, create
+the original with ``CREATE TABLE ... (LIKE ... INCLUDING ALL)``, copy the rows
+across with ``INSERT ... SELECT``, restore the single-column primary key, move
+the id sequence over with ``ALTER SEQUENCE ... OWNED BY``, and drop the
+partitioned table with its partitions.
+"""
+
+import re
+from datetime import datetime, timezone
+
+from django.conf import settings
+from django.db import connection
+
+PARTITIONED_TABLES = {
+    "tblUserActivities": "created_at",
+    "tblStockTransactions": "created_at",
+}
+DEFAULT_MONTHS_AHEAD = 3
+LEGACY_SUFFIX = "_legacy"
+DEFAULT_SUFFIX = "_default"
+
+_BOUND = re.compile(r"FROM \((.+)\) TO \((.+)\)")
+
+
+def month_start(value):
+    return datetime(value.year, value.month, 1, tzinfo=timezone.utc)
+
+
+def add_months(month, months):
+    index = month.year * 12 + month.month - 1 + months
+    return datetime(index // 12, index % 12 + 1, 1, tzinfo=timezone.utc)
+
+
+def partition_name(table, month):
+    return f"{table}_p{month:%Y_%m}"
+
+
+def _parse_bound(value):
+    if value == "MINVALUE":
+        return datetime.min.replace(tzinfo=timezone.utc)
+    if value == "MAXVALUE":
+        return datetime.max.replace(tzinfo=timezone.utc)
+    value = value.strip("'")
+    # PostgreSQL prints UTC offsets as "+00"; older Pythons want "+00:00".
+    if re.search(r"[+-]\d\d$", value):
+        value += ":00"
+    return datetime.fromisoformat(value)
+
+
+def is_partitioned(cursor, table):
+    cursor.execute(
+        "SELECT EXISTS (SELECT 1 FROM pg_partitioned_table "
+        "WHERE partrelid = to_regclass(%s))",
+        [connection.ops.quote_name(table)],
+    )
+    return cursor.fetchone()[0]
+
+
+def partitions(cursor, table):
+    """``(name, start, end)`` of ``table``'s range partitions, oldest first."""
+    cursor.execute(
+        "SELECT c.relname, pg_get_expr(c.relpartbound, c.oid) "
+        "FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+        "WHERE i.inhparent = %s::regclass",
+        [connection.ops.quote_name(table)],
+    )
+    result = []
+    for name, bound in cursor.fetchall():
+        match = _BOUND.search(bound)
+        if match:
+            start, end = (_parse_bound(value) for value in match.groups())
+            result.append((name, start, end))
+    return sorted(result, key=lambda partition: partition[1])
+
+
+def _literal(month):
+    # DDL can't take bound parameters under server-side binding.
+    return f"'{month.isoformat()}'"
+
+
+def _create_partition(cursor, table, start, end):
+    quote = connection.ops.quote_name
+    cursor.execute(
+        f"CREATE TABLE {quote(partition_name(table, start))} "
+        f"PARTITION OF {quote(table)} "
+        f"FOR VALUES FROM ({_literal(start)}) TO ({_literal(end)})"
+    )
+
+
+def ensure_partitions(table, months_ahead=DEFAULT_MONTHS_AHEAD, now=None):
+    """Create monthly partitions from the newest one to ``months_ahead`` months
+    past the current month, filling any gap left by a missed run.
+
+    Returns the names of the partitions created.
+    """
+    current = month_start(now or datetime.now(timezone.utc))
+    created = []
+    with connection.cursor() as cursor:
+        month = max(
+            (end for _name, _start, end in partitions(cursor, table)), default=current
+        )
+        last = add_months(current, months_ahead + 1)
+        while month < last:
+            _create_partition(cursor, table, month, add_months(month, 1))
+            created.append(partition_name(table, month))
+            month = add_months(month, 1)
+    return created
+
+
+def expire_partitions(table, months, drop=False, now=None):
+    """Detach (or drop) partitions that ended ``months`` months before this one.
+
+    Returns the names of the partitions removed.
+    """
+    quote = connection.ops.quote_name
+    cutoff = add_months(month_start(now or datetime.now(timezone.utc)), -months)
+    removed = []
+    with connection.cursor() as cursor:
+        for name, _start, end in partitions(cursor, table):
+            if end > cutoff:
+                continue
+            cursor.execute(f"ALTER TABLE {quote(table)} DETACH PARTITION {quote(name)}")
+            if drop:
+                cursor.execute(f"DROP TABLE {quote(name)}")
+            removed.append(name)
+    return removed
+
+
+def default_partition_rows(table):
+    """Whether ``table``'s default partition holds rows (it should not)."""
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"SELECT EXISTS (SELECT 1 FROM "
+            f"{connection.ops.quote_name(table + DEFAULT_SUFFIX)})"
+        )
+        return cursor.fetchone()[0]
+
+
+def manage_partitions(drop=False, now=None):
+    """Run ``ensure_partitions`` and ``expire_partitions`` on every table.
+
+    Returns ``{table: {"created", "removed", "default_rows"}}`` for the tables
+    that are partitioned.
+    """
+    if connection.vendor != "postgresql":
+        return {}
+    months_ahead = getattr(
+        settings, "LEMMO_PARTITION_MONTHS_AHEAD", DEFAULT_MONTHS_AHEAD
+    )
+    retention = getattr(settings, "LEMMO_PARTITION_RETENTION_MONTHS", {})
+    results = {}
+    for table in PARTITIONED_TABLES:
+        with connection.cursor() as cursor:
+            if not is_partitioned(cursor, table):
+                continue
+        removed = []
+        if retention.get(table) is not None:
+            removed = expire_partitions(table, retention[table], drop=drop, now=now)
+        results[table] = {
+            "created": ensure_partitions(table, months_ahead, now=now),
+            "removed": removed,
+            "default_rows": default_partition_rows(table),
+        }
+    return results
+
+
+def partition_by_month(schema_editor, table, column="created_at"):
+    """Convert ``table`` into a table partitioned by month on ``column``.
+
+    For use in a ``RunPython`` migration; does nothing on other databases or
+    if the table is already partitioned.
+    """
+    conn = schema_editor.connection
+    if conn.vendor != "postgresql":
+        return
+    quote = schema_editor.quote_name
+    legacy = table + LEGACY_SUFFIX
+
+    with conn.cursor() as cursor:
+        if is_partitioned(cursor, table):
+            return
+
+        cursor.execute(
+            "SELECT i.relname, pg_get_indexdef(i.oid), x.indisprimary, x.indisunique "
+            "FROM pg_index x JOIN pg_class i ON i.oid = x.indexrelid "
+            "WHERE x.indrelid = %s::regclass",
+            [quote(table)],
+        )
+        indexes = cursor.fetchall()
+        cursor.execute(
+            "SELECT conname, pg_get_constraintdef(oid) FROM pg_constraint "
+            "WHERE conrelid = %s::regclass AND contype = 'f'",
+            [quote(table)],
+        )
+        foreign_keys = cursor.fetchall()
+        cursor.execute(
+            "SELECT a.attname, a.attidentity FROM pg_index x "
+            "JOIN pg_attribute a ON a.attrelid = x.indrelid "
+            "AND a.attnum = ANY(x.indkey) "
+            "WHERE x.indrelid = %s::regclass AND x.indisprimary",
+            [quote(table)],
+        )
+        primary_key = cursor.fetchall()
+        cursor.execute(f"SELECT MAX({quote(column)}) FROM {quote(table)}")
+        newest = cursor.fetchone()[0]
+
+        for name, _definition, is_primary, is_unique in indexes:
+            if is_unique and not is_primary:
+                raise ValueError(
+                    f"Unique index {name} cannot be kept once {table} is "
+                    f"partitioned on {column}"
+                )
+
+        cursor.execute(f"ALTER TABLE {quote(table)} RENAME TO {quote(legacy)}")
+        for name, *_rest in indexes:
+            cursor.execute(
+                f"ALTER INDEX {quote(name)} RENAME TO {quote((name + LEGACY_SUFFIX)[:63])}"
+            )
+
+        # Identity columns can't be attached to a parent without one, so the
+        # sequence moves to the new table as a plain default.
+        sequences = []
+        for pk_column, identity in primary_key:
+            if identity:
+                sequence = f"{table}_{pk_column}_seq"
+                cursor.execute(
+                    f"SELECT COALESCE(MAX({quote(pk_column)}), 0) FROM {quote(legacy)}"
+                )
+                sequences.append((pk_column, sequence, cursor.fetchone()[0]))
+                cursor.execute(
+                    f"ALTER TABLE {quote(legacy)} ALTER COLUMN {quote(pk_column)} "
+                    "DROP IDENTITY"
+                )
+
+        cursor.execute(
+            f"CREATE TABLE {quote(table)} (LIKE {quote(legacy)} INCLUDING DEFAULTS "
+            f"INCLUDING CONSTRAINTS INCLUDING STORAGE INCLUDING COMMENTS) "
+            f"PARTITION BY RANGE ({quote(column)})"
+        )
+        for pk_column, sequence, last_value in sequences:
+            cursor.execute(f"CREATE SEQUENCE {quote(sequence)} AS bigint")
+            cursor.execute(
+                f"ALTER SEQUENCE {quote(sequence)} OWNED BY "
+                f"{quote(table)}.{quote(pk_column)}"
+            )
+            cursor.execute(
+                "SELECT setval(%s, %s, %s)",
+                [quote(sequence), max(last_value, 1), last_value > 0],
+            )
+            cursor.execute(
+                f"ALTER TABLE {quote(table)} ALTER COLUMN {quote(pk_column)} "
+                f"SET DEFAULT nextval('{quote(sequence)}'::regclass)"
+            )
+
+        for name, definition, is_primary, _is_unique in indexes:
+            if is_primary:
+                columns = [pk_column for pk_column, _identity in primary_key]
+                if column not in columns:
+                    columns.append(column)
+                cursor.execute(
+                    f"ALTER TABLE {quote(table)} ADD CONSTRAINT {quote(name)} "
+                    f"PRIMARY KEY ({', '.join(quote(c) for c in columns)})"
+                )
+            else:
+                # Captured before the rename, so it names the new table.
+                cursor.execute(definition)
+        for name, definition in foreign_keys:
+            cursor.execute(
+                f"ALTER TABLE {quote(table)} ADD CONSTRAINT {quote(name)} {definition}"
+            )
+
+        current = month_start(datetime.now(timezone.utc))
+        if newest is None:
+            cursor.execute(f"DROP TABLE {quote(legacy)}")
+            month = current
+        else:
+            month = add_months(month_start(newest), 1)
+            cursor.execute(
+                f"ALTER TABLE {quote(table)} ATTACH PARTITION {quote(legacy)} "
+                f"FOR VALUES FROM (MINVALUE) TO ({_literal(month)})"
+            )
+        cursor.execute(
+            f"CREATE TABLE {quote(table + DEFAULT_SUFFIX)} "
+            f"PARTITION OF {quote(table)} DEFAULT"
+        )
+
+    last = add_months(max(current, month), DEFAULT_MONTHS_AHEAD)
+    with conn.cursor() as cursor:
+        while month <= last:
+            _create_partition(cursor, table, month, add_months(month, 1))
+            month = add_months(month, 1)
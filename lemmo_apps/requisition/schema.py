@@ -2,6 +2,12 @@ import graphene
 from graphene_django import DjangoObjectType
 from .models.requisition import Requisition
 from .models.requisition_item import RequisitionItem
+from lemmo_apps.dashboard.services.cache import cached_stats
+from lemmo_apps.gql.pagination import CountableConnection, KeysetConnectionField
+from lemmo_apps.gql.optimizer import optimize_queryset
+from lemmo_apps.stock.schema import StockTransactionType
+from lemmo_apps.stock.services.allocation import fulfil_requisition
+from lemmo_apps.stock.services.ledger import InsufficientStock
 
 
 class RequisitionType(DjangoObjectType):
@@ -10,6 +16,11 @@ class RequisitionType(DjangoObjectType):
         fields = "__all__"
 
 
+class RequisitionConnection(CountableConnection):
+    class Meta:
+        node = RequisitionType
+
+
 class RequisitionItemType(DjangoObjectType):
     class Meta:
         model = RequisitionItem
@@ -28,6 +39,15 @@ class Query(graphene.ObjectType):
         offset=graphene.Int(),
     )
 
+    requisitions_connection = KeysetConnectionField(
+        RequisitionConnection,
+        ordering=("-created_at", "-id"),
+        status=graphene.String(),
+        priority=graphene.String(),
+        requested_by=graphene.UUID(),
+        requested_facility=graphene.UUID(),
+    )
+
     requisition = graphene.Field(RequisitionType, id=graphene.UUID(required=True))
 
     # Requisition item queries
@@ -58,7 +78,7 @@ class Query(graphene.ObjectType):
         limit=None,
         offset=None,
     ):
-        queryset = Requisition.objects.all()
+        queryset = optimize_queryset(Requisition.objects.all(), info)
 
         if status:
             queryset = queryset.filter(status=status)
@@ -80,13 +100,16 @@ class Query(graphene.ObjectType):
 
         return queryset
 
+    def resolve_requisitions_connection(self, info, **kwargs):
+        return Query.resolve_requisitions(self, info, **kwargs)
+
     def resolve_requisition(self, info, id):
         return Requisition.objects.get(id=id)
 
     def resolve_requisition_items(
         self, info, requisition_id=None, product_id=None, is_fulfilled=None
     ):
-        queryset = RequisitionItem.objects.all()
+        queryset = optimize_queryset(RequisitionItem.objects.all(), info)
 
         if requisition_id:
             queryset = queryset.filter(requisition_id=requisition_id)
@@ -100,20 +123,21 @@ class Query(graphene.ObjectType):
         return queryset
 
     def resolve_pending_requisitions(self, info):
-        return Requisition.objects.filter(status="PENDING")
+        return optimize_queryset(Requisition.objects.filter(status="PENDING"), info)
 
     def resolve_approved_requisitions(self, info):
-        return Requisition.objects.filter(status="APPROVED")
+        return optimize_queryset(Requisition.objects.filter(status="APPROVED"), info)
 
     def resolve_rejected_requisitions(self, info):
-        return Requisition.objects.filter(status="REJECTED")
+        return optimize_queryset(Requisition.objects.filter(status="REJECTED"), info)
 
     def resolve_fulfilled_requisitions(self, info):
-        return Requisition.objects.filter(status="FULFILLED")
+        return optimize_queryset(Requisition.objects.filter(status="FULFILLED"), info)
 
     def resolve_emergency_requisitions(self, info):
-        return Requisition.objects.filter(priority="EMERGENCY")
+        return optimize_queryset(Requisition.objects.filter(priority="EMERGENCY"), info)
 
+    @cached_stats("requisition_stats", tags=("requisition",))
     def resolve_requisition_stats(self, info):
         from django.db.models import Count
         from django.utils import timezone
@@ -161,8 +185,49 @@ class Query(graphene.ObjectType):
         }
 
 
+class FulfilRequisition(graphene.Mutation):
+    class Arguments:
+        id = graphene.UUID(required=True)
+        source_facility_id = graphene.UUID(required=True)
+        allow_partial = graphene.Boolean()
+
+    requisition = graphene.Field(RequisitionType)
+    transactions = graphene.List(StockTransactionType)
+    success = graphene.Boolean()
+    message = graphene.String()
+
+    def mutate(self, info, id, source_facility_id, allow_partial=True):
+        try:
+            requisition = Requisition.objects.get(id=id)
+            if requisition.status != "APPROVED":
+                return FulfilRequisition(
+                    requisition=requisition,
+                    success=False,
+                    message="Only approved requisitions can be fulfilled",
+                )
+
+            transactions = fulfil_requisition(
+                requisition, source_facility_id, allow_partial=allow_partial
+            )
+
+            return FulfilRequisition(
+                requisition=requisition,
+                transactions=transactions,
+                success=True,
+                message=(
+                    "Requisition fulfilled"
+                    if requisition.status == "FULFILLED"
+                    else "Requisition partially fulfilled"
+                ),
+            )
+        except Requisition.DoesNotExist:
+            return FulfilRequisition(success=False, message="Requisition not found")
+        except InsufficientStock as e:
+            return FulfilRequisition(success=False, message=str(e))
+
+
 class Mutation(graphene.ObjectType):
-    pass
+    fulfil_requisition = FulfilRequisition.Field()
 
 
 schema = graphene.Schema(query=Query, mutation=Mutation)
@@ -0,0 +1,70 @@
+from django.core.management.base import BaseCommand
+
+from lemmo_apps.stock.services.ledger import (
+    balance_drift,
+    product_stock_drift,
+    rebuild_balances,
+    rebuild_product_stock,
+)
+
+
+class Command(BaseCommand):
+    help = "Rebuild stock balances from the stock transaction ledger"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--facility",
+            help="Only rebuild balances for this facility id",
+        )
+        parser.add_argument(
+            "--skip-products",
+            action="store_true",
+            help="Do not rebuild product stock quantities from their batches",
+        )
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Report the differences without correcting them",
+        )
+
+    def handle(self, *args, **options):
+        facility_id = options["facility"]
+        products = not options["skip_products"] and facility_id is None
+
+        if options["dry_run"]:
+            self.report(facility_id, products)
+            return
+
+        self.stdout.write("Rebuilding stock balances from the ledger...")
+        drifted = rebuild_balances(facility_id=facility_id)
+        self.stdout.write(f"Corrected {drifted} stock balances")
+
+        if products:
+            self.stdout.write("Rebuilding product stock from batches...")
+            drifted = rebuild_product_stock()
+            self.stdout.write(f"Corrected {drifted} product stock quantities")
+
+        self.stdout.write(self.style.SUCCESS("Stock reconciliation complete"))
+
+    def report(self, facility_id, products):
+        drift = balance_drift(facility_id=facility_id)
+        for item_id, balance_facility_id, quantity, ledger_total in drift:
+            balance = "missing" if quantity is None else quantity
+            self.stdout.write(
+                f"Item {item_id} at facility {balance_facility_id}: "
+                f"balance {balance}, ledger {ledger_total}"
+            )
+        self.stdout.write(f"{len(drift)} stock balances differ from the ledger")
+
+        if products:
+            drift = product_stock_drift()
+            for product_id, stock_quantity, batch_total in drift:
+                self.stdout.write(
+                    f"Product {product_id}: stock {stock_quantity}, "
+                    f"batches {batch_total}"
+                )
+            self.stdout.write(
+                f"{len(drift)} product stock quantities differ from their batches"
+            )
+
+        self.stdout.write(self.style.WARNING("Dry run, nothing was changed"))
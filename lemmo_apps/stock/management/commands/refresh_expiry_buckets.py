@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+
+from lemmo_apps.stock.services.expiry_buckets import refresh_expiry_buckets
+
+
+class Command(BaseCommand):
+    help = "Rebuild per-facility, per-product expiry buckets (run nightly)"
+
+    def handle(self, *args, **options):
+        self.stdout.write("Rebuilding expiry buckets...")
+        count = refresh_expiry_buckets()
+        self.stdout.write(self.style.SUCCESS(f"Stored {count} expiry buckets"))
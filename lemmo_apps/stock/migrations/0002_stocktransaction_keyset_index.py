@@ -0,0 +1,19 @@
+# Generated by Django 5.2.4 on 2026-10-17 09:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("stock", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="stocktransaction",
+            index=models.Index(
+                fields=["created_at", "id"], name="stock_txn_created_id_idx"
+            ),
+        ),
+    ]
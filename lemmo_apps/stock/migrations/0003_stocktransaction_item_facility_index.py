@@ -0,0 +1,19 @@
+# Generated by Django 5.2.4 on 2026-10-17 10:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("stock", "0002_stocktransaction_keyset_index"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="stocktransaction",
+            index=models.Index(
+                fields=["item", "facility"], name="stock_txn_item_facility_idx"
+            ),
+        ),
+    ]
@@ -0,0 +1,72 @@
+# Generated by Django 5.2.4 on 2026-10-17 11:20
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("inventory", "0004_expiry_indexes"),
+        ("location", "0001_initial"),
+        ("stock", "0003_stocktransaction_item_facility_index"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ExpiryBucket",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "bucket",
+                    models.CharField(
+                        choices=[
+                            ("EXPIRED", "Expired"),
+                            ("DAYS_0_30", "0-30 days"),
+                            ("DAYS_31_90", "31-90 days"),
+                            ("OVER_90", "Over 90 days"),
+                        ],
+                        max_length=20,
+                    ),
+                ),
+                ("quantity", models.PositiveIntegerField(default=0)),
+                ("lot_count", models.PositiveIntegerField(default=0)),
+                ("computed_on", models.DateField()),
+                (
+                    "facility",
+                    models.ForeignKey(
+                        blank=True,
+                        null=True,
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="expiry_buckets",
+                        to="location.facility",
+                    ),
+                ),
+                (
+                    "product",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="expiry_buckets",
+                        to="inventory.product",
+                    ),
+                ),
+            ],
+            options={
+                "db_table": "tblExpiryBuckets",
+                "indexes": [
+                    models.Index(
+                        fields=["bucket", "facility", "product"],
+                        name="expiry_bucket_lookup_idx",
+                    )
+                ],
+            },
+        ),
+    ]
@@ -0,0 +1,9 @@
+from .stock import Stock
+from .stock_transaction import StockTransaction
+from .expiry_bucket import ExpiryBucket
+
+__all__ = [
+    "Stock",
+    "StockTransaction",
+    "ExpiryBucket",
+]
@@ -0,0 +1,39 @@
+from django.db import models
+from lemmo_apps.inventory.models.product import Product
+from lemmo_apps.inventory.services.expiry import BUCKET_CHOICES
+from lemmo_apps.location.models.facility import Facility
+
+
+class ExpiryBucket(models.Model):
+    """Quantity of a product expiring within one window, rebuilt nightly.
+
+    Rows with a facility summarise that facility's stock lots; rows without
+    one summarise the product's central ``ProductBatch`` records.
+    """
+
+    facility = models.ForeignKey(
+        Facility,
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name="expiry_buckets",
+    )
+    product = models.ForeignKey(
+        Product, on_delete=models.CASCADE, related_name="expiry_buckets"
+    )
+    bucket = models.CharField(max_length=20, choices=BUCKET_CHOICES)
+    quantity = models.PositiveIntegerField(default=0)
+    lot_count = models.PositiveIntegerField(default=0)
+    computed_on = models.DateField()
+
+    class Meta:
+        db_table = "tblExpiryBuckets"
+        indexes = [
+            models.Index(
+                fields=["bucket", "facility", "product"],
+                name="expiry_bucket_lookup_idx",
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.product} @ {self.facility or 'central'}: {self.bucket}"
@@ -26,6 +26,12 @@ class StockTransaction(models.Model):
     class Meta:
         db_table = "tblStockTransactions"
         ordering = ["-created_at"]
+        indexes = [
+            models.Index(fields=["created_at", "id"], name="stock_txn_created_id_idx"),
+            models.Index(
+                fields=["item", "facility"], name="stock_txn_item_facility_idx"
+            ),
+        ]
 
     def __str__(self):
         return (
@@ -2,7 +2,19 @@ import graphene
 from graphene_django import DjangoObjectType
 from .models.stock import Stock
 from .models.stock_transaction import StockTransaction
+from .models.expiry_bucket import ExpiryBucket
+from lemmo_apps.inventory.models.item import Item
+from lemmo_apps.location.models.facility import Facility
 from django.db.models import F
+from lemmo_apps.dashboard.services.cache import cached_stats
+from lemmo_apps.gql.pagination import CountableConnection, KeysetConnectionField
+from lemmo_apps.gql.optimizer import optimize_queryset
+from lemmo_apps.stock.services.expiry_buckets import (
+    bucket_totals,
+    expired_stock,
+    expiring_stock,
+)
+from lemmo_apps.stock.services.ledger import InsufficientStock, record_movement
 
 
 class StockType(DjangoObjectType):
@@ -11,12 +23,28 @@ class StockType(DjangoObjectType):
         fields = "__all__"
 
 
+class StockConnection(CountableConnection):
+    class Meta:
+        node = StockType
+
+
 class StockTransactionType(DjangoObjectType):
     class Meta:
         model = StockTransaction
         fields = "__all__"
 
 
+class StockTransactionConnection(CountableConnection):
+    class Meta:
+        node = StockTransactionType
+
+
+class ExpiryBucketType(DjangoObjectType):
+    class Meta:
+        model = ExpiryBucket
+        fields = "__all__"
+
+
 class Query(graphene.ObjectType):
     # Stock queries
     stock = graphene.List(
@@ -28,6 +56,14 @@ class Query(graphene.ObjectType):
         offset=graphene.Int(),
     )
 
+    stock_connection = KeysetConnectionField(
+        StockConnection,
+        ordering=("-created_at", "-id"),
+        product_id=graphene.UUID(),
+        facility_id=graphene.UUID(),
+        is_active=graphene.Boolean(),
+    )
+
     stock_item = graphene.Field(StockType, id=graphene.UUID(required=True))
 
     # Stock transaction queries
@@ -40,6 +76,14 @@ class Query(graphene.ObjectType):
         offset=graphene.Int(),
     )
 
+    stock_transactions_connection = KeysetConnectionField(
+        StockTransactionConnection,
+        ordering=("-created_at", "-id"),
+        stock_id=graphene.UUID(),
+        transaction_type=graphene.String(),
+        facility_id=graphene.UUID(),
+    )
+
     stock_transaction = graphene.Field(
         StockTransactionType, id=graphene.UUID(required=True)
     )
@@ -51,6 +95,15 @@ class Query(graphene.ObjectType):
     expiring_stock = graphene.List(StockType)
     expired_stock = graphene.List(StockType)
 
+    # Expiry buckets, rebuilt nightly by refresh_expiry_buckets
+    expiry_buckets = graphene.List(
+        ExpiryBucketType,
+        facility_id=graphene.UUID(),
+        product_id=graphene.UUID(),
+        bucket=graphene.String(),
+    )
+    expiry_summary = graphene.JSONString(facility_id=graphene.UUID())
+
     # Dashboard statistics
     stock_stats = graphene.JSONString()
     transaction_stats = graphene.JSONString()
@@ -64,7 +117,7 @@ class Query(graphene.ObjectType):
         limit=None,
         offset=None,
     ):
-        queryset = Stock.objects.all()
+        queryset = optimize_queryset(Stock.objects.all(), info)
 
         if product_id:
             queryset = queryset.filter(product_id=product_id)
@@ -83,6 +136,9 @@ class Query(graphene.ObjectType):
 
         return queryset
 
+    def resolve_stock_connection(self, info, **kwargs):
+        return Query.resolve_stock(self, info, **kwargs)
+
     def resolve_stock_item(self, info, id):
         return Stock.objects.get(id=id)
 
@@ -95,7 +151,7 @@ class Query(graphene.ObjectType):
         limit=None,
         offset=None,
     ):
-        queryset = StockTransaction.objects.all()
+        queryset = optimize_queryset(StockTransaction.objects.all(), info)
 
         if stock_id:
             queryset = queryset.filter(stock_id=stock_id)
@@ -114,36 +170,52 @@ class Query(graphene.ObjectType):
 
         return queryset
 
+    def resolve_stock_transactions_connection(self, info, **kwargs):
+        return Query.resolve_stock_transactions(self, info, **kwargs)
+
     def resolve_stock_transaction(self, info, id):
         return StockTransaction.objects.get(id=id)
 
     def resolve_low_stock(self, info):
-        return Stock.objects.filter(quantity__lte=F("reorder_point"), is_active=True)
+        return optimize_queryset(
+            Stock.objects.filter(quantity__lte=F("reorder_point"), is_active=True), info
+        )
 
     def resolve_out_of_stock(self, info):
-        return Stock.objects.filter(quantity=0, is_active=True)
+        return optimize_queryset(Stock.objects.filter(quantity=0, is_active=True), info)
 
     def resolve_overstocked(self, info):
-        return Stock.objects.filter(quantity__gt=F("max_stock_level"), is_active=True)
+        return optimize_queryset(
+            Stock.objects.filter(quantity__gt=F("max_stock_level"), is_active=True),
+            info,
+        )
 
     def resolve_expiring_stock(self, info):
-        from django.utils import timezone
-        from datetime import timedelta
-
-        expiry_threshold = timezone.now().date() + timedelta(days=30)
-        return Stock.objects.filter(
-            expiration_date__lte=expiry_threshold,
-            expiration_date__gte=timezone.now().date(),
-            is_active=True,
-        )
+        return optimize_queryset(expiring_stock(), info)
 
     def resolve_expired_stock(self, info):
-        from django.utils import timezone
+        return optimize_queryset(expired_stock(), info)
 
-        return Stock.objects.filter(
-            expiration_date__lt=timezone.now().date(), is_active=True
-        )
+    def resolve_expiry_buckets(
+        self, info, facility_id=None, product_id=None, bucket=None
+    ):
+        queryset = optimize_queryset(ExpiryBucket.objects.all(), info)
+
+        if facility_id:
+            queryset = queryset.filter(facility_id=facility_id)
+
+        if product_id:
+            queryset = queryset.filter(product_id=product_id)
+
+        if bucket:
+            queryset = queryset.filter(bucket=bucket)
+
+        return queryset
 
+    def resolve_expiry_summary(self, info, facility_id=None):
+        return bucket_totals(facility_id=facility_id)
+
+    @cached_stats("stock_stats", tags=("stock",))
     def resolve_stock_stats(self, info):
         from django.db.models import Count, Sum, Avg
         from django.db.models import F
@@ -181,6 +253,7 @@ class Query(graphene.ObjectType):
             "avg_stock_level": float(avg_stock_level),
         }
 
+    @cached_stats("transaction_stats", tags=("stock_transaction",))
     def resolve_transaction_stats(self, info):
         from django.db.models import Count, Sum
         from django.utils import timezone
@@ -217,8 +290,60 @@ class Query(graphene.ObjectType):
         }
 
 
+class RecordStockTransaction(graphene.Mutation):
+    class Arguments:
+        item_id = graphene.UUID(required=True)
+        facility_id = graphene.UUID(required=True)
+        quantity = graphene.Int(required=True)
+        transaction_type = graphene.String(required=True)
+        reference = graphene.String()
+        comment = graphene.String()
+
+    transaction = graphene.Field(StockTransactionType)
+    stock = graphene.Field(StockType)
+    success = graphene.Boolean()
+    message = graphene.String()
+
+    def mutate(
+        self,
+        info,
+        item_id,
+        facility_id,
+        quantity,
+        transaction_type,
+        reference=None,
+        comment=None,
+    ):
+        if transaction_type not in dict(StockTransaction.TRANSACTION_TYPES):
+            return RecordStockTransaction(
+                success=False, message="Invalid transaction type"
+            )
+        try:
+            transaction = record_movement(
+                item=Item.objects.get(id=item_id),
+                facility=Facility.objects.get(id=facility_id),
+                quantity=quantity,
+                transaction_type=transaction_type,
+                reference=reference,
+                comment=comment,
+            )
+        except Item.DoesNotExist:
+            return RecordStockTransaction(success=False, message="Item not found")
+        except Facility.DoesNotExist:
+            return RecordStockTransaction(success=False, message="Facility not found")
+        except InsufficientStock as e:
+            return RecordStockTransaction(success=False, message=str(e))
+
+        return RecordStockTransaction(
+            transaction=transaction,
+            stock=Stock.objects.get(item_id=item_id, facility_id=facility_id),
+            success=True,
+            message="Stock transaction recorded",
+        )
+
+
 class Mutation(graphene.ObjectType):
-    pass
+    record_stock_transaction = RecordStockTransaction.Field()
 
 
 schema = graphene.Schema(query=Query, mutation=Mutation)
@@ -0,0 +1,151 @@
+"""First-expiry-first-out allocation of facility stock.
+
+A product's stock at a facility is held as one ``Stock`` row per ``Item`` lot.
+Allocation locks only the lots it is going to read with
+``SELECT ... FOR UPDATE SKIP LOCKED``, so concurrent issues of the same
+product take different lots instead of queueing behind each other, and the
+resulting movements go through the ledger in the same transaction.
+"""
+
+from collections import defaultdict
+
+from django.db import transaction
+from django.db.models import F, Q
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from lemmo_apps.requisition.models.requisition_item import RequisitionItem
+from lemmo_apps.stock.models.stock import Stock
+from lemmo_apps.stock.models.stock_transaction import StockTransaction
+from lemmo_apps.stock.services.ledger import InsufficientStock, record_movements
+
+
+def _available_lots(facility_id, product_ids):
+    """Unexpired lots with stock, locked, in FEFO order per product."""
+    return (
+        Stock.objects.select_for_update(skip_locked=True, of=("self",))
+        .filter(
+            facility_id=facility_id,
+            item__product_id__in=product_ids,
+            quantity__gt=0,
+        )
+        .annotate(
+            product_id=F("item__product_id"),
+            expiry=Coalesce("item__expiry_date", "item__batch__expiry_date"),
+        )
+        .filter(Q(expiry__isnull=True) | Q(expiry__gte=timezone.now().date()))
+        .order_by("product_id", F("expiry").asc(nulls_last=True), "id")
+    )
+
+
+def _pick_lots(facility_id, demands, allow_partial):
+    """Map each product in ``demands`` to ``[(lot, quantity), ...]``."""
+    remaining = dict(demands)
+    picks = defaultdict(list)
+    for lot in _available_lots(facility_id, list(demands)):
+        wanted = remaining[lot.product_id]
+        if wanted <= 0:
+            continue
+        take = min(wanted, lot.quantity)
+        picks[lot.product_id].append((lot, take))
+        remaining[lot.product_id] = wanted - take
+
+    short = {product_id: left for product_id, left in remaining.items() if left > 0}
+    if short and not allow_partial:
+        raise InsufficientStock(
+            f"Not enough unexpired stock at facility {facility_id} for "
+            f"products {', '.join(str(product_id) for product_id in short)}"
+        )
+    return picks
+
+
+def allocate(
+    product_id,
+    facility_id,
+    quantity,
+    reference=None,
+    comment=None,
+    allow_partial=False,
+):
+    """Issue ``quantity`` of a product from a facility, earliest expiry first.
+
+    Returns the ``StockTransaction`` rows written, one per lot consumed.
+    """
+    with transaction.atomic():
+        picks = _pick_lots(facility_id, {product_id: quantity}, allow_partial)
+        return record_movements(
+            [
+                StockTransaction(
+                    item_id=lot.item_id,
+                    facility_id=facility_id,
+                    quantity=-take,
+                    transaction_type="ISSUE",
+                    reference=reference,
+                    comment=comment,
+                )
+                for lot, take in picks[product_id]
+            ]
+        )
+
+
+def fulfil_requisition(requisition, source_facility_id, allow_partial=True):
+    """Transfer every outstanding requisition line from ``source_facility_id``.
+
+    Lots are picked for all lines with one locked query, each line's product
+    may be served from any of its lots, and the transfers out of the source
+    and into the requesting facility are written in one transaction.
+    Returns the ``StockTransaction`` rows written.
+    """
+    reference = f"REQ-{requisition.pk}"
+    with transaction.atomic():
+        lines = list(
+            RequisitionItem.objects.select_for_update(of=("self",))
+            .filter(requisition=requisition)
+            .select_related("item")
+        )
+        outstanding = {}
+        for line in lines:
+            wanted = line.approved_quantity
+            if wanted is None:
+                wanted = line.requested_quantity
+            outstanding[line.pk] = max(wanted - (line.issued_quantity or 0), 0)
+
+        demands = defaultdict(int)
+        for line in lines:
+            demands[line.item.product_id] += outstanding[line.pk]
+        picks = _pick_lots(source_facility_id, demands, allow_partial)
+
+        movements = []
+        for line in lines:
+            wanted = outstanding[line.pk]
+            lots = picks[line.item.product_id]
+            while wanted > 0 and lots:
+                lot, available = lots[0]
+                take = min(wanted, available)
+                if take == available:
+                    lots.pop(0)
+                else:
+                    lots[0] = (lot, available - take)
+                wanted -= take
+                line.issued_quantity = (line.issued_quantity or 0) + take
+                for facility_id, signed, transaction_type in (
+                    (source_facility_id, -take, "TRANSFER_OUT"),
+                    (requisition.facility_id, take, "TRANSFER_IN"),
+                ):
+                    movements.append(
+                        StockTransaction(
+                            item_id=lot.item_id,
+                            facility_id=facility_id,
+                            quantity=signed,
+                            transaction_type=transaction_type,
+                            reference=reference,
+                        )
+                    )
+            outstanding[line.pk] = wanted
+
+        created = record_movements(movements)
+        RequisitionItem.objects.bulk_update(lines, ["issued_quantity"])
+        if not any(outstanding.values()):
+            requisition.status = "FULFILLED"
+            requisition.save()
+    return created
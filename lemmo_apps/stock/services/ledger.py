@@ -0,0 +1,254 @@
+"""Append-only stock ledger.
+
+Every movement is inserted as a ``StockTransaction``; the per-(item, facility)
+balance in ``Stock.quantity`` is moved by the same signed quantity with a
+single ``UPDATE ... SET quantity = quantity + n`` in the same database
+transaction, so concurrent movements never overwrite each other and reading a
+balance is one indexed row lookup. Product and batch counters are moved the
+same way. ``rebuild_balances`` recomputes balances from the ledger; balances
+with no ledger rows at all are left alone, since they predate the ledger or
+were set outside it.
+
+Queryset updates send no ``post_save``, so each write marks the matching
+dashboard cache tags stale itself once the transaction commits.
+"""
+
+from collections import defaultdict
+
+from django.db import transaction
+from django.db.models import (
+    Exists,
+    F,
+    IntegerField,
+    OuterRef,
+    Subquery,
+    Sum,
+    Value,
+)
+from django.db.models.functions import Coalesce
+
+from lemmo_apps.dashboard.services.cache import invalidate
+from lemmo_apps.inventory.models.product import Product, ProductBatch
+from lemmo_apps.stock.models.stock import Stock
+from lemmo_apps.stock.models.stock_transaction import StockTransaction
+
+
+class InsufficientStock(Exception):
+    """A movement would take a balance below zero."""
+
+
+def _invalidate(*tags):
+    transaction.on_commit(lambda: invalidate(*tags))
+
+
+def _apply_delta(queryset, field, delta):
+    """Atomically add ``delta`` to ``field``; False if it would go negative."""
+    if delta < 0:
+        queryset = queryset.filter(**{f"{field}__gte": -delta})
+    return queryset.update(**{field: F(field) + delta}) > 0
+
+
+def _move_balance(item_id, facility_id, delta):
+    balance = Stock.objects.filter(item_id=item_id, facility_id=facility_id)
+    if _apply_delta(balance, "quantity", delta):
+        return
+    if delta < 0 or balance.exists():
+        raise InsufficientStock(
+            f"Not enough stock of item {item_id} at facility {facility_id}"
+        )
+    # First movement for this pair; the unique (item, facility) constraint
+    # makes a concurrent creator fall through to the update below.
+    Stock.objects.get_or_create(item_id=item_id, facility_id=facility_id)
+    _apply_delta(balance, "quantity", delta)
+
+
+def record_movement(
+    item, facility, quantity, transaction_type, reference=None, comment=None
+):
+    """Insert one ledger row and move the matching balance.
+
+    ``quantity`` is signed: negative for stock leaving the facility.
+    """
+    return record_movements(
+        [
+            StockTransaction(
+                item=item,
+                facility=facility,
+                quantity=quantity,
+                transaction_type=transaction_type,
+                reference=reference,
+                comment=comment,
+            )
+        ]
+    )[0]
+
+
+def record_movements(movements):
+    """Insert unsaved ``StockTransaction`` rows and move their balances.
+
+    Movements are netted per (item, facility) and balances are updated in a
+    fixed order, so two callers touching the same pairs cannot deadlock.
+    Raises ``InsufficientStock`` and writes nothing if any balance would
+    go negative.
+    """
+    deltas = defaultdict(int)
+    for movement in movements:
+        deltas[(movement.item_id, movement.facility_id)] += movement.quantity
+
+    with transaction.atomic():
+        created = StockTransaction.objects.bulk_create(movements)
+        for (item_id, facility_id), delta in sorted(
+            deltas.items(), key=lambda pair: (str(pair[0][0]), str(pair[0][1]))
+        ):
+            if delta:
+                _move_balance(item_id, facility_id, delta)
+        _invalidate("stock", "stock_transaction")
+    return created
+
+
+def adjust_batch_quantity(batch_id, delta):
+    """Move a batch's remaining quantity and its product's stock together."""
+    with transaction.atomic():
+        batch = ProductBatch.objects.filter(pk=batch_id)
+        product_id = batch.values_list("product_id", flat=True).get()
+        if not _apply_delta(batch, "remaining_quantity", delta):
+            raise InsufficientStock(f"Not enough remaining in batch {batch_id}")
+        adjust_product_stock(product_id, delta)
+        _invalidate("product_batch")
+
+
+def adjust_product_stock(product_id, delta):
+    if not _apply_delta(Product.objects.filter(pk=product_id), "stock_quantity", delta):
+        raise InsufficientStock(f"Not enough stock of product {product_id}")
+    _invalidate("product")
+
+
+def _ledger_total():
+    totals = (
+        StockTransaction.objects.filter(
+            item=OuterRef("item"), facility=OuterRef("facility")
+        )
+        .values("item", "facility")
+        .annotate(total=Sum("quantity"))
+        .values("total")
+    )
+    return Coalesce(Subquery(totals), Value(0), output_field=IntegerField())
+
+
+def _has_ledger():
+    return Exists(
+        StockTransaction.objects.filter(
+            item=OuterRef("item"), facility=OuterRef("facility")
+        )
+    )
+
+
+def _scope(facility_id):
+    transactions = StockTransaction.objects.all()
+    balances = Stock.objects.filter(_has_ledger())
+    if facility_id is not None:
+        transactions = transactions.filter(facility_id=facility_id)
+        balances = balances.filter(facility_id=facility_id)
+    return transactions, balances
+
+
+def balance_drift(facility_id=None):
+    """List the balances that differ from their ledger total.
+
+    Returns ``(item_id, facility_id, quantity, ledger_total)`` tuples;
+    ``quantity`` is None for pairs with ledger rows but no ``Stock`` row yet.
+    """
+    transactions, balances = _scope(facility_id)
+    drift = list(
+        balances.annotate(ledger_total=_ledger_total())
+        .exclude(quantity=F("ledger_total"))
+        .values_list("item_id", "facility_id", "quantity", "ledger_total")
+    )
+    unbalanced = (
+        transactions.exclude(
+            Exists(
+                Stock.objects.filter(
+                    item=OuterRef("item"), facility=OuterRef("facility")
+                )
+            )
+        )
+        .values("item_id", "facility_id")
+        .annotate(total=Sum("quantity"))
+        .order_by()
+    )
+    drift.extend(
+        (row["item_id"], row["facility_id"], None, row["total"]) for row in unbalanced
+    )
+    return drift
+
+
+def rebuild_balances(facility_id=None):
+    """Recompute ``Stock.quantity`` from the ledger in bulk.
+
+    Only balances with ledger rows are touched. Returns the number of
+    existing balances that had drifted from their ledger total.
+    """
+    transactions, balances = _scope(facility_id)
+
+    with transaction.atomic():
+        ledger_total = _ledger_total()
+        drifted = (
+            balances.annotate(ledger_total=ledger_total)
+            .exclude(quantity=F("ledger_total"))
+            .count()
+        )
+        Stock.objects.bulk_create(
+            [
+                Stock(item_id=item_id, facility_id=facility_id)
+                for item_id, facility_id in transactions.values_list(
+                    "item_id", "facility_id"
+                ).distinct()
+            ],
+            ignore_conflicts=True,
+        )
+        balances.update(quantity=ledger_total)
+        _invalidate("stock")
+    return drifted
+
+
+def _batch_products(product_ids):
+    remaining = (
+        ProductBatch.objects.filter(product=OuterRef("pk"))
+        .values("product")
+        .annotate(total=Sum("remaining_quantity"))
+        .values("total")
+    )
+    products = Product.objects.filter(
+        Exists(ProductBatch.objects.filter(product=OuterRef("pk")))
+    )
+    if product_ids is not None:
+        products = products.filter(pk__in=product_ids)
+    return products, Subquery(remaining, output_field=IntegerField())
+
+
+def product_stock_drift(product_ids=None):
+    """List ``(product_id, stock_quantity, batch_total)`` for drifted products."""
+    products, batch_total = _batch_products(product_ids)
+    return list(
+        products.annotate(batch_total=batch_total)
+        .exclude(stock_quantity=F("batch_total"))
+        .values_list("id", "stock_quantity", "batch_total")
+    )
+
+
+def rebuild_product_stock(product_ids=None):
+    """Recompute ``Product.stock_quantity`` from its batches' remaining quantity.
+
+    Limited to ``product_ids`` when given; products without batches are left
+    alone. Returns the number of products whose counter had drifted.
+    """
+    products, batch_total = _batch_products(product_ids)
+    with transaction.atomic():
+        drifted = (
+            products.annotate(batch_total=batch_total)
+            .exclude(stock_quantity=F("batch_total"))
+            .count()
+        )
+        products.update(stock_quantity=batch_total)
+        _invalidate("product")
+    return drifted
@@ -1,3 +1,265 @@
+from datetime import date, timedelta
+from decimal import Decimal
+from io import StringIO
+from unittest import mock
+
+from django.core.management import call_command
 from django.test import TestCase
+from django.utils import timezone
+
+from lemmo_apps.inventory.models.item import Item
+from lemmo_apps.inventory.models.product import Product, ProductBatch
+from lemmo_apps.inventory.models.product_management import Batch
+from lemmo_apps.location.models.facility import Facility
+from lemmo_apps.requisition.models.requisition import Requisition
+from lemmo_apps.requisition.models.requisition_item import RequisitionItem
+
+from .models.stock import Stock
+from .models.stock_transaction import StockTransaction
+from .services import ledger
+from .services.allocation import allocate, fulfil_requisition
+
+
+def make_product(code, **fields):
+    fields.setdefault("name", f"Product {code}")
+    fields.setdefault("unit_of_measure", "units")
+    fields.setdefault("price", Decimal("1.00"))
+    return Product.objects.create(code=code, **fields)
+
+
+def make_item(code, product, expiry_date=None):
+    batch = Batch.objects.create(code=f"B-{code}", name=f"Batch {code}")
+    return Item.objects.create(
+        code=code,
+        label=f"Item {code}",
+        price=Decimal("1.00"),
+        product=product,
+        batch=batch,
+        expiry_date=expiry_date,
+    )
+
+
+def make_facility(name):
+    return Facility.objects.create(
+        name=name,
+        address="1 Main St",
+        city="Springfield",
+        state="IL",
+        postal_code="62701",
+    )
+
+
+def make_batch(product, number, remaining, expires=date(2030, 1, 1)):
+    return ProductBatch.objects.create(
+        product=product,
+        batch_number=number,
+        quantity=remaining,
+        remaining_quantity=remaining,
+        manufacturing_date=date(2025, 1, 1),
+        expiration_date=expires,
+        cost_per_unit=Decimal("1.00"),
+    )
+
+
+def movement(item, facility, quantity, transaction_type="RECEIPT"):
+    return StockTransaction(
+        item=item,
+        facility=facility,
+        quantity=quantity,
+        transaction_type=transaction_type,
+    )
+
+
+class LedgerTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.product = make_product("P1")
+        cls.item = make_item("I1", cls.product)
+        cls.other_item = make_item("I2", cls.product)
+        cls.facility = make_facility("Central Store")
+
+    def balance(self, item=None):
+        return Stock.objects.get(
+            item=item or self.item, facility=self.facility
+        ).quantity
+
+    def test_movements_are_netted_into_one_balance(self):
+        ledger.record_movements(
+            [
+                movement(self.item, self.facility, 10),
+                movement(self.item, self.facility, -4, "ISSUE"),
+            ]
+        )
+
+        self.assertEqual(self.balance(), 6)
+        self.assertEqual(StockTransaction.objects.count(), 2)
+
+    def test_overdraw_writes_nothing(self):
+        ledger.record_movement(self.item, self.facility, 5, "RECEIPT")
+
+        with self.assertRaises(ledger.InsufficientStock):
+            ledger.record_movements(
+                [
+                    movement(self.other_item, self.facility, 3),
+                    movement(self.item, self.facility, -6, "ISSUE"),
+                ]
+            )
+
+        self.assertEqual(self.balance(), 5)
+        self.assertEqual(StockTransaction.objects.count(), 1)
+        self.assertFalse(
+            Stock.objects.filter(item=self.other_item, quantity__gt=0).exists()
+        )
+
+    def test_cache_tags_are_invalidated_on_commit(self):
+        with mock.patch.object(ledger, "invalidate") as invalidate:
+            with self.captureOnCommitCallbacks(execute=True):
+                ledger.record_movement(self.item, self.facility, 1, "RECEIPT")
+                invalidate.assert_not_called()
+
+        invalidate.assert_called_once_with("stock", "stock_transaction")
+
+    def test_rebuild_corrects_drift_and_creates_missing_balances(self):
+        ledger.record_movement(self.item, self.facility, 7, "RECEIPT")
+        Stock.objects.filter(item=self.item).update(quantity=2)
+        StockTransaction.objects.create(
+            item=self.other_item,
+            facility=self.facility,
+            quantity=3,
+            transaction_type="RECEIPT",
+        )
+
+        self.assertEqual(
+            sorted(ledger.balance_drift(), key=lambda row: row[2] is None),
+            [
+                (self.item.pk, self.facility.pk, 2, 7),
+                (self.other_item.pk, self.facility.pk, None, 3),
+            ],
+        )
+        self.assertEqual(ledger.rebuild_balances(), 1)
+        self.assertEqual(self.balance(), 7)
+        self.assertEqual(self.balance(self.other_item), 3)
+        self.assertEqual(ledger.balance_drift(), [])
+
+    def test_rebuild_leaves_balances_without_ledger_rows_alone(self):
+        Stock.objects.create(item=self.item, facility=self.facility, quantity=40)
+
+        self.assertEqual(ledger.rebuild_balances(), 0)
+        self.assertEqual(self.balance(), 40)
+
+    def test_batch_adjustment_moves_batch_and_product(self):
+        batch = make_batch(self.product, "LOT-1", 10)
+        Product.objects.filter(pk=self.product.pk).update(stock_quantity=10)
+
+        ledger.adjust_batch_quantity(batch.pk, -4)
+        with self.assertRaises(ledger.InsufficientStock):
+            ledger.adjust_batch_quantity(batch.pk, -7)
+
+        batch.refresh_from_db()
+        self.product.refresh_from_db()
+        self.assertEqual(batch.remaining_quantity, 6)
+        self.assertEqual(self.product.stock_quantity, 6)
+
+
+class ProductStockRebuildTests(TestCase):
+    def test_products_without_batches_are_skipped(self):
+        batched = make_product("P1", stock_quantity=1)
+        make_batch(batched, "LOT-1", 4)
+        make_batch(batched, "LOT-2", 5)
+        unbatched = make_product("P2", stock_quantity=12)
+
+        self.assertEqual(ledger.product_stock_drift(), [(batched.pk, 1, 9)])
+        self.assertEqual(ledger.rebuild_product_stock(), 1)
+
+        batched.refresh_from_db()
+        unbatched.refresh_from_db()
+        self.assertEqual(batched.stock_quantity, 9)
+        self.assertEqual(unbatched.stock_quantity, 12)
+
+
+class ReconcileStockCommandTests(TestCase):
+    def test_dry_run_reports_without_changing_anything(self):
+        product = make_product("P1")
+        item = make_item("I1", product)
+        facility = make_facility("Central Store")
+        ledger.record_movement(item, facility, 8, "RECEIPT")
+        Stock.objects.filter(item=item).update(quantity=3)
+        out = StringIO()
+
+        call_command("reconcile_stock", "--dry-run", stdout=out)
+
+        self.assertIn("balance 3, ledger 8", out.getvalue())
+        self.assertIn("1 stock balances differ from the ledger", out.getvalue())
+        self.assertEqual(Stock.objects.get(item=item).quantity, 3)
+
+
+class AllocationTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        today = timezone.now().date()
+        cls.product = make_product("P1")
+        cls.store = make_facility("Central Store")
+        cls.clinic = make_facility("Clinic")
+        cls.expired = make_item("EXP", cls.product, today - timedelta(days=1))
+        cls.late = make_item("LATE", cls.product, today + timedelta(days=90))
+        cls.soon = make_item("SOON", cls.product, today + timedelta(days=10))
+        cls.undated = make_item("NONE", cls.product)
+        for item, quantity in [
+            (cls.expired, 50),
+            (cls.late, 5),
+            (cls.soon, 4),
+            (cls.undated, 6),
+        ]:
+            ledger.record_movement(item, cls.store, quantity, "RECEIPT")
+
+    def balances(self, facility=None):
+        return dict(
+            Stock.objects.filter(facility=facility or self.store).values_list(
+                "item_id", "quantity"
+            )
+        )
+
+    def test_issues_earliest_expiry_first_and_skips_expired_lots(self):
+        created = allocate(self.product.pk, self.store.pk, 7, reference="ISS-1")
+
+        self.assertEqual(
+            [(row.item_id, row.quantity) for row in created],
+            [(self.soon.pk, -4), (self.late.pk, -3)],
+        )
+        self.assertEqual(
+            self.balances(),
+            {self.expired.pk: 50, self.soon.pk: 0, self.late.pk: 2, self.undated.pk: 6},
+        )
+
+    def test_undated_lots_are_used_last(self):
+        created = allocate(self.product.pk, self.store.pk, 12)
+
+        self.assertEqual(created[-1].item_id, self.undated.pk)
+        self.assertEqual(created[-1].quantity, -3)
+
+    def test_shortfall_raises_unless_partial_allowed(self):
+        with self.assertRaises(ledger.InsufficientStock):
+            allocate(self.product.pk, self.store.pk, 16)
+        self.assertEqual(self.balances()[self.soon.pk], 4)
+
+        created = allocate(self.product.pk, self.store.pk, 16, allow_partial=True)
+        self.assertEqual(sum(row.quantity for row in created), -15)
+
+    def test_requisition_is_transferred_and_fulfilled(self):
+        requisition = Requisition.objects.create(facility=self.clinic)
+        line = RequisitionItem.objects.create(
+            requisition=requisition,
+            item=self.late,
+            requested_quantity=9,
+            approved_quantity=6,
+            issued_quantity=1,
+        )
+
+        fulfil_requisition(requisition, self.store.pk)
 
-# Create your tests here.
+        line.refresh_from_db()
+        requisition.refresh_from_db()
+        self.assertEqual(line.issued_quantity, 6)
+        self.assertEqual(requisition.status, "FULFILLED")
+        self.assertEqual(self.balances(self.clinic), {self.soon.pk: 4, self.late.pk: 1})
+        self.assertEqual(self.balances()[self.late.pk], 4)
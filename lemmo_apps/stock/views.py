@@ -14,6 +14,7 @@ from django.utils import timezone
 from datetime import timedelta
 
 from .models.stock import Stock
+from .services.expiry_buckets import expired_stock, expiring_stock
 from .models.transaction import StockTransaction
 
 
@@ -193,9 +194,7 @@ class ExpiringStockView(LoginRequiredMixin, ListView):
     context_object_name = "expiring_items"
 
     def get_queryset(self):
-        # This would need to be implemented based on your item model structure
-        # For now, returning empty queryset
-        return Stock.objects.none()
+        return expiring_stock()
 
 
 class ExpiredStockView(LoginRequiredMixin, ListView):
@@ -204,9 +203,7 @@ class ExpiredStockView(LoginRequiredMixin, ListView):
     context_object_name = "expired_items"
 
     def get_queryset(self):
-        # This would need to be implemented based on your item model structure
-        # For now, returning empty queryset
-        return Stock.objects.none()
+        return expired_stock()
 
 
 class StockStatsView(LoginRequiredMixin, ListView):
@@ -7,6 +7,7 @@ from lemmo_apps.supplier.models.supplier import (
 )
 from lemmo_apps.supplier.models.purchase_order import PurchaseOrder, PurchaseOrderItem
 from lemmo_apps.supplier.models.contract import Contract, ContractTerm
+from lemmo_apps.totals import defer_totals
 from lemmo_apps.inventory.models.product import Product
 from lemmo_apps.location.models.facility import Facility
 from django.contrib.auth import get_user_model
@@ -347,27 +348,29 @@ class Command(BaseCommand):
 
             # Generate purchase order items
             num_items = random.randint(1, 5)
-            for j in range(num_items):
-                product = random.choice(products)
-
-                item_data = {
-                    "purchase_order": purchase_order,
-                    "product": product,
-                    "quantity": random.randint(10, 100),
-                    "unit_price": Decimal(str(random.uniform(5.0, 500.0))).quantize(
-                        Decimal("0.01")
-                    ),
-                    "received_quantity": random.randint(0, 100),
-                    "quality_control_passed": random.choice([True, False]),
-                    "batch_number": f"B{fake.unique.random_number(digits=6)}"
-                    if random.choice([True, False])
-                    else None,
-                    "notes": fake.text(max_nb_chars=200)
-                    if random.choice([True, False])
-                    else None,
-                }
-
-                PurchaseOrderItem.objects.create(**item_data)
+            # Recalculate the totals once, not after every line
+            with defer_totals():
+                for j in range(num_items):
+                    product = random.choice(products)
+
+                    item_data = {
+                        "purchase_order": purchase_order,
+                        "product": product,
+                        "quantity": random.randint(10, 100),
+                        "unit_price": Decimal(str(random.uniform(5.0, 500.0))).quantize(
+                            Decimal("0.01")
+                        ),
+                        "received_quantity": random.randint(0, 100),
+                        "quality_control_passed": random.choice([True, False]),
+                        "batch_number": f"B{fake.unique.random_number(digits=6)}"
+                        if random.choice([True, False])
+                        else None,
+                        "notes": fake.text(max_nb_chars=200)
+                        if random.choice([True, False])
+                        else None,
+                    }
+
+                    PurchaseOrderItem.objects.create(**item_data)
 
             if (i + 1) % 10 == 0:
                 self.stdout.write(f"Created {i + 1} purchase orders...")
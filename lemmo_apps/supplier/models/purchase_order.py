@@ -1,8 +1,10 @@
 from django.db import models
+from django.db.models import Sum
 from django.conf import settings
 from core.models import UUIDModel, TimeDataStampedModel
 from simple_history.models import HistoricalRecords
 from lemmo_apps.inventory.models.product import Product
+from lemmo_apps.totals import recalculate
 
 
 class PurchaseOrder(UUIDModel, TimeDataStampedModel):
@@ -118,12 +120,12 @@ class PurchaseOrder(UUIDModel, TimeDataStampedModel):
 
     def calculate_totals(self):
         """Calculate order totals"""
-        subtotal = sum(item.total_price for item in self.items.all())
+        subtotal = self.items.aggregate(subtotal=Sum("total_price"))["subtotal"] or 0
         self.subtotal = subtotal
         self.total_amount = (
             subtotal + self.tax_amount + self.shipping_amount - self.discount_amount
         )
-        self.save()
+        self.save(update_fields=["subtotal", "total_amount", "updated_at"])
 
 
 class PurchaseOrderItem(models.Model):
@@ -182,5 +184,10 @@ class PurchaseOrderItem(models.Model):
         # Calculate total price
         self.total_price = self.quantity_ordered * self.unit_price
         super().save(*args, **kwargs)
-        # Update purchase order totals
-        self.purchase_order.calculate_totals()
+        # Update purchase order totals, once per bulk operation under defer_totals
+        recalculate(self.purchase_order)
+
+    def delete(self, *args, **kwargs):
+        result = super().delete(*args, **kwargs)
+        recalculate(self.purchase_order)
+        return result
@@ -3,6 +3,8 @@ from graphene_django import DjangoObjectType
 from .models.supplier import Supplier, SupplierContact, SupplierRating
 from .models.purchase_order import PurchaseOrder, PurchaseOrderItem
 from .models.contract import Contract, ContractTerm
+from lemmo_apps.gql.pagination import CountableConnection, KeysetConnectionField
+from lemmo_apps.gql.optimizer import optimize_queryset
 
 
 class SupplierType(DjangoObjectType):
@@ -11,6 +13,11 @@ class SupplierType(DjangoObjectType):
         fields = "__all__"
 
 
+class SupplierConnection(CountableConnection):
+    class Meta:
+        node = SupplierType
+
+
 class SupplierContactType(DjangoObjectType):
     class Meta:
         model = SupplierContact
@@ -29,6 +36,11 @@ class PurchaseOrderType(DjangoObjectType):
         fields = "__all__"
 
 
+class PurchaseOrderConnection(CountableConnection):
+    class Meta:
+        node = PurchaseOrderType
+
+
 class PurchaseOrderItemType(DjangoObjectType):
     class Meta:
         model = PurchaseOrderItem
@@ -60,6 +72,16 @@ class Query(graphene.ObjectType):
         offset=graphene.Int(),
     )
 
+    suppliers_connection = KeysetConnectionField(
+        SupplierConnection,
+        ordering=("name", "id"),
+        supplier_type=graphene.String(),
+        status=graphene.String(),
+        is_active=graphene.Boolean(),
+        search=graphene.String(),
+        is_preferred=graphene.Boolean(),
+    )
+
     supplier = graphene.Field(SupplierType, id=graphene.UUID(required=True))
 
     # Supplier contact queries
@@ -90,6 +112,15 @@ class Query(graphene.ObjectType):
         offset=graphene.Int(),
     )
 
+    purchase_orders_connection = KeysetConnectionField(
+        PurchaseOrderConnection,
+        ordering=("-created_at", "-id"),
+        supplier_id=graphene.UUID(),
+        status=graphene.String(),
+        priority=graphene.String(),
+        requested_by=graphene.UUID(),
+    )
+
     purchase_order = graphene.Field(PurchaseOrderType, id=graphene.UUID(required=True))
 
     purchase_order_by_number = graphene.Field(
@@ -135,7 +166,7 @@ class Query(graphene.ObjectType):
         limit=None,
         offset=None,
     ):
-        queryset = Supplier.objects.all()
+        queryset = optimize_queryset(Supplier.objects.all(), info)
 
         if supplier_type:
             queryset = queryset.filter(supplier_type=supplier_type)
@@ -160,13 +191,16 @@ class Query(graphene.ObjectType):
 
         return queryset
 
+    def resolve_suppliers_connection(self, info, **kwargs):
+        return Query.resolve_suppliers(self, info, **kwargs)
+
     def resolve_supplier(self, info, id):
         return Supplier.objects.get(id=id)
 
     def resolve_supplier_contacts(
         self, info, supplier_id=None, contact_type=None, is_active=None
     ):
-        queryset = SupplierContact.objects.all()
+        queryset = optimize_queryset(SupplierContact.objects.all(), info)
 
         if supplier_id:
             queryset = queryset.filter(supplier_id=supplier_id)
@@ -182,7 +216,7 @@ class Query(graphene.ObjectType):
     def resolve_supplier_ratings(
         self, info, supplier_id=None, rating_type=None, limit=None, offset=None
     ):
-        queryset = SupplierRating.objects.all()
+        queryset = optimize_queryset(SupplierRating.objects.all(), info)
 
         if supplier_id:
             queryset = queryset.filter(supplier_id=supplier_id)
@@ -208,7 +242,7 @@ class Query(graphene.ObjectType):
         limit=None,
         offset=None,
     ):
-        queryset = PurchaseOrder.objects.all()
+        queryset = optimize_queryset(PurchaseOrder.objects.all(), info)
 
         if supplier_id:
             queryset = queryset.filter(supplier_id=supplier_id)
@@ -230,6 +264,9 @@ class Query(graphene.ObjectType):
 
         return queryset
 
+    def resolve_purchase_orders_connection(self, info, **kwargs):
+        return Query.resolve_purchase_orders(self, info, **kwargs)
+
     def resolve_purchase_order(self, info, id):
         return PurchaseOrder.objects.get(id=id)
 
@@ -246,7 +283,7 @@ class Query(graphene.ObjectType):
         limit=None,
         offset=None,
     ):
-        queryset = Contract.objects.all()
+        queryset = optimize_queryset(Contract.objects.all(), info)
 
         if supplier_id:
             queryset = queryset.filter(supplier_id=supplier_id)
@@ -275,32 +312,40 @@ class Query(graphene.ObjectType):
         return Contract.objects.get(contract_number=contract_number)
 
     def resolve_approved_suppliers(self, info):
-        return Supplier.objects.filter(status="ACTIVE", is_active=True)
+        return optimize_queryset(
+            Supplier.objects.filter(status="ACTIVE", is_active=True), info
+        )
 
     def resolve_preferred_suppliers(self, info):
-        return Supplier.objects.filter(is_preferred=True, is_active=True)
+        return optimize_queryset(
+            Supplier.objects.filter(is_preferred=True, is_active=True), info
+        )
 
     def resolve_active_contracts(self, info):
         from django.utils import timezone
 
         today = timezone.now().date()
-        return Contract.objects.filter(
+        queryset = Contract.objects.filter(
             status="ACTIVE", start_date__lte=today, end_date__gte=today
         )
+        return optimize_queryset(queryset, info)
 
     def resolve_expiring_contracts(self, info):
         from django.utils import timezone
         from datetime import timedelta
 
         expiry_threshold = timezone.now().date() + timedelta(days=90)
-        return Contract.objects.filter(
+        queryset = Contract.objects.filter(
             status="ACTIVE",
             end_date__lte=expiry_threshold,
             end_date__gte=timezone.now().date(),
         )
+        return optimize_queryset(queryset, info)
 
     def resolve_pending_orders(self, info):
-        return PurchaseOrder.objects.filter(status__in=["DRAFT", "SUBMITTED"])
+        return optimize_queryset(
+            PurchaseOrder.objects.filter(status__in=["DRAFT", "SUBMITTED"]), info
+        )
 
     def resolve_supplier_stats(self, info):
         from django.db.models import Count, Avg
@@ -378,8 +423,134 @@ class Query(graphene.ObjectType):
         }
 
 
+class PurchaseOrderLineInput(graphene.InputObjectType):
+    product_id = graphene.UUID(required=True)
+    quantity_ordered = graphene.Int(required=True)
+    unit_price = graphene.Decimal(required=True)
+    supplier_product_code = graphene.String()
+    expected_delivery_date = graphene.Date()
+    notes = graphene.String()
+
+
+class ReceiveLineInput(graphene.InputObjectType):
+    line_id = graphene.ID(required=True)
+    quantity = graphene.Int(required=True)
+    batch_number = graphene.String(required=True)
+    lot_number = graphene.String()
+    supplier_batch_number = graphene.String()
+    manufacturing_date = graphene.Date(required=True)
+    expiration_date = graphene.Date(required=True)
+    quality_control_passed = graphene.Boolean()
+    stock_item_id = graphene.ID()
+
+
+class CreatePurchaseOrder(graphene.Mutation):
+    class Arguments:
+        supplier_id = graphene.UUID(required=True)
+        po_number = graphene.String(required=True)
+        priority = graphene.String()
+        expected_delivery_date = graphene.Date()
+        shipping_address = graphene.String()
+        notes = graphene.String()
+        lines = graphene.List(graphene.NonNull(PurchaseOrderLineInput), required=True)
+
+    purchase_order = graphene.Field(PurchaseOrderType)
+    success = graphene.Boolean()
+    message = graphene.String()
+
+    def mutate(self, info, supplier_id, lines, **fields):
+        from .services.purchase_orders import create_purchase_order
+
+        try:
+            supplier = Supplier.objects.get(id=supplier_id)
+            user = info.context.user
+            purchase_order = create_purchase_order(
+                supplier,
+                [dict(line) for line in lines],
+                requested_by=user if user.is_authenticated else None,
+                **fields,
+            )
+            return CreatePurchaseOrder(
+                purchase_order=purchase_order,
+                success=True,
+                message=f"Created purchase order with {len(lines)} lines",
+            )
+        except Supplier.DoesNotExist:
+            return CreatePurchaseOrder(success=False, message="Supplier not found")
+        except ValueError as e:
+            return CreatePurchaseOrder(success=False, message=str(e))
+
+
+class AddPurchaseOrderItems(graphene.Mutation):
+    class Arguments:
+        purchase_order_id = graphene.UUID(required=True)
+        lines = graphene.List(graphene.NonNull(PurchaseOrderLineInput), required=True)
+
+    purchase_order = graphene.Field(PurchaseOrderType)
+    items = graphene.List(PurchaseOrderItemType)
+    success = graphene.Boolean()
+    message = graphene.String()
+
+    def mutate(self, info, purchase_order_id, lines):
+        from .services.purchase_orders import add_purchase_order_items
+
+        try:
+            purchase_order = PurchaseOrder.objects.get(id=purchase_order_id)
+            items = add_purchase_order_items(
+                purchase_order, [dict(line) for line in lines]
+            )
+            return AddPurchaseOrderItems(
+                purchase_order=purchase_order,
+                items=items,
+                success=True,
+                message=f"Added {len(items)} lines",
+            )
+        except PurchaseOrder.DoesNotExist:
+            return AddPurchaseOrderItems(
+                success=False, message="Purchase order not found"
+            )
+        except ValueError as e:
+            return AddPurchaseOrderItems(success=False, message=str(e))
+
+
+class ReceivePurchaseOrder(graphene.Mutation):
+    class Arguments:
+        purchase_order_id = graphene.UUID(required=True)
+        facility_id = graphene.UUID()
+        lines = graphene.List(graphene.NonNull(ReceiveLineInput), required=True)
+
+    purchase_order = graphene.Field(PurchaseOrderType)
+    batch_count = graphene.Int()
+    transaction_count = graphene.Int()
+    success = graphene.Boolean()
+    message = graphene.String()
+
+    def mutate(self, info, purchase_order_id, lines, facility_id=None):
+        from .services.purchase_orders import receive_purchase_order
+
+        try:
+            purchase_order, batches, transactions = receive_purchase_order(
+                purchase_order_id, [dict(line) for line in lines], facility_id
+            )
+            return ReceivePurchaseOrder(
+                purchase_order=purchase_order,
+                batch_count=len(batches),
+                transaction_count=len(transactions),
+                success=True,
+                message=f"Received {len(lines)} lines",
+            )
+        except PurchaseOrder.DoesNotExist:
+            return ReceivePurchaseOrder(
+                success=False, message="Purchase order not found"
+            )
+        except ValueError as e:
+            return ReceivePurchaseOrder(success=False, message=str(e))
+
+
 class Mutation(graphene.ObjectType):
-    pass
+    create_purchase_order = CreatePurchaseOrder.Field()
+    add_purchase_order_items = AddPurchaseOrderItems.Field()
+    receive_purchase_order = ReceivePurchaseOrder.Field()
 
 
 schema = graphene.Schema(query=Query, mutation=Mutation)
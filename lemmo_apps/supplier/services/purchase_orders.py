@@ -0,0 +1,229 @@
+"""Bulk line entry and receiving for purchase orders.
+
+Lines are written with ``bulk_create``/``bulk_update`` and the order totals
+recalculated once, so a several-hundred-line order or delivery costs a
+handful of queries rather than a few per line.
+"""
+
+from collections import Counter, defaultdict
+from decimal import Decimal
+
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.utils import timezone
+
+from lemmo_apps.inventory.models.item import Item
+from lemmo_apps.inventory.models.product import Product, ProductBatch
+from lemmo_apps.stock.models.stock_transaction import StockTransaction
+from lemmo_apps.stock.services.ledger import adjust_product_stock, record_movements
+from lemmo_apps.supplier.models.purchase_order import PurchaseOrder, PurchaseOrderItem
+from lemmo_apps.totals import recalculate
+
+RECEIVABLE_STATUSES = ("APPROVED", "ORDERED", "PARTIALLY_RECEIVED")
+
+
+def add_purchase_order_items(purchase_order, lines):
+    """Add many lines to ``purchase_order`` with one ``INSERT``.
+
+    ``lines`` are dicts of ``PurchaseOrderItem`` field values, with the
+    product given as ``product_id``; ``total_price`` is computed as in
+    ``PurchaseOrderItem.save``. The order totals are recalculated once.
+    Raises ``ValueError`` naming the first bad line; nothing is saved in that
+    case.
+    """
+    items = []
+    for index, line in enumerate(lines):
+        item = PurchaseOrderItem(purchase_order=purchase_order, **line)
+        if not item.quantity_ordered or item.quantity_ordered < 1:
+            raise ValueError(f"Line {index + 1}: quantity ordered must be at least 1")
+        if item.unit_price is None or Decimal(item.unit_price) < 0:
+            raise ValueError(f"Line {index + 1}: unit price must not be negative")
+        item.total_price = item.quantity_ordered * Decimal(item.unit_price)
+        items.append(item)
+
+    product_ids = {item.product_id for item in items}
+    known = {
+        str(pk)
+        for pk in Product.objects.filter(pk__in=product_ids).values_list(
+            "pk", flat=True
+        )
+    }
+    for index, item in enumerate(items):
+        if str(item.product_id) not in known:
+            raise ValueError(f"Line {index + 1}: unknown product {item.product_id}")
+
+    with transaction.atomic():
+        items = PurchaseOrderItem.objects.bulk_create(items)
+        recalculate(purchase_order)
+    return items
+
+
+def create_purchase_order(supplier, lines, **fields):
+    """Create a purchase order with all its lines in one transaction."""
+    po_number = fields.get("po_number")
+    if PurchaseOrder.objects.filter(po_number=po_number).exists():
+        raise ValueError(f"Purchase order {po_number} already exists")
+    with transaction.atomic():
+        purchase_order = PurchaseOrder.objects.create(supplier=supplier, **fields)
+        add_purchase_order_items(purchase_order, lines)
+    return purchase_order
+
+
+def _receipt_batch(purchase_order, item, line, index):
+    for field in ("batch_number", "manufacturing_date", "expiration_date"):
+        if not line.get(field):
+            raise ValueError(f"Line {index}: {field} is required")
+    return ProductBatch(
+        product_id=item.product_id,
+        batch_number=line["batch_number"],
+        lot_number=line.get("lot_number"),
+        quantity=line["quantity"],
+        remaining_quantity=line["quantity"],
+        manufacturing_date=line["manufacturing_date"],
+        expiration_date=line["expiration_date"],
+        cost_per_unit=item.unit_price,
+        supplier=purchase_order.supplier.name,
+        supplier_batch_number=line.get("supplier_batch_number"),
+        quality_control_passed=line.get("quality_control_passed", True),
+    )
+
+
+def receive_purchase_order(purchase_order_id, lines, facility_id=None):
+    """Receive many lines of a purchase order in one transaction.
+
+    Each line is a dict with the ``line_id`` of a ``PurchaseOrderItem``, the
+    ``quantity`` received, and the ``batch_number``, ``manufacturing_date``
+    and ``expiration_date`` of the delivered batch (optionally
+    ``lot_number``, ``supplier_batch_number``, ``quality_control_passed``).
+    Every line becomes a ``ProductBatch``; lines that name a ``stock_item_id``
+    (an ``Item`` of the line's product) are also booked into the stock ledger
+    as receipts at ``facility_id``.
+
+    Returns ``(purchase_order, batches, transactions)``. Raises ``ValueError``
+    naming the first bad line, in which case nothing is saved.
+    """
+    if not lines:
+        raise ValueError("Nothing to receive")
+    now = timezone.now()
+    today = now.date()
+    with transaction.atomic():
+        purchase_order = (
+            PurchaseOrder.objects.select_for_update()
+            .select_related("supplier")
+            .get(pk=purchase_order_id)
+        )
+        if purchase_order.status not in RECEIVABLE_STATUSES:
+            raise ValueError(
+                f"Purchase order is {purchase_order.get_status_display()}; "
+                "only approved or ordered purchase orders can be received"
+            )
+        items = {
+            str(item.pk): item
+            for item in PurchaseOrderItem.objects.select_for_update().filter(
+                purchase_order=purchase_order
+            )
+        }
+
+        batches, movements, changed, stock_lines = [], [], {}, []
+        for index, line in enumerate(lines, start=1):
+            item = items.get(str(line.get("line_id")))
+            if item is None:
+                raise ValueError(f"Line {index}: not a line of this purchase order")
+            quantity = line.get("quantity") or 0
+            if quantity < 1:
+                raise ValueError(f"Line {index}: quantity must be at least 1")
+            if quantity > item.quantity_outstanding:
+                raise ValueError(
+                    f"Line {index}: only {item.quantity_outstanding} outstanding"
+                )
+
+            batches.append(_receipt_batch(purchase_order, item, line, index))
+            item.quantity_received += quantity
+            item.batch_number = line["batch_number"]
+            item.lot_number = line.get("lot_number") or item.lot_number
+            item.expiration_date = line["expiration_date"]
+            item.actual_delivery_date = today
+            item.updated_at = now
+            if line.get("quality_control_passed") is False:
+                item.quality_control_passed = False
+            changed[item.pk] = item
+
+            if line.get("stock_item_id"):
+                if facility_id is None:
+                    raise ValueError(
+                        f"Line {index}: a facility is required to book stock"
+                    )
+                try:
+                    stock_item_id = Item._meta.pk.to_python(line["stock_item_id"])
+                except ValidationError:
+                    raise ValueError(f"Line {index}: invalid stock item id")
+                stock_lines.append((index, stock_item_id, item.product_id))
+                movements.append(
+                    StockTransaction(
+                        item_id=stock_item_id,
+                        facility_id=facility_id,
+                        quantity=quantity,
+                        transaction_type="RECEIPT",
+                        reference=purchase_order.po_number,
+                    )
+                )
+
+        batch_numbers = Counter(batch.batch_number for batch in batches)
+        repeated = [number for number, count in batch_numbers.items() if count > 1]
+        existing = list(
+            ProductBatch.objects.filter(batch_number__in=batch_numbers).values_list(
+                "batch_number", flat=True
+            )[:1]
+        )
+        if repeated or existing:
+            raise ValueError(f"Batch {(repeated or existing)[0]} already exists")
+        stock_products = dict(
+            Item.objects.filter(
+                pk__in={stock_item_id for _, stock_item_id, _ in stock_lines}
+            ).values_list("pk", "product_id")
+        )
+        for index, stock_item_id, product_id in stock_lines:
+            if stock_item_id not in stock_products:
+                raise ValueError(f"Line {index}: unknown stock item {stock_item_id}")
+            if stock_products[stock_item_id] != product_id:
+                raise ValueError(
+                    f"Line {index}: stock item {stock_item_id} is not "
+                    "an item of the ordered product"
+                )
+
+        batches = ProductBatch.objects.bulk_create(batches)
+        PurchaseOrderItem.objects.bulk_update(
+            changed.values(),
+            [
+                "quantity_received",
+                "batch_number",
+                "lot_number",
+                "expiration_date",
+                "actual_delivery_date",
+                "quality_control_passed",
+                "updated_at",
+            ],
+        )
+        received = defaultdict(int)
+        for batch in batches:
+            received[batch.product_id] += batch.remaining_quantity
+        # Fixed order, so two receipts touching the same products can't deadlock.
+        for product_id in sorted(received):
+            adjust_product_stock(product_id, received[product_id])
+        transactions = record_movements(movements) if movements else []
+
+        fully_received = all(item.quantity_outstanding == 0 for item in items.values())
+        purchase_order.status = (
+            "FULLY_RECEIVED" if fully_received else "PARTIALLY_RECEIVED"
+        )
+        purchase_order.received_at = now
+        purchase_order.actual_delivery_date = today
+        purchase_order.save(
+            update_fields=[
+                "status",
+                "received_at",
+                "actual_delivery_date",
+                "updated_at",
+            ]
+        )
+    return purchase_order, batches, transactions
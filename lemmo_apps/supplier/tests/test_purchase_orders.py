@@ -0,0 +1,152 @@
+from datetime import date
+from decimal import Decimal
+
+from django.test import TestCase
+
+from lemmo_apps.inventory.models.item import Item
+from lemmo_apps.inventory.models.product import Product, ProductBatch
+from lemmo_apps.inventory.models.product_management import Batch
+from lemmo_apps.location.models.facility import Facility
+from lemmo_apps.stock.models.stock import Stock
+from lemmo_apps.supplier.models.purchase_order import PurchaseOrder
+from lemmo_apps.supplier.models.supplier import Supplier
+from lemmo_apps.supplier.services.purchase_orders import (
+    add_purchase_order_items,
+    receive_purchase_order,
+)
+
+
+def make_product(code):
+    return Product.objects.create(
+        code=code, name=f"Product {code}", unit_of_measure="units", price=Decimal("1")
+    )
+
+
+def make_item(code, product):
+    return Item.objects.create(
+        code=code,
+        label=f"Item {code}",
+        price=Decimal("1.00"),
+        product=product,
+        batch=Batch.objects.create(code=f"B-{code}", name=f"Batch {code}"),
+    )
+
+
+class ReceivePurchaseOrderTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        address = {
+            "address": "1 Main St",
+            "city": "Springfield",
+            "state": "IL",
+            "postal_code": "62701",
+        }
+        cls.supplier = Supplier.objects.create(name="MedSupply", **address)
+        cls.facility = Facility.objects.create(name="Central Store", **address)
+        cls.product = make_product("P1")
+        cls.other_product = make_product("P2")
+        cls.stock_item = make_item("I1", cls.product)
+        cls.other_item = make_item("I2", cls.other_product)
+
+    def setUp(self):
+        self.purchase_order = PurchaseOrder.objects.create(
+            po_number="PO-1", supplier=self.supplier, status="ORDERED"
+        )
+        self.line, self.other_line = add_purchase_order_items(
+            self.purchase_order,
+            [
+                {
+                    "product_id": self.product.pk,
+                    "quantity_ordered": 10,
+                    "unit_price": Decimal("2.50"),
+                },
+                {
+                    "product_id": self.other_product.pk,
+                    "quantity_ordered": 4,
+                    "unit_price": Decimal("1.00"),
+                },
+            ],
+        )
+
+    def receipt(self, line, quantity, batch_number, **fields):
+        return {
+            "line_id": line.pk,
+            "quantity": quantity,
+            "batch_number": batch_number,
+            "manufacturing_date": date(2026, 1, 1),
+            "expiration_date": date(2028, 1, 1),
+            **fields,
+        }
+
+    def receive(self, *lines):
+        return receive_purchase_order(
+            self.purchase_order.pk, list(lines), facility_id=self.facility.pk
+        )
+
+    def test_lines_add_totals_once(self):
+        self.purchase_order.refresh_from_db()
+
+        self.assertEqual(self.purchase_order.subtotal, Decimal("29.00"))
+
+    def test_receipt_creates_batches_and_books_stock(self):
+        purchase_order, batches, transactions = self.receive(
+            self.receipt(self.line, 6, "LOT-1", stock_item_id=str(self.stock_item.pk)),
+        )
+
+        self.line.refresh_from_db()
+        self.product.refresh_from_db()
+        self.assertEqual(purchase_order.status, "PARTIALLY_RECEIVED")
+        self.assertEqual(self.line.quantity_received, 6)
+        self.assertEqual(batches[0].cost_per_unit, Decimal("2.50"))
+        self.assertEqual(self.product.stock_quantity, 6)
+        self.assertEqual(transactions[0].reference, "PO-1")
+        self.assertEqual(
+            Stock.objects.get(item=self.stock_item, facility=self.facility).quantity, 6
+        )
+
+    def test_receiving_everything_completes_the_order(self):
+        purchase_order, _, transactions = self.receive(
+            self.receipt(self.line, 10, "LOT-1"),
+            self.receipt(self.other_line, 4, "LOT-2"),
+        )
+
+        self.assertEqual(purchase_order.status, "FULLY_RECEIVED")
+        self.assertEqual(transactions, [])
+
+    def assertRejected(self, message, *lines):
+        with self.assertRaisesMessage(ValueError, message):
+            self.receive(*lines)
+        self.assertFalse(ProductBatch.objects.exists())
+        self.assertFalse(Stock.objects.exists())
+
+    def test_over_receipt_is_rejected(self):
+        self.assertRejected(
+            "Line 1: only 10 outstanding", self.receipt(self.line, 11, "LOT-1")
+        )
+
+    def test_repeated_batch_number_is_rejected(self):
+        self.assertRejected(
+            "Batch LOT-1 already exists",
+            self.receipt(self.line, 1, "LOT-1"),
+            self.receipt(self.other_line, 1, "LOT-1"),
+        )
+
+    def test_malformed_stock_item_id_is_rejected(self):
+        self.assertRejected(
+            "Line 2: invalid stock item id",
+            self.receipt(self.line, 1, "LOT-1"),
+            self.receipt(self.other_line, 1, "LOT-2", stock_item_id="not-an-id"),
+        )
+
+    def test_stock_item_of_another_product_is_rejected(self):
+        self.assertRejected(
+            "Line 1: stock item",
+            self.receipt(self.line, 1, "LOT-1", stock_item_id=str(self.other_item.pk)),
+        )
+
+    def test_order_that_is_not_ordered_cannot_be_received(self):
+        PurchaseOrder.objects.filter(pk=self.purchase_order.pk).update(status="DRAFT")
+
+        self.assertRejected(
+            "only approved or ordered", self.receipt(self.line, 1, "LOT-1")
+        )
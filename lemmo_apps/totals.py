@@ -0,0 +1,44 @@
+"""Deferred recalculation of document totals (shipments, purchase orders).
+
+Saving a line calls ``recalculate(document)``. Normally that recomputes the
+document's totals at once; inside ``defer_totals()`` each document is only
+recomputed once, when the block exits, however many of its lines were saved::
+
+    with transaction.atomic(), defer_totals():
+        for line in lines:
+            line.save()
+"""
+
+import threading
+from contextlib import contextmanager
+
+_local = threading.local()
+
+
+@contextmanager
+def defer_totals():
+    """Postpone ``recalculate`` calls until the outermost block exits.
+
+    Nothing is recalculated if the block raises.
+    """
+    if getattr(_local, "pending", None) is not None:
+        yield
+        return
+
+    _local.pending = {}
+    try:
+        yield
+        pending = _local.pending
+    finally:
+        _local.pending = None
+    for document in pending.values():
+        document.calculate_totals()
+
+
+def recalculate(document):
+    """Recompute ``document``'s totals now, or when ``defer_totals`` exits."""
+    pending = getattr(_local, "pending", None)
+    if pending is None:
+        document.calculate_totals()
+    else:
+        pending[(type(document), document.pk)] = document